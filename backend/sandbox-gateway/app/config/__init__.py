@@ -6,6 +6,9 @@ from app.config.constants import (
     AGENT_LABEL_PREFIX,
     QDRANT_LABEL,
     QDRANT_LABEL_PREFIX,
+    SANDBOX_POOL_LABEL,
+    SANDBOX_POOL_PREFIX,
+    POOL_QDRANT_LABEL_PREFIX,
     WS_MESSAGE_TYPE_ERROR,
     WS_MESSAGE_TYPE_DATA,
     WS_MESSAGE_TYPE_STATUS,
@@ -22,6 +25,9 @@ __all__ = [
     "AGENT_LABEL_PREFIX",
     "QDRANT_LABEL",
     "QDRANT_LABEL_PREFIX",
+    "SANDBOX_POOL_LABEL",
+    "SANDBOX_POOL_PREFIX",
+    "POOL_QDRANT_LABEL_PREFIX",
     "WS_MESSAGE_TYPE_ERROR",
     "WS_MESSAGE_TYPE_DATA",
     "WS_MESSAGE_TYPE_STATUS",
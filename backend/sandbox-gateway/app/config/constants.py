@@ -13,6 +13,11 @@ AGENT_LABEL_PREFIX = "sandbox-agent-"
 QDRANT_LABEL = "qdrant_id"
 QDRANT_LABEL_PREFIX = "sandbox-qdrant-"
 
+# 预热池容器标签，值为池内编号；被认领后容器重命名为正式的沙箱容器名，标签保持不变
+SANDBOX_POOL_LABEL = "sandbox_pool_id"
+SANDBOX_POOL_PREFIX = "sandbox-pool-"
+POOL_QDRANT_LABEL_PREFIX = "sandbox-pool-qdrant-"
+
 # WebSocket消息类型
 WS_MESSAGE_TYPE_ERROR = "error"
 WS_MESSAGE_TYPE_DATA = "data"
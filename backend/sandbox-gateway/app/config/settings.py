@@ -40,7 +40,37 @@ class Settings(BaseSettings):
 
     # WebSocket 接收消息超时时间（秒）
     ws_receive_timeout: float = Field(600.0, env="WS_RECEIVE_TIMEOUT")
-    
+
+    # 代理到容器的HTTP请求超时时间（秒），流式下载时为相邻两次读取的最大间隔
+    container_http_timeout: float = Field(60.0, env="CONTAINER_HTTP_TIMEOUT")
+
+    # 代理到容器的HTTP连接超时时间（秒）
+    container_http_connect_timeout: float = Field(5.0, env="CONTAINER_HTTP_CONNECT_TIMEOUT")
+
+    # 代理到容器的HTTP连接池大小
+    container_http_max_connections: int = Field(100, env="CONTAINER_HTTP_MAX_CONNECTIONS")
+
+    # DEBUG级别下WebSocket帧日志的采样率，每N帧记录一帧
+    ws_log_sample_rate: int = Field(1, env="WS_LOG_SAMPLE_RATE")
+
+    # Docker调用线程池大小，所有docker-py调用都在该线程池中执行，避免阻塞事件循环
+    docker_executor_workers: int = Field(8, env="DOCKER_EXECUTOR_WORKERS")
+
+    # 单次Docker调用超时时间（秒）
+    docker_call_timeout: float = Field(30.0, env="DOCKER_CALL_TIMEOUT")
+
+    # 创建、停止容器等耗时较长的Docker调用超时时间（秒）
+    docker_slow_call_timeout: float = Field(120.0, env="DOCKER_SLOW_CALL_TIMEOUT")
+
+    # 沙箱预热池大小（预先启动的Qdrant容器数量），0表示不启用
+    sandbox_pool_size: int = Field(0, env="SANDBOX_POOL_SIZE")
+
+    # 预热池中容器的最长空闲时间（秒），超过后销毁并重新创建，避免认领到运行过久的容器
+    sandbox_pool_max_idle_time: int = Field(1800, env="SANDBOX_POOL_MAX_IDLE_TIME")
+
+    # 预热池补充检查间隔（秒）
+    sandbox_pool_refill_interval: float = Field(10.0, env="SANDBOX_POOL_REFILL_INTERVAL")
+
     # Qdrant配置
     qdrant_image_name: str = Field("qdrant/qdrant:latest", env="QDRANT_IMAGE_NAME")
     qdrant_port: int = Field(6333, env="QDRANT_PORT")
@@ -5,59 +5,72 @@ import logging
 from typing import Optional
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 import httpx
 
 from app.services.sandbox_service import sandbox_service
 from app.utils.exceptions import async_handle_exceptions
+from app.utils.http_client import get_http_client
 
 logger = logging.getLogger("sandbox_gateway")
 
 # 创建API路由
 router = APIRouter(prefix="/sandboxes", tags=["chat"])
 
+# 不在代理两端之间转发的逐跳头部
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade"
+}
+
 
 @router.get("/{sandbox_id}/chat-history/download")
 @async_handle_exceptions
 async def proxy_chat_history_download(request: Request, sandbox_id: str) -> StreamingResponse:
     """
     代理下载聊天历史记录
-    
+
+    响应体按块原样转发，不在网关缓存完整文件；Range、If-Range、If-None-Match 等请求头和
+    ETag、Content-Range 等响应头透传，客户端可以断点续传或跳过未变化的下载。
+
     Args:
         request: FastAPI请求对象
         sandbox_id: 沙箱ID
-        
+
     Returns:
         StreamingResponse: 代理的聊天历史下载响应流
     """
     try:
-        # 获取沙箱容器
-        container = sandbox_service._get_agent_container_by_sandbox_id(sandbox_id)
-        if not container:
+        # 获取沙箱容器信息
+        container_info = await sandbox_service._get_agent_container_info(sandbox_id)
+        if not container_info:
             logger.error(f"找不到沙箱容器: {sandbox_id}")
             raise HTTPException(status_code=404, detail=f"无法找到沙箱 {sandbox_id}")
-            
-        # 获取容器信息
-        container_info = sandbox_service._get_container_info(container)
-        
+
         # 构建API请求URL
         target_url = f"http://{container_info.ip}:{container_info.ws_port}/api/chat-history/download"
-        
-        # 使用httpx代理请求
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                target_url,
-                headers={k: v for k, v in request.headers.items() if k.lower() not in ["host", "content-length"]},
-                follow_redirects=True
-            )
-            
-            # 返回流式响应
-            return StreamingResponse(
-                response.aiter_bytes(),
-                status_code=response.status_code,
-                headers=dict(response.headers),
-                media_type=response.headers.get("content-type")
-            )
+
+        # 使用共享的连接池发起流式请求，响应头到达后即开始向客户端转发
+        client = get_http_client()
+        upstream_request = client.build_request(
+            "GET",
+            target_url,
+            headers={
+                k: v for k, v in request.headers.items()
+                if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() not in ["host", "content-length"]
+            }
+        )
+        response = await client.send(upstream_request, stream=True, follow_redirects=True)
+
+        # 转发未解码的原始字节，Content-Encoding、Content-Length 与响应体保持一致；
+        # 客户端读取变慢时 StreamingResponse 不再读取上游，形成背压
+        return StreamingResponse(
+            response.aiter_raw(),
+            status_code=response.status_code,
+            headers={k: v for k, v in response.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS},
+            background=BackgroundTask(response.aclose)
+        )
     except httpx.RequestError as e:
         error_msg = f"代理请求出错: {str(e)}"
         logger.error(error_msg)
-        raise HTTPException(status_code=500, detail=error_msg) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=error_msg)
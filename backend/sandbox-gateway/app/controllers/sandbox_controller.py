@@ -9,7 +9,8 @@ from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from app.models.sandbox import (
     SandboxCreateResponse, SandboxInfo, SandboxData,
     SandboxListResponse, SandboxDetailResponse,
-    SandboxDeleteResponse, DeleteResponse, SandboxCreateRequest
+    SandboxDeleteResponse, DeleteResponse, SandboxCreateRequest,
+    WebSocketStats, WebSocketStatsResponse
 )
 from app.services.sandbox_service import sandbox_service
 from app.utils.exceptions import async_handle_exceptions
@@ -50,7 +51,7 @@ async def list_sandboxes() -> SandboxListResponse:
     Returns:
         SandboxListResponse: 沙箱容器列表响应
     """
-    sandboxes = sandbox_service.list_sandboxes()
+    sandboxes = await sandbox_service.list_sandboxes()
     return SandboxListResponse(data=sandboxes)
 
 
@@ -65,7 +66,7 @@ async def get_agent_container(sandbox_id: str) -> SandboxDetailResponse:
     Returns:
         SandboxDetailResponse: 沙箱容器信息响应
     """
-    sandbox = sandbox_service.get_agent_container(sandbox_id)
+    sandbox = await sandbox_service.get_agent_container(sandbox_id)
     if not sandbox:
         return SandboxDetailResponse(
             code=4004,
@@ -74,6 +75,21 @@ async def get_agent_container(sandbox_id: str) -> SandboxDetailResponse:
     return SandboxDetailResponse(data=sandbox)
 
 
+@router.get("/{sandbox_id}/ws-stats", response_model=WebSocketStatsResponse)
+async def get_websocket_stats(sandbox_id: str) -> WebSocketStatsResponse:
+    """
+    获取沙箱WebSocket代理的累计吞吐统计
+    
+    Args:
+        sandbox_id: 沙箱ID
+        
+    Returns:
+        WebSocketStatsResponse: 统计数据响应，沙箱尚无WebSocket连接时数据为空
+    """
+    stats = sandbox_service.get_websocket_stats(sandbox_id).get(sandbox_id)
+    return WebSocketStatsResponse(data=WebSocketStats(**stats) if stats else None)
+
+
 @router.delete("/{sandbox_id}", response_model=SandboxDeleteResponse)
 async def delete_sandbox(sandbox_id: str) -> SandboxDeleteResponse:
     """
@@ -85,7 +101,7 @@ async def delete_sandbox(sandbox_id: str) -> SandboxDeleteResponse:
     Returns:
         SandboxDeleteResponse: 删除操作响应
     """
-    sandbox_service.delete_sandbox(sandbox_id)
+    await sandbox_service.delete_sandbox(sandbox_id)
     return SandboxDeleteResponse(
         data=DeleteResponse(
             message=f"沙箱 {sandbox_id} 已成功删除"
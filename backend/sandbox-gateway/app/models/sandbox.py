@@ -66,6 +66,21 @@ class SandboxDeleteResponse(Response[DeleteResponse]):
     pass
 
 
+class WebSocketStats(BaseModel):
+    """WebSocket代理累计吞吐统计"""
+    connections: int = 0
+    frames_to_container: int = 0
+    bytes_to_container: int = 0
+    frames_to_client: int = 0
+    bytes_to_client: int = 0
+    frames_per_second: float = 0.0
+
+
+class WebSocketStatsResponse(Response[WebSocketStats]):
+    """WebSocket代理统计响应模型"""
+    pass
+
+
 class ContainerInfo(BaseModel):
     """容器信息模型，用于内部处理"""
     id: str
@@ -0,0 +1,289 @@
+"""
+沙箱预热池
+
+预先启动若干个未分配的Qdrant容器，创建沙箱时直接认领并重命名为正式的Qdrant容器名，
+把Qdrant的创建和健康检查等待从创建沙箱的请求路径上移走，池中容器被认领后在后台补充。
+
+Agent容器在启动时从环境变量读取沙箱ID和认证token（SANDBOX_ID、MAGIC_AUTHORIZATION），
+无法提前启动后再分配身份，因此不进入预热池，认领Qdrant后以正式的身份创建。
+"""
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+
+import docker
+
+from app.config import (
+    POOL_QDRANT_LABEL_PREFIX,
+    QDRANT_LABEL_PREFIX,
+    SANDBOX_LABEL,
+    SANDBOX_POOL_LABEL,
+    SANDBOX_POOL_PREFIX
+)
+from app.utils.exceptions import ContainerOperationError
+
+if TYPE_CHECKING:
+    from app.services.sandbox_service import SandboxService
+
+logger = logging.getLogger("sandbox_gateway")
+
+
+class _NameConflict(Exception):
+    """认领时沙箱的Qdrant容器名已被占用"""
+
+
+@dataclass
+class PooledQdrant:
+    """预热池中一个已就绪的Qdrant容器"""
+    pool_id: str
+    container: docker.models.containers.Container
+    created_at: float
+
+
+class SandboxPool:
+    """沙箱预热池，维护固定数量的已就绪Qdrant容器"""
+
+    def __init__(self, service: "SandboxService", size: int, max_idle_time: int, refill_interval: float):
+        """
+        初始化预热池
+
+        Args:
+            service: 沙箱服务，用于创建和操作容器
+            size: 池中保持的Qdrant容器数量，0表示不启用
+            max_idle_time: 容器在池中的最长空闲时间（秒）
+            refill_interval: 补充检查间隔（秒）
+        """
+        self._service = service
+        self.size = max(size, 0)
+        self.max_idle_time = max_idle_time
+        self.refill_interval = refill_interval
+        self._ready: List[PooledQdrant] = []
+        self._filling_tasks: Set[asyncio.Task] = set()
+        # 被认领容器的认领时间（容器ID → 时间戳），容器的启动时间早于认领时间，空闲清理按认领时间计算运行时长
+        self._claimed_at: Dict[str, float] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, int] = {
+            "claimed": 0,
+            "misses": 0,
+            "created": 0,
+            "failed": 0,
+            "expired": 0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用预热池"""
+        return self.size > 0
+
+    async def start(self) -> None:
+        """清理上次运行遗留的预热容器并启动后台补充任务"""
+        if not self.enabled or self._task:
+            return
+        await self._remove_stale_containers()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._maintain_loop())
+        logger.info(f"沙箱预热池已启动，目标数量: {self.size}")
+
+    async def stop(self) -> None:
+        """停止后台补充任务，池中容器留待下次启动时清理"""
+        tasks = list(self._filling_tasks)
+        if self._task:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        logger.info(f"沙箱预热池已停止，统计: {self.stats}")
+
+    async def claim(self, sandbox_id: str) -> bool:
+        """
+        从池中认领一个Qdrant容器并重命名为指定沙箱的Qdrant容器，Agent容器由调用方创建
+
+        Args:
+            sandbox_id: 沙箱ID
+
+        Returns:
+            bool: 是否认领成功，池为空或认领失败时返回False，由调用方冷启动
+        """
+        while self._ready:
+            # 优先认领最早创建的容器，减少因空闲过期被回收的数量
+            pooled = self._ready.pop(0)
+            self._notify_refill()
+            try:
+                assigned = await self._assign(pooled, sandbox_id)
+            except _NameConflict:
+                # 目标名称已被占用时换用其他预热容器也会冲突，停止认领，由调用方冷启动处理已有容器
+                self.stats["misses"] += 1
+                return False
+            if assigned:
+                self.stats["claimed"] += 1
+                logger.info(
+                    f"已从预热池认领沙箱，沙箱ID: {sandbox_id}，池内编号: {pooled.pool_id}，"
+                    f"剩余: {len(self._ready)}"
+                )
+                return True
+
+        self.stats["misses"] += 1
+        self._notify_refill()
+        logger.info(f"预热池为空，冷启动沙箱: {sandbox_id}")
+        return False
+
+    def get_claimed_at(self, container_id: str) -> Optional[float]:
+        """获取被认领容器的认领时间，非预热池容器返回None"""
+        return self._claimed_at.get(container_id)
+
+    def forget_claim(self, container_id: str) -> None:
+        """容器停止或删除后移除其认领时间"""
+        self._claimed_at.pop(container_id, None)
+
+    async def _assign(self, pooled: PooledQdrant, sandbox_id: str) -> bool:
+        """
+        校验容器仍在运行并重命名为正式的Qdrant容器名
+
+        Args:
+            pooled: 预热的Qdrant容器
+            sandbox_id: 沙箱ID
+
+        Returns:
+            bool: 是否成功
+        """
+        service = self._service
+        container = pooled.container
+        try:
+            await service._run_docker(container.reload)
+            if container.status != "running":
+                raise ContainerOperationError(f"预热容器 {container.name} 状态异常: {container.status}")
+
+            try:
+                await service._run_docker(container.rename, f"{QDRANT_LABEL_PREFIX}{sandbox_id}")
+            except docker.errors.APIError as e:
+                if e.status_code != 409:
+                    raise
+                # 名称冲突说明沙箱的Qdrant容器已存在，预热容器本身完好，归还到池中而不是删除
+                logger.warning(f"认领预热沙箱 {pooled.pool_id} 时名称冲突，已归还预热池: {e}")
+                self._ready.insert(0, pooled)
+                raise _NameConflict(sandbox_id) from e
+            # 运行时长从认领时开始计算，避免刚认领的容器因在池中等待的时间被空闲清理停止
+            self._claimed_at[container.id] = time.time()
+            return True
+        except _NameConflict:
+            raise
+        except Exception as e:
+            logger.warning(f"认领预热沙箱 {pooled.pool_id} 失败: {e}")
+            await self._discard(pooled)
+            return False
+
+    def _notify_refill(self) -> None:
+        """唤醒后台任务立即补充"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _maintain_loop(self) -> None:
+        """后台任务：回收过期容器并补充到目标数量"""
+        while True:
+            try:
+                await self._evict_expired()
+                self._refill()
+            except Exception as e:
+                logger.error(f"维护沙箱预热池时出错: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _evict_expired(self) -> None:
+        """回收在池中空闲过久的容器"""
+        now = time.time()
+        expired = [pooled for pooled in self._ready if now - pooled.created_at > self.max_idle_time]
+        if not expired:
+            return
+        self._ready = [pooled for pooled in self._ready if pooled not in expired]
+        for pooled in expired:
+            self.stats["expired"] += 1
+            logger.info(f"预热沙箱 {pooled.pool_id} 空闲超过 {self.max_idle_time} 秒，回收")
+            await self._discard(pooled)
+
+    def _refill(self) -> None:
+        """按缺口并行创建容器，不等待创建完成"""
+        missing = self.size - len(self._ready) - len(self._filling_tasks)
+        for _ in range(missing):
+            task = asyncio.create_task(self._fill_one())
+            self._filling_tasks.add(task)
+            task.add_done_callback(self._filling_tasks.discard)
+
+    async def _fill_one(self) -> None:
+        """创建一个容器并放入池中"""
+        pooled = await self._create_pooled_sandbox()
+        if pooled:
+            self._ready.append(pooled)
+            self.stats["created"] += 1
+            logger.info(f"预热沙箱已就绪: {pooled.pool_id}，当前数量: {len(self._ready)}/{self.size}")
+        else:
+            self.stats["failed"] += 1
+
+    async def _create_pooled_sandbox(self) -> Optional[PooledQdrant]:
+        """
+        创建一个预热的Qdrant容器并等待其通过健康检查
+
+        Returns:
+            Optional[PooledQdrant]: 就绪的容器，失败时返回None
+        """
+        service = self._service
+        pool_id = uuid.uuid4().hex[:8]
+        labels = {SANDBOX_LABEL: pool_id, SANDBOX_POOL_LABEL: pool_id}
+        container = None
+        try:
+            container = await service._run_qdrant_container(f"{POOL_QDRANT_LABEL_PREFIX}{pool_id}", labels)
+            container_info = await service._get_container_info(container)
+            if not await service._wait_for_qdrant_ready(container_info):
+                container_logs = await service._get_container_logs(container)
+                raise ContainerOperationError(f"健康检查失败\n容器日志:\n{container_logs}")
+
+            return PooledQdrant(pool_id=pool_id, container=container, created_at=time.time())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"创建预热沙箱 {pool_id} 失败: {e}")
+            if container:
+                await self._remove_container(container)
+            return None
+
+    async def _discard(self, pooled: PooledQdrant) -> None:
+        """删除一个预热容器"""
+        await self._remove_container(pooled.container)
+
+    async def _remove_container(self, container: docker.models.containers.Container) -> None:
+        """强制删除容器，失败时只记录日志"""
+        try:
+            await self._service._run_docker(
+                container.remove,
+                force=True,
+                timeout=self._service.docker_slow_call_timeout
+            )
+        except Exception as e:
+            logger.error(f"删除预热容器 {container.name} 时出错: {e}")
+
+    async def _remove_stale_containers(self) -> None:
+        """删除上次运行遗留的、未被认领的预热容器"""
+        service = self._service
+        try:
+            containers = await service._run_docker(
+                service.docker_client.containers.list,
+                all=True,
+                filters={"label": [SANDBOX_POOL_LABEL]}
+            )
+        except Exception as e:
+            logger.error(f"查询遗留的预热容器时出错: {e}")
+            return
+
+        stale = [container for container in containers if container.name.startswith(SANDBOX_POOL_PREFIX)]
+        if stale:
+            logger.info(f"清理 {len(stale)} 个遗留的预热容器")
+            await asyncio.gather(*(self._remove_container(container) for container in stale))
@@ -0,0 +1,274 @@
+"""
+沙箱注册表
+
+在进程内维护 sandbox_id → 容器信息（容器ID、IP、端口、状态）的映射，
+启动时全量同步一次，之后通过Docker事件流增量更新，
+使WebSocket连接、聊天记录下载等请求的路由只需一次字典查询，而不必每次调用Docker API。
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+import docker
+from docker.errors import NotFound
+
+from app.config import AGENT_LABEL_PREFIX, SANDBOX_LABEL
+from app.models.sandbox import ContainerInfo
+
+if TYPE_CHECKING:
+    from app.services.sandbox_service import SandboxService
+
+logger = logging.getLogger("sandbox_gateway")
+
+# 需要重新读取容器信息的事件，其余事件（exec、health_status等）不影响路由信息
+REFRESH_ACTIONS = {"create", "start", "restart", "die", "stop", "kill", "pause", "unpause", "rename", "update"}
+
+# 事件流断开后的重连间隔（秒）
+EVENTS_RECONNECT_DELAY = 2.0
+
+
+class SandboxRegistry:
+    """沙箱注册表，由Docker事件流保持最新"""
+
+    def __init__(self, service: "SandboxService"):
+        """
+        初始化注册表
+
+        Args:
+            service: 沙箱服务，用于访问Docker客户端和线程池
+        """
+        self._service = service
+        self._entries: Dict[str, ContainerInfo] = {}
+        self._container_sandbox_ids: Dict[str, str] = {}
+        # 沙箱记录最近一次写入或移除的时间（monotonic），全量同步时不覆盖同步开始后才变化的记录
+        self._updated_at: Dict[str, float] = {}
+        self._refreshing: Set[str] = set()
+        self._refresh_again: Set[str] = set()
+        self._synced = False
+        self._stopped = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._events_thread: Optional[threading.Thread] = None
+        self._events_stream: Any = None
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "events": 0, "resyncs": 0}
+
+    @property
+    def synced(self) -> bool:
+        """注册表是否与Docker保持同步（事件流正常时为True）"""
+        return self._synced
+
+    async def start(self) -> None:
+        """在后台线程中订阅Docker事件流，订阅成功后全量同步"""
+        if self._events_thread:
+            return
+        self._stopped = False
+        self._loop = asyncio.get_running_loop()
+        self._events_thread = threading.Thread(target=self._watch_events, name="docker-events", daemon=True)
+        self._events_thread.start()
+        logger.info("沙箱注册表已启动，开始监听Docker事件")
+
+    def stop(self) -> None:
+        """停止监听事件流"""
+        self._stopped = True
+        self._synced = False
+        if self._events_stream is not None:
+            try:
+                self._events_stream.close()
+            except Exception as e:
+                logger.debug(f"关闭Docker事件流时出错: {e}")
+        self._events_thread = None
+        logger.info(f"沙箱注册表已停止，统计: {self.stats}")
+
+    def get(self, sandbox_id: str) -> Optional[ContainerInfo]:
+        """
+        查询沙箱的Agent容器信息
+
+        Args:
+            sandbox_id: 沙箱ID
+
+        Returns:
+            Optional[ContainerInfo]: 容器信息，未同步或未找到时返回None，由调用方回退到Docker查询
+        """
+        if not self._synced:
+            return None
+        info = self._entries.get(sandbox_id)
+        if info:
+            self.stats["hits"] += 1
+        else:
+            self.stats["misses"] += 1
+        return info
+
+    def list_entries(self) -> List[Tuple[str, ContainerInfo]]:
+        """
+        列出注册表中的所有沙箱
+
+        Returns:
+            List[Tuple[str, ContainerInfo]]: (sandbox_id, 容器信息) 列表
+        """
+        return list(self._entries.items())
+
+    def put(self, sandbox_id: str, info: ContainerInfo) -> None:
+        """
+        写入沙箱的容器信息
+
+        Args:
+            sandbox_id: 沙箱ID
+            info: 容器信息
+        """
+        old = self._entries.get(sandbox_id)
+        if old and old.id != info.id:
+            self._container_sandbox_ids.pop(old.id, None)
+        self._entries[sandbox_id] = info
+        self._container_sandbox_ids[info.id] = sandbox_id
+        self._updated_at[sandbox_id] = time.monotonic()
+
+    def remove(self, sandbox_id: str) -> None:
+        """
+        移除沙箱
+
+        Args:
+            sandbox_id: 沙箱ID
+        """
+        info = self._entries.pop(sandbox_id, None)
+        if info:
+            self._container_sandbox_ids.pop(info.id, None)
+        self._updated_at[sandbox_id] = time.monotonic()
+
+    def _remove_container(self, container_id: str) -> None:
+        """按容器ID移除沙箱"""
+        sandbox_id = self._container_sandbox_ids.pop(container_id, None)
+        if sandbox_id and self._entries.get(sandbox_id) and self._entries[sandbox_id].id == container_id:
+            del self._entries[sandbox_id]
+            self._updated_at[sandbox_id] = time.monotonic()
+
+    def _update_from_container(self, container: docker.models.containers.Container) -> None:
+        """根据已加载属性的容器更新注册表，非Agent容器（如被重命名离开）会被移除"""
+        if not container.name.startswith(AGENT_LABEL_PREFIX):
+            self._remove_container(container.id)
+            return
+        sandbox_id = container.name[len(AGENT_LABEL_PREFIX):]
+        # 容器重命名后先移除旧名称下的记录
+        old_sandbox_id = self._container_sandbox_ids.get(container.id)
+        if old_sandbox_id and old_sandbox_id != sandbox_id:
+            self._remove_container(container.id)
+        self.put(sandbox_id, self._service._parse_container_info(container))
+
+    async def sync(self) -> None:
+        """
+        全量同步所有沙箱Agent容器
+
+        列出容器期间到达的事件和register/remove等调用会先更新注册表，
+        合并时保留同步开始后才变化的记录，只用列表结果更新其余沙箱
+        """
+        service = self._service
+        sync_started = time.monotonic()
+        containers = await service._run_docker(
+            service.docker_client.containers.list,
+            all=True,
+            filters={"label": [SANDBOX_LABEL]}
+        )
+        agent_containers = [container for container in containers if container.name.startswith(AGENT_LABEL_PREFIX)]
+        # 列表接口返回的属性格式与inspect不同，逐个reload获取完整信息
+        results = await asyncio.gather(
+            *(service._run_docker(container.reload) for container in agent_containers),
+            return_exceptions=True
+        )
+
+        entries: Dict[str, ContainerInfo] = {}
+        for container, result in zip(agent_containers, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"同步容器 {container.name} 信息失败: {result}")
+                continue
+            entries[container.name[len(AGENT_LABEL_PREFIX):]] = service._parse_container_info(container)
+
+        # 合并过程中没有await，注册表的其他修改都在事件循环中执行，不会与合并交错
+        for sandbox_id in [sandbox_id for sandbox_id in self._entries if sandbox_id not in entries]:
+            if self._updated_at.get(sandbox_id, 0.0) <= sync_started:
+                self.remove(sandbox_id)
+        for sandbox_id, info in entries.items():
+            if self._updated_at.get(sandbox_id, 0.0) <= sync_started:
+                self.put(sandbox_id, info)
+        # 早于本次同步的移除记录已无需保留
+        for sandbox_id in [
+            sandbox_id for sandbox_id, updated_at in self._updated_at.items()
+            if updated_at < sync_started and sandbox_id not in self._entries
+        ]:
+            del self._updated_at[sandbox_id]
+
+        self._synced = True
+        self.stats["resyncs"] += 1
+        logger.info(f"沙箱注册表已同步，沙箱数量: {len(self._entries)}")
+
+    def _watch_events(self) -> None:
+        """事件监听线程：订阅事件流并把事件转交给事件循环，断开后重连并重新全量同步"""
+        service = self._service
+        while not self._stopped:
+            try:
+                # 从订阅时刻开始接收事件，全量同步期间发生的变化会在之后的事件中补齐
+                self._events_stream = service.docker_client.events(
+                    decode=True,
+                    since=int(time.time()),
+                    filters={"type": "container", "label": [SANDBOX_LABEL]}
+                )
+                asyncio.run_coroutine_threadsafe(self._resync(), self._loop)
+                for event in self._events_stream:
+                    self._loop.call_soon_threadsafe(self._handle_event, event)
+            except RuntimeError:
+                # 事件循环已关闭
+                break
+            except Exception as e:
+                if self._stopped:
+                    break
+                logger.error(f"Docker事件流异常: {e}，{EVENTS_RECONNECT_DELAY}秒后重连")
+
+            # 事件流中断期间注册表可能过期，查询回退到Docker
+            self._synced = False
+            if not self._stopped:
+                time.sleep(EVENTS_RECONNECT_DELAY)
+
+    async def _resync(self) -> None:
+        """事件流订阅后的全量同步"""
+        try:
+            await self.sync()
+        except Exception as e:
+            logger.error(f"同步沙箱注册表失败: {e}")
+
+    def _handle_event(self, event: Dict[str, Any]) -> None:
+        """在事件循环中处理单个容器事件"""
+        self.stats["events"] += 1
+        action = (event.get("Action") or event.get("status") or "").split(":")[0]
+        container_id = event.get("Actor", {}).get("ID") or event.get("id")
+        if not container_id:
+            return
+
+        if action == "destroy":
+            self._remove_container(container_id)
+        elif action in REFRESH_ACTIONS:
+            self._schedule_refresh(container_id)
+
+    def _schedule_refresh(self, container_id: str) -> None:
+        """刷新容器信息，同一容器的刷新串行执行，刷新期间到达的事件合并为一次后续刷新"""
+        if container_id in self._refreshing:
+            self._refresh_again.add(container_id)
+            return
+        self._refreshing.add(container_id)
+        asyncio.create_task(self._refresh(container_id))
+
+    async def _refresh(self, container_id: str) -> None:
+        """重新读取容器信息并更新注册表"""
+        service = self._service
+        try:
+            while True:
+                self._refresh_again.discard(container_id)
+                try:
+                    container = await service._run_docker(service.docker_client.containers.get, container_id)
+                    self._update_from_container(container)
+                except NotFound:
+                    self._remove_container(container_id)
+                except Exception as e:
+                    logger.warning(f"刷新容器 {container_id[:12]} 信息失败: {e}")
+                if container_id not in self._refresh_again:
+                    break
+        finally:
+            self._refreshing.discard(container_id)
@@ -2,17 +2,20 @@
 沙箱服务核心逻辑
 """
 import asyncio
+import functools
 import json
 import logging
 import time
 import uuid
 import os
-from typing import Dict, List, Optional, Tuple, cast
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar, cast
 
 import docker
 import websockets
 import aiohttp
-from docker.errors import DockerException, ImageNotFound
+from docker.errors import DockerException, ImageNotFound, NotFound
 from fastapi import WebSocket, WebSocketDisconnect
 from starlette.websockets import WebSocketState
 from websockets.legacy.client import WebSocketClientProtocol
@@ -23,20 +26,73 @@ from app.config import (
     AGENT_LABEL_PREFIX,
     QDRANT_LABEL,
     QDRANT_LABEL_PREFIX,
+    SANDBOX_POOL_PREFIX,
     WS_MESSAGE_TYPE_ERROR,
     settings
 )
 from app.config.constants import AGENT_LABEL
 from app.models.sandbox import ContainerInfo, SandboxInfo
+from app.services.sandbox_pool import SandboxPool
+from app.services.sandbox_registry import SandboxRegistry
 from app.utils.exceptions import (
     ContainerOperationError,
     SandboxNotFoundError,
-    handle_exceptions,
     async_handle_exceptions
 )
 
 logger = logging.getLogger("sandbox_gateway")
 
+T = TypeVar("T")
+
+# DEBUG日志中帧内容的最大预览长度
+WS_LOG_PREVIEW_CHARS = 500
+
+
+def _preview_frame(data: Any) -> str:
+    """生成帧内容的日志预览，只在真正输出日志时调用"""
+    if isinstance(data, (bytes, bytearray)):
+        return f"<二进制帧 {len(data)} 字节>"
+    if len(data) > WS_LOG_PREVIEW_CHARS:
+        return f"{data[:WS_LOG_PREVIEW_CHARS]}...(共{len(data)}字符)"
+    return data
+
+
+def _frame_size(data: Any) -> int:
+    """帧的字节数，文本帧按 UTF-8 编码后的长度计算"""
+    if isinstance(data, str):
+        return len(data.encode())
+    return len(data)
+
+
+@dataclass
+class WebSocketProxyStats:
+    """WebSocket代理吞吐统计，帧大小按字节数计"""
+    connections: int = 0
+    frames_to_container: int = 0
+    bytes_to_container: int = 0
+    frames_to_client: int = 0
+    bytes_to_client: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def merge(self, other: "WebSocketProxyStats") -> None:
+        """累加另一个连接的统计"""
+        self.frames_to_container += other.frames_to_container
+        self.bytes_to_container += other.bytes_to_container
+        self.frames_to_client += other.frames_to_client
+        self.bytes_to_client += other.bytes_to_client
+
+    def to_dict(self) -> Dict[str, float]:
+        """转换为字典，包含自首次连接以来的平均帧率"""
+        duration = max(time.monotonic() - self.started_at, 1e-6)
+        return {
+            "connections": self.connections,
+            "frames_to_container": self.frames_to_container,
+            "bytes_to_container": self.bytes_to_container,
+            "frames_to_client": self.frames_to_client,
+            "bytes_to_client": self.bytes_to_client,
+            "frames_per_second": (self.frames_to_container + self.frames_to_client) / duration
+        }
+
 
 class SandboxService:
     """沙箱服务，负责管理Docker容器和WebSocket通信"""
@@ -52,6 +108,25 @@ class SandboxService:
             self.container_ws_port = settings.container_ws_port
             self.qdrant_port = settings.qdrant_port
             self.qdrant_grpc_port = settings.qdrant_grpc_port
+            self.docker_call_timeout = settings.docker_call_timeout
+            self.docker_slow_call_timeout = settings.docker_slow_call_timeout
+            # docker-py 为同步客户端，所有调用都放到有界线程池中执行，
+            # 避免Docker守护进程响应缓慢时阻塞事件循环（进而阻塞所有WebSocket代理）
+            self._docker_executor = ThreadPoolExecutor(
+                max_workers=settings.docker_executor_workers,
+                thread_name_prefix="docker"
+            )
+            # 每个沙箱的WebSocket代理累计统计
+            self._ws_stats: Dict[str, WebSocketProxyStats] = {}
+            # 沙箱注册表，通过Docker事件流维护 sandbox_id → 容器信息 的映射
+            self.sandbox_registry = SandboxRegistry(self)
+            # 沙箱预热池，sandbox_pool_size 为0时不启用
+            self.sandbox_pool = SandboxPool(
+                self,
+                size=settings.sandbox_pool_size,
+                max_idle_time=settings.sandbox_pool_max_idle_time,
+                refill_interval=settings.sandbox_pool_refill_interval
+            )
             # 获取网络配置，默认使用'bridge'
             self.network_name = os.environ.get('SANDBOX_NETWORK', 'bridge')
             logger.info(
@@ -59,13 +134,52 @@ class SandboxService:
                 f"运行中容器超时时间: {self.running_container_expire_time}秒, "
                 f"已退出容器过期时间: {self.exited_container_expire_time}秒, "
                 f"网络: {self.network_name}, "
-                f"Qdrant镜像: {self.qdrant_image_name}"
+                f"Qdrant镜像: {self.qdrant_image_name}, "
+                f"Docker线程池大小: {settings.docker_executor_workers}, "
+                f"预热池大小: {settings.sandbox_pool_size}"
             )
         except Exception as e:
             logger.error(f"Docker客户端初始化失败: {e}")
             raise
 
-    def _get_agent_container_by_sandbox_id(self, sandbox_id: str) -> Optional[docker.models.containers.Container]:
+    async def _run_docker(
+        self,
+        func: Callable[..., T],
+        *args: Any,
+        timeout: Optional[float] = None,
+        **kwargs: Any
+    ) -> T:
+        """
+        在Docker线程池中执行同步的docker-py调用
+
+        Args:
+            func: 要执行的docker-py方法
+            *args: 位置参数
+            timeout: 超时时间（秒），默认使用 docker_call_timeout
+            **kwargs: 关键字参数
+
+        Returns:
+            T: 调用结果
+
+        Raises:
+            ContainerOperationError: 调用超时
+        """
+        timeout = timeout or self.docker_call_timeout
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._docker_executor, functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            # 线程中的调用无法被中断，仅停止等待，由docker客户端自身的超时兜底
+            func_name = getattr(func, "__qualname__", repr(func))
+            raise ContainerOperationError(f"Docker调用超时({timeout}秒): {func_name}")
+
+    def shutdown(self) -> None:
+        """关闭Docker线程池，不等待仍在执行的调用"""
+        self._docker_executor.shutdown(wait=False)
+        logger.info("Docker线程池已关闭")
+
+    async def _get_agent_container_by_sandbox_id(self, sandbox_id: str) -> Optional[docker.models.containers.Container]:
         """
         通过沙箱ID获取对应的容器
 
@@ -76,17 +190,15 @@ class SandboxService:
             Container: 容器对象，如果未找到则返回None
         """
         try:
-            # 通过标签查找容器
-            containers = self.docker_client.containers.list(
-                all=True,
-                filters={"label": f"{AGENT_LABEL}={sandbox_id}"}
-            )
-            return containers[0] if containers else None
+            # 通过容器名查找容器（预热池容器被认领后只会重命名，标签无法修改）
+            return await self._run_docker(self.docker_client.containers.get, f"{AGENT_LABEL_PREFIX}{sandbox_id}")
+        except NotFound:
+            return None
         except Exception as e:
             logger.error(f"查询容器时出错: {e}")
             return None
 
-    def _get_qdrant_container_by_sandbox_id(self, sandbox_id: str) -> Optional[docker.models.containers.Container]:
+    async def _get_qdrant_container_by_sandbox_id(self, sandbox_id: str) -> Optional[docker.models.containers.Container]:
         """
         通过Qdrant ID获取对应的容器
 
@@ -97,17 +209,37 @@ class SandboxService:
             Container: 容器对象，如果未找到则返回None
         """
         try:
-            # 通过标签查找容器
-            containers = self.docker_client.containers.list(
-                all=True,
-                filters={"label": f"{QDRANT_LABEL}={sandbox_id}"}
-            )
-            return containers[0] if containers else None
+            # 通过容器名查找容器
+            return await self._run_docker(self.docker_client.containers.get, f"{QDRANT_LABEL_PREFIX}{sandbox_id}")
+        except NotFound:
+            return None
         except Exception as e:
             logger.error(f"查询Qdrant容器时出错: {e}")
             return None
 
-    def _get_container_info(self, container: docker.models.containers.Container) -> ContainerInfo:
+    async def _get_agent_container_info(self, sandbox_id: str) -> Optional[ContainerInfo]:
+        """
+        获取沙箱Agent容器的信息，优先查询注册表，未命中时回退到Docker查询并写回注册表
+
+        Args:
+            sandbox_id: 沙箱ID
+
+        Returns:
+            Optional[ContainerInfo]: 容器信息，如果沙箱不存在则返回None
+        """
+        container_info = self.sandbox_registry.get(sandbox_id)
+        if container_info:
+            return container_info
+
+        container = await self._get_agent_container_by_sandbox_id(sandbox_id)
+        if not container:
+            return None
+
+        container_info = await self._get_container_info(container)
+        self.sandbox_registry.put(sandbox_id, container_info)
+        return container_info
+
+    async def _get_container_info(self, container: docker.models.containers.Container) -> ContainerInfo:
         """
         获取容器的详细信息
 
@@ -117,8 +249,19 @@ class SandboxService:
         Returns:
             ContainerInfo: 容器信息
         """
-        container.reload()
+        await self._run_docker(container.reload)
+        return self._parse_container_info(container)
 
+    def _parse_container_info(self, container: docker.models.containers.Container) -> ContainerInfo:
+        """
+        从容器属性中解析容器信息，不访问Docker守护进程
+
+        Args:
+            container: 已加载属性的Docker容器对象
+
+        Returns:
+            ContainerInfo: 容器信息
+        """
         # 获取容器信息和网络设置
         network_settings = container.attrs['NetworkSettings']
         networks_data = network_settings['Networks']
@@ -188,7 +331,7 @@ class SandboxService:
             exited_at=exited_at
         )
 
-    def _get_container_logs(self, container: docker.models.containers.Container, tail: int = 100) -> str:
+    async def _get_container_logs(self, container: docker.models.containers.Container, tail: int = 100) -> str:
         """
         获取容器的日志
 
@@ -200,12 +343,41 @@ class SandboxService:
             str: 容器日志内容
         """
         try:
-            logs = container.logs(tail=tail, timestamps=True, stream=False).decode('utf-8')
+            logs = await self._run_docker(container.logs, tail=tail, timestamps=True, stream=False)
+            logs = logs.decode('utf-8')
             return logs
         except Exception as e:
             logger.error(f"获取时出错: {e}")
             return f"无法获取: {e}"
 
+    async def _get_container_logs_by_id(self, container_id: str, tail: int = 100) -> str:
+        """
+        根据容器ID获取容器的日志
+
+        Args:
+            container_id: Docker容器ID
+            tail: 返回的日志行数，默认为100行
+
+        Returns:
+            str: 容器日志内容
+        """
+        try:
+            container = await self._run_docker(self.docker_client.containers.get, container_id)
+        except Exception as e:
+            logger.error(f"获取时出错: {e}")
+            return f"无法获取: {e}"
+        return await self._get_container_logs(container, tail=tail)
+
+    async def _stop_and_remove_container(self, container: docker.models.containers.Container) -> None:
+        """
+        停止并删除容器
+
+        Args:
+            container: Docker容器对象
+        """
+        await self._run_docker(container.stop, timeout=self.docker_slow_call_timeout)
+        await self._run_docker(container.remove)
+
     @async_handle_exceptions
     async def _get_auth_token(self) -> Optional[str]:
         """
@@ -255,6 +427,119 @@ class SandboxService:
             logger.error(error_msg)
             raise ContainerOperationError(error_msg)
 
+    async def _run_agent_container(
+        self,
+        name: str,
+        labels: Dict[str, str],
+        sandbox_id: str,
+        qdrant_host: str
+    ) -> docker.models.containers.Container:
+        """
+        创建并启动Agent容器（不等待健康检查）
+
+        Args:
+            name: 容器名称
+            labels: 容器标签
+            sandbox_id: 写入容器环境变量的沙箱ID
+            qdrant_host: Agent访问Qdrant使用的主机名
+
+        Returns:
+            Container: 已启动的容器对象
+
+        Raises:
+            ContainerOperationError: 镜像不存在
+        """
+        # 检查镜像是否存在
+        try:
+            await self._run_docker(self.docker_client.images.get, self.image_name)
+            logger.info(f"使用镜像: {self.image_name}")
+        except ImageNotFound:
+            raise ContainerOperationError(f"镜像不存在: {self.image_name}")
+
+        # 准备容器环境变量
+        environment = {
+            "QDRANT_BASE_URI": f"http://{qdrant_host}:{self.qdrant_port}",
+            "SANDBOX_ID": sandbox_id,
+            "APP_ENV": settings.app_env,
+        }
+
+        token = await self._get_auth_token()
+        if token:
+            environment["MAGIC_AUTHORIZATION"] = token
+            logger.info("已成功获取认证 token 并添加到容器环境变量中")
+
+        # 读取Agent环境文件变量(文件必定存在，因为settings加载时已检查)
+        env_vars = dotenv_values(settings.agent_env_file_path)
+        if env_vars:
+            # 合并环境变量，允许环境文件中的变量覆盖默认值
+            environment.update(env_vars)
+            logger.info(f"已从Agent环境文件{settings.agent_env_file_path}添加{len(env_vars)}个环境变量")
+        else:
+            logger.warning(f"Agent环境文件{settings.agent_env_file_path}存在但未读取到任何环境变量")
+
+        # 创建并启动容器
+        # 挂载配置文件,判断/app/config/config.yaml是否存在
+        config_file_path = os.environ.get("SUPER_MAGIC_CONFIG_FILE_PATH")
+        if config_file_path:
+            volumes = {
+                config_file_path: {
+                    'bind': '/app/config/config.yaml',
+                    'mode': 'rw'
+                }
+            }
+            logger.info(f"使用配置文件: {config_file_path}")
+        else:
+            logger.warning(f"SUPER_MAGIC_CONFIG_FILE_PATH 配置文件不存在: {config_file_path}")
+            volumes = {}
+
+        # 挂载配置文件
+        container = await self._run_docker(
+            self.docker_client.containers.run,
+            self.image_name,
+            detach=True,
+            environment=environment,
+            name=name,
+            labels=labels,
+            network=self.network_name,  # 使用与网关相同的网络
+            volumes=volumes,
+            timeout=self.docker_slow_call_timeout
+        )
+        logger.info(f"容器已创建: {container.name}，使用网络: {self.network_name}")
+        return container
+
+    async def _run_qdrant_container(self, name: str, labels: Dict[str, str]) -> docker.models.containers.Container:
+        """
+        创建并启动Qdrant容器（不等待健康检查）
+
+        Args:
+            name: 容器名称
+            labels: 容器标签
+
+        Returns:
+            Container: 已启动的容器对象
+
+        Raises:
+            ContainerOperationError: 镜像不存在
+        """
+        # 检查Qdrant镜像是否存在
+        try:
+            await self._run_docker(self.docker_client.images.get, self.qdrant_image_name)
+            logger.info(f"使用Qdrant镜像: {self.qdrant_image_name}")
+        except ImageNotFound:
+            raise ContainerOperationError(f"Qdrant镜像不存在: {self.qdrant_image_name}")
+
+        # 创建并启动Qdrant容器
+        return await self._run_docker(
+            self.docker_client.containers.run,
+            self.qdrant_image_name,
+            detach=True,
+            environment={},
+            name=name,
+            labels=labels,
+            network=self.network_name,  # 使用与沙箱容器相同的网络
+            timeout=self.docker_slow_call_timeout
+        )
+
     @async_handle_exceptions
     async def _create_agent_container(self, sandbox_id: str) -> str:
         """
@@ -271,7 +556,7 @@ class SandboxService:
         """
         try:
             # 检查是否已存在处于退出状态的容器
-            container = self._get_agent_container_by_sandbox_id(sandbox_id)
+            container = await self._get_agent_container_by_sandbox_id(sandbox_id)
 
             if container:
                 if container.status == "running":
@@ -279,103 +564,52 @@ class SandboxService:
                 elif container.status == "exited":
                     logger.info(f"发现处于退出状态的Agent容器: {container.name}，尝试重新启动")
                     # 启动已有容器
-                    container.start()
+                    await self._run_docker(container.start, timeout=self.docker_slow_call_timeout)
                 else:
                     raise ContainerOperationError(f"Agent容器状态异常: {container.status}")
             else:
-                # 检查镜像是否存在
-                try:
-                    self.docker_client.images.get(self.image_name)
-                    logger.info(f"使用镜像: {self.image_name}")
-                except ImageNotFound:
-                    raise ContainerOperationError(f"镜像不存在: {self.image_name}")
-
-                # 准备容器环境变量
-                environment = {
-                    "QDRANT_BASE_URI": f"http://{QDRANT_LABEL_PREFIX}{sandbox_id}:{self.qdrant_port}",
-                    "SANDBOX_ID": sandbox_id,
-                    "APP_ENV": settings.app_env,
-                }
-
-                token = await self._get_auth_token()
-                if token:
-                    environment["MAGIC_AUTHORIZATION"] = token
-                    logger.info("已成功获取认证 token 并添加到容器环境变量中")
-
-                # 读取Agent环境文件变量(文件必定存在，因为settings加载时已检查)
-                env_vars = dotenv_values(settings.agent_env_file_path)
-                if env_vars:
-                    # 合并环境变量，允许环境文件中的变量覆盖默认值
-                    environment.update(env_vars)
-                    logger.info(f"已从Agent环境文件{settings.agent_env_file_path}添加{len(env_vars)}个环境变量")
-                else:
-                    logger.warning(f"Agent环境文件{settings.agent_env_file_path}存在但未读取到任何环境变量")
-
-                # 创建并启动容器
-                # 挂载配置文件,判断/app/config/config.yaml是否存在
-                config_file_path = os.environ.get("SUPER_MAGIC_CONFIG_FILE_PATH")
-                if config_file_path:
-                    volumes = {
-                        config_file_path: {
-                            'bind': '/app/config/config.yaml',
-                            'mode': 'rw'
-                        }
-                    }
-                    logger.info(f"使用配置文件: {config_file_path}")
-                else:
-                    logger.warning(f"SUPER_MAGIC_CONFIG_FILE_PATH 配置文件不存在: {config_file_path}")
-                    volumes = {}
-
-                # 挂载配置文件
-                container = self.docker_client.containers.run(
-                    self.image_name,
-                    detach=True,
-                    environment=environment,
+                container = await self._run_agent_container(
                     name=f"{AGENT_LABEL_PREFIX}{sandbox_id}",
                     labels={
                         AGENT_LABEL: sandbox_id,
                         SANDBOX_LABEL: sandbox_id
                     },
-                    network=self.network_name,  # 使用与网关相同的网络
-                    volumes=volumes
+                    sandbox_id=sandbox_id,
+                    qdrant_host=f"{QDRANT_LABEL_PREFIX}{sandbox_id}"
                 )
-                logger.info(f"容器已创建: {container.name}，使用网络: {self.network_name}")
 
             # 无论是启动已有容器还是创建新容器，以下代码都是一样的
-            # 等待容器启动
-            container.reload()
-
-            # 获取容器信息
-            container_info = self._get_container_info(container)
+            # 等待容器启动并获取容器信息
+            container_info = await self._get_container_info(container)
 
             # 使用健康检查端点确认容器是否准备就绪
             container_ready = await self._wait_for_container_ready(container_info)
             if not container_ready:
                 # 获取容器日志
-                container_logs = self._get_container_logs(container)
+                container_logs = await self._get_container_logs(container)
                 error_msg = "容器启动超时，健康检查失败"
                 logger.error(f"{error_msg}\n容器日志:\n{container_logs}")
                 # 清理容器
                 try:
-                    container.stop()
-                    container.remove()
+                    await self._stop_and_remove_container(container)
                 except Exception as e:
                     logger.error(f"清理失败的容器时出错: {e}")
                 raise ContainerOperationError(f"{error_msg}，详细错误信息请查看日志")
 
             if not container_info.ip:
                 # 获取容器日志
-                container_logs = self._get_container_logs(container)
+                container_logs = await self._get_container_logs(container)
                 error_msg = "无法获取容器IP地址"
                 logger.error(f"{error_msg}\n容器日志:\n{container_logs}")
                 # 清理容器
                 try:
-                    container.stop()
-                    container.remove()
+                    await self._stop_and_remove_container(container)
                 except Exception as e:
                     logger.error(f"清理失败的容器时出错: {e}")
                 raise ContainerOperationError(error_msg)
 
+            self.sandbox_registry.put(sandbox_id, container_info)
+
             # 打印沙箱容器的ip
             is_restarted = container and container.status == "exited"
             if is_restarted:
@@ -417,11 +651,31 @@ class SandboxService:
             sandbox_id = str(uuid.uuid4())[:8]
 
         try:
-            await self._create_qdrant_container(sandbox_id)
-            logger.info(f"Qdrant容器已创建，关联沙箱ID: {sandbox_id}")
+            existing_agent, existing_qdrant = await asyncio.gather(
+                self._get_agent_container_by_sandbox_id(sandbox_id),
+                self._get_qdrant_container_by_sandbox_id(sandbox_id)
+            )
+            # 任一容器已存在都不是新沙箱，不能认领预热容器，否则重命名会与已有的Qdrant容器冲突
+            is_new_sandbox = not existing_agent and not existing_qdrant
 
-            await self._create_agent_container(sandbox_id)
-            logger.info(f"Agent容器已创建，关联沙箱ID: {sandbox_id}")
+            # 新沙箱优先从预热池认领已就绪的Qdrant容器，Agent容器需要以正式的沙箱ID和token启动，始终在此创建
+            if is_new_sandbox and self.sandbox_pool.enabled and await self.sandbox_pool.claim(sandbox_id):
+                tasks = [self._create_agent_container(sandbox_id)]
+            else:
+                # 冷启动：Agent通过容器名访问Qdrant，不依赖Qdrant就绪，两个容器并行创建
+                tasks = [self._create_qdrant_container(sandbox_id), self._create_agent_container(sandbox_id)]
+
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            errors = [result for result in results if isinstance(result, BaseException)]
+            if errors:
+                # 任一容器失败时只删除本次调用创建的容器，避免留下不完整的沙箱，已存在的容器及其数据保持不变
+                await self._remove_sandbox_containers(
+                    sandbox_id,
+                    remove_agent=not existing_agent,
+                    remove_qdrant=not existing_qdrant
+                )
+                raise errors[0]
+            logger.info(f"Qdrant和Agent容器已创建，关联沙箱ID: {sandbox_id}")
 
             return sandbox_id
 
@@ -436,6 +690,38 @@ class SandboxService:
             logger.error(error_msg)
             raise ContainerOperationError(error_msg)
 
+    async def _remove_sandbox_containers(
+        self,
+        sandbox_id: str,
+        remove_agent: bool = True,
+        remove_qdrant: bool = True
+    ) -> None:
+        """
+        强制删除沙箱的Agent和Qdrant容器，失败时只记录日志
+
+        Args:
+            sandbox_id: 沙箱ID
+            remove_agent: 是否删除Agent容器
+            remove_qdrant: 是否删除Qdrant容器
+        """
+        lookups = []
+        if remove_agent:
+            lookups.append(self._get_agent_container_by_sandbox_id(sandbox_id))
+        if remove_qdrant:
+            lookups.append(self._get_qdrant_container_by_sandbox_id(sandbox_id))
+        containers = await asyncio.gather(*lookups)
+        for container in containers:
+            if not container:
+                continue
+            try:
+                await self._run_docker(container.remove, force=True, timeout=self.docker_slow_call_timeout)
+                self.sandbox_pool.forget_claim(container.id)
+                logger.info(f"已删除沙箱 {sandbox_id} 的容器: {container.name}")
+            except Exception as e:
+                logger.error(f"删除沙箱 {sandbox_id} 的容器 {container.name} 时出错: {e}")
+        if remove_agent:
+            self.sandbox_registry.remove(sandbox_id)
+
     @async_handle_exceptions
     async def _create_qdrant_container(self, sandbox_id: str) -> str:
         """
@@ -452,7 +738,7 @@ class SandboxService:
         """
         try:
             # 检查是否已存在处于退出状态的Qdrant容器
-            qdrant_container = self._get_qdrant_container_by_sandbox_id(sandbox_id)
+            qdrant_container = await self._get_qdrant_container_by_sandbox_id(sandbox_id)
 
             if qdrant_container:
                 if qdrant_container.status == "running":
@@ -461,52 +747,33 @@ class SandboxService:
                 elif qdrant_container.status == "exited":
                     logger.info(f"发现处于退出状态的Qdrant容器: {qdrant_container.name}，尝试重新启动")
                     # 启动已有容器
-                    qdrant_container.start()
+                    await self._run_docker(qdrant_container.start, timeout=self.docker_slow_call_timeout)
                 else:
                     raise ContainerOperationError(f"Qdrant容器状态异常: {qdrant_container.status}")
             else:
-                # 检查Qdrant镜像是否存在
-                try:
-                    self.docker_client.images.get(self.qdrant_image_name)
-                    logger.info(f"使用Qdrant镜像: {self.qdrant_image_name}")
-                except ImageNotFound:
-                    raise ContainerOperationError(f"Qdrant镜像不存在: {self.qdrant_image_name}")
-
-                # 设置容器名称和标签
-                qdrant_name = f"{QDRANT_LABEL_PREFIX}{sandbox_id}"
-
-                # 创建并启动Qdrant容器
-                qdrant_container = self.docker_client.containers.run(
-                    self.qdrant_image_name,
-                    detach=True,
-                    environment={},
-                    name=qdrant_name,
+                qdrant_container = await self._run_qdrant_container(
+                    name=f"{QDRANT_LABEL_PREFIX}{sandbox_id}",
                     labels={
                         QDRANT_LABEL: sandbox_id,  # 使用相同的sandbox_id作为关联
                         SANDBOX_LABEL: sandbox_id
-                    },
-                    network=self.network_name  # 使用与沙箱容器相同的网络
+                    }
                 )
                 logger.info(f"Qdrant容器已创建: {qdrant_container.name}，关联沙箱ID: {sandbox_id}，使用网络: {self.network_name}")
 
             # 无论是启动已有容器还是创建新容器，以下代码都是一样的
-            # 等待容器启动
-            qdrant_container.reload()
-
-            # 获取容器信息
-            container_info = self._get_container_info(qdrant_container)
+            # 等待容器启动并获取容器信息
+            container_info = await self._get_container_info(qdrant_container)
 
             # 检查Qdrant容器是否准备就绪
             qdrant_ready = await self._wait_for_qdrant_ready(container_info)
             if not qdrant_ready:
                 # 获取容器日志
-                container_logs = self._get_container_logs(qdrant_container)
+                container_logs = await self._get_container_logs(qdrant_container)
                 error_msg = "Qdrant容器启动超时，健康检查失败"
                 logger.error(f"{error_msg}\n容器日志:\n{container_logs}")
                 # 清理容器
                 try:
-                    qdrant_container.stop()
-                    qdrant_container.remove()
+                    await self._stop_and_remove_container(qdrant_container)
                 except Exception as e:
                     logger.error(f"清理失败的Qdrant容器时出错: {e}")
                 raise ContainerOperationError(f"{error_msg}，详细错误信息请查看日志")
@@ -563,8 +830,8 @@ class SandboxService:
         logger.warning(f"Qdrant容器健康检查失败，已达到最大尝试次数: {max_attempts}")
         return False
 
-    @handle_exceptions
-    def get_agent_container(self, sandbox_id: str) -> Optional[SandboxInfo]:
+    @async_handle_exceptions
+    async def get_agent_container(self, sandbox_id: str) -> Optional[SandboxInfo]:
         """
         获取沙箱信息
 
@@ -574,13 +841,11 @@ class SandboxService:
         Returns:
             SandboxInfo: 沙箱信息，如果沙箱不存在则返回None
         """
-        container = self._get_agent_container_by_sandbox_id(sandbox_id)
+        container_info = await self._get_agent_container_info(sandbox_id)
 
-        if not container:
+        if not container_info:
             return None
 
-        container_info = self._get_container_info(container)
-
         return SandboxInfo(
             sandbox_id=sandbox_id,
             status=container_info.status,
@@ -589,41 +854,64 @@ class SandboxService:
             ip_address=container_info.ip
         )
 
-    @handle_exceptions
-    def list_sandboxes(self) -> List[SandboxInfo]:
+    @async_handle_exceptions
+    async def list_sandboxes(self) -> List[SandboxInfo]:
         """
         列出所有沙箱容器
 
         Returns:
             List[SandboxInfo]: 沙箱信息列表
         """
+        # 注册表与Docker同步时直接使用注册表中的信息
+        if self.sandbox_registry.synced:
+            return [
+                SandboxInfo(
+                    sandbox_id=sandbox_id,
+                    status=container_info.status,
+                    created_at=container_info.created_at,
+                    started_at=container_info.started_at,
+                    ip_address=container_info.ip
+                )
+                for sandbox_id, container_info in self.sandbox_registry.list_entries()
+            ]
+
         result = []
         try:
             # 获取所有带有沙箱标签的容器
-            containers = self.docker_client.containers.list(
+            containers = await self._run_docker(
+                self.docker_client.containers.list,
                 all=True,
                 filters={"label": [f"{SANDBOX_LABEL}"]}
             )
 
-            for container in containers:
-                sandbox_id = container.labels.get(SANDBOX_LABEL)
-                # 排除Qdrant容器
-                if sandbox_id and container.name.startswith(AGENT_LABEL_PREFIX):
-                    container_info = self._get_container_info(container)
-                    result.append(SandboxInfo(
-                        sandbox_id=sandbox_id,
-                        status=container_info.status,
-                        created_at=container_info.created_at,
-                        started_at=container_info.started_at,
-                        ip_address=container_info.ip
-                    ))
+            # 排除Qdrant容器和未被认领的预热池容器
+            agent_containers = [
+                container for container in containers
+                if container.name.startswith(AGENT_LABEL_PREFIX)
+            ]
+
+            # 并发获取容器详情，并发数受Docker线程池大小限制
+            container_infos = await asyncio.gather(
+                *(self._get_container_info(container) for container in agent_containers)
+            )
+
+            for container, container_info in zip(agent_containers, container_infos):
+                # 沙箱ID以容器名为准，与注册表的取法一致
+                sandbox_id = container.name[len(AGENT_LABEL_PREFIX):]
+                result.append(SandboxInfo(
+                    sandbox_id=sandbox_id,
+                    status=container_info.status,
+                    created_at=container_info.created_at,
+                    started_at=container_info.started_at,
+                    ip_address=container_info.ip
+                ))
         except Exception as e:
             logger.error(f"列出沙箱容器时出错: {e}")
 
         return result
 
-    @handle_exceptions
-    def delete_sandbox(self, sandbox_id: str) -> bool:
+    @async_handle_exceptions
+    async def delete_sandbox(self, sandbox_id: str) -> bool:
         """
         删除沙箱容器
 
@@ -637,25 +925,26 @@ class SandboxService:
             SandboxNotFoundError: 沙箱不存在
             ContainerOperationError: 容器操作失败
         """
-        container = self._get_agent_container_by_sandbox_id(sandbox_id)
+        container = await self._get_agent_container_by_sandbox_id(sandbox_id)
 
         if not container:
             raise SandboxNotFoundError(sandbox_id)
 
         try:
             # 先删除对应的Qdrant容器
-            qdrant_container = self._get_qdrant_container_by_sandbox_id(sandbox_id)
+            qdrant_container = await self._get_qdrant_container_by_sandbox_id(sandbox_id)
             if qdrant_container:
                 try:
-                    qdrant_container.stop()
-                    qdrant_container.remove()
+                    await self._stop_and_remove_container(qdrant_container)
+                    self.sandbox_pool.forget_claim(qdrant_container.id)
                     logger.info(f"Qdrant容器已删除，关联沙箱ID: {sandbox_id}")
                 except Exception as e:
                     logger.error(f"删除Qdrant容器 {sandbox_id} 时出错: {e}")
 
             # 删除沙箱容器
-            container.stop()
-            container.remove()
+            await self._stop_and_remove_container(container)
+            self.sandbox_registry.remove(sandbox_id)
+            self._ws_stats.pop(sandbox_id, None)
             logger.info(f"沙箱容器已删除: {sandbox_id}")
             return True
         except Exception as e:
@@ -680,9 +969,9 @@ class SandboxService:
         logger.info(f"沙箱WebSocket连接已接受，连接到沙箱: {sandbox_id}")
 
         # 检查沙箱是否存在
-        container = self._get_agent_container_by_sandbox_id(sandbox_id)
+        container_info = await self._get_agent_container_info(sandbox_id)
 
-        if not container:
+        if not container_info:
             error_msg = f"沙箱 {sandbox_id} 不存在或已过期"
             logger.error(error_msg)
             await websocket.send_text(json.dumps({
@@ -693,8 +982,6 @@ class SandboxService:
             return
 
         try:
-            # 获取容器信息
-            container_info = self._get_container_info(container)
             container_ip = container_info.ip
             ws_port = container_info.ws_port
 
@@ -739,29 +1026,42 @@ class SandboxService:
         sandbox_id: str
     ) -> None:
         """
-        代理WebSocket连接
+        代理WebSocket连接，文本帧和二进制帧均原样转发，不做解析
 
         Args:
             client_ws: 客户端WebSocket连接
             container_ws: 容器WebSocket连接
             sandbox_id: 容器ID
         """
+        stats = self._ws_stats.get(sandbox_id)
+        if stats is None:
+            stats = self._ws_stats[sandbox_id] = WebSocketProxyStats()
+        stats.connections += 1
+        connection_stats = WebSocketProxyStats(connections=1)
+        # 只在开启DEBUG时按采样率记录帧内容，避免在热路径上格式化日志
+        log_frames = logger.isEnabledFor(logging.DEBUG)
+        sample_rate = max(settings.ws_log_sample_rate, 1)
+
         async def forward_to_container() -> None:
             """将消息从客户端转发到容器"""
             try:
                 while True:
-                    data = await client_ws.receive_text()
-                    try:
-                        # 尝试解析接收到的JSON
-                        json_data = json.loads(data)
-                        # 重新格式化为缩进格式的JSON
-                        formatted_data = json.dumps(json_data, ensure_ascii=False, indent=2)
-                        logger.debug(f"转发到容器 {sandbox_id}: {formatted_data}")
-                        await container_ws.send(data)  # 发送原始数据而不是格式化的数据
-                    except json.JSONDecodeError:
-                        # 如果不是有效的JSON，直接传递原始数据
-                        logger.debug(f"转发到容器 {sandbox_id}: {data}")
-                        await container_ws.send(data)
+                    message = await client_ws.receive()
+                    if message["type"] == "websocket.disconnect":
+                        logger.info(f"客户端WebSocket断开连接 {sandbox_id}")
+                        return
+                    data = message.get("text")
+                    if data is None:
+                        data = message.get("bytes")
+                        if data is None:
+                            continue
+                    await container_ws.send(data)
+
+                    size = _frame_size(data)
+                    connection_stats.frames_to_container += 1
+                    connection_stats.bytes_to_container += size
+                    if log_frames and connection_stats.frames_to_container % sample_rate == 0:
+                        logger.debug("转发到容器 %s: %s", sandbox_id, _preview_frame(data))
             except WebSocketDisconnect:
                 logger.info(f"客户端WebSocket断开连接 {sandbox_id}")
             except Exception as e:
@@ -777,21 +1077,20 @@ class SandboxService:
                             container_ws.recv(),
                             timeout=settings.ws_receive_timeout
                         )
-                        try:
-                            # 尝试解析接收到的JSON (仅用于日志)
-                            json_data = json.loads(data)
-                            # 重新格式化为缩进格式的JSON (仅用于日志)
-                            formatted_data = json.dumps(json_data, ensure_ascii=False, indent=2)
-                            logger.debug(f"转发到客户端 {sandbox_id}: {formatted_data}")
-                        except json.JSONDecodeError:
-                            # 如果不是有效的JSON，直接记录原始数据
-                            logger.debug(f"转发到客户端 {sandbox_id}: {data}")
-
-                        # 始终发送原始数据
-                        await client_ws.send_text(data)
                     except asyncio.TimeoutError:
                         logger.warning(f"容器 {sandbox_id} 接收消息超时，关闭连接")
                         return
+
+                    if isinstance(data, str):
+                        await client_ws.send_text(data)
+                    else:
+                        await client_ws.send_bytes(data)
+
+                    size = _frame_size(data)
+                    connection_stats.frames_to_client += 1
+                    connection_stats.bytes_to_client += size
+                    if log_frames and connection_stats.frames_to_client % sample_rate == 0:
+                        logger.debug("转发到客户端 %s: %s", sandbox_id, _preview_frame(data))
             except websockets.exceptions.ConnectionClosed:
                 logger.info(f"容器WebSocket断开连接 {sandbox_id}")
             except Exception as e:
@@ -801,19 +1100,49 @@ class SandboxService:
         client_task = asyncio.create_task(forward_to_container())
         container_task = asyncio.create_task(forward_to_client())
 
-        # 等待任一任务完成
-        done, pending = await asyncio.wait(
-            [client_task, container_task],
-            return_when=asyncio.FIRST_COMPLETED
-        )
+        try:
+            # 等待任一任务完成
+            done, pending = await asyncio.wait(
+                [client_task, container_task],
+                return_when=asyncio.FIRST_COMPLETED
+            )
 
-        # 取消未完成的任务
-        for task in pending:
-            task.cancel()
-            try:
-                await task
-            except asyncio.CancelledError:
-                pass
+            # 取消未完成的任务
+            for task in pending:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        finally:
+            stats.merge(connection_stats)
+            duration = max(time.monotonic() - connection_stats.started_at, 1e-6)
+            logger.info(
+                f"WebSocket代理统计 沙箱ID: {sandbox_id}, 持续 {duration:.1f}秒, "
+                f"上行 {connection_stats.frames_to_container}帧/{connection_stats.bytes_to_container}字节, "
+                f"下行 {connection_stats.frames_to_client}帧/{connection_stats.bytes_to_client}字节, "
+                f"平均 {(connection_stats.frames_to_container + connection_stats.frames_to_client) / duration:.1f}帧/秒"
+            )
+
+    def get_websocket_stats(self, sandbox_id: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        """
+        获取WebSocket代理的累计吞吐统计
+
+        Args:
+            sandbox_id: 沙箱ID，为空时返回所有沙箱的统计
+
+        Returns:
+            Dict[str, Dict[str, float]]: 沙箱ID → 统计数据
+        """
+        if sandbox_id is not None:
+            stats = self._ws_stats.get(sandbox_id)
+            return {sandbox_id: stats.to_dict()} if stats else {}
+        return {key: stats.to_dict() for key, stats in self._ws_stats.items()}
+
+    def _forget_ws_stats(self, container: docker.models.containers.Container) -> None:
+        """清理容器被停止或删除后，删除其所属沙箱的WebSocket代理统计"""
+        if container.name.startswith(AGENT_LABEL_PREFIX):
+            self._ws_stats.pop(container.name[len(AGENT_LABEL_PREFIX):], None)
 
     async def _check_container_health(self, container_id: str) -> Tuple[bool, str]:
         """
@@ -825,22 +1154,17 @@ class SandboxService:
         Returns:
             Tuple[bool, str]: (是否健康, 状态信息)
         """
-        container = self._get_agent_container_by_sandbox_id(container_id)
-        if not container:
+        container_info = await self._get_agent_container_info(container_id)
+        if not container_info:
             return False, "容器不存在"
 
         try:
-            container.reload()
-
             # 检查容器是否在运行
-            if container.status != "running":
+            if container_info.status != "running":
                 # 获取容器日志以了解故障原因
-                container_logs = self._get_container_logs(container)
-                logger.error(f"容器状态异常: {container.status}\n容器日志:\n{container_logs}")
-                return False, f"容器状态: {container.status}"
-
-            # 获取容器信息
-            container_info = self._get_container_info(container)
+                container_logs = await self._get_container_logs_by_id(container_info.id)
+                logger.error(f"容器状态异常: {container_info.status}\n容器日志:\n{container_logs}")
+                return False, f"容器状态: {container_info.status}"
 
             # 尝试连接容器WebSocket服务
             container_ws_url = f"ws://{container_info.ip}:{container_info.ws_port}/ws"
@@ -851,14 +1175,14 @@ class SandboxService:
                     return True, "容器健康"
             except Exception as e:
                 # 获取容器日志以了解WebSocket服务未能启动的原因
-                container_logs = self._get_container_logs(container)
+                container_logs = await self._get_container_logs_by_id(container_info.id)
                 logger.error(f"WebSocket连接失败: {e}\n容器日志:\n{container_logs}")
                 return False, f"WebSocket连接失败: {e}"
 
         except Exception as e:
             # 尝试获取容器日志，即使在健康检查过程中发生了异常
             try:
-                container_logs = self._get_container_logs(container)
+                container_logs = await self._get_container_logs_by_id(container_info.id)
                 logger.error(f"健康检查失败: {e}\n容器日志:\n{container_logs}")
             except Exception as log_error:
                 logger.error(f"健康检查失败: {e}，且无法获取容器日志: {log_error}")
@@ -873,19 +1197,25 @@ class SandboxService:
         """
         try:
             # 获取所有运行中带有沙箱标签的容器
-            running_containers = self.docker_client.containers.list(
+            running_containers = await self._run_docker(
+                self.docker_client.containers.list,
                 filters={"label": [f"{SANDBOX_LABEL}"], "status": "running"}
             )
 
             for container in running_containers:
+                # 未被认领的预热池容器由预热池自行回收
+                if container.name.startswith(SANDBOX_POOL_PREFIX):
+                    continue
                 try:
-                    container_info = self._get_container_info(container)
+                    container_info = await self._get_container_info(container)
 
                     # 使用启动时间代替创建时间
                     started_at = container_info.started_at
                     if not started_at:
                         logger.warning(f"容器 {container.name} 没有有效的启动时间，使用创建时间代替")
                         started_at = container_info.created_at
+                    # 从预热池认领的容器按认领时间计算
+                    started_at = max(started_at, self.sandbox_pool.get_claimed_at(container.id) or 0)
 
                     running_seconds = (current_time - started_at)
 
@@ -898,7 +1228,9 @@ class SandboxService:
                     # 检查是否超过运行时间限制
                     if running_seconds > self.running_container_expire_time:
                         logger.info(f"开始暂停过期容器: {container.name}，已运行时间: {running_seconds:.2f}秒")
-                        container.stop()
+                        await self._run_docker(container.stop, timeout=self.docker_slow_call_timeout)
+                        self.sandbox_pool.forget_claim(container.id)
+                        self._forget_ws_stats(container)
                         logger.info(f"成功暂停容器: {container.name}")
                 except Exception as e:
                     logger.error(f"暂停容器时出错: {container.name}, {e}")
@@ -914,14 +1246,17 @@ class SandboxService:
         """
         try:
             # 获取所有已退出带有沙箱标签的容器
-            exited_containers = self.docker_client.containers.list(
+            exited_containers = await self._run_docker(
+                self.docker_client.containers.list,
                 all=True,  # 包含所有状态的容器
                 filters={"label": [f"{SANDBOX_LABEL}"], "status": "exited"}
             )
 
             for container in exited_containers:
+                if container.name.startswith(SANDBOX_POOL_PREFIX):
+                    continue
                 try:
-                    container_info = self._get_container_info(container)
+                    container_info = await self._get_container_info(container)
                     created_at = container_info.created_at
                     exited_at = container_info.exited_at
 
@@ -935,7 +1270,8 @@ class SandboxService:
                     # 检查是否超过退出容器保留时间
                     if idle_seconds > self.exited_container_expire_time:
                         logger.info(f"开始删除已退出的过期容器: {container.name}，已退出时间: {idle_seconds:.2f}秒")
-                        container.remove()
+                        await self._run_docker(container.remove)
+                        self._forget_ws_stats(container)
                         logger.info(f"成功删除已退出的容器: {container.name}")
                 except Exception as e:
                     logger.error(f"处理已退出容器时出错: {container.name} - {e}")
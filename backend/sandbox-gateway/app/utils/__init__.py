@@ -8,6 +8,7 @@ from app.utils.exceptions import (
     handle_exceptions, 
     async_handle_exceptions
 )
+from app.utils.http_client import get_http_client, close_http_client
 from app.utils.logging import setup_logging
 from app.utils.middleware import TokenValidationMiddleware
 
@@ -17,6 +18,8 @@ __all__ = [
     "ContainerOperationError", 
     "handle_exceptions",
     "async_handle_exceptions",
+    "get_http_client",
+    "close_http_client",
     "setup_logging",
     "TokenValidationMiddleware"
 ] 
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""
+共享HTTP客户端
+
+网关代理到沙箱容器的HTTP请求共用一个带连接池的 httpx.AsyncClient，
+避免每个请求重新建立连接，应用关闭时统一释放。
+"""
+import logging
+from typing import Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger("sandbox_gateway")
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    获取共享的HTTP客户端，首次调用时创建
+
+    Returns:
+        httpx.AsyncClient: 共享的HTTP客户端
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.container_http_timeout, connect=settings.container_http_connect_timeout),
+            limits=httpx.Limits(
+                max_connections=settings.container_http_max_connections,
+                max_keepalive_connections=settings.container_http_max_connections
+            ),
+            # 目标是内网的容器地址，不使用环境变量中的代理配置
+            trust_env=False
+        )
+        logger.info("共享HTTP客户端已创建")
+    return _client
+
+
+async def close_http_client() -> None:
+    """关闭共享的HTTP客户端"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        logger.info("共享HTTP客户端已关闭")
+    _client = None
@@ -31,12 +31,12 @@ read -p "请输入选项 [1-5]: " OPTION
 case $OPTION in
     1)
         echo -e "\n${GREEN}=== 查找需要清理的所有沙箱容器 ===${NC}\n"
-        FILTER_ARGS="--filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\""
+        FILTER_ARGS="--filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" --filter \"name=sandbox-pool-\""
         ACTION="clean"
         ;;
     2)
         echo -e "\n${GREEN}=== 查找需要清理的已退出沙箱容器 ===${NC}\n"
-        FILTER_ARGS="--filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" --filter \"status=exited\""
+        FILTER_ARGS="--filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" --filter \"name=sandbox-pool-\" --filter \"status=exited\""
         ACTION="clean"
         ;;
     3)
@@ -54,12 +54,12 @@ case $OPTION in
         echo -e "\n${GREEN}=== 查找已退出超过 ${DAYS_FILTER} 天的沙箱容器 ===${NC}\n"
         
         # 基础过滤条件
-        FILTER_ARGS="--filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" --filter \"status=exited\""
+        FILTER_ARGS="--filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" --filter \"name=sandbox-pool-\" --filter \"status=exited\""
         ACTION="clean_by_days"
         ;;
     4)
         echo -e "\n${GREEN}=== 查找需要停止的沙箱容器 ===${NC}\n"
-        FILTER_ARGS="--filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" --filter \"status=running\""
+        FILTER_ARGS="--filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" --filter \"name=sandbox-pool-\" --filter \"status=running\""
         ACTION="stop"
         ;;
     5|*)
@@ -197,14 +197,14 @@ if [ "$ACTION" == "clean" ] || [ "$ACTION" == "clean_by_days" ]; then
     # 显示完成后的状态
     if [ "$OPTION" -eq 1 ]; then
         # 检查所有容器
-        FILTER_CHECK="--filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\""
+        FILTER_CHECK="--filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" --filter \"name=sandbox-pool-\""
     elif [ "$OPTION" -eq 3 ]; then
         # 这里不再检查，因为按天数过滤的容器可能已经全部被删除
         echo -e "${GREEN}清理已退出超过 ${DAYS_FILTER} 天的沙箱容器操作完成${NC}"
         exit 0
     else
         # 检查已退出容器
-        FILTER_CHECK="--filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" --filter \"status=exited\""
+        FILTER_CHECK="--filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" --filter \"name=sandbox-pool-\" --filter \"status=exited\""
     fi
 
     if [ "$OPTION" -ne 3 ]; then
@@ -215,10 +215,10 @@ if [ "$ACTION" == "clean" ] || [ "$ACTION" == "clean_by_days" ]; then
             echo -e "${RED}警告: 仍有 ${REMAINING} 个沙箱容器未能清除${NC}"
             if [ "$OPTION" -eq 1 ]; then
                 echo -e "${YELLOW}您可以尝试使用强制选项再次运行:${NC}"
-                echo -e "  docker rm -f \$(docker ps -a --filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" -q)"
+                echo -e "  docker rm -f \$(docker ps -a --filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" --filter \"name=sandbox-pool-\" -q)"
             else
                 echo -e "${YELLOW}您可以尝试使用强制选项再次运行:${NC}"
-                echo -e "  docker rm -f \$(docker ps -a --filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" --filter \"status=exited\" -q)"
+                echo -e "  docker rm -f \$(docker ps -a --filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" --filter \"name=sandbox-pool-\" --filter \"status=exited\" -q)"
             fi
         fi
     fi
@@ -226,12 +226,12 @@ else
     echo -e "\n${GREEN}=== 沙箱容器停止完成 ===${NC}"
     
     # 检查是否有容器未能停止
-    STILL_RUNNING=$(eval "docker ps --format \"{{.ID}}\" --filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" --filter \"status=running\"" | wc -l)
+    STILL_RUNNING=$(eval "docker ps --format \"{{.ID}}\" --filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" --filter \"name=sandbox-pool-\" --filter \"status=running\"" | wc -l)
     if [ "$STILL_RUNNING" -eq 0 ]; then
         echo -e "${GREEN}所有沙箱容器已成功停止${NC}"
     else
         echo -e "${RED}警告: 仍有 ${STILL_RUNNING} 个沙箱容器在运行${NC}"
         echo -e "${YELLOW}您可以尝试使用强制选项停止:${NC}"
-        echo -e "  docker stop \$(docker ps --filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" -q)"
+        echo -e "  docker stop \$(docker ps --filter \"name=sandbox-agent-\" --filter \"name=sandbox-qdrant-\" --filter \"name=sandbox-pool-\" -q)"
     fi
 fi 
\ No newline at end of file
@@ -24,6 +24,7 @@ from app.config import settings
 from app.controllers import health_router, sandbox_router, chat_history_router
 from app.middlewares import TokenValidationMiddleware, RequestLoggingMiddleware
 from app.services.sandbox_service import sandbox_service
+from app.utils.http_client import close_http_client
 from app.utils.logging import setup_logging
 
 # 配置日志
@@ -98,17 +99,32 @@ async def startup_event() -> None:
     # 检查Docker镜像是否存在
     try:
         image_name = sandbox_service.image_name
-        sandbox_service.docker_client.images.get(image_name)
+        await sandbox_service._run_docker(sandbox_service.docker_client.images.get, image_name)
         logger.info(f"沙箱容器镜像 '{image_name}' 已就绪")
     except Exception as e:
         logger.warning(f"警告: 沙箱容器镜像检查失败: {str(e)}")
         logger.warning("请先确保已经构建好镜像，否则沙箱功能将无法正常使用")
 
+    # 启动沙箱注册表
+    await sandbox_service.sandbox_registry.start()
+
+    # 启动沙箱预热池
+    await sandbox_service.sandbox_pool.start()
+
     # 启动沙箱容器清理任务
     asyncio.create_task(sandbox_service.cleanup_idle_containers())
     logger.info("沙箱网关已启动，开始定期清理闲置沙箱容器")
 
 
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    """应用关闭时执行"""
+    await sandbox_service.sandbox_pool.stop()
+    sandbox_service.sandbox_registry.stop()
+    await close_http_client()
+    sandbox_service.shutdown()
+
+
 async def start_async() -> None:
     """异步启动沙箱网关服务"""
     global server
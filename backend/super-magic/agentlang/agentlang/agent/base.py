@@ -285,11 +285,8 @@ class BaseAgent(ABC):
         valid_tools = {}
         for tool_name in tools_definition.keys():
             try:
-                # 获取工具实例（不是工具信息）
-                tool_instance = tool_factory.get_tool_instance(tool_name)
-
-                # 检查工具是否可用
-                if not tool_instance.is_available():
+                # 检查工具是否可用（没有自定义可用性检查的工具不会被导入）
+                if not tool_factory.is_tool_available(tool_name):
                     logger.warning(f"工具 '{tool_name}' 不可用（环境变量未配置或依赖缺失），将在 Agent 定义中被忽略")
                     continue
 
@@ -3,11 +3,12 @@
 此模块定义了用于管理聊天记录的类。
 """
 
+import hashlib
 import json
 import os
 from dataclasses import asdict
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import tiktoken
 
@@ -26,11 +27,32 @@ from agentlang.chat_history.chat_history_models import (
     format_duration_to_str,
     parse_duration_from_str,
 )
+from agentlang.config.config import config
 from agentlang.llms.token_usage.models import TokenUsage
 from agentlang.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 聊天记录持久化模式
+STORAGE_MODE_SNAPSHOT = "snapshot"  # 每次变更都完整重写 JSON 快照文件
+STORAGE_MODE_JOURNAL = "journal"  # 追加消息写入 JSONL 日志，定期合并为 JSON 快照
+DEFAULT_JOURNAL_COMPACT_THRESHOLD = 200  # 追加日志合并为快照的条数阈值
+
+_token_encoding = None
+_token_encoding_loaded = False
+
+
+def _get_token_encoding():
+    """获取并缓存 tiktoken 编码器，加载失败时返回 None"""
+    global _token_encoding, _token_encoding_loaded
+    if not _token_encoding_loaded:
+        _token_encoding_loaded = True
+        try:
+            _token_encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(f"加载tiktoken编码器失败: {e!s}，将使用字符长度估算token数")
+    return _token_encoding
+
 # ==============================================================================
 # ChatHistory 类
 # ==============================================================================
@@ -42,7 +64,8 @@ class ChatHistory:
     """
 
     def __init__(self, agent_name: str, agent_id: str, chat_history_dir: str,
-                 compression_config: Optional[CompressionConfig] = None):
+                 compression_config: Optional[CompressionConfig] = None,
+                 storage_mode: Optional[str] = None):
         """
         初始化 ChatHistory。
 
@@ -51,6 +74,7 @@ class ChatHistory:
             agent_id (str): Agent 的唯一 ID，用于构建文件名。
             chat_history_dir (str): 存储聊天记录文件的目录。
             compression_config (Optional[CompressionConfig]): 压缩配置，如不提供则使用默认配置。
+            storage_mode (Optional[str]): 持久化模式 (snapshot/journal)，如不提供则读取 chat_history.storage_mode 配置。
         """
         if not agent_name:
             raise ValueError("agent_name 不能为空")
@@ -64,6 +88,17 @@ class ChatHistory:
         self.chat_history_dir = chat_history_dir
         self.messages: List[ChatMessage] = []
 
+        # token 账本：id(message) -> (message, token 数)
+        self._token_ledger: Dict[int, Tuple[ChatMessage, int]] = {}
+        # 历史中所有消息的 token 总数，由各修改方法按增量维护
+        self._total_tokens = 0
+        # LLM 消息字典缓存：id(message) -> (message, 版本, 转换后的字典)
+        self._llm_message_cache: Dict[int, Tuple[ChatMessage, tuple, Optional[Dict[str, Any]]]] = {}
+        # 最近一次写入 .tools.json 的内容哈希，内容不变时跳过写入
+        self._tools_list_hash: Optional[str] = None
+        # 最近一次保存的工具列表对象，调用方复用同一个列表对象时跳过序列化和哈希计算
+        self._saved_tools_list: Optional[List[Dict[str, Any]]] = None
+
         # 设置压缩配置，如未提供则使用默认配置
         self.compression_config = compression_config or CompressionConfig()
         self.compression_config.agent_name = agent_name
@@ -73,8 +108,22 @@ class ChatHistory:
         self._last_compression_message_count = 0
         self._last_compression_token_count = 0
 
+        # 持久化模式配置
+        self.storage_mode = str(storage_mode or config.get("chat_history.storage_mode", STORAGE_MODE_SNAPSHOT)).lower()
+        if self.storage_mode not in (STORAGE_MODE_SNAPSHOT, STORAGE_MODE_JOURNAL):
+            logger.warning(f"未知的聊天记录持久化模式: {self.storage_mode}，将使用 {STORAGE_MODE_SNAPSHOT} 模式")
+            self.storage_mode = STORAGE_MODE_SNAPSHOT
+        try:
+            self.journal_compact_threshold = max(1, int(config.get("chat_history.journal_compact_threshold", DEFAULT_JOURNAL_COMPACT_THRESHOLD)))
+        except (ValueError, TypeError):
+            self.journal_compact_threshold = DEFAULT_JOURNAL_COMPACT_THRESHOLD
+        self._journal_entry_count = 0
+        # 当前快照文件内容的摘要，作为快照的代号写入每条追加日志记录，重放时跳过属于其他快照的记录
+        self._snapshot_generation: Optional[str] = None
+
         os.makedirs(self.chat_history_dir, exist_ok=True) # 确保目录存在
         self._history_file_path = self._build_chat_history_filename()
+        self._journal_file_path = self._build_journal_filename()
         self.load() # 初始化时尝试加载历史记录
 
         # 实例化压缩器
@@ -94,116 +143,146 @@ class ChatHistory:
     def tokens_count(self) -> int:
         """
         统计聊天历史中消耗的token总数。
+        总数由新增、插入、移除、替换和加载等修改方法按增量维护，读取时不遍历消息列表。
+        直接修改 messages 或其中消息的内容后，需要调用 invalidate_tokens_count 重新统计。
+
+        Returns:
+            int: token总数
+        """
+        return self._total_tokens
+
+    def invalidate_tokens_count(self) -> int:
+        """
+        丢弃 token 账本，按当前消息列表完整重新统计 token 总数。
         优先使用消息中已有的token_usage数据，对于没有token_usage的消息，
         使用tiktoken计算token数并保存到消息的token_usage属性中。
 
         Returns:
-            int: token总数
+            int: 重新统计后的token总数
+        """
+        if self._rebuild_token_ledger():
+            self._save_token_usage_updates()
+        return self._total_tokens
+
+    def _count_message_tokens(self, msg: ChatMessage) -> Tuple[int, bool]:
+        """
+        计算单条消息的 token 数。
+        对于没有 token_usage 的 AssistantMessage，会将估算结果写入其 token_usage 属性。
+
+        Args:
+            msg (ChatMessage): 要计算的消息
+
+        Returns:
+            Tuple[int, bool]: (token 数, 是否更新了消息的 token_usage)
         """
-        encoding = None
+        # 1. 优先使用已有的token_usage数据
+        if isinstance(msg, AssistantMessage) and msg.token_usage is not None:
+            # 对于 AssistantMessage 使用 token_usage 对象 (统一为 TokenUsage 类型)
+            # 如果有 total_tokens，使用它；否则使用 output_tokens 或 input_tokens
+            msg_tokens = 0
+            if hasattr(msg.token_usage, "total_tokens") and msg.token_usage.total_tokens > 0:
+                msg_tokens = msg.token_usage.total_tokens
+            elif hasattr(msg.token_usage, "output_tokens") and msg.token_usage.output_tokens > 0:
+                msg_tokens = msg.token_usage.output_tokens
+            elif hasattr(msg.token_usage, "input_tokens") and msg.token_usage.input_tokens > 0:
+                msg_tokens = msg.token_usage.input_tokens
+
+            if msg_tokens > 0:
+                return msg_tokens, False  # 已有有效的token_usage数据，跳过tiktoken计算
+
+        content = getattr(msg, 'content', '') or ''
+        encoding = _get_token_encoding()
+        if not encoding:
+            # 如果没有encoding，使用字符长度估算 (1个token约等于4个字符，5是基础开销)
+            return len(content) // 4 + 5, False
+
+        # 2. 无有效token_usage数据，使用tiktoken计算
         try:
-            # 尝试加载编码器，如果失败则在后续步骤中处理
-            encoding = tiktoken.get_encoding("cl100k_base")
+            # 计算消息内容的token数
+            content_tokens = len(encoding.encode(content))
+
+            # 估算消息元数据的token数（角色等）
+            metadata_tokens = 4  # 每条消息大约4个token用于角色等基本信息
+
+            # 处理工具调用消息
+            if isinstance(msg, AssistantMessage) and msg.tool_calls:
+                for tc in msg.tool_calls:
+                    # 计算工具名称和参数的token
+                    content_tokens += len(encoding.encode(tc.function.name)) + len(encoding.encode(tc.function.arguments)) + 10
+
+            # 处理工具结果消息
+            if isinstance(msg, ToolMessage):
+                metadata_tokens += 4  # 工具结果消息额外token
+
+            msg_tokens = content_tokens + metadata_tokens
         except Exception as e:
-            logger.warning(f"加载tiktoken编码器失败: {e!s}，将在遇到无token_usage的消息时使用备选计算方法")
+            logger.warning(f"使用tiktoken计算消息token失败: {e!s}，使用长度估算方法")
+            return len(content) // 4 + 5, False
+
+        # 3. 将计算结果保存到消息的token_usage属性中
+        if isinstance(msg, AssistantMessage) and msg.token_usage is None:
+            # 作为估算值，我们将 msg_tokens 全部分配给 output_tokens
+            msg.token_usage = TokenUsage(
+                input_tokens=0,
+                output_tokens=msg_tokens,
+                total_tokens=msg_tokens
+            )
+            return msg_tokens, True
 
-        total_tokens = 0
-        history_updated = False
+        return msg_tokens, False
 
-        for i, msg in enumerate(self.messages):
-            msg_tokens = 0
+    def _ledger_record(self, msg: ChatMessage) -> Tuple[int, bool]:
+        """
+        计算消息的 token 数并记入账本，按与旧记录的差值更新总数。
 
-            # 1. 优先使用已有的token_usage数据
-            if isinstance(msg, AssistantMessage) and msg.token_usage is not None:
-                # 对于 AssistantMessage 使用 token_usage 对象 (统一为 TokenUsage 类型)
-                # 如果有 total_tokens，使用它；否则使用 output_tokens 或 input_tokens
-                if hasattr(msg.token_usage, "total_tokens") and msg.token_usage.total_tokens > 0:
-                    msg_tokens = msg.token_usage.total_tokens
-                elif hasattr(msg.token_usage, "output_tokens") and msg.token_usage.output_tokens > 0:
-                    msg_tokens = msg.token_usage.output_tokens
-                elif hasattr(msg.token_usage, "input_tokens") and msg.token_usage.input_tokens > 0:
-                    msg_tokens = msg.token_usage.input_tokens
-
-                if msg_tokens > 0:
-                    total_tokens += msg_tokens
-                    continue  # 已有有效的token_usage数据，跳过tiktoken计算
-
-            # 2. 无有效token_usage数据，使用tiktoken计算
-            if encoding:
-                try:
-                    # 计算消息内容的token数
-                    content = getattr(msg, 'content', '') or ''
-                    content_tokens = len(encoding.encode(content))
-
-                    # 估算消息元数据的token数（角色等）
-                    metadata_tokens = 4  # 每条消息大约4个token用于角色等基本信息
-
-                    # 处理工具调用消息
-                    if isinstance(msg, AssistantMessage) and msg.tool_calls:
-                        tool_tokens = 0
-                        for tc in msg.tool_calls:
-                            # 计算工具名称和参数的token
-                            tool_name = tc.function.name
-                            tool_args = tc.function.arguments
-
-                            # 计算工具调用的token
-                            tool_tokens += len(encoding.encode(tool_name)) + len(encoding.encode(tool_args)) + 10
-                        content_tokens += tool_tokens
-
-                    # 处理工具结果消息
-                    if isinstance(msg, ToolMessage):
-                        metadata_tokens += 4  # 工具结果消息额外token
-
-                    msg_tokens = content_tokens + metadata_tokens
-
-                    # 3. 将计算结果保存到消息的token_usage属性中
-                    if isinstance(msg, AssistantMessage):
-                        if msg.token_usage is None:
-                            # 使用新的 TokenUsage 类创建对象
-                            # 作为估算值，我们将 msg_tokens 全部分配给 output_tokens
-                            msg.token_usage = TokenUsage(
-                                input_tokens=0,
-                                output_tokens=msg_tokens,
-                                total_tokens=msg_tokens
-                            )
-                            history_updated = True
-
-                    total_tokens += msg_tokens
-
-                except Exception as e:
-                    logger.warning(f"使用tiktoken计算第{i+1}条消息token失败: {e!s}")
-                    # 计算失败时使用备选方案：根据消息内容长度估算
-                    try:
-                        content = getattr(msg, 'content', '') or ''
-                        # 粗略估计：1个token约等于4个字符
-                        estimated_tokens = len(content) // 4 + 5  # 5是基础开销
-                        total_tokens += estimated_tokens
-                        logger.warning(f"使用长度估算方法计算token: {estimated_tokens}")
-                    except Exception as est_err:
-                        logger.error(f"备选token估算也失败: {est_err!s}")
-                        # 如果连估算都失败，加一个最小值
-                        total_tokens += 5
+        Returns:
+            Tuple[int, bool]: (token 数, 是否更新了消息的 token_usage)
+        """
+        msg_tokens, updated = self._count_message_tokens(msg)
+        entry = self._token_ledger.get(id(msg))
+        if entry is not None and entry[0] is msg:
+            self._total_tokens -= entry[1]
+        self._token_ledger[id(msg)] = (msg, msg_tokens)
+        self._total_tokens += msg_tokens
+        return msg_tokens, updated
+
+    def _ledger_forget(self, msg: ChatMessage) -> None:
+        """将已移出历史的消息从账本中删除，并从总数中减去其 token 数"""
+        entry = self._token_ledger.pop(id(msg), None)
+        if entry is not None and entry[0] is msg:
+            self._total_tokens -= entry[1]
+
+    def _rebuild_token_ledger(self, reuse_counts: bool = False) -> bool:
+        """
+        根据当前消息列表重建 token 账本和总数。
 
-            else:
-                # 如果没有encoding，使用字符长度估算
-                try:
-                    content = getattr(msg, 'content', '') or ''
-                    # 粗略估计：1个token约等于4个字符
-                    estimated_tokens = len(content) // 4 + 5  # 5是基础开销
-                    total_tokens += estimated_tokens
-                except Exception as est_err:
-                    logger.error(f"备选token估算失败: {est_err!s}")
-                    total_tokens += 5
-
-        # 如果有更新token_usage，保存聊天历史
-        if history_updated:
-            try:
-                self.save()
-                logger.debug("已更新消息的token_usage数据并保存聊天历史")
-            except Exception as e:
-                logger.warning(f"保存更新的token_usage数据失败: {e!s}")
+        Args:
+            reuse_counts: 是否沿用账本中仍在历史里的消息的 token 数，只计算新的消息
 
-        return total_tokens
+        Returns:
+            bool: 是否有消息的 token_usage 被更新
+        """
+        old_ledger = self._token_ledger if reuse_counts else {}
+        self._token_ledger = {}
+        self._total_tokens = 0
+        history_updated = False
+        for msg in self.messages:
+            entry = old_ledger.get(id(msg))
+            if entry is not None and entry[0] is msg:
+                self._token_ledger[id(msg)] = entry
+                self._total_tokens += entry[1]
+                continue
+            _, updated = self._ledger_record(msg)
+            history_updated = history_updated or updated
+        return history_updated
+
+    def _save_token_usage_updates(self) -> None:
+        """保存重建账本时更新的 token_usage 数据"""
+        try:
+            self.save()
+            logger.debug("已更新消息的token_usage数据并保存聊天历史")
+        except Exception as e:
+            logger.warning(f"保存更新的token_usage数据失败: {e!s}")
 
     def _build_chat_history_filename(self) -> str:
         """构建聊天记录文件的完整路径"""
@@ -215,183 +294,354 @@ class ChatHistory:
         filename = f"{self.agent_name}<{self.agent_id}>.tools.json"
         return os.path.join(self.chat_history_dir, filename)
 
+    def _build_journal_filename(self) -> str:
+        """构建追加日志文件的完整路径"""
+        filename = f"{self.agent_name}<{self.agent_id}>.journal.jsonl"
+        return os.path.join(self.chat_history_dir, filename)
+
     def exists(self) -> bool:
-        """检查历史记录文件是否存在"""
-        return os.path.exists(self._history_file_path)
+        """检查历史记录文件（快照或追加日志）是否存在"""
+        return os.path.exists(self._history_file_path) or os.path.exists(self._journal_file_path)
 
     def load(self) -> None:
         """
-        从 JSON 文件加载聊天记录。
+        从 JSON 快照文件加载聊天记录，并重放追加日志中尚未合并到快照的消息。
         会查找 'duration' 字符串字段并尝试解析为 duration_ms (float)。
         会查找 'show_in_ui' 字段，如果不存在则默认为 True。
         """
+        self._journal_entry_count = 0
         if not self.exists():
             logger.info(f"聊天记录文件不存在: {self._history_file_path}，将初始化为空历史。")
             self.messages = []
+            self._snapshot_generation = None
+            self._rebuild_token_ledger()
             return
 
-        try:
-            with open(self._history_file_path, "r", encoding='utf-8') as f:
-                history_data = json.load(f)
+        self.messages = self._load_snapshot()
 
-            loaded_messages = []
-            if isinstance(history_data, list):
-                for msg_dict in history_data:
-                    if not isinstance(msg_dict, dict):
-                        logger.warning(f"加载历史时跳过无效的条目 (非字典): {msg_dict}")
-                        continue
+        # 重放追加日志 (无论当前持久化模式如何，都需要重放，避免切换模式后丢失消息)
+        replayed_count = self._replay_journal()
+        if replayed_count > 0:
+            logger.info(f"从追加日志 {self._journal_file_path} 重放了 {replayed_count} 条聊天记录。")
 
-                    role = msg_dict.get("role")
-                    # 创建一个副本用于实例化，只包含 dataclass 定义的字段
-                    args_dict = {} # 从空字典开始，只添加需要的
-                    # 通用字段 (移除单独的 token 字段)
-                    for key in [
-                        "content", "role", "tool_calls", "tool_call_id",
-                        # "created_at", "system", "prompt_tokens", "completion_tokens", "cached_tokens",
-                        #"cache_write_tokens", "cache_hit_tokens" #<-- 移除
-                    ]:
-                         if key in msg_dict:
-                              args_dict[key] = msg_dict[key]
-                              # # 对 token 字段做类型检查和转换，防止加载旧的错误数据 <-- 移除
-                              # if key.endswith("_tokens"):
-                              #     try:
-                              #         args_dict[key] = int(msg_dict[key]) if msg_dict[key] is not None else None
-                              #     except (ValueError, TypeError):
-                              #         logger.warning(f"加载历史时 token 字段 '{key}' 值无效: {msg_dict[key]}，将忽略。")
-                              #         args_dict[key] = None
-                              # else:
-                              #      args_dict[key] = msg_dict[key]
-
-                    # 处理 show_in_ui (替换 is_internal)
-                    # 默认为 True，除非显式指定为 False
-                    show_ui_value = msg_dict.get("show_in_ui", msg_dict.get("is_internal") == False if "is_internal" in msg_dict else True)
-                    args_dict["show_in_ui"] = bool(show_ui_value)
-
-                    # 特殊处理 duration: 从 'duration' 字符串解析到 'duration_ms' float
-                    parsed_duration_ms = None
-                    duration_str = msg_dict.get("duration")
-                    if duration_str is not None:
-                        parsed_duration_ms = parse_duration_from_str(duration_str)
-                        if parsed_duration_ms is None:
-                             logger.warning(f"加载历史时未能解析 'duration' 字段: {duration_str}，将忽略。消息: {msg_dict}")
-
-                    # 如果解析成功，添加到 args_dict (仅 assistant 和 tool)
-                    if role in ["assistant", "tool"] and parsed_duration_ms is not None:
-                        args_dict["duration_ms"] = parsed_duration_ms
-                    # 兼容旧的 duration_ms float 字段（如果存在且 duration 字符串不存在）
-                    elif role in ["assistant", "tool"] and "duration_ms" in msg_dict and duration_str is None:
-                        try:
-                             legacy_duration_ms = float(msg_dict["duration_ms"])
-                             args_dict["duration_ms"] = legacy_duration_ms
-                             logger.debug(f"从旧的 duration_ms 字段加载了耗时: {legacy_duration_ms}")
-                        except (ValueError, TypeError):
-                             logger.warning(f"无法将旧的 duration_ms 字段 {msg_dict['duration_ms']} 转为 float，已忽略。")
+        if self._rebuild_token_ledger():
+            self._save_token_usage_updates()
 
-                    try:
-                        # 根据 role 转换回相应的 dataclass
-                        if role == "system":
-                            message = SystemMessage(**args_dict)
-                        elif role == "user":
-                            message = UserMessage.from_dict(msg_dict) if UserMessage.from_dict else UserMessage(**args_dict)
-                        elif role == "assistant":
-                            message = AssistantMessage.from_dict(msg_dict)
-                        elif role == "tool":
-                            message = ToolMessage.from_dict(msg_dict)
-                        else:
-                            logger.warning(f"加载历史时发现未知的角色: {role}，跳过此消息: {msg_dict}")
-                            continue
-                        loaded_messages.append(message)
-                    except TypeError as e:
-                        logger.warning(f"加载历史时转换消息失败 (字段不匹配或类型错误): {args_dict} (原始: {msg_dict})，错误: {e}")
-                    except Exception as e:
-                        logger.error(f"加载历史时处理消息出错: {msg_dict}，错误: {e}", exc_info=True)
+    def _load_snapshot(self) -> List[ChatMessage]:
+        """
+        从 JSON 快照文件加载消息列表。
 
-                self.messages = loaded_messages
-                logger.info(f"成功从 {self._history_file_path} 加载 {len(self.messages)} 条聊天记录。")
-            else:
+        Returns:
+            List[ChatMessage]: 加载到的消息列表，文件不存在或解析失败时返回空列表
+        """
+        self._snapshot_generation = None
+        if not os.path.exists(self._history_file_path):
+            return []
+
+        try:
+            with open(self._history_file_path, "rb") as f:
+                raw_data = f.read()
+            self._snapshot_generation = self._snapshot_digest(raw_data)
+            history_data = json.loads(raw_data.decode("utf-8"))
+
+            if not isinstance(history_data, list):
                 logger.warning(f"聊天记录文件格式无效 (不是列表): {self._history_file_path}")
-                self.messages = []
+                return []
+
+            loaded_messages = []
+            for msg_dict in history_data:
+                message = self._message_from_saved_dict(msg_dict)
+                if message is not None:
+                    loaded_messages.append(message)
+
+            logger.info(f"成功从 {self._history_file_path} 加载 {len(loaded_messages)} 条聊天记录。")
+            return loaded_messages
 
         except json.JSONDecodeError as e:
             logger.error(f"解析聊天记录文件 JSON 失败: {self._history_file_path}，错误: {e}")
-            self.messages = [] # 解析失败则清空
+            return [] # 解析失败则清空
         except Exception as e:
             logger.error(f"加载聊天记录时发生未知错误: {self._history_file_path}，错误: {e}", exc_info=True)
-            self.messages = [] # 其他错误也清空
+            return [] # 其他错误也清空
 
-    def save(self) -> None:
+    def _message_from_saved_dict(self, msg_dict: Any) -> Optional[ChatMessage]:
+        """
+        将持久化的消息字典转换回消息对象。
+
+        Args:
+            msg_dict (Any): 从快照或追加日志中读取的消息字典
+
+        Returns:
+            Optional[ChatMessage]: 转换后的消息对象，无效条目返回 None
         """
-        将当前聊天记录保存到 JSON 文件。
+        if not isinstance(msg_dict, dict):
+            logger.warning(f"加载历史时跳过无效的条目 (非字典): {msg_dict}")
+            return None
+
+        role = msg_dict.get("role")
+        # 创建一个副本用于实例化，只包含 dataclass 定义的字段
+        args_dict = {} # 从空字典开始，只添加需要的
+        for key in ["content", "role", "tool_calls", "tool_call_id"]:
+            if key in msg_dict:
+                args_dict[key] = msg_dict[key]
+
+        # 处理 show_in_ui (替换 is_internal)
+        # 默认为 True，除非显式指定为 False
+        show_ui_value = msg_dict.get("show_in_ui", msg_dict.get("is_internal") == False if "is_internal" in msg_dict else True)
+        args_dict["show_in_ui"] = bool(show_ui_value)
+
+        # 特殊处理 duration: 从 'duration' 字符串解析到 'duration_ms' float
+        parsed_duration_ms = None
+        duration_str = msg_dict.get("duration")
+        if duration_str is not None:
+            parsed_duration_ms = parse_duration_from_str(duration_str)
+            if parsed_duration_ms is None:
+                logger.warning(f"加载历史时未能解析 'duration' 字段: {duration_str}，将忽略。消息: {msg_dict}")
+
+        # 如果解析成功，添加到 args_dict (仅 assistant 和 tool)
+        if role in ["assistant", "tool"] and parsed_duration_ms is not None:
+            args_dict["duration_ms"] = parsed_duration_ms
+        # 兼容旧的 duration_ms float 字段（如果存在且 duration 字符串不存在）
+        elif role in ["assistant", "tool"] and "duration_ms" in msg_dict and duration_str is None:
+            try:
+                legacy_duration_ms = float(msg_dict["duration_ms"])
+                args_dict["duration_ms"] = legacy_duration_ms
+                logger.debug(f"从旧的 duration_ms 字段加载了耗时: {legacy_duration_ms}")
+            except (ValueError, TypeError):
+                logger.warning(f"无法将旧的 duration_ms 字段 {msg_dict['duration_ms']} 转为 float，已忽略。")
+
+        try:
+            # 根据 role 转换回相应的 dataclass
+            if role == "system":
+                return SystemMessage(**args_dict)
+            elif role == "user":
+                return UserMessage.from_dict(msg_dict) if UserMessage.from_dict else UserMessage(**args_dict)
+            elif role == "assistant":
+                return AssistantMessage.from_dict(msg_dict)
+            elif role == "tool":
+                return ToolMessage.from_dict(msg_dict)
+            else:
+                logger.warning(f"加载历史时发现未知的角色: {role}，跳过此消息: {msg_dict}")
+                return None
+        except TypeError as e:
+            logger.warning(f"加载历史时转换消息失败 (字段不匹配或类型错误): {args_dict} (原始: {msg_dict})，错误: {e}")
+        except Exception as e:
+            logger.error(f"加载历史时处理消息出错: {msg_dict}，错误: {e}", exc_info=True)
+        return None
+
+    def _replay_journal(self) -> int:
+        """
+        重放追加日志，将快照之后追加的消息恢复到 self.messages。
+        日志中每条记录都带有其所基于的快照代号 snapshot，与当前快照不一致的记录说明
+        已经合并进更新的快照（例如写入快照后、清空日志前进程退出），会被跳过。
+        没有快照代号的旧格式记录按消息位置 index 判断，index 小于当前消息数的记录会被跳过。
+        进程崩溃可能导致最后一行写入不完整，解析失败的行会被忽略。
+
+        Returns:
+            int: 重放的消息数量
+        """
+        if not os.path.exists(self._journal_file_path):
+            return 0
+
+        replayed_count = 0
+        stale_count = 0
+        try:
+            with open(self._journal_file_path, "r", encoding="utf-8") as f:
+                for line_no, line in enumerate(f, start=1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    self._journal_entry_count += 1
+
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"追加日志第 {line_no} 行不完整或已损坏，已忽略: {self._journal_file_path}")
+                        continue
+
+                    index = record.get("index") if isinstance(record, dict) else None
+                    msg_dict = record.get("message") if isinstance(record, dict) else None
+                    if not isinstance(index, int) or not isinstance(msg_dict, dict):
+                        logger.warning(f"追加日志第 {line_no} 行格式无效，已忽略: {line[:200]}")
+                        continue
+
+                    # 已合并到快照中的记录直接跳过
+                    if "snapshot" in record and record["snapshot"] != self._snapshot_generation:
+                        stale_count += 1
+                        continue
+                    if index < len(self.messages):
+                        continue
+                    if index > len(self.messages):
+                        logger.warning(f"追加日志第 {line_no} 行的位置 {index} 与当前消息数 {len(self.messages)} 不连续，将按顺序追加")
+
+                    message = self._message_from_saved_dict(msg_dict)
+                    if message is not None:
+                        self.messages.append(message)
+                        replayed_count += 1
+        except Exception as e:
+            logger.error(f"重放追加日志 {self._journal_file_path} 时出错: {e}", exc_info=True)
+
+        if stale_count > 0:
+            logger.info(f"追加日志中有 {stale_count} 条记录已合并到当前快照，已跳过: {self._journal_file_path}")
+        return replayed_count
+
+    def _message_to_save_dict(self, message: ChatMessage) -> Dict[str, Any]:
+        """
+        将消息对象转换为持久化使用的字典格式。
         对于 Assistant 和 Tool 消息，会将 duration_ms (float) 转换为 'duration' (str) 存储。
-        会包含 show_in_ui 字段。
         可选字段如果等于 None 或默认值，则会被省略以减少冗余。
+
+        Args:
+            message (ChatMessage): 要转换的消息对象
+
+        Returns:
+            Dict[str, Any]: 持久化格式的消息字典
+        """
+        # 将 dataclass 转为字典 (使用 to_dict 方法确保应用模型层的逻辑)
+        if hasattr(message, 'to_dict') and callable(message.to_dict):
+            msg_dict = message.to_dict()
+        else:
+            # 备选方案 (理论上不应执行，因为所有消息类型都有 to_dict)
+            msg_dict = asdict(message)
+            logger.warning(f"消息对象缺少 to_dict 方法: {type(message)}")
+
+        # 1. 处理 duration (移除 duration_ms, 添加 duration str)
+        if isinstance(message, (AssistantMessage, ToolMessage)):
+            duration_ms = msg_dict.pop('duration_ms', None) # 总是移除 ms 字段
+            if duration_ms is not None:
+                duration_str = format_duration_to_str(duration_ms)
+                if duration_str:
+                    msg_dict['duration'] = duration_str
+        # 确保其他类型也没有 duration_ms
+        elif 'duration_ms' in msg_dict:
+            msg_dict.pop('duration_ms')
+
+        # 2. 移除值为默认值的可选字段 (已在 to_dict 中处理 show_in_ui, content, tool_calls, system)
+        # 这里我们额外检查 to_dict 可能仍保留的 None 值 (例如转换失败的 token_usage)
+        # 并确保 compression_info 为 None 时被移除
+        keys_to_remove = []
+        for key, value in msg_dict.items():
+            # 移除值为 None 的字段 (除非是允许为 None 的 content 或 tool_calls)
+            if value is None and key not in ['content', 'tool_calls']:
+                keys_to_remove.append(key)
+            # 检查 token_usage 是否为空字典
+            elif key == 'token_usage' and isinstance(value, dict) and not value:
+                keys_to_remove.append(key)
+
+        for key in keys_to_remove:
+            msg_dict.pop(key)
+
+        # 移除消息字典中的 ID 字段，因为它仅用于运行时
+        msg_dict.pop('id', None)
+
+        return msg_dict
+
+    def save(self) -> None:
+        """
+        将当前聊天记录完整保存到 JSON 快照文件，并清空追加日志。
+        快照先写入临时文件再原子替换，避免写入过程中崩溃导致文件损坏。
+        替换后快照代号随之变化，即使清空追加日志前进程退出，旧的日志记录也不会被重复重放。
+        会包含 show_in_ui 字段。
         """
         try:
-            history_to_save = []
-            for message in self.messages:
-                # 将 dataclass 转为字典 (使用 to_dict 方法确保应用模型层的逻辑)
-                if hasattr(message, 'to_dict') and callable(message.to_dict):
-                    msg_dict = message.to_dict()
-                else:
-                    # 备选方案 (理论上不应执行，因为所有消息类型都有 to_dict)
-                    msg_dict = asdict(message)
-                    logger.warning(f"消息对象缺少 to_dict 方法: {type(message)}")
-
-                # 1. 处理 duration (移除 duration_ms, 添加 duration str)
-                if isinstance(message, (AssistantMessage, ToolMessage)):
-                    duration_ms = msg_dict.pop('duration_ms', None) # 总是移除 ms 字段
-                    if duration_ms is not None:
-                        duration_str = format_duration_to_str(duration_ms)
-                        if duration_str:
-                            msg_dict['duration'] = duration_str
-                # 确保其他类型也没有 duration_ms
-                elif 'duration_ms' in msg_dict:
-                     msg_dict.pop('duration_ms')
-
-                # 2. 移除值为默认值的可选字段 (已在 to_dict 中处理 show_in_ui, content, tool_calls, system)
-                # 这里我们额外检查 to_dict 可能仍保留的 None 值 (例如转换失败的 token_usage)
-                # 并确保 compression_info 为 None 时被移除
-                keys_to_remove = []
-                for key, value in msg_dict.items():
-                    # 移除值为 None 的字段 (除非是允许为 None 的 content 或 tool_calls)
-                    if value is None and key not in ['content', 'tool_calls']:
-                        keys_to_remove.append(key)
-                    # 特别处理 compression_info，如果它是 None，也移除
-                    elif key == 'compression_info' and value is None:
-                         keys_to_remove.append(key)
-                    # 检查 token_usage 是否为 None 或空字典
-                    elif key == 'token_usage' and (value is None or (isinstance(value, dict) and not value)):
-                        keys_to_remove.append(key)
-
-                for key in keys_to_remove:
-                    msg_dict.pop(key)
-
-                # 移除消息字典中的 ID 字段，因为它仅用于运行时
-                msg_dict.pop('id', None)
-
-                history_to_save.append(msg_dict)
+            history_to_save = [self._message_to_save_dict(message) for message in self.messages]
 
             # 使用 indent 美化 JSON 输出
-            history_json = json.dumps(history_to_save, indent=4, ensure_ascii=False)
-            with open(self._history_file_path, "w", encoding='utf-8') as f:
-                f.write(history_json)
+            history_data = json.dumps(history_to_save, indent=4, ensure_ascii=False).encode("utf-8")
+            tmp_file_path = f"{self._history_file_path}.tmp"
+            with open(tmp_file_path, "wb") as f:
+                f.write(history_data)
+            os.replace(tmp_file_path, self._history_file_path)
+            self._snapshot_generation = self._snapshot_digest(history_data)
+
+            # 快照已包含全部消息，追加日志可以清空
+            self._reset_journal()
             # logger.debug(f"聊天记录已保存到: {self._history_file_path}")
         except Exception as e:
             logger.error(f"保存聊天记录到 {self._history_file_path} 时出错: {e}", exc_info=True)
 
+    @staticmethod
+    def _snapshot_digest(data: bytes) -> str:
+        """计算快照文件内容的摘要，用作快照代号"""
+        return hashlib.sha256(data).hexdigest()[:16]
+
+    def _reset_journal(self) -> None:
+        """删除追加日志文件并重置计数"""
+        self._journal_entry_count = 0
+        if os.path.exists(self._journal_file_path):
+            os.remove(self._journal_file_path)
+
+    def _append_to_journal(self, message: ChatMessage, index: int) -> None:
+        """
+        将一条新追加的消息写入追加日志，写入量与历史长度无关。
+        日志条数达到 journal_compact_threshold 时合并为快照。
+
+        Args:
+            message (ChatMessage): 新追加的消息
+            index (int): 消息在历史中的位置
+        """
+        try:
+            record = {"snapshot": self._snapshot_generation, "index": index, "message": self._message_to_save_dict(message)}
+            with open(self._journal_file_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+            self._journal_entry_count += 1
+        except Exception as e:
+            logger.error(f"写入追加日志 {self._journal_file_path} 时出错: {e}，将改为保存完整快照", exc_info=True)
+            self.save()
+            return
+
+        if self._journal_entry_count >= self.journal_compact_threshold:
+            self.compact()
+
+    def _persist_appended_message(self) -> None:
+        """持久化刚追加到末尾的消息，根据持久化模式选择追加日志或完整快照"""
+        if self.storage_mode == STORAGE_MODE_JOURNAL:
+            self._append_to_journal(self.messages[-1], len(self.messages) - 1)
+        else:
+            self.save()
+
+    def compact(self) -> None:
+        """
+        将追加日志合并到 JSON 快照文件中。
+        在 journal 模式下，Agent 运行结束时应调用此方法，保证快照文件是完整的。
+        """
+        if self._journal_entry_count <= 0 and not os.path.exists(self._journal_file_path):
+            return
+        logger.debug(f"合并聊天记录追加日志 ({self._journal_entry_count} 条) 到快照: {self._history_file_path}")
+        self.save()
+
     def save_tools_list(self, tools_list: List[Dict[str, Any]]) -> None:
         """
         将工具列表保存到与聊天记录文件同名的.tools.json文件中。
+        传入与上次相同的列表对象时直接跳过，调用方在工具集合变化时应传入新的列表对象，而不是原地修改。
 
         Args:
             tools_list (List[Dict[str, Any]]): 要保存的工具列表。
         """
+        if tools_list is self._saved_tools_list:
+            return
+
+        tools_file_path = self._build_tools_list_filename()
         try:
-            tools_file_path = self._build_tools_list_filename()
             # 使用indent美化JSON输出
             tools_json = json.dumps(tools_list, indent=4, ensure_ascii=False)
+            tools_hash = hashlib.sha256(tools_json.encode("utf-8")).hexdigest()
+
+            # 进程内首次保存时，与已有文件比较，避免重启后重复写入相同内容
+            if self._tools_list_hash is None and os.path.exists(tools_file_path):
+                with open(tools_file_path, "r", encoding="utf-8") as f:
+                    self._tools_list_hash = hashlib.sha256(f.read().encode("utf-8")).hexdigest()
+
+            if tools_hash == self._tools_list_hash:
+                logger.debug(f"工具列表未变化，跳过保存: {tools_file_path}")
+                self._saved_tools_list = tools_list
+                return
+
             with open(tools_file_path, "w", encoding="utf-8") as f:
                 f.write(tools_json)
+            self._tools_list_hash = tools_hash
+            self._saved_tools_list = tools_list
             logger.debug(f"工具列表已保存到: {tools_file_path}")
         except Exception as e:
             logger.error(f"保存工具列表到 {tools_file_path} 时出错: {e}", exc_info=True)
@@ -509,7 +759,9 @@ class ChatHistory:
                 return False
 
             self.messages.append(validated_message)
-            self.save()
+            # 先记录 token 数 (可能会补充 token_usage)，再持久化
+            self._ledger_record(validated_message)
+            self._persist_appended_message()
 
             # 异步检查并执行压缩
             compressed = await self.check_and_compress_if_needed()
@@ -675,92 +927,155 @@ class ChatHistory:
         获取用于传递给 LLM API 的消息列表 (字典格式，严格白名单字段)。
         此方法确保只包含 LLM API 理解的字段，并且格式正确。
         所有内部使用的字段 (如 show_in_ui, duration_ms, token_usage, created_at, system(tool)) 都不会包含在内。
+
+        每条消息转换后的字典会按消息对象及其版本 (role、content、tool_calls、tool_call_id) 缓存，
+        只有新增或被修改的消息才会重新转换。返回的是缓存字典的副本，调用方（例如 BEFORE_LLM_REQUEST 的监听器）
+        修改它们不会影响缓存。
         """
         llm_messages = []
-        # 遍历所有内部存储的消息
+        cache = self._llm_message_cache
         for message in self.messages:
-            # --- 白名单模式：只添加 API 需要的字段 --- #
-            llm_msg: Dict[str, Any] = {"role": message.role}
+            version = self._llm_message_version(message)
+            cached = cache.get(id(message))
+            if cached is not None and cached[0] is message and cached[1] == version:
+                llm_msg = cached[2]
+            else:
+                llm_msg = self._convert_message_for_llm(message)
+                cache[id(message)] = (message, version, llm_msg)
 
-            role = message.role
+            if llm_msg is not None:
+                llm_messages.append(self._copy_llm_message(llm_msg))
 
-            if role == "system":
-                # System 消息只需要 role 和 content
-                content = getattr(message, 'content', ' ') # 确保 content 存在
-                llm_msg["content"] = content if content and content.strip() else " "
+        # 清理已经不在历史中的消息缓存 (例如压缩、替换之后)
+        if len(cache) > 2 * len(self.messages) + 16:
+            live_ids = {id(message) for message in self.messages}
+            for key in [key for key in cache if key not in live_ids]:
+                del cache[key]
 
-            elif role == "user":
-                # User 消息只需要 role 和 content
-                content = getattr(message, 'content', ' ')
-                llm_msg["content"] = content if content and content.strip() else " "
+        return llm_messages
 
-            elif role == "assistant":
-                # Assistant 消息可以有 content, tool_calls, 或两者都有
-                has_content = False
-                content = getattr(message, 'content', None)
-                # 只有当 content 存在且非空时才添加
-                if content and content.strip():
-                    llm_msg["content"] = content
-                    has_content = True
-
-                tool_calls = getattr(message, 'tool_calls', None)
-                has_tool_calls = False
-                if tool_calls:
-                    # 格式化 tool_calls
-                    formatted_tool_calls = []
-                    for tc in tool_calls:
-                         # 确保 tc 是 ToolCall 对象且结构有效
-                         if isinstance(tc, ToolCall) and isinstance(tc.function, FunctionCall) and tc.id and tc.function.name:
-                             arguments_str = tc.function.arguments
-                             # 确保 arguments 是字符串
-                             if not isinstance(arguments_str, str):
-                                  try:
-                                      arguments_str = json.dumps(arguments_str, ensure_ascii=False)
-                                  except Exception:
-                                       logger.warning(f"无法在 get_messages_for_llm 中序列化 assistant tool_call arguments: {arguments_str}。将使用空JSON对象字符串。")
-                                       arguments_str = "{}"
-
-                             formatted_tool_calls.append({
-                                "id": tc.id,
-                                "type": tc.type,
-                                "function": {
-                                    "name": tc.function.name,
-                                    "arguments": arguments_str
-                                }
-                             })
-                         else:
-                              logger.warning(f"在 get_messages_for_llm 中跳过无效的 assistant tool_call 结构: {tc}")
-
-                    if formatted_tool_calls:
-                        llm_msg["tool_calls"] = formatted_tool_calls
-                        has_tool_calls = True
-
-                # 健全性检查: Assistant 消息必须至少有 content 或 tool_calls
-                # 如果两者都没有，强制添加一个空格 content，以避免 API 错误
-                if not has_content and not has_tool_calls:
-                    logger.warning(f"为 LLM 准备的助手消息既无有效内容也无工具调用: {message}。强制添加空格 content。")
-                    llm_msg["content"] = " "
+    @staticmethod
+    def _copy_llm_message(llm_msg: Dict[str, Any]) -> Dict[str, Any]:
+        """复制缓存的 LLM 消息字典，tool_calls 中的嵌套字典也一并复制，字符串等不可变值共享"""
+        llm_msg_copy = dict(llm_msg)
+        tool_calls = llm_msg_copy.get("tool_calls")
+        if tool_calls:
+            llm_msg_copy["tool_calls"] = [
+                {**tc, "function": dict(tc["function"])} for tc in tool_calls
+            ]
+        return llm_msg_copy
 
-            elif role == "tool":
-                # Tool 消息需要 role, content, 和 tool_call_id
-                content = getattr(message, 'content', ' ')
-                llm_msg["content"] = content if content and content.strip() else " "
-                tool_call_id = getattr(message, 'tool_call_id', None)
-                if tool_call_id:
-                    llm_msg["tool_call_id"] = tool_call_id
-                else:
-                    logger.error(f"为 LLM 准备的工具消息缺少 tool_call_id: {message}。这可能导致 API 错误。")
-                    # 即使缺少 id，也继续添加消息，让 API 层处理错误
+    @staticmethod
+    def _llm_message_version(message: ChatMessage) -> tuple:
+        """
+        获取消息中影响 LLM 字典内容的字段，用于判断缓存是否失效。
+        字符串比较会先比较对象标识，未修改的消息比较开销很小。
+        """
+        tool_calls = getattr(message, 'tool_calls', None)
+        tool_calls_version = None
+        if tool_calls:
+            tool_calls_version = tuple(
+                (tc.id, tc.type, tc.function.name, tc.function.arguments)
+                if isinstance(tc, ToolCall) and isinstance(tc.function, FunctionCall) else id(tc)
+                for tc in tool_calls
+            )
+        return (
+            message.role,
+            getattr(message, 'content', None),
+            getattr(message, 'tool_call_id', None),
+            tool_calls_version,
+        )
+
+    def _convert_message_for_llm(self, message: ChatMessage) -> Optional[Dict[str, Any]]:
+        """
+        将单条消息转换为 LLM API 需要的字典格式 (白名单字段)。
+
+        Args:
+            message (ChatMessage): 要转换的消息
 
-            # 其他 role 类型不应出现在这里，如果出现则忽略
+        Returns:
+            Optional[Dict[str, Any]]: 转换后的字典，未知角色的消息返回 None
+        """
+        # --- 白名单模式：只添加 API 需要的字段 --- #
+        llm_msg: Dict[str, Any] = {"role": message.role}
+
+        role = message.role
+
+        if role == "system":
+            # System 消息只需要 role 和 content
+            content = getattr(message, 'content', ' ') # 确保 content 存在
+            llm_msg["content"] = content if content and content.strip() else " "
+
+        elif role == "user":
+            # User 消息只需要 role 和 content
+            content = getattr(message, 'content', ' ')
+            llm_msg["content"] = content if content and content.strip() else " "
+
+        elif role == "assistant":
+            # Assistant 消息可以有 content, tool_calls, 或两者都有
+            has_content = False
+            content = getattr(message, 'content', None)
+            # 只有当 content 存在且非空时才添加
+            if content and content.strip():
+                llm_msg["content"] = content
+                has_content = True
+
+            tool_calls = getattr(message, 'tool_calls', None)
+            has_tool_calls = False
+            if tool_calls:
+                # 格式化 tool_calls
+                formatted_tool_calls = []
+                for tc in tool_calls:
+                     # 确保 tc 是 ToolCall 对象且结构有效
+                     if isinstance(tc, ToolCall) and isinstance(tc.function, FunctionCall) and tc.id and tc.function.name:
+                         arguments_str = tc.function.arguments
+                         # 确保 arguments 是字符串
+                         if not isinstance(arguments_str, str):
+                              try:
+                                  arguments_str = json.dumps(arguments_str, ensure_ascii=False)
+                              except Exception:
+                                   logger.warning(f"无法在 get_messages_for_llm 中序列化 assistant tool_call arguments: {arguments_str}。将使用空JSON对象字符串。")
+                                   arguments_str = "{}"
+
+                         formatted_tool_calls.append({
+                            "id": tc.id,
+                            "type": tc.type,
+                            "function": {
+                                "name": tc.function.name,
+                                "arguments": arguments_str
+                            }
+                         })
+                     else:
+                          logger.warning(f"在 get_messages_for_llm 中跳过无效的 assistant tool_call 结构: {tc}")
+
+                if formatted_tool_calls:
+                    llm_msg["tool_calls"] = formatted_tool_calls
+                    has_tool_calls = True
+
+            # 健全性检查: Assistant 消息必须至少有 content 或 tool_calls
+            # 如果两者都没有，强制添加一个空格 content，以避免 API 错误
+            if not has_content and not has_tool_calls:
+                logger.warning(f"为 LLM 准备的助手消息既无有效内容也无工具调用: {message}。强制添加空格 content。")
+                llm_msg["content"] = " "
+
+        elif role == "tool":
+            # Tool 消息需要 role, content, 和 tool_call_id
+            content = getattr(message, 'content', ' ')
+            llm_msg["content"] = content if content and content.strip() else " "
+            tool_call_id = getattr(message, 'tool_call_id', None)
+            if tool_call_id:
+                llm_msg["tool_call_id"] = tool_call_id
             else:
-                logger.warning(f"在 get_messages_for_llm 中遇到未知角色: {role}，已跳过。")
-                continue # 跳过这条消息
+                logger.error(f"为 LLM 准备的工具消息缺少 tool_call_id: {message}。这可能导致 API 错误。")
+                # 即使缺少 id，也继续添加消息，让 API 层处理错误
 
-            # --- 白名单构建结束，不需要 pop 任何字段 --- #
-            llm_messages.append(llm_msg)
+        # 其他 role 类型不应出现在这里，如果出现则忽略
+        else:
+            logger.warning(f"在 get_messages_for_llm 中遇到未知角色: {role}，已跳过。")
+            return None # 跳过这条消息
 
-        return llm_messages
+        # --- 白名单构建结束，不需要 pop 任何字段 --- #
+        return llm_msg
 
     def get_last_messages(self, n: int = 1) -> Union[Optional[ChatMessage], List[ChatMessage]]:
         """
@@ -817,6 +1132,7 @@ class ChatHistory:
         """
         if self.messages:
             removed_message = self.messages.pop()
+            self._ledger_forget(removed_message)
             self.save()
             logger.debug(f"移除了最后一条消息: {removed_message}")
             return removed_message
@@ -836,9 +1152,11 @@ class ChatHistory:
             if len(self.messages) > 0:
                  insert_index = len(self.messages) - 1
                  self.messages.insert(insert_index, validated_message)
+                 self._ledger_record(validated_message)
                  logger.debug(f"在索引 {insert_index} 处插入消息: {validated_message}")
             else:
                  self.messages.append(validated_message) # 如果列表为空或只有一个元素，则追加
+                 self._ledger_record(validated_message)
                  logger.debug(f"历史记录不足，追加消息: {validated_message}")
 
             self.save()
@@ -869,6 +1187,8 @@ class ChatHistory:
             # 清空原有消息并添加新消息
             self.messages.clear()
             self.messages.extend(validated_messages)
+            # 保留下来的消息沿用已有的 token 数，只计算新消息
+            self._rebuild_token_ledger(reuse_counts=True)
 
             # 保存更新后的历史
             self.save()
@@ -1015,6 +1335,7 @@ class ChatHistory:
             if self.messages[i].role == "user":
                 # 找到了用户消息，替换内容
                 self.messages[i].content = new_content
+                self._ledger_record(self.messages[i])
                 # 保存更改
                 self.save()
                 logger.debug(f"已将最后一条用户消息内容替换为: {new_content}")
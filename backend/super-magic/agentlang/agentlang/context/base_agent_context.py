@@ -11,12 +11,16 @@ from typing import Any, Callable, Dict, Optional
 from agentlang.context.base_context import BaseContext
 from agentlang.context.shared_context import AgentSharedContext
 from agentlang.event.dispatcher import EventDispatcher
+from agentlang.event.event import ListenerMode
 from agentlang.event.interface import EventDispatcherInterface
 from agentlang.interface.context import AgentContextInterface
 from agentlang.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 关闭资源前等待后台事件监听器处理积压事件的最长时间（秒）
+EVENT_DRAIN_TIMEOUT = 30
+
 class BaseAgentContext(BaseContext, AgentContextInterface):
     """基础代理上下文实现
     
@@ -167,10 +171,10 @@ class BaseAgentContext(BaseContext, AgentContextInterface):
         logger.debug(f"分发事件: {event_type}")
         return await self.get_event_dispatcher().dispatch(event)
 
-    def add_event_listener(self, event_type: str, listener: Callable) -> None:
+    def add_event_listener(self, event_type: str, listener: Callable, mode: ListenerMode = ListenerMode.INLINE) -> None:
         """添加事件监听器"""
-        self.get_event_dispatcher().add_listener(event_type, listener)
-        logger.debug(f"添加事件监听器: {event_type}")
+        self.get_event_dispatcher().add_listener(event_type, listener, mode=mode)
+        logger.debug(f"添加事件监听器: {event_type}, 模式: {mode}")
 
     async def get_resource(self, name: str, factory=None) -> Any:
         """获取资源，如不存在则创建"""
@@ -220,7 +224,24 @@ class BaseAgentContext(BaseContext, AgentContextInterface):
             raise RuntimeError(f"关闭资源 {name} 时出错: {e}")
 
     async def close_all_resources(self) -> None:
-        """关闭并移除所有资源"""
+        """关闭并移除所有资源，关闭前先等待后台事件监听器处理完积压事件并停止其后台任务，再写入token使用报告"""
+        dispatcher = self.get_event_dispatcher()
+        try:
+            await dispatcher.drain(timeout=EVENT_DRAIN_TIMEOUT)
+        except Exception as e:
+            logger.error(f"等待后台事件监听器时出错: {e}")
+        try:
+            await dispatcher.close()
+        except Exception as e:
+            logger.error(f"停止后台事件监听器时出错: {e}")
+
+        # 写入内存中尚未保存的token使用报告
+        try:
+            from agentlang.llms.token_usage.report import TokenUsageReport
+            await asyncio.to_thread(TokenUsageReport.flush_all)
+        except Exception as e:
+            logger.error(f"写入token使用报告时出错: {e}")
+
         # 复制键列表，因为在迭代过程中会修改字典
         resource_names = list(self._resources.keys())
         for name in resource_names:
@@ -44,6 +44,15 @@ class AfterLlmResponseEventData(BaseEventData):
     show_in_ui: bool = True  # 是否在UI中显示
 
 
+class LlmStreamDeltaEventData(BaseEventData):
+    """大模型流式输出增量的事件数据结构"""
+
+    model_name: str
+    tool_context: ToolContext
+    content_delta: str  # 本次新增的文本内容（多个响应块合并后）
+    content: str  # 截至目前已接收的完整文本内容
+
+
 class BeforeToolCallEventData(BaseEventData):
     """工具调用前的事件数据结构"""
 
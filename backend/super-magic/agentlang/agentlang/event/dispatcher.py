@@ -1,7 +1,9 @@
+import asyncio
 import traceback
+from dataclasses import dataclass, field
 from typing import Any, Callable, Dict, Iterable, List, Optional, TypeVar
 
-from agentlang.event.event import Event, EventType, StoppableEvent
+from agentlang.event.event import Event, EventType, ListenerMode, StoppableEvent
 from agentlang.event.interface import EventDispatcherInterface
 from agentlang.logger import get_logger
 
@@ -9,24 +11,49 @@ logger = get_logger(__name__)
 
 T = TypeVar('T')  # 暂时解除与 BaseEventData 的绑定，以避免循环导入
 
+# 后台监听器默认的最大积压事件数
+DEFAULT_MAX_BACKLOG = 100
+
+
+@dataclass
+class ListenerRegistration:
+    """监听器注册信息"""
+    listener: Callable[[Event[Any]], None]
+    mode: ListenerMode = ListenerMode.INLINE
+    max_backlog: int = DEFAULT_MAX_BACKLOG
+    queue: Optional[asyncio.Queue] = field(default=None, repr=False)
+    worker: Optional[asyncio.Task] = field(default=None, repr=False)
+    loop: Optional[asyncio.AbstractEventLoop] = field(default=None, repr=False)
+
+
 class ListenerProvider:
     """监听器提供者，负责管理和提供事件监听器"""
 
     def __init__(self):
         """初始化监听器提供者"""
-        self._listeners: Dict[EventType, List[Callable[[Event[Any]], None]]] = {}
+        self._listeners: Dict[EventType, List[ListenerRegistration]] = {}
 
-    def add_listener(self, event_type: EventType, listener: Callable[[Event[Any]], None]) -> None:
+    def add_listener(
+        self,
+        event_type: EventType,
+        listener: Callable[[Event[Any]], None],
+        mode: ListenerMode = ListenerMode.INLINE,
+        max_backlog: int = DEFAULT_MAX_BACKLOG
+    ) -> None:
         """添加事件监听器
 
         Args:
             event_type: 事件类型
             listener: 监听器函数，接收一个事件参数
+            mode: 监听器执行模式
+            max_backlog: 后台模式下允许积压的最大事件数，队列满时 dispatch 等待队列腾出空间
         """
         if event_type not in self._listeners:
             self._listeners[event_type] = []
-        self._listeners[event_type].append(listener)
-        logger.info(f"已添加事件监听器: {event_type}, 监听器: {listener.__name__}")
+        self._listeners[event_type].append(
+            ListenerRegistration(listener=listener, mode=ListenerMode(mode), max_backlog=max(max_backlog, 1))
+        )
+        logger.info(f"已添加事件监听器: {event_type}, 监听器: {listener.__name__}, 模式: {ListenerMode(mode).value}")
 
     def get_listeners_for_event(self, event: Event[Any]) -> Iterable[Callable[[Event[Any]], None]]:
         """获取指定事件的所有监听器
@@ -37,8 +64,28 @@ class ListenerProvider:
         Returns:
             Iterable[Callable]: 监听器函数列表
         """
+        return [registration.listener for registration in self.get_registrations_for_event(event)]
+
+    def get_registrations_for_event(self, event: Event[Any]) -> List[ListenerRegistration]:
+        """获取指定事件的所有监听器注册信息
+
+        Args:
+            event: 事件实例
+
+        Returns:
+            List[ListenerRegistration]: 按注册顺序排列的监听器注册信息
+        """
         return self._listeners.get(event.event_type, [])
 
+    def get_background_registrations(self) -> List[ListenerRegistration]:
+        """获取所有后台模式的监听器注册信息"""
+        return [
+            registration
+            for registrations in self._listeners.values()
+            for registration in registrations
+            if registration.mode == ListenerMode.BACKGROUND
+        ]
+
 
 class EventDispatcher(EventDispatcherInterface):
     """事件分发器，负责分发事件到对应的监听器"""
@@ -51,19 +98,29 @@ class EventDispatcher(EventDispatcherInterface):
         """
         self._provider = provider or ListenerProvider()
 
-    def add_listener(self, event_type: EventType, listener: Callable[[Event[Any]], None]) -> None:
+    def add_listener(
+        self,
+        event_type: EventType,
+        listener: Callable[[Event[Any]], None],
+        mode: ListenerMode = ListenerMode.INLINE,
+        max_backlog: int = DEFAULT_MAX_BACKLOG
+    ) -> None:
         """添加事件监听器
 
         Args:
             event_type: 事件类型
             listener: 监听器函数
+            mode: 监听器执行模式，默认为 INLINE
+            max_backlog: 后台模式下允许积压的最大事件数
         """
-        self._provider.add_listener(event_type, listener)
+        self._provider.add_listener(event_type, listener, mode, max_backlog)
 
     async def dispatch(self, event: Event[T]) -> Event[T]:
         """分发事件到所有相关的监听器
 
-        按照顺序同步调用所有监听器，如果是可停止事件，会在每个监听器调用前检查是否需要停止传播。
+        按注册顺序处理监听器：INLINE 监听器依次等待执行，如果是可停止事件，会在每个 INLINE 监听器调用前检查是否需要停止传播；
+        CONCURRENT 监听器立即启动，与后续监听器并发执行，在返回前等待其全部完成；
+        BACKGROUND 监听器只把事件放入各自的队列，由后台任务按事件到达顺序逐个处理。
         如果事件数据中包含工具上下文引用，可以通过工具上下文访问到共享的事件上下文。
 
         Args:
@@ -72,33 +129,136 @@ class EventDispatcher(EventDispatcherInterface):
         Returns:
             Event: 处理后的事件对象
         """
-        listeners = self._provider.get_listeners_for_event(event)
+        registrations = self._provider.get_registrations_for_event(event)
+        concurrent_tasks: List[asyncio.Task] = []
 
-        for listener in listeners:
+        for registration in registrations:
             # 如果是可停止事件且已停止传播，则立即返回
             if isinstance(event, StoppableEvent) and event.is_propagation_stopped():
                 logger.info(f"事件 {event.event_type} 传播已停止")
                 break
 
-            try:
-                # 获取监听器的名称
-                listener_name = self._get_listener_name(listener)
-
-                # 调用监听器
-                await listener(event)
-
-                # 记录处理成功信息
-                logger.debug(f"监听器 {listener_name} 成功处理事件 {event.event_type}")
-            except Exception as e:
-                # 打印调用栈
-                traceback.print_exc()
-                listener_name = self._get_listener_name(listener)
-                logger.error(f"执行事件监听器时出错: {listener_name}, 错误: {e}")
-                # 继续执行其他监听器，但记录错误
-                continue
+            if registration.mode == ListenerMode.CONCURRENT:
+                concurrent_tasks.append(asyncio.create_task(self._call_listener(registration.listener, event)))
+            elif registration.mode == ListenerMode.BACKGROUND:
+                await self._enqueue(registration, event)
+            else:
+                await self._call_listener(registration.listener, event)
+
+        if concurrent_tasks:
+            await asyncio.gather(*concurrent_tasks)
 
         return event
 
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """等待所有后台监听器处理完已积压的事件
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            bool: 是否在超时前处理完毕
+        """
+        loop = asyncio.get_running_loop()
+        queues = [
+            registration.queue
+            for registration in self._provider.get_background_registrations()
+            if registration.queue is not None and registration.loop is loop
+            and registration.worker is not None and not registration.worker.done()
+        ]
+        if not queues:
+            return True
+        pending = sum(queue.qsize() for queue in queues)
+
+        logger.debug(f"等待后台事件监听器处理完积压事件，队列数: {len(queues)}，积压: {pending}")
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in queues)), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            remaining = sum(queue.qsize() for queue in queues)
+            logger.warning(f"等待后台事件监听器超时（{timeout} 秒），仍有 {remaining} 个事件未处理")
+            return False
+
+    async def close(self) -> None:
+        """停止当前事件循环中所有后台监听器的后台任务，丢弃尚未处理的事件
+
+        之后再分发事件时会重新创建队列和后台任务。
+        """
+        loop = asyncio.get_running_loop()
+        workers: List[asyncio.Task] = []
+        dropped = 0
+        for registration in self._provider.get_background_registrations():
+            if registration.loop is not loop:
+                continue
+            if registration.queue is not None:
+                dropped += registration.queue.qsize()
+            if registration.worker is not None and not registration.worker.done():
+                registration.worker.cancel()
+                workers.append(registration.worker)
+            registration.queue = None
+            registration.worker = None
+
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+        if dropped:
+            logger.warning(f"后台事件监听器已停止，丢弃 {dropped} 个未处理的事件")
+        logger.debug(f"已停止 {len(workers)} 个后台事件监听器任务")
+
+    async def _enqueue(self, registration: ListenerRegistration, event: Event[Any]) -> None:
+        """把事件放入后台监听器的队列，必要时启动后台任务
+
+        Args:
+            registration: 监听器注册信息
+            event: 事件实例
+        """
+        loop = asyncio.get_running_loop()
+        # 队列和后台任务绑定在事件循环上，事件循环变化（如多次 asyncio.run）时重新创建
+        if registration.loop is not loop or registration.worker is None or registration.worker.done():
+            if registration.loop is not loop or registration.queue is None:
+                registration.queue = asyncio.Queue(maxsize=registration.max_backlog)
+            registration.loop = loop
+            registration.worker = loop.create_task(self._run_background_listener(registration))
+
+        if registration.queue.full():
+            # 队列已满时让分发方等待，以限制积压而不丢弃事件
+            listener_name = self._get_listener_name(registration.listener)
+            logger.warning(f"后台监听器 {listener_name} 积压已达上限 {registration.max_backlog}，等待处理")
+        await registration.queue.put(event)
+
+    async def _run_background_listener(self, registration: ListenerRegistration) -> None:
+        """后台任务：按到达顺序逐个处理监听器队列中的事件
+
+        Args:
+            registration: 监听器注册信息
+        """
+        queue = registration.queue
+        while True:
+            event = await queue.get()
+            try:
+                await self._call_listener(registration.listener, event)
+            finally:
+                queue.task_done()
+
+    async def _call_listener(self, listener: Callable, event: Event[Any]) -> None:
+        """调用监听器，记录并吞掉监听器抛出的异常，不影响其他监听器
+
+        Args:
+            listener: 监听器函数
+            event: 事件实例
+        """
+        # 获取监听器的名称
+        listener_name = self._get_listener_name(listener)
+        try:
+            # 调用监听器
+            await listener(event)
+
+            # 记录处理成功信息
+            logger.debug(f"监听器 {listener_name} 成功处理事件 {event.event_type}")
+        except Exception as e:
+            # 打印调用栈
+            traceback.print_exc()
+            logger.error(f"执行事件监听器时出错: {listener_name}, 错误: {e}")
+
     def _get_listener_name(self, listener: Callable) -> str:
         """获取监听器的名称，用于日志记录
         
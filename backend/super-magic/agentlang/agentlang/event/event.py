@@ -14,6 +14,7 @@ class EventType(str, Enum):
     AFTER_CLIENT_CHAT = "after_client_chat"
     BEFORE_LLM_REQUEST = "before_llm_request"  # 请求大模型前的事件
     AFTER_LLM_REQUEST = "after_llm_request"  # 请求大模型后的事件
+    LLM_STREAM_DELTA = "llm_stream_delta"  # 大模型流式输出增量事件
     BEFORE_TOOL_CALL = "before_tool_call"  # 工具调用前的事件
     AFTER_TOOL_CALL = "after_tool_call"  # 工具调用后的事件
     AGENT_SUSPENDED = "agent_suspended"  # agent终止事件
@@ -31,6 +32,14 @@ class EventType(str, Enum):
 T = TypeVar("T", bound=BaseEventData)
 
 
+class ListenerMode(str, Enum):
+    """事件监听器执行模式"""
+
+    INLINE = "inline"  # 按注册顺序依次等待执行，dispatch 返回前完成，可以停止事件传播
+    CONCURRENT = "concurrent"  # 与同一事件的其他监听器并发执行，dispatch 返回前完成
+    BACKGROUND = "background"  # 放入监听器自己的有界队列后立即返回，由后台任务按到达顺序执行
+
+
 class Event(Generic[T]):
     """事件基类，所有事件都应该继承这个类"""
 
@@ -5,9 +5,9 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import Any, Callable, TypeVar
+from typing import Any, Callable, Optional, TypeVar
 
-from agentlang.event.event import Event, EventType
+from agentlang.event.event import Event, EventType, ListenerMode
 
 T = TypeVar('T')
 
@@ -15,12 +15,20 @@ class EventDispatcherInterface(ABC):
     """事件分发器接口，定义事件分发器的基本方法"""
 
     @abstractmethod
-    def add_listener(self, event_type: EventType, listener: Callable[[Event[Any]], None]) -> None:
+    def add_listener(
+        self,
+        event_type: EventType,
+        listener: Callable[[Event[Any]], None],
+        mode: ListenerMode = ListenerMode.INLINE,
+        max_backlog: int = 100
+    ) -> None:
         """添加事件监听器
 
         Args:
             event_type: 事件类型
             listener: 监听器函数
+            mode: 监听器执行模式
+            max_backlog: 后台模式下允许积压的最大事件数
         """
         pass
 
@@ -34,4 +42,21 @@ class EventDispatcherInterface(ABC):
         Returns:
             Event: 处理后的事件对象
         """
-        pass 
+        pass
+
+    @abstractmethod
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """等待所有后台监听器处理完已积压的事件
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            bool: 是否在超时前处理完毕
+        """
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:
+        """停止所有后台监听器的后台任务，丢弃尚未处理的事件"""
+        pass
@@ -7,6 +7,8 @@
 from abc import ABC, abstractmethod
 from typing import Any, Callable, Dict, Optional, TypeVar
 
+from agentlang.event.event import ListenerMode
+
 T = TypeVar('T')  # 用于泛型类型
 
 class AgentContextInterface(ABC):
@@ -66,12 +68,15 @@ class AgentContextInterface(ABC):
         pass
 
     @abstractmethod
-    def add_event_listener(self, event_type: str, listener: Callable[[Any], None]) -> None:
+    def add_event_listener(
+        self, event_type: str, listener: Callable[[Any], None], mode: ListenerMode = ListenerMode.INLINE
+    ) -> None:
         """添加事件监听器
         
         Args:
             event_type: 事件类型
             listener: 事件监听函数，接收一个事件参数
+            mode: 监听器执行模式（inline、concurrent、background）
         """
         pass
 
@@ -6,14 +6,15 @@ based on the model ID provided.
 """
 
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
-from openai import AsyncOpenAI
-from openai.types.chat import ChatCompletion
+from openai import AsyncOpenAI, BadRequestError, UnprocessableEntityError
+from openai.types.chat import ChatCompletion, ChatCompletionMessageToolCall
 from pydantic import BaseModel
 
 from agentlang.config.config import config
 from agentlang.interface.context import AgentContextInterface
+from agentlang.llms.stream_assembler import ChatCompletionStreamAssembler
 from agentlang.llms.token_usage.pricing import ModelPricing
 from agentlang.llms.token_usage.report import TokenUsageReport
 from agentlang.llms.token_usage.tracker import TokenUsageTracker
@@ -24,6 +25,11 @@ logger = get_logger(__name__)
 DEFAULT_TIMEOUT = int(config.get("llm.api_timeout", 600))
 MAX_RETRIES = int(config.get("llm.api_max_retries", 3))
 
+# 流式回调: (新增文本内容, 新完成的工具调用, 组装器)
+StreamChunkCallback = Callable[
+    [str, List[ChatCompletionMessageToolCall], ChatCompletionStreamAssembler], Awaitable[None]
+]
+
 
 class LLMClientConfig(BaseModel):
     """Configuration for LLM clients."""
@@ -40,6 +46,8 @@ class LLMClientConfig(BaseModel):
     stop: Optional[List[str]] = None
     extra_params: Dict[str, Any] = {}
     supports_tool_use: bool = True
+    # 流式请求时是否发送 stream_options.include_usage，要求在最后一个响应块中返回 usage
+    stream_include_usage: bool = True
     type: str = "llm"
 
 class LLMFactory:
@@ -104,6 +112,7 @@ class LLMFactory:
                 name=str(model_config["name"]),
                 provider=model_config["provider"],
                 supports_tool_use=model_config.get("supports_tool_use", False),
+                stream_include_usage=model_config.get("stream_include_usage", True),
                 max_output_tokens=model_config.get("max_output_tokens", 4 * 1024),
                 max_context_tokens=model_config.get("max_context_tokens", 8 * 1024),
                 temperature=model_config.get("temperature", 0.7),
@@ -128,12 +137,15 @@ class LLMFactory:
         messages: List[Dict[str, Any]],
         tools: Optional[List[Dict[str, Any]]] = None,
         stop: Optional[List[str]] = None,
-        agent_context: Optional[AgentContextInterface] = None
+        agent_context: Optional[AgentContextInterface] = None,
+        stream: bool = False,
+        on_chunk: Optional[StreamChunkCallback] = None
     ) -> ChatCompletion:
         """使用工具支持调用 LLM。
 
         根据模型配置使用工具调用。
         对于支持工具调用的模型，直接使用 OpenAI API 的工具调用功能。
+        流式模式下会边接收边组装响应，最终仍返回完整的 ChatCompletion。
 
         Args:
             model_id: 要使用的模型 ID。
@@ -141,6 +153,8 @@ class LLMFactory:
             tools: 可用工具的列表，可选。
             stop: 终止序列列表，可选。
             agent_context: Agent 上下文接口，可选。
+            stream: 是否使用流式响应，可选。
+            on_chunk: 流式模式下每个响应块合并后的回调，可选。
 
         Returns:
             LLM 响应。
@@ -214,7 +228,10 @@ class LLMFactory:
         # 发送请求并获取响应
         # logger.debug(f"发送聊天完成请求到 {llm_config.name}: {request_params}")
         try:
-            response = await client.chat.completions.create(**request_params)
+            if stream:
+                response = await cls._create_streaming_completion(client, request_params, llm_config, on_chunk)
+            else:
+                response = await client.chat.completions.create(**request_params)
 
             # 使用 TokenUsageTracker 记录 token 使用情况
             cls.token_tracker.record_llm_usage(
@@ -229,6 +246,58 @@ class LLMFactory:
             logger.critical(f"调用 LLM {model_id} 时出错: {e!r}", exc_info=True)
             raise
 
+    @classmethod
+    async def _create_streaming_completion(
+        cls,
+        client: AsyncOpenAI,
+        request_params: Dict[str, Any],
+        llm_config: LLMClientConfig,
+        on_chunk: Optional[StreamChunkCallback] = None
+    ) -> ChatCompletion:
+        """以流式方式请求 LLM，并将响应块组装为完整的 ChatCompletion。
+
+        模型配置了 stream_include_usage 时要求在最后一个响应块中返回 usage，保证 token 统计与非流式一致；
+        服务商拒绝 stream_options 参数时，不带该参数重试，成功后当前进程内该模型不再发送它。
+
+        Args:
+            client: OpenAI 客户端。
+            request_params: 请求参数。
+            llm_config: 模型配置。
+            on_chunk: 每个响应块合并后的回调，可选。
+
+        Returns:
+            组装完成的 LLM 响应。
+        """
+        params = dict(request_params)
+        params["stream"] = True
+        if llm_config.stream_include_usage:
+            params["stream_options"] = {"include_usage": True}
+
+        try:
+            stream = await client.chat.completions.create(**params)
+        except (BadRequestError, UnprocessableEntityError) as e:
+            if "stream_options" not in params:
+                raise
+            logger.warning(f"模型 {llm_config.model_id} 的流式请求被拒绝，尝试不带 stream_options 重试: {e!r}")
+            params.pop("stream_options")
+            stream = await client.chat.completions.create(**params)
+            logger.warning(
+                f"模型 {llm_config.model_id} 不支持 stream_options，后续流式请求不再发送该参数，"
+                f"流式响应的 token 用量将无法统计，可在模型配置中设置 stream_include_usage: false"
+            )
+            llm_config.stream_include_usage = False
+
+        assembler = ChatCompletionStreamAssembler()
+        try:
+            async for chunk in stream:
+                content_delta, completed_tool_calls = assembler.add_chunk(chunk)
+                if on_chunk and (content_delta or completed_tool_calls):
+                    await on_chunk(content_delta, completed_tool_calls, assembler)
+        finally:
+            await stream.close()
+
+        return assembler.build()
+
     @classmethod
     def get_embedding_client(cls, model_id: str) -> Any:
         """Get an embedding client for the given model ID.
@@ -0,0 +1,153 @@
+"""
+流式响应组装模块
+
+将 OpenAI 兼容接口返回的 ChatCompletionChunk 增量组装为完整的 ChatCompletion，
+并在组装过程中识别已经完整的工具调用，便于调用方提前执行。
+"""
+
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from openai.types.chat import ChatCompletion, ChatCompletionChunk, ChatCompletionMessage, ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion import Choice
+
+from agentlang.logger import get_logger
+
+logger = get_logger(__name__)
+
+# ChatCompletion.Choice 允许的 finish_reason 取值
+_VALID_FINISH_REASONS = {"stop", "length", "tool_calls", "content_filter", "function_call"}
+
+
+class ChatCompletionStreamAssembler:
+    """
+    ChatCompletionChunk 组装器。
+
+    工具调用按 index 累积，满足以下任一条件时认为该工具调用已经完整：
+    1. 出现了 index 更大的工具调用增量 (OpenAI 按顺序输出工具调用)
+    2. 参数已经是合法的 JSON 对象 (JSON 对象闭合后不可能再继续追加)
+    3. 流返回了 finish_reason
+    """
+
+    def __init__(self):
+        self.response_id: Optional[str] = None
+        self.model: Optional[str] = None
+        self.created: Optional[int] = None
+        self.finish_reason: Optional[str] = None
+        self.usage: Any = None
+        self._content_parts: List[str] = []
+        self._tool_calls: Dict[int, Dict[str, Any]] = {}
+        self._completed_indexes: set = set()
+
+    @property
+    def content(self) -> str:
+        """当前已经接收到的文本内容"""
+        return "".join(self._content_parts)
+
+    def add_chunk(self, chunk: ChatCompletionChunk) -> Tuple[str, List[ChatCompletionMessageToolCall]]:
+        """
+        合并一个流式响应块。
+
+        Args:
+            chunk: 流式响应块
+
+        Returns:
+            Tuple[str, List[ChatCompletionMessageToolCall]]: (新增文本内容, 新完成的工具调用)
+        """
+        self.response_id = self.response_id or getattr(chunk, "id", None)
+        self.model = self.model or getattr(chunk, "model", None)
+        self.created = self.created or getattr(chunk, "created", None)
+
+        # 开启 include_usage 后，最后一个块只包含 usage，choices 为空
+        if getattr(chunk, "usage", None):
+            self.usage = chunk.usage
+
+        content_delta = ""
+        touched_indexes = []
+        for choice in chunk.choices or []:
+            delta = choice.delta
+            if delta is not None:
+                if delta.content:
+                    content_delta += delta.content
+                for tc_delta in delta.tool_calls or []:
+                    self._merge_tool_call_delta(tc_delta)
+                    touched_indexes.append(tc_delta.index)
+            if choice.finish_reason:
+                self.finish_reason = choice.finish_reason
+
+        if content_delta:
+            self._content_parts.append(content_delta)
+
+        completed = []
+        for index in sorted(self._tool_calls):
+            if index in self._completed_indexes:
+                continue
+            followed = any(touched > index for touched in touched_indexes)
+            if self.finish_reason or followed or self._is_arguments_complete(index):
+                self._completed_indexes.add(index)
+                completed.append(self._to_tool_call(index))
+
+        return content_delta, completed
+
+    def _merge_tool_call_delta(self, tc_delta: Any) -> None:
+        """合并单个工具调用增量"""
+        entry = self._tool_calls.setdefault(
+            tc_delta.index, {"id": None, "type": "function", "name": "", "arguments": []}
+        )
+        if tc_delta.id:
+            entry["id"] = tc_delta.id
+        if getattr(tc_delta, "type", None):
+            entry["type"] = tc_delta.type
+        function = getattr(tc_delta, "function", None)
+        if function is not None:
+            if function.name:
+                entry["name"] += function.name
+            if function.arguments:
+                entry["arguments"].append(function.arguments)
+
+    def _is_arguments_complete(self, index: int) -> bool:
+        """判断工具调用参数是否已经是完整的 JSON 对象"""
+        entry = self._tool_calls[index]
+        if not entry["id"] or not entry["name"] or not entry["arguments"]:
+            return False
+        # 只有结尾是 } 时才尝试解析，避免对大参数反复解析
+        if not entry["arguments"][-1].rstrip().endswith("}"):
+            return False
+        try:
+            return isinstance(json.loads("".join(entry["arguments"])), dict)
+        except json.JSONDecodeError:
+            return False
+
+    def _to_tool_call(self, index: int) -> ChatCompletionMessageToolCall:
+        """将累积的工具调用转换为 ChatCompletionMessageToolCall"""
+        entry = self._tool_calls[index]
+        return ChatCompletionMessageToolCall(
+            id=entry["id"] or "",
+            type="function",
+            function={"name": entry["name"], "arguments": "".join(entry["arguments"])}
+        )
+
+    def build_message(self) -> ChatCompletionMessage:
+        """根据当前已接收的内容构建助手消息 (流未结束时为部分消息)"""
+        tool_calls = [self._to_tool_call(index) for index in sorted(self._tool_calls)]
+        return ChatCompletionMessage(
+            role="assistant",
+            content=self.content or None,
+            tool_calls=tool_calls or None
+        )
+
+    def build(self) -> ChatCompletion:
+        """构建完整的 ChatCompletion 响应"""
+        finish_reason = self.finish_reason if self.finish_reason in _VALID_FINISH_REASONS else None
+        if finish_reason is None:
+            finish_reason = "tool_calls" if self._tool_calls else "stop"
+
+        return ChatCompletion(
+            id=self.response_id or "",
+            object="chat.completion",
+            created=self.created or int(time.time()),
+            model=self.model or "",
+            choices=[Choice(index=0, finish_reason=finish_reason, message=self.build_message())],
+            usage=self.usage
+        )
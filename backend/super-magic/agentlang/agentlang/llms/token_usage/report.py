@@ -4,8 +4,12 @@ Token使用报告模块
 负责将TokenUsageTracker中的数据生成报告
 """
 
+import atexit
+import copy
 import json
 import os
+import tempfile
+import threading
 from datetime import datetime
 
 # 为避免循环导入，使用字符串类型注解
@@ -106,6 +110,21 @@ class TokenUsageReport:
         # 确保报告目录存在
         os.makedirs(self.report_dir, exist_ok=True)
 
+        # 内存账本：模型ID -> 使用记录，首次更新时从文件加载
+        self._ledger: Dict[str, ModelUsage] = {}
+        self._ledger_loaded = False
+        self._timestamp = self.report_time
+        self._currency_code = pricing.display_currency
+        self._lock = threading.Lock()
+
+        # 后台批量写入：累计 flush_every 次更新或每隔 flush_interval 秒写入一次
+        self.flush_interval = config.get("token_usage.flush_interval", 5.0)
+        self.flush_every = config.get("token_usage.flush_every", 20)
+        self._pending_updates = 0
+        self._flush_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._flush_thread: Optional[threading.Thread] = None
+
     def get_report_file_path(self) -> str:
         """获取报告文件的路径
 
@@ -194,53 +213,139 @@ class TokenUsageReport:
 
         return report
 
-    def _get_or_create_report(self) -> CostReport:
-        """获取现有报告对象或创建新的报告对象
+    def _load_ledger(self) -> None:
+        """首次使用时从文件加载已有报告到内存账本，之后不再读取文件"""
+        if self._ledger_loaded:
+            return
 
-        Returns:
-            CostReport: 报告对象
-        """
         file_path = self.get_report_file_path()
+        report = None
 
         # 如果文件存在，尝试从文件加载
         if os.path.exists(file_path):
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     report_data = json.load(f)
-                    return self._deserialize_report(report_data)
+                    report = self._deserialize_report(report_data)
             except Exception as e:
                 logger.error(f"读取现有token使用报告失败: {e!s}")
 
         # 如果文件不存在或读取失败，创建新的报告对象
-        return CostReport(currency_code=self.pricing.display_currency)
+        if report is None:
+            report = CostReport(currency_code=self.pricing.display_currency)
+
+        self._timestamp = report.timestamp
+        self._currency_code = report.currency_code
+        self._ledger = {model.model_name: model for model in report.models}
+        self._ledger_loaded = True
+
+    def _build_report(self) -> CostReport:
+        """根据内存账本构建报告对象，调用方需持有 self._lock"""
+        return CostReport(
+            models=list(self._ledger.values()),
+            timestamp=self._timestamp,
+            currency_code=self._currency_code
+        )
 
     def _save_report(self, report: CostReport) -> bool:
-        """保存报告到文件
+        """保存报告到文件，先写临时文件再原子替换，避免读到写了一半的报告
 
         Args:
             report: 报告对象
 
+        Returns:
+            bool: 是否保存成功
+        """
+        return self._write_report_dict(self._serialize_report(report))
+
+    def _write_report_dict(self, report_dict: Dict[str, Any]) -> bool:
+        """把序列化后的报告原子写入文件
+
+        Args:
+            report_dict: 序列化后的报告
+
         Returns:
             bool: 是否保存成功
         """
         file_path = self.get_report_file_path()
+        tmp_path = None
 
         try:
-            # 将报告转换为可JSON化的字典
-            report_dict = self._serialize_report(report)
-
-            # 保存到文件
-            with open(file_path, 'w', encoding='utf-8') as f:
+            fd, tmp_path = tempfile.mkstemp(prefix=".token_usage_", suffix=".tmp", dir=self.report_dir)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
                 json.dump(report_dict, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
 
-            logger.info(f"保存token使用报告到文件成功: {file_path}")
+            logger.debug(f"保存token使用报告到文件成功: {file_path}")
             return True
         except Exception as e:
             logger.error(f"保存token使用报告到文件失败: {e!s}")
+            if tmp_path and os.path.exists(tmp_path):
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            return False
+
+    def flush(self) -> bool:
+        """把内存账本中未保存的变更写入文件
+
+        Returns:
+            bool: 是否保存成功，没有未保存的变更时返回True
+        """
+        # 同一时间只有一个写入者，保证后写入的一定是更新的快照
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending_updates:
+                    return True
+                # 在锁内只做序列化，文件写入在锁外进行，不阻塞记录使用量
+                report_dict = self._serialize_report(self._build_report())
+                pending = self._pending_updates
+                self._pending_updates = 0
+
+            if self._write_report_dict(report_dict):
+                logger.debug(f"已写入 {pending} 次token使用更新: {self.get_report_file_path()}")
+                return True
+
+            # 写入失败时保留待写入标记，下次重试
+            with self._lock:
+                self._pending_updates += pending
             return False
 
+    @classmethod
+    def flush_all(cls) -> None:
+        """写入所有实例未保存的变更，在关闭资源和进程退出时调用"""
+        for instance in list(cls._instances.values()):
+            instance.flush()
+
+    def _ensure_flush_thread(self) -> None:
+        """启动后台写入线程，调用方需持有 self._lock"""
+        if self._flush_thread and self._flush_thread.is_alive():
+            return
+        self._flush_thread = threading.Thread(
+            target=self._flush_loop,
+            name=f"token-usage-flush-{self.sandbox_id}",
+            daemon=True
+        )
+        self._flush_thread.start()
+
+    def _flush_loop(self) -> None:
+        """后台写入线程：按时间间隔或累计更新次数触发写入"""
+        while True:
+            self._flush_requested.wait(timeout=self.flush_interval)
+            self._flush_requested.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"后台写入token使用报告失败: {e!s}")
+
     def update_and_save_usage(self, model_id: str, token_usage: TokenUsage) -> None:
-        """更新并保存当前token使用情况到JSON文件
+        """更新内存中的token使用情况，由后台线程批量写入JSON文件
+
+        每次调用只更新字典中对应模型的记录，不读写文件；
+        累计更新次数达到 flush_every 或距上次写入超过 flush_interval 秒时由后台线程写入。
 
         Args:
             model_id: 模型ID
@@ -251,58 +356,59 @@ class TokenUsageReport:
             logger.error("无法更新token使用情况，未设置token_tracker")
             return
 
-        # 获取或创建报告
-        report = self._get_or_create_report()
-
-        # 计算成本
-        cost, currency = self.pricing.calculate_cost(model_id, token_usage)
-
-        # 如果货币不匹配，转换成本
-        if currency != report.currency_code:
-            cost = self.pricing.convert_currency(cost, currency, report.currency_code)
-
-        # 查找现有模型或创建新模型
-        existing_model = next((m for m in report.models if m.model_name == model_id), None)
-
-        if existing_model:
-            # 更新现有模型
-            existing_model.usage.input_tokens += token_usage.input_tokens
-            existing_model.usage.output_tokens += token_usage.output_tokens
-
-            # 更新缓存相关数据
-            if token_usage.input_tokens_details:
-                if not existing_model.usage.input_tokens_details:
-                    existing_model.usage.input_tokens_details = InputTokensDetails()
-
-                if token_usage.input_tokens_details.cache_write_tokens:
-                    existing_model.usage.input_tokens_details.cache_write_tokens = (
-                        (existing_model.usage.input_tokens_details.cache_write_tokens or 0) +
-                        token_usage.input_tokens_details.cache_write_tokens
-                    )
-
-                if token_usage.input_tokens_details.cached_tokens:
-                    existing_model.usage.input_tokens_details.cached_tokens = (
-                        (existing_model.usage.input_tokens_details.cached_tokens or 0) +
-                        token_usage.input_tokens_details.cached_tokens
-                    )
-
-            # 更新总tokens
-            existing_model.usage.total_tokens = existing_model.usage.input_tokens + existing_model.usage.output_tokens
-
-            # 更新成本
-            existing_model.cost += cost
-        else:
-            # 创建新的模型使用记录
-            model_usage = ModelUsage(
-                model_name=model_id,
-                usage=token_usage,
-                cost=cost,
-                currency=report.currency_code
-            )
-            report.models.append(model_usage)
-
-        # 保存报告
-        self._save_report(report)
+        with self._lock:
+            self._load_ledger()
+
+            # 计算成本
+            cost, currency = self.pricing.calculate_cost(model_id, token_usage)
+
+            # 如果货币不匹配，转换成本
+            if currency != self._currency_code:
+                cost = self.pricing.convert_currency(cost, currency, self._currency_code)
+
+            # 查找现有模型或创建新模型
+            existing_model = self._ledger.get(model_id)
+
+            if existing_model:
+                # 更新现有模型
+                existing_model.usage.input_tokens += token_usage.input_tokens
+                existing_model.usage.output_tokens += token_usage.output_tokens
+
+                # 更新缓存相关数据
+                if token_usage.input_tokens_details:
+                    if not existing_model.usage.input_tokens_details:
+                        existing_model.usage.input_tokens_details = InputTokensDetails()
+
+                    if token_usage.input_tokens_details.cache_write_tokens:
+                        existing_model.usage.input_tokens_details.cache_write_tokens = (
+                            (existing_model.usage.input_tokens_details.cache_write_tokens or 0) +
+                            token_usage.input_tokens_details.cache_write_tokens
+                        )
+
+                    if token_usage.input_tokens_details.cached_tokens:
+                        existing_model.usage.input_tokens_details.cached_tokens = (
+                            (existing_model.usage.input_tokens_details.cached_tokens or 0) +
+                            token_usage.input_tokens_details.cached_tokens
+                        )
+
+                # 更新总tokens
+                existing_model.usage.total_tokens = existing_model.usage.input_tokens + existing_model.usage.output_tokens
+
+                # 更新成本
+                existing_model.cost += cost
+            else:
+                # 创建新的模型使用记录，复制一份，避免后续累加修改调用方的对象
+                self._ledger[model_id] = ModelUsage(
+                    model_name=model_id,
+                    usage=copy.deepcopy(token_usage),
+                    cost=cost,
+                    currency=self._currency_code
+                )
+
+            self._pending_updates += 1
+            if self._pending_updates >= self.flush_every:
+                self._flush_requested.set()
+            self._ensure_flush_thread()
 
         # 重置累计使用量，避免下次再次累加
         self.token_tracker.reset()
@@ -370,22 +476,16 @@ class TokenUsageReport:
     def get_cost_report(self) -> CostReport:
         """获取token使用和成本报告
 
+        直接读取内存账本，包含尚未写入文件的更新
+
         Returns:
-            CostReport: 成本报告对象
+            CostReport: 成本报告对象，是账本的副本
         """
-        file_path = self.get_report_file_path()
-
-        # 尝试读取文件
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    report_data = json.load(f)
-
-                # 转换为CostReport对象
-                return self._deserialize_report(report_data)
+        with self._lock:
+            self._load_ledger()
+            # 通过序列化复制一份，调用方修改报告不会影响账本
+            return self._deserialize_report(self._serialize_report(self._build_report()))
 
-            except Exception as e:
-                logger.error(f"读取token使用报告失败: {e}")
 
-        # 如果文件不存在或读取失败，创建新的报告
-        return CostReport(currency_code=self.pricing.display_currency)
+# 后台写入线程是守护线程，进程退出时写入剩余的更新
+atexit.register(TokenUsageReport.flush_all)
@@ -11,7 +11,7 @@ import threading
 from typing import TYPE_CHECKING, Any, Dict, Optional, Protocol
 
 from agentlang.llms.token_usage.models import InputTokensDetails, TokenUsage
-from agentlang.logger import get_logger
+from agentlang.logger import get_logger, truncate_payload
 
 if TYPE_CHECKING:
     from agentlang.llms.token_usage.report import TokenUsageReport
@@ -108,21 +108,22 @@ class TokenUsageTracker:
         Returns:
             LlmUsageResponse: 记录结果
         """
-        # 记录原始usage数据以进行调试
-        try:
-            if response_usage:
-                if hasattr(response_usage, '__dict__'):
-                    logger.debug(f"记录LLM使用量 - 原始usage数据(dict): {response_usage.__dict__}")
-                else:
-                    logger.debug(f"记录LLM使用量 - 原始usage数据(str): {str(response_usage)[:500]}")
-        except Exception as e:
-            logger.warning(f"记录原始usage数据时出错: {e}")
+        # 记录原始usage数据以进行调试，DEBUG 未启用时不构造消息
+        if response_usage:
+            logger.opt(lazy=True).debug(
+                "记录LLM使用量 - 原始usage数据: {}",
+                lambda: truncate_payload(getattr(response_usage, '__dict__', response_usage), 500)
+            )
 
         # 从响应中提取token使用情况
         token_usage = TokenUsage.from_response(response_usage)
 
         # 记录解析后的token_usage对象
-        logger.debug(f"记录LLM使用量 - 解析后的token_usage: {token_usage.to_dict()}, model_id={model_id}")
+        logger.opt(lazy=True).debug(
+            "记录LLM使用量 - 解析后的token_usage: {}, model_id={}",
+            lambda: token_usage.to_dict(),
+            lambda: model_id
+        )
 
         # 添加使用记录到跟踪器
         self.add_usage(model_id, token_usage)
@@ -1,12 +1,77 @@
+import json
 import logging
+import queue
 import sys
+import threading
 from pathlib import Path
-from typing import ClassVar, Optional
+from typing import Any, ClassVar, List, Optional, TextIO
 
 from loguru import logger as _logger
 
 from agentlang.context.application_context import ApplicationContext
 
+# 日志中单个载荷（工具参数、原始响应等）的最大字符数，超出部分截断
+LOG_PAYLOAD_MAX_LENGTH = 2000
+
+
+class BackgroundSink:
+    """
+    后台写入的日志输出
+
+    记录日志的线程只把格式化好的消息放入内存队列，由后台线程批量写入目标流并刷新，
+    终端或磁盘较慢时不会阻塞事件循环。loguru 自带的 enqueue 通过进程间管道传递并序列化整条记录，
+    开销比同步写入更大，因此使用线程内队列。
+    """
+
+    def __init__(self, stream: TextIO, name: str, close_stream: bool = False):
+        """
+        初始化后台输出
+
+        Args:
+            stream: 目标流，如 sys.stderr 或打开的日志文件
+            name: 后台线程名称后缀
+            close_stream: 停止时是否关闭目标流
+        """
+        self._stream = stream
+        self._close_stream = close_stream
+        self._queue: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=f"log-sink-{name}", daemon=True)
+        self._thread.start()
+
+    def isatty(self) -> bool:
+        """目标流是否为终端，供 loguru 判断是否着色"""
+        return self._stream.isatty()
+
+    def write(self, message: str) -> None:
+        """放入队列后立即返回"""
+        self._queue.put(message)
+
+    def stop(self) -> None:
+        """写完队列中剩余的消息后停止后台线程，由 loguru 在移除输出（包括进程退出）时调用"""
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        if self._close_stream:
+            self._stream.close()
+
+    def _run(self) -> None:
+        """后台线程：取出当前积压的所有消息一次写入，再刷新一次"""
+        while True:
+            batch: List[str] = [self._queue.get()]
+            while len(batch) < 1000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stopped = None in batch
+            try:
+                self._stream.write("".join(message for message in batch if message is not None))
+                self._stream.flush()
+            except Exception as e:
+                sys.__stderr__.write(f"写入日志失败: {e}\n")
+            if stopped:
+                break
+
 
 class Logger:
     """
@@ -25,13 +90,16 @@ class Logger:
         """
         self.name = name
         self.logger = _logger.bind(name=name)
+        # opt() 每次调用都会创建新的 loguru 实例，转发方法复用同一个
+        self._caller_logger = self.logger.opt(depth=1)
 
     @classmethod
     def setup(cls,
               log_name: str = "agentlang",
               console_level: str = "INFO",
               logfile_level: Optional[str] = "DEBUG",
-              log_file: Optional[str] = None) -> 'Logger':
+              log_file: Optional[str] = None,
+              enqueue: bool = True) -> 'Logger':
         """
         设置并返回日志记录器实例
 
@@ -40,6 +108,7 @@ class Logger:
             console_level: 控制台日志级别
             logfile_level: 文件日志级别，如果为 None 则不记录到文件
             log_file: 日志文件路径，如果为 None，则使用默认路径
+            enqueue: 是否通过 BackgroundSink 由后台线程写入，开启后记录日志的调用方不再等待终端和磁盘 I/O
 
         Returns:
             配置好的 LoguruLogger 实例
@@ -57,7 +126,7 @@ class Logger:
         _logger.configure(
             handlers=[
                 {
-                    "sink": sys.stderr,
+                    "sink": BackgroundSink(sys.stderr, "console") if enqueue else sys.stderr,
                     "level": console_level,
                     "format": "<green>{time:HH:mm:ss.SSS}</green> | "
                     "<level>{level: <8}</level> | "
@@ -84,9 +153,10 @@ class Logger:
             file_path.parent.mkdir(parents=True, exist_ok=True)
 
             _logger.add(
-                file_path,
+                BackgroundSink(open(file_path, "a", encoding="utf-8"), "file", close_stream=True) if enqueue else file_path,
                 level=logfile_level,
                 format="{time:HH:mm:ss.SSS} | {level: <8} | {file.path}:{line} - {message}",
+                colorize=False,
             )
 
         # 设置到ApplicationContext
@@ -106,30 +176,33 @@ class Logger:
         """
         new_logger = Logger()
         new_logger.logger = self.logger.bind(**kwargs)
+        new_logger._caller_logger = new_logger.logger.opt(depth=1)
         if 'name' in kwargs:
             new_logger.name = kwargs['name']
         return new_logger
 
     # 转发所有日志方法到内部的loguru实例
     def debug(self, message, *args, **kwargs):
-        return self.logger.opt(depth=1).debug(message, *args, **kwargs)
+        return self._caller_logger.debug(message, *args, **kwargs)
 
     def info(self, message, *args, **kwargs):
-        return self.logger.opt(depth=1).info(message, *args, **kwargs)
+        return self._caller_logger.info(message, *args, **kwargs)
 
     def warning(self, message, *args, **kwargs):
-        return self.logger.opt(depth=1).warning(message, *args, **kwargs)
+        return self._caller_logger.warning(message, *args, **kwargs)
 
     def error(self, message, *args, **kwargs):
-        return self.logger.opt(depth=1).error(message, *args, **kwargs)
+        return self._caller_logger.error(message, *args, **kwargs)
 
     def critical(self, message, *args, **kwargs):
-        return self.logger.opt(depth=1).critical(message, *args, **kwargs)
+        return self._caller_logger.critical(message, *args, **kwargs)
 
     def exception(self, message, *args, **kwargs):
-        return self.logger.opt(depth=1).exception(message, *args, **kwargs)
+        return self._caller_logger.exception(message, *args, **kwargs)
 
-    # 允许像loguru一样使用opt
+    # 允许像loguru一样使用opt，热路径上可用 opt(lazy=True) 延迟构造消息：
+    # logger.opt(lazy=True).debug("响应: {}", lambda: truncate_payload(response))
+    # 级别未启用时不会调用 lambda
     def opt(self, *args, **kwargs):
         return self.logger.opt(*args, **kwargs)
 
@@ -139,7 +212,8 @@ logger = Logger.setup()
 
 
 def setup_logger(log_name: str = "agentlang", console_level: str = "INFO",
-                logfile_level: Optional[str] = "DEBUG", log_file: Optional[str] = None) -> Logger:
+                logfile_level: Optional[str] = "DEBUG", log_file: Optional[str] = None,
+                enqueue: bool = True) -> Logger:
     """
     设置日志记录器
 
@@ -148,8 +222,44 @@ def setup_logger(log_name: str = "agentlang", console_level: str = "INFO",
         console_level: 控制台日志级别
         logfile_level: 文件日志级别，如果为 None 则不记录到文件
         log_file: 日志文件路径，如果为 None，则使用默认路径
+        enqueue: 是否通过队列由后台线程写入
+    """
+    return Logger.setup(log_name, console_level, logfile_level, log_file, enqueue)
+
+
+def truncate_payload(payload: Any, max_length: int = LOG_PAYLOAD_MAX_LENGTH) -> str:
+    """
+    把日志载荷转换为单行字符串并截断到指定长度
+
+    Args:
+        payload: 要记录的内容，非字符串会序列化为紧凑的 JSON
+        max_length: 最大字符数
+
+    Returns:
+        截断后的字符串，超出部分以总长度提示代替
     """
-    return Logger.setup(log_name, console_level, logfile_level, log_file)
+    if isinstance(payload, str):
+        text = payload
+    else:
+        try:
+            # 先截断嵌套的长字符串再序列化，开销不随字段内容（如写入的文件内容）增长
+            text = json.dumps(_shrink_payload(payload, max_length), ensure_ascii=False, default=str)
+        except Exception:
+            text = str(payload)
+    if len(text) <= max_length:
+        return text
+    return f"{text[:max_length]}...(已截断，共 {len(text)} 字符)"
+
+
+def _shrink_payload(value: Any, max_length: int) -> Any:
+    """递归截断字典和列表中超过长度的字符串"""
+    if isinstance(value, str):
+        return value if len(value) <= max_length else f"{value[:max_length]}...(已截断，共 {len(value)} 字符)"
+    if isinstance(value, dict):
+        return {key: _shrink_payload(item, max_length) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_shrink_payload(item, max_length) for item in value]
+    return value
 
 
 def get_logger(name: str = None) -> Logger:
@@ -6,9 +6,11 @@ import asyncio
 import os
 import re
 import shutil
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Set
+from typing import List, Optional, Set, Tuple
 
 import aiofiles
 import aiofiles.os
@@ -358,14 +360,44 @@ def format_file_size(size: int) -> str:
         size /= 1024
     return f"{size:.1f}TB"
 
-def count_file_lines(file_path: Path) -> Optional[int]:
-    """计算文件行数"""
+# 文件行数缓存：(路径, 修改时间, 大小) -> 行数，文件变化后键随之变化，旧条目按 LRU 淘汰
+_LINE_COUNT_CACHE_MAX_ENTRIES = 10000
+_line_count_cache: "OrderedDict[Tuple[str, int, int], Optional[int]]" = OrderedDict()
+_line_count_cache_lock = threading.Lock()
+
+
+def count_file_lines(file_path: Path, stat_result: Optional[os.stat_result] = None) -> Optional[int]:
+    """计算文件行数
+
+    结果按 (路径, 修改时间, 大小) 缓存，文件未变化时不会重复读取。
+
+    Args:
+        file_path: 文件路径
+        stat_result: 调用方已获取的 stat 结果，可选，避免重复 stat
+
+    Returns:
+        Optional[int]: 文件行数，文件过大或读取失败时返回 None
+    """
     try:
+        stat_result = stat_result or file_path.stat()
         # 优化：对于大文件，不实际读取所有行
-        if file_path.stat().st_size > 10 * 1024 * 1024: # 超过 10MB 不计数
+        if stat_result.st_size > 10 * 1024 * 1024: # 超过 10MB 不计数
              return None
+
+        cache_key = (str(file_path), stat_result.st_mtime_ns, stat_result.st_size)
+        with _line_count_cache_lock:
+            if cache_key in _line_count_cache:
+                _line_count_cache.move_to_end(cache_key)
+                return _line_count_cache[cache_key]
+
         with file_path.open("r", encoding="utf-8", errors='ignore') as f:
-            return sum(1 for _ in f)
+            line_count = sum(1 for _ in f)
+
+        with _line_count_cache_lock:
+            _line_count_cache[cache_key] = line_count
+            if len(_line_count_cache) > _LINE_COUNT_CACHE_MAX_ENTRIES:
+                _line_count_cache.popitem(last=False)
+        return line_count
     except Exception as e:
         logger.debug(f"计算文件行数失败: {file_path}, 错误: {e}")
         return None
@@ -10,6 +10,17 @@ from agentlang.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 按 token 预算截断时每次编码的字符数
+TOKEN_BUDGET_CHUNK_CHARS = 8192
+
+
+def _get_encoding(model: str):
+    """获取模型对应的编码器"""
+    if model.startswith(("gpt-4", "gpt-3.5-turbo")):
+        return tiktoken.encoding_for_model(model)
+    # 默认使用通用编码器
+    return tiktoken.get_encoding("cl100k_base")
+
 
 def num_tokens_from_string(string: str, model: str = "gpt-3.5-turbo") -> int:
     """
@@ -28,11 +39,7 @@ def num_tokens_from_string(string: str, model: str = "gpt-3.5-turbo") -> int:
     try:
         # 获取对应模型的编码器
         try:
-            if model.startswith(("gpt-4", "gpt-3.5-turbo")):
-                encoding = tiktoken.encoding_for_model(model)
-            else:
-                # 默认使用通用编码器
-                encoding = tiktoken.get_encoding("cl100k_base")
+            encoding = _get_encoding(model)
         except Exception as enc_err:
             # 编码器获取失败，直接抛出异常使用模拟计算方法
             logger.error(f"获取编码器失败: {enc_err!s}，使用模拟计算方法")
@@ -120,4 +127,65 @@ def truncate_text_by_token(text: str, max_tokens: int) -> tuple[str, bool]:
 
     # 截断文本并添加省略提示
     truncated_text = text[:position] + "\n\n... [内容过长已截断] ..."
-    return truncated_text, True 
+    return truncated_text, True
+
+
+def truncate_text_to_token_budget(text: str, max_tokens: int, model: str = "gpt-3.5-turbo") -> tuple[str, int, bool]:
+    """
+    按 token 预算截断文本，达到预算后即停止编码
+
+    文本按块逐段编码并累加 token 数，超出预算的块按 token 精确截断，
+    无需对整段文本编码，也无需二分查找反复编码。
+
+    Args:
+        text: 要截断的文本
+        max_tokens: 最大 token 数量
+        model: 模型名称
+
+    Returns:
+        tuple[str, int, bool]: (截断后的文本, 截断后文本的 token 数, 是否被截断)
+    """
+    if not text:
+        return "", 0, False
+
+    try:
+        encoding = _get_encoding(model)
+    except Exception as e:
+        logger.error(f"获取编码器失败: {e!s}，使用模拟计算方法")
+        encoding = None
+
+    token_count = 0
+    position = 0
+    while position < len(text):
+        end = min(position + TOKEN_BUDGET_CHUNK_CHARS, len(text))
+        # 尽量在换行处分块，减少块边界对分词的影响
+        if end < len(text):
+            newline = text.rfind("\n", position, end)
+            if newline > position:
+                end = newline + 1
+        chunk = text[position:end]
+
+        if encoding is not None:
+            tokens = encoding.encode(chunk, disallowed_special=())
+            chunk_tokens = len(tokens)
+        else:
+            tokens = None
+            chunk_tokens = _simulate_token_count(chunk)
+
+        if token_count + chunk_tokens > max_tokens:
+            remaining = max_tokens - token_count
+            if tokens is not None:
+                kept = encoding.decode(tokens[:remaining])
+                # 解码可能在多字节字符中间产生替换字符，保证结果是原文前缀
+                while kept and not chunk.startswith(kept):
+                    remaining -= 1
+                    kept = encoding.decode(tokens[:remaining])
+            else:
+                kept = chunk[:int(len(chunk) * remaining / chunk_tokens)]
+                remaining = _simulate_token_count(kept) if kept else 0
+            return text[:position] + kept, token_count + remaining, True
+
+        token_count += chunk_tokens
+        position = end
+
+    return text, token_count, False
@@ -3,11 +3,16 @@
 
 提供聊天历史相关功能，如打包下载历史记录等
 """
+import asyncio
+import hashlib
 import os
 import shutil
 import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
 
-from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.responses import FileResponse
 
 from agentlang.logger import get_logger
@@ -17,6 +22,19 @@ logger = get_logger(__name__)
 
 router = APIRouter(prefix="/chat-history", tags=["chat_history"])
 
+# 聊天历史压缩包的文件名前缀，压缩包按内容指纹缓存在临时目录中
+ARCHIVE_PREFIX = "chat_history_"
+
+# 旧指纹的压缩包在最后一次下载后保留的时间（秒），期间仍在传输或断点续传的下载不受影响
+ARCHIVE_RETENTION_SECONDS = 3600
+
+# 除当前压缩包外，无论是否过期都保留的最近的旧压缩包数量
+ARCHIVE_KEEP_PREVIOUS = 1
+
+# 压缩包路径 → 最后一次开始下载的时间
+_archive_last_served: Dict[str, float] = {}
+
+
 def remove_file(path: str):
     """删除指定路径的文件"""
     try:
@@ -25,9 +43,97 @@ def remove_file(path: str):
     except Exception as e:
         logger.error(f"删除文件失败: {e}")
 
+
+def get_chat_history_fingerprint(chat_history_dir: Path) -> str:
+    """根据目录下文件的路径、大小和修改时间计算内容指纹，内容不变时指纹不变"""
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(chat_history_dir):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            digest.update(f"{os.path.relpath(path, chat_history_dir)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def prune_chat_history_archives(archive_dir: str, current_path: str) -> None:
+    """清理旧指纹的压缩包：保留最近的 ARCHIVE_KEEP_PREVIOUS 个，其余在超过保留时间未被下载后删除"""
+    archives = []
+    for name in os.listdir(archive_dir):
+        path = os.path.join(archive_dir, name)
+        if not (name.startswith(ARCHIVE_PREFIX) and name.endswith(".zip")) or path == current_path:
+            continue
+        try:
+            last_used = max(os.stat(path).st_mtime, _archive_last_served.get(path, 0))
+        except OSError:
+            continue
+        archives.append((last_used, path))
+
+    now = time.time()
+    archives.sort(reverse=True)
+    for last_used, path in archives[ARCHIVE_KEEP_PREVIOUS:]:
+        if now - last_used > ARCHIVE_RETENTION_SECONDS:
+            remove_file(path)
+            _archive_last_served.pop(path, None)
+
+
+def build_chat_history_archive(fingerprint: str) -> str:
+    """打包聊天历史目录，同一指纹的压缩包直接复用，并清理过期的旧指纹压缩包"""
+    archive_dir = tempfile.gettempdir()
+    archive_path = os.path.join(archive_dir, f"{ARCHIVE_PREFIX}{fingerprint}.zip")
+    if os.path.exists(archive_path):
+        logger.info(f"复用聊天历史压缩包: {archive_path}")
+        return archive_path
+
+    # 先打包到临时文件再原子替换，避免并发请求读到不完整的压缩包
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.zip', dir=archive_dir) as tmp:
+        tmp_path = tmp.name
+    logger.info(f"创建临时文件: {tmp_path}")
+    try:
+        built_path = shutil.make_archive(
+            tmp_path[:-len('.zip')],
+            'zip',
+            root_dir=PathManager.get_project_root(),
+            base_dir=PathManager.get_chat_history_dir_name()
+        )
+        os.replace(built_path, archive_path)
+    except Exception:
+        remove_file(tmp_path)
+        raise
+
+    logger.info(f"创建聊天历史压缩包: {archive_path}")
+    prune_chat_history_archives(archive_dir, archive_path)
+    return archive_path
+
+
+def parse_entity_tags(header: str) -> List[str]:
+    """解析 If-None-Match 等头部中逗号分隔的 ETag 列表"""
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def strip_weak_prefix(tag: str) -> str:
+    """去掉弱校验前缀 W/，用于弱比较"""
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def drop_range_headers(request: Request) -> None:
+    """移除请求中的 Range 和 If-Range 头，FileResponse 随后返回完整内容"""
+    request.scope["headers"] = [
+        (name, value) for name, value in request.scope["headers"] if name not in (b"range", b"if-range")
+    ]
+
+
 @router.get("/download")
-async def download_chat_history(background_tasks: BackgroundTasks):
-    """打包并下载.chat_history目录"""
+async def download_chat_history(request: Request):
+    """打包并下载.chat_history目录
+
+    ETag 由目录内容决定：If-None-Match 命中时返回 304（弱比较，W/ 前缀的 ETag 同样命中），
+    内容不变时复用同一个压缩包，以便客户端通过 Range 请求断点续传。If-Range 只接受与当前 ETag
+    完全相同的强校验值，弱 ETag 或旧 ETag 返回完整内容。
+    """
     try:
         # 检查目录是否存在
         chat_history_dir = PathManager.get_chat_history_dir()
@@ -35,30 +141,28 @@ async def download_chat_history(background_tasks: BackgroundTasks):
             logger.error("聊天历史目录不存在")
             raise HTTPException(status_code=404, detail="聊天历史目录不存在")
 
-        # 创建临时文件
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as tmp:
-            tmp_path = tmp.name
-
-        logger.info(f"创建临时文件: {tmp_path}")
-
-        # 创建zip文件
-        archive_path = shutil.make_archive(
-            tmp_path.replace('.zip', ''), 
-            'zip', 
-            root_dir=PathManager.get_project_root(),
-            base_dir=PathManager.get_chat_history_dir_name()
-        )
+        fingerprint = await asyncio.to_thread(get_chat_history_fingerprint, chat_history_dir)
+        etag = f'"{fingerprint}"'
+        if_none_match = parse_entity_tags(request.headers.get("if-none-match", ""))
+        if "*" in if_none_match or etag in [strip_weak_prefix(tag) for tag in if_none_match]:
+            return Response(status_code=304, headers={"ETag": etag})
 
-        logger.info(f"创建聊天历史压缩包: {archive_path}")
+        # If-Range 为 ETag 时只能强比较；为日期时交由 FileResponse 与 Last-Modified 比较
+        if_range = request.headers.get("if-range", "").strip()
+        if if_range.startswith(("\"", "W/")) and if_range != etag:
+            drop_range_headers(request)
 
-        # 添加后台任务，在响应完成后删除临时文件
-        background_tasks.add_task(remove_file, archive_path)
+        archive_path = await asyncio.to_thread(build_chat_history_archive, fingerprint)
+        _archive_last_served[archive_path] = time.time()
 
         return FileResponse(
             path=archive_path,
             media_type="application/zip",
-            filename="chat_history.zip"
+            filename="chat_history.zip",
+            headers={"ETag": etag}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"打包聊天历史失败: {e!s}")
-        raise HTTPException(status_code=500, detail=f"打包失败: {e!s}") 
+        raise HTTPException(status_code=500, detail=f"打包失败: {e!s}")
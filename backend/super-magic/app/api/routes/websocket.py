@@ -196,4 +196,4 @@ async def websocket_endpoint(websocket: WebSocket):
             logger.info("已取消manager任务")
     finally:
         # 从Agent上下文中移除WebSocket流
-        ws_manager.agent_dispatcher.agent_context.remove_stream(stream)
+        await ws_manager.agent_dispatcher.agent_context.remove_stream(stream)
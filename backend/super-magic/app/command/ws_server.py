@@ -21,6 +21,7 @@ from app.api.routes import api_router
 from app.api.routes.websocket import router as websocket_router
 from app.service.agent_dispatcher import AgentDispatcher
 from app.service.idle_monitor_service import IdleMonitorService
+from app.service.workspace_index_service import WorkspaceIndexService
 
 # 获取日志记录器
 logger = get_logger(__name__)
@@ -44,6 +45,8 @@ async def lifespan(app: FastAPI):
     yield
     # 关闭时
     logger.info("服务正在关闭...")
+    # 停止工作区文件索引的目录监听
+    WorkspaceIndexService.stop_all()
 
 
 def create_app() -> FastAPI:
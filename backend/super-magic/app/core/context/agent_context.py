@@ -10,6 +10,7 @@ import os
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
+from agentlang.config.config import config
 from agentlang.context.base_agent_context import BaseAgentContext
 from agentlang.event.common import BaseEventData
 from agentlang.event.event import Event, EventType, StoppableEvent
@@ -18,12 +19,18 @@ from app.core.config.communication_config import STSTokenRefreshConfig
 from app.core.entity.attachment import Attachment
 from app.core.entity.message.client_message import ChatClientMessage, InitClientMessage
 from app.core.entity.project_archive import ProjectArchiveInfo
-from app.core.stream import Stream
+from app.core.stream import Stream, StreamSender
 from app.paths import PathManager
 
 # 获取日志记录器
 logger = get_logger(__name__)
 
+# 关闭资源时等待各流发送完积压消息的最长时间（秒）
+STREAM_FLUSH_TIMEOUT = 30
+
+# 删除通信流前等待其发送完积压消息的最长时间（秒）
+STREAM_REMOVE_FLUSH_TIMEOUT = 5
+
 class AgentContext(BaseAgentContext):
     """
     代理上下文类，包含代理运行需要的上下文信息
@@ -75,11 +82,12 @@ class AgentContext(BaseAgentContext):
         from app.core.entity.attachment import Attachment
         from app.core.entity.message.client_message import ChatClientMessage, InitClientMessage
         from app.core.entity.project_archive import ProjectArchiveInfo
-        from app.core.stream import Stream
+        from app.core.stream import Stream, StreamSender
 
         # 初始化并注册共享字段
         self.shared_context.register_fields({
             "streams": ({}, Dict[str, Stream]),
+            "stream_senders": ({}, Dict[str, StreamSender]),
             "todo_items": ({}, Dict[str, Dict[str, Any]]),
             "attachments": ({}, Dict[str, Attachment]),
             "chat_client_message": (None, Optional[ChatClientMessage]),
@@ -250,10 +258,34 @@ class AgentContext(BaseAgentContext):
         streams = self.shared_context.get_field("streams")
         stream_id = str(id(stream))  # 使用stream对象的id作为键
         streams[stream_id] = stream
+
+        # 每个流拥有独立的发送队列，重复添加同一个流时复用已有的发送器
+        senders = self.shared_context.get_field("stream_senders")
+        if stream_id not in senders:
+            senders[stream_id] = StreamSender(
+                stream,
+                max_queue_size=config.get("stream.max_queue_size", 1000),
+                overflow_policy=stream.overflow_policy,
+                on_write_error=self._handle_stream_write_error
+            )
         logger.info(f"已添加新的Stream，当前Stream数量: {len(streams)}")
 
-    def remove_stream(self, stream: Stream) -> None:
-        """删除一个通信流。
+    async def remove_stream(self, stream: Stream, flush_timeout: Optional[float] = STREAM_REMOVE_FLUSH_TIMEOUT) -> None:
+        """删除一个通信流，删除前等待其发送完已入队的消息（最多 flush_timeout 秒）。
+
+        等待期间流仍然保留，期间入队的消息（如任务结束消息）同样会被发送。
+
+        Args:
+            stream: 要删除的通信流实例。
+            flush_timeout: 最长等待时间（秒），None 表示一直等待。
+        """
+        sender = self.get_stream_sender(stream)
+        if sender:
+            await sender.aclose(flush_timeout)
+        self._discard_stream(stream)
+
+    def _discard_stream(self, stream: Stream) -> None:
+        """立即删除一个通信流，丢弃其未发送的消息。
 
         Args:
             stream: 要删除的通信流实例。
@@ -264,6 +296,70 @@ class AgentContext(BaseAgentContext):
             del streams[stream_id]
             logger.info(f"已删除Stream, type: {type(stream)}, 当前Stream数量: {len(streams)}")
 
+        sender = self.shared_context.get_field("stream_senders").pop(stream_id, None)
+        if sender:
+            sender.close()
+
+    def get_stream_sender(self, stream: Stream) -> Optional[StreamSender]:
+        """获取通信流的发送器。
+
+        Args:
+            stream: 通信流实例。
+
+        Returns:
+            Optional[StreamSender]: 发送器，流未添加时返回None。
+        """
+        return self.shared_context.get_field("stream_senders").get(str(id(stream)))
+
+    async def flush_streams(self, timeout: Optional[float] = None) -> bool:
+        """等待所有通信流发送完已入队的消息。
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待。
+
+        Returns:
+            bool: 是否全部在超时前发送完毕。
+        """
+        senders = list(self.shared_context.get_field("stream_senders").values())
+        if not senders:
+            return True
+        results = await asyncio.gather(*(sender.flush(timeout) for sender in senders))
+        return all(results)
+
+    def get_stream_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """获取各通信流的发送指标（积压、合并、丢弃、溢出、延迟）。
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 键为stream ID，值为流类型和指标。
+        """
+        return {
+            stream_id: {"type": type(sender.stream).__name__, **sender.metrics.to_dict()}
+            for stream_id, sender in self.shared_context.get_field("stream_senders").items()
+        }
+
+    def _handle_stream_write_error(self, stream: Stream, error: Exception) -> None:
+        """通信流写入失败时的处理：标准输出流和HTTP订阅流保留，其他流（如已断开的WebSocket）删除。
+
+        Args:
+            stream: 写入失败的通信流。
+            error: 写入时抛出的异常。
+        """
+        from app.core.stream import StdoutStream
+        from app.core.stream.http_subscription_stream import HTTPSubscriptionStream
+
+        if isinstance(stream, (StdoutStream, HTTPSubscriptionStream)):
+            logger.info(f"不删除流, stream type: {type(stream)}")
+        else:
+            logger.info(f"删除流, stream type: {type(stream)}")
+            # 在发送器的后台任务中回调，流已不可写，不等待积压消息
+            self._discard_stream(stream)
+
+    async def close_all_resources(self) -> None:
+        """关闭并移除所有资源，并等待各通信流发送完积压消息"""
+        await super().close_all_resources()
+        if not await self.flush_streams(timeout=STREAM_FLUSH_TIMEOUT):
+            logger.warning(f"部分通信流未能在 {STREAM_FLUSH_TIMEOUT} 秒内发送完积压消息，指标: {self.get_stream_metrics()}")
+
     @property
     def streams(self) -> Dict[str, Stream]:
         """获取所有通信流的字典。
@@ -524,6 +620,7 @@ class AgentContext(BaseAgentContext):
 
         try:
             result["streams_count"] = len(self.streams)
+            result["stream_metrics"] = self.get_stream_metrics()
         except Exception as e:
             result["streams_error"] = str(e)
 
@@ -7,6 +7,7 @@
 from agentlang.event.data import (
     AfterInitEventData,
     AfterLlmResponseEventData,
+    LlmStreamDeltaEventData,
     AfterMainAgentRunEventData,
     AfterToolCallEventData,
     BeforeInitEventData,
@@ -262,6 +263,34 @@ class TaskMessageFactory:
             )
         )
 
+    @classmethod
+    def create_llm_stream_delta_message(cls, event: Event[LlmStreamDeltaEventData]) -> ServerMessage:
+        """
+        创建LLM流式输出增量的任务消息
+
+        Args:
+            event: LLM流式输出增量事件
+
+        Returns:
+            TaskMessage: 仅包含本次新增内容的任务消息
+        """
+        agent_context = event.data.tool_context.get_extension_typed("agent_context", AgentContext)
+
+        # 确保 task_id 不为 None，如果为 None 则使用空字符串
+        task_id = agent_context.get_task_id() or ""
+
+        return ServerMessage.create(
+            metadata=agent_context.get_init_client_message_metadata(),
+            payload=ServerMessagePayload.create(
+                task_id=task_id,
+                sandbox_id=agent_context.get_sandbox_id(),
+                message_type=MessageType.THINKING,
+                status=TaskStatus.RUNNING,
+                content=event.data.content_delta,
+                event=event.event_type
+            )
+        )
+
     @classmethod
     async def create_before_tool_call_message(cls, event: Event[BeforeToolCallEventData]) -> ServerMessage:
         """
@@ -6,6 +6,7 @@
 
 from app.core.stream.base import Stream
 from app.core.stream.stdout_stream import StdoutStream
+from app.core.stream.stream_sender import OverflowPolicy, StreamSender
 from app.core.stream.websocket_stream import WebSocketStream
 
-__all__ = ["StdoutStream", "Stream", "WebSocketStream"] 
+__all__ = ["OverflowPolicy", "StdoutStream", "Stream", "StreamSender", "WebSocketStream"] 
@@ -28,6 +28,8 @@ class Stream(ABC):
         """
         # 默认处理所有事件
         self._ignored_events: List[EventType] = []
+        # 发送队列已满时的处理策略，取值见 stream_sender.OverflowPolicy，默认丢弃最早的进度消息
+        self.overflow_policy: str = "drop_oldest"
 
     def ignore_events(self, event_types: List[EventType]) -> None:
         """配置此流应该忽略的事件类型
@@ -14,6 +14,7 @@ from agentlang.event.event import EventType
 from agentlang.logger import get_logger
 from app.core.entity.message.client_message import MessageSubscriptionConfig
 from app.core.stream import Stream
+from app.core.stream.stream_sender import OverflowPolicy
 
 logger = get_logger(__name__)
 
@@ -37,8 +38,11 @@ class HTTPSubscriptionStream(Stream):
         self._base_retry_delay = 1.0  # 基础延迟(秒)
         self._max_retry_delay = 10.0  # 最大延迟(秒)
 
-        self.ignore_events([EventType.AFTER_CLIENT_CHAT])
-        logger.info("已配置HTTPSubscriptionStream忽略AFTER_CLIENT_CHAT事件")
+        # 订阅端负责持久化消息，积压时溢出到磁盘而不是丢弃
+        self.overflow_policy = OverflowPolicy.SPILL
+
+        self.ignore_events([EventType.AFTER_CLIENT_CHAT, EventType.LLM_STREAM_DELTA])
+        logger.info("已配置HTTPSubscriptionStream忽略AFTER_CLIENT_CHAT和LLM_STREAM_DELTA事件")
 
     async def _ensure_session(self):
         """Ensure an HTTP session exists."""
@@ -0,0 +1,327 @@
+"""
+流发送器
+
+每个通信流拥有独立的有界发送队列和后台发送任务，慢速订阅者（如重试中的HTTP订阅）不会阻塞其他流和代理主循环。
+积压时合并连续的流式增量消息，队列满时按策略丢弃或溢出到磁盘，并记录每个流的积压指标。
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from enum import Enum
+from typing import Any, Callable, Deque, Dict, Optional
+
+from agentlang.event.event import EventType
+from agentlang.logger import get_logger
+from app.core.entity.message.server_message import ServerMessage
+from app.core.stream.base import Stream
+
+logger = get_logger(__name__)
+
+# 进度类事件：内容是增量的，积压时连续的消息可以合并，队列满时优先丢弃（最终内容由后续完整消息给出）
+PROGRESS_EVENTS = {EventType.LLM_STREAM_DELTA}
+
+
+class OverflowPolicy(str, Enum):
+    """发送队列已满时的处理策略"""
+
+    DROP_OLDEST = "drop_oldest"  # 丢弃最早的进度消息，没有进度消息时丢弃最早的消息
+    SPILL = "spill"  # 写入本地临时文件，队列腾出空间后按原顺序补发，不丢消息
+
+
+@dataclass
+class QueuedMessage:
+    """发送队列中的消息"""
+
+    event_type: EventType
+    data: Optional[str]  # 序列化后的消息，合并后置空，发送时重新序列化
+    message: Optional[ServerMessage] = None  # 原始消息，用于合并，从磁盘恢复的消息没有
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+    def get_data(self) -> str:
+        """获取序列化后的消息"""
+        if self.data is None:
+            self.data = self.message.model_dump_json()
+        return self.data
+
+
+@dataclass
+class StreamMetrics:
+    """单个流的发送指标，延迟单位为秒"""
+
+    enqueued: int = 0
+    sent: int = 0
+    failed: int = 0
+    coalesced: int = 0
+    dropped: int = 0
+    spilled: int = 0
+    queue_size: int = 0
+    spill_size: int = 0
+    max_queue_size: int = 0
+    last_lag: float = 0.0
+    max_lag: float = 0.0
+    total_lag: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典，附带平均延迟"""
+        result = asdict(self)
+        result["avg_lag"] = self.total_lag / self.sent if self.sent else 0.0
+        return result
+
+
+class StreamSender:
+    """流发送器，按入队顺序把消息写入单个流"""
+
+    def __init__(
+        self,
+        stream: Stream,
+        max_queue_size: int = 1000,
+        overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        on_write_error: Optional[Callable[[Stream, Exception], None]] = None
+    ):
+        """
+        初始化流发送器
+
+        Args:
+            stream: 要写入的流
+            max_queue_size: 内存中最多积压的消息数
+            overflow_policy: 队列已满时的处理策略
+            on_write_error: 写入失败时的回调，接收流和异常
+        """
+        self.stream = stream
+        self.max_queue_size = max(max_queue_size, 1)
+        self.overflow_policy = OverflowPolicy(overflow_policy)
+        self.metrics = StreamMetrics()
+        self._on_write_error = on_write_error
+        self._queue: Deque[QueuedMessage] = deque()
+        self._spill_path: Optional[str] = None
+        self._spill_offset = 0
+        self._spill_count = 0
+        self._worker: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._closed = False
+
+    def put(self, event_type: EventType, data: str, message: Optional[ServerMessage] = None) -> None:
+        """
+        把消息放入发送队列，立即返回
+
+        Args:
+            event_type: 消息对应的事件类型
+            data: 序列化后的消息
+            message: 原始消息，提供时积压的进度消息可以合并
+        """
+        if self._closed:
+            return
+        self._ensure_worker()
+        self.metrics.enqueued += 1
+        item = QueuedMessage(event_type=event_type, data=data, message=message)
+
+        if self._spill_count:
+            # 磁盘上还有未补发的消息，新消息也写入磁盘，保证发送顺序
+            self._spill(item)
+        elif not self._coalesce(item):
+            if len(self._queue) >= self.max_queue_size:
+                self._handle_overflow(item)
+            else:
+                self._queue.append(item)
+
+        self._update_queue_size()
+        self._idle.clear()
+        self._wakeup.set()
+
+    async def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待已入队的消息全部发送完成
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            bool: 是否在超时前发送完毕
+        """
+        if not self._worker or self._worker.done() or self._idle.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"等待流发送完成超时（{timeout} 秒），stream type: {type(self.stream)}，"
+                f"剩余: {len(self._queue) + self._spill_count}"
+            )
+            return False
+
+    async def aclose(self, timeout: Optional[float] = None) -> None:
+        """
+        等待已入队的消息发送完毕（最多 timeout 秒）后关闭，超时后仍未发送的消息被丢弃
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+        """
+        if not self._closed:
+            await self.flush(timeout)
+        self.close()
+
+    def close(self) -> None:
+        """立即停止后台发送任务，丢弃未发送的消息并删除溢出文件"""
+        self._closed = True
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+        if self._idle:
+            # 唤醒仍在 flush 中等待的调用方
+            self._idle.set()
+        pending = len(self._queue) + self._spill_count
+        self._queue.clear()
+        self._remove_spill_file()
+        self._update_queue_size()
+        if pending:
+            logger.warning(f"流发送器已关闭，丢弃 {pending} 条未发送消息，stream type: {type(self.stream)}")
+        logger.info(f"流发送器已关闭，stream type: {type(self.stream)}，指标: {self.metrics.to_dict()}")
+
+    def _ensure_worker(self) -> None:
+        """在当前事件循环中启动后台发送任务"""
+        loop = asyncio.get_running_loop()
+        if self._worker and not self._worker.done() and self._worker.get_loop() is loop:
+            return
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._worker = loop.create_task(self._run())
+
+    def _coalesce(self, item: QueuedMessage) -> bool:
+        """
+        把进度消息合并到队尾尚未发送的同类消息中
+
+        Returns:
+            bool: 是否已合并
+        """
+        if item.event_type not in PROGRESS_EVENTS or item.message is None or not self._queue:
+            return False
+        last = self._queue[-1]
+        if last.event_type != item.event_type or last.message is None:
+            return False
+        last_payload = last.message.payload
+        payload = item.message.payload
+        if (last.message.metadata != item.message.metadata or last_payload.task_id != payload.task_id
+                or last_payload.type != payload.type):
+            return False
+
+        # 不修改原消息，其他流的队列可能引用同一个对象
+        last.message = last.message.model_copy(update={
+            "payload": last_payload.model_copy(update={
+                "content": last_payload.content + payload.content,
+                "send_timestamp": payload.send_timestamp
+            })
+        })
+        last.data = None
+        self.metrics.coalesced += 1
+        return True
+
+    def _handle_overflow(self, item: QueuedMessage) -> None:
+        """队列已满时按策略处理新消息"""
+        if self.overflow_policy == OverflowPolicy.SPILL:
+            self._spill(item)
+            return
+
+        # 优先丢弃最早的进度消息，全是重要消息时丢弃最早的一条
+        victim = next((queued for queued in self._queue if queued.event_type in PROGRESS_EVENTS), self._queue[0])
+        self._queue.remove(victim)
+        self._queue.append(item)
+        self.metrics.dropped += 1
+        if self.metrics.dropped == 1 or self.metrics.dropped % 100 == 0:
+            logger.warning(
+                f"流发送积压已达上限 {self.max_queue_size}，丢弃消息 (event: {victim.event_type})，"
+                f"stream type: {type(self.stream)}，累计丢弃: {self.metrics.dropped}"
+            )
+
+    def _spill(self, item: QueuedMessage) -> None:
+        """把消息追加到溢出文件"""
+        try:
+            if self._spill_path is None:
+                fd, self._spill_path = tempfile.mkstemp(prefix="stream_spill_", suffix=".jsonl")
+                os.close(fd)
+                self._spill_offset = 0
+                logger.warning(f"流发送积压已达上限 {self.max_queue_size}，开始溢出到文件: {self._spill_path}")
+            line = json.dumps({"event_type": item.event_type, "data": item.get_data(), "enqueued_at": item.enqueued_at})
+            with open(self._spill_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self._spill_count += 1
+            self.metrics.spilled += 1
+        except Exception as e:
+            # 写磁盘失败时退化为放入内存队列，不丢消息
+            logger.error(f"写入流溢出文件失败: {e}")
+            self._queue.append(item)
+
+    def _load_spilled(self) -> None:
+        """从溢出文件按顺序读回一批消息到内存队列，全部读完后删除文件"""
+        try:
+            with open(self._spill_path, "r", encoding="utf-8") as f:
+                f.seek(self._spill_offset)
+                while self._spill_count and len(self._queue) < self.max_queue_size:
+                    line = f.readline()
+                    if not line:
+                        break
+                    record = json.loads(line)
+                    self._queue.append(QueuedMessage(
+                        event_type=record["event_type"],
+                        data=record["data"],
+                        enqueued_at=record["enqueued_at"]
+                    ))
+                    self._spill_count -= 1
+                self._spill_offset = f.tell()
+        except Exception as e:
+            logger.error(f"读取流溢出文件失败，丢弃 {self._spill_count} 条消息: {e}")
+            self.metrics.dropped += self._spill_count
+            self._spill_count = 0
+
+        if not self._spill_count:
+            self._remove_spill_file()
+
+    def _remove_spill_file(self) -> None:
+        """删除溢出文件"""
+        if self._spill_path is None:
+            return
+        try:
+            os.unlink(self._spill_path)
+        except OSError:
+            pass
+        self._spill_path = None
+        self._spill_offset = 0
+        self._spill_count = 0
+
+    def _update_queue_size(self) -> None:
+        """更新积压指标"""
+        self.metrics.queue_size = len(self._queue)
+        self.metrics.spill_size = self._spill_count
+        self.metrics.max_queue_size = max(self.metrics.max_queue_size, len(self._queue) + self._spill_count)
+
+    async def _run(self) -> None:
+        """后台任务：按顺序逐条写入流"""
+        while True:
+            if not self._queue and self._spill_count:
+                self._load_spilled()
+            if not self._queue:
+                self._update_queue_size()
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            item = self._queue.popleft()
+            self._update_queue_size()
+            try:
+                await self.stream.write(item.get_data())
+                lag = time.monotonic() - item.enqueued_at
+                self.metrics.sent += 1
+                self.metrics.last_lag = lag
+                self.metrics.max_lag = max(self.metrics.max_lag, lag)
+                self.metrics.total_lag += lag
+            except Exception as e:
+                self.metrics.failed += 1
+                logger.error(f"失败往流中写入消息: {e!s}, stream type: {type(self.stream)}")
+                if self._on_write_error:
+                    self._on_write_error(self.stream, e)
@@ -27,23 +27,31 @@ from agentlang.event.data import (
     BeforeMainAgentRunEventData,
     BeforeToolCallEventData,
     ErrorEventData,
+    LlmStreamDeltaEventData,
 )
 from agentlang.event.event import EventType
 from agentlang.exceptions import UserFriendlyException
 from agentlang.llms.factory import LLMFactory
+from agentlang.llms.stream_assembler import ChatCompletionStreamAssembler
 from agentlang.llms.token_usage.models import TokenUsage
-from agentlang.logger import get_logger
+from agentlang.logger import get_logger, truncate_payload
 from agentlang.tools.tool_result import ToolResult
 from agentlang.utils.parallel import Parallel
 from app.core.context.agent_context import AgentContext
 from app.paths import PathManager
-from app.tools.core.base_tool import BaseTool
 from app.tools.core.tool_executor import tool_executor
 from app.tools.core.tool_factory import tool_factory
 from app.tools.list_dir import ListDir
 
 logger = get_logger(__name__)
 
+# 流式输出增量事件的最小分发间隔（秒），避免每个 token 都推送一次消息
+STREAM_DELTA_DISPATCH_INTERVAL = 0.1
+# 只读且无副作用的工具，允许在流式响应结束前提前执行；响应最终被作废时，这些工具的执行不会留下任何影响
+STREAM_EARLY_EXECUTION_TOOLS = {
+    "read_file", "read_files", "list_dir", "file_search", "grep_search", "web_search", "image_search", "thinking"
+}
+
 
 class Agent(BaseAgent):
 
@@ -91,6 +99,15 @@ class Agent(BaseAgent):
         self.enable_parallel_tool_calls = config.get("agent.enable_parallel_tool_calls", False)
         # 并行工具调用超时时间（秒），默认无超时
         self.parallel_tool_calls_timeout = config.get("agent.parallel_tool_calls_timeout", None)
+        # 流式模式下是否在响应结束前提前执行第一个完整的只读工具调用，默认禁用
+        self.stream_early_tool_execution = config.get("agent.stream_early_tool_execution", False)
+        # 流式响应期间提前启动的工具调用任务，key 为 tool_call_id
+        self._early_tool_call_tasks: Dict[str, asyncio.Task] = {}
+        # 本轮助手消息写入聊天历史后置位，提前执行的工具调用需要等待它之后才能产出结果
+        self._assistant_message_recorded: Optional[asyncio.Event] = None
+        # 工具参数列表缓存，工具集合变化时失效
+        self._tools_list_cache: List[Dict[str, Any]] = []
+        self._tools_list_cache_key: Optional[tuple] = None
 
         logger.info(f"初始化 agent: {self.agent_name}")
         self._initialize_agent()
@@ -164,8 +181,7 @@ class Agent(BaseAgent):
         # 收集工具提示
         tool_hints = []
         for tool_name in self.tools.keys():
-            tool_instance = tool_factory.get_tool_instance(tool_name)
-            if tool_instance and (hint := tool_instance.get_prompt_hint()):
+            if hint := tool_factory.get_tool_prompt_hint(tool_name):
                 tool_hints.append((tool_name, hint))
         # 将工具提示追加到 system prompt
         if tool_hints:
@@ -252,7 +268,7 @@ class Agent(BaseAgent):
                 query=query,
             ))
 
-            await self.run(query)
+            await self.run(query, close_resources=False)
 
             # 触发主 agent 运行后事件
             await self.agent_context.dispatch_event(EventType.AFTER_MAIN_AGENT_RUN, AfterMainAgentRunEventData(
@@ -269,8 +285,17 @@ class Agent(BaseAgent):
                     agent_context=self.agent_context,
                     error_message=e.get_user_friendly_message()
                 ))
-    async def run(self, query: str):
-        """运行 agent"""
+        finally:
+            # 在运行后事件和错误事件分发之后再关闭资源，保证这些事件的后台监听器也被等待和停止
+            await self.agent_context.close_all_resources()
+
+    async def run(self, query: str, close_resources: bool = True):
+        """运行 agent
+
+        Args:
+            query: 用户查询
+            close_resources: 结束时是否关闭上下文的所有资源；由 run_main_agent 调用时为 False，由其在分发完运行后事件后关闭
+        """
         self.set_agent_state(AgentState.RUNNING)
 
         logger.info(f"开始运行 agent: {self.agent_name}, query: {query}")
@@ -317,8 +342,13 @@ class Agent(BaseAgent):
             else:
                 # 理论上不应发生，但记录以防万一
                 logger.warning(f"尝试移除 Agent (name='{self.agent_name}', id='{self.id}') 但未在活动注册表中找到。")
+            # 取消仍未被消费的提前执行的工具调用
+            self._cancel_early_tool_calls()
+            # 将追加日志合并到聊天记录快照，保证快照文件完整
+            self.chat_history.compact()
             # 任务被用户终止时，agent 协程会被 cancel 异常强制挂掉，需要在这里关闭所有资源
-            await self.agent_context.close_all_resources()
+            if close_resources:
+                await self.agent_context.close_all_resources()
 
 
     async def _handle_agent_loop(self) -> None:
@@ -612,7 +642,7 @@ class Agent(BaseAgent):
                         arguments = json.loads(tool_call.function.arguments)
                         if "explanation" in arguments:
                             llm_response_message.content = arguments["explanation"]
-                            logger.debug(f"使用tool_call explanation作为LLM content: {llm_response_message.content}")
+                            logger.opt(lazy=True).debug("使用tool_call explanation作为LLM content: {}", lambda: truncate_payload(llm_response_message.content))
                             break
                     except (json.JSONDecodeError, AttributeError, TypeError):
                         continue
@@ -625,15 +655,14 @@ class Agent(BaseAgent):
                 logger.warning("LLM响应消息内容为空且无tool_calls，使用默认值'Continue'")
                 try:
                     message_dict = llm_response_message.model_dump()
-                    formatted_json = json.dumps(message_dict, ensure_ascii=False, indent=2)
-                    logger.warning(f"详细信息:\n{formatted_json}")
+                    logger.warning(f"详细信息: {truncate_payload(message_dict)}")
                 except Exception as e:
                     logger.warning(f"尝试打印LLM响应消息失败: {e!s}")
                 llm_response_message.content = "Continue"
 
         # 解析OpenAI的ToolCalls
         openai_tool_calls = self._parse_tool_calls(chat_response)
-        logger.debug(f"来自chat_response的OpenAI tool_calls: {openai_tool_calls}")
+        logger.opt(lazy=True).debug("来自chat_response的OpenAI tool_calls: {}", lambda: truncate_payload(str(openai_tool_calls)))
 
         # 标准化并转换为内部ToolCall类型
         tool_calls_to_execute = await self._parse_and_convert_tool_calls(openai_tool_calls)
@@ -677,11 +706,11 @@ class Agent(BaseAgent):
 
                 # 处理非字符串参数
                 if not isinstance(arguments_str, str):
-                    logger.warning(f"OpenAI ToolCall arguments非字符串: {arguments_str}，尝试转为JSON字符串")
+                    logger.warning(f"OpenAI ToolCall arguments非字符串: {truncate_payload(str(arguments_str))}，尝试转为JSON字符串")
                     try:
                         arguments_str = json.dumps(arguments_str, ensure_ascii=False)
                     except Exception:
-                        logger.error(f"无法将OpenAI ToolCall arguments转为JSON字符串: {arguments_str}，使用空对象字符串")
+                        logger.error(f"无法将OpenAI ToolCall arguments转为JSON字符串: {truncate_payload(str(arguments_str))}，使用空对象字符串")
                         arguments_str = "{}"
 
                 # 创建内部FunctionCall
@@ -727,6 +756,10 @@ class Agent(BaseAgent):
             self.set_agent_state(AgentState.ERROR)
             raise ValueError(f"无法记录助手响应 ({e})")
 
+        # 助手消息已记录，提前执行的工具调用可以产出结果
+        if self._assistant_message_recorded is not None:
+            self._assistant_message_recorded.set()
+
     async def _handle_no_tool_calls(self, llm_response_message: ChatCompletionMessage, no_tool_call_count: int, token_usage: Optional[TokenUsage], llm_duration_ms: float) -> tuple[int, bool, Optional[str]]:
         """
         处理LLM响应中没有工具调用的情况
@@ -905,6 +938,9 @@ class Agent(BaseAgent):
         logger.error(f"错误堆栈: {traceback.format_exc()}")
         self.set_agent_state(AgentState.ERROR)
 
+        # 本轮响应已作废，提前执行的工具调用结果不会被记录
+        self._cancel_early_tool_calls()
+
         # 处理中断的工具调用
         await self._handle_interrupted_tool_calls(exception)
 
@@ -1050,24 +1086,136 @@ class Agent(BaseAgent):
         return final_response
 
     async def _handle_agent_loop_stream(self) -> None:
-        """处理 agent 循环流"""
-        # 目前未实现流式处理，返回空值
-        return None
+        """
+        处理 agent 循环流
+
+        循环流程与非流式模式一致，区别在于 _call_llm 以流式方式请求 LLM：
+        增量内容通过 LLM_STREAM_DELTA 事件推送到客户端，第一个完整的工具调用会在响应结束前提前执行。
+        """
+        return await self._handle_agent_loop()
+
+    def _create_stream_chunk_handler(self, tool_context: ToolContext):
+        """
+        创建流式响应块的处理函数
+
+        Args:
+            tool_context: 本次 LLM 请求的工具上下文
+
+        Returns:
+            Tuple: (响应块回调, 推送剩余缓冲内容的函数)
+        """
+        pending_deltas: List[str] = []
+        state = {"last_dispatch_time": 0.0, "content": ""}
+
+        async def flush() -> None:
+            if not pending_deltas:
+                return
+            content_delta = "".join(pending_deltas)
+            pending_deltas.clear()
+            state["last_dispatch_time"] = time.time()
+            await self.agent_context.dispatch_event(
+                EventType.LLM_STREAM_DELTA,
+                LlmStreamDeltaEventData(
+                    model_name=self.llm_name,
+                    tool_context=tool_context,
+                    content_delta=content_delta,
+                    content=state["content"]
+                )
+            )
+
+        async def on_chunk(content_delta: str, completed_tool_calls: List[ChatCompletionMessageToolCall],
+                           assembler: ChatCompletionStreamAssembler) -> None:
+            if content_delta:
+                pending_deltas.append(content_delta)
+                state["content"] = assembler.content
+                if time.time() - state["last_dispatch_time"] >= STREAM_DELTA_DISPATCH_INTERVAL:
+                    await flush()
+
+            if completed_tool_calls and self.stream_early_tool_execution:
+                # 工具调用开始前先把已有的文本推送出去，保证客户端看到的顺序正确
+                await flush()
+                await self._start_early_tool_call(completed_tool_calls[0], assembler)
+
+        return on_chunk, flush
+
+    async def _start_early_tool_call(self, openai_tool_call: ChatCompletionMessageToolCall,
+                                     assembler: ChatCompletionStreamAssembler) -> None:
+        """
+        在流式响应结束前提前执行工具调用，仅对本轮响应的第一个工具调用生效
+
+        Args:
+            openai_tool_call: 已完整接收的工具调用
+            assembler: 当前的流式响应组装器
+        """
+        if self._early_tool_call_tasks:
+            return
+        first_tool_call = assembler.build_message().tool_calls[0]
+        if first_tool_call.id != openai_tool_call.id:
+            return
+        if openai_tool_call.function.name not in STREAM_EARLY_EXECUTION_TOOLS:
+            return
+
+        tool_calls = await self._parse_and_convert_tool_calls([openai_tool_call])
+        if not tool_calls:
+            return
+
+        # 工具事件需要 LLM 响应消息，使用截至目前的部分响应，content 为空时使用 explanation
+        partial_message = assembler.build_message()
+        if not partial_message.content:
+            try:
+                arguments = json.loads(openai_tool_call.function.arguments)
+                partial_message.content = arguments.get("explanation", "") if isinstance(arguments, dict) else ""
+            except json.JSONDecodeError:
+                partial_message.content = ""
+
+        logger.info(f"流式响应未结束，提前执行工具调用: {openai_tool_call.function.name}")
+        self._assistant_message_recorded = asyncio.Event()
+        self._early_tool_call_tasks[openai_tool_call.id] = asyncio.create_task(
+            self._execute_tool_calls_sequential(tool_calls, partial_message, self._assistant_message_recorded)
+        )
+
+    def _cancel_early_tool_calls(self) -> None:
+        """取消所有尚未被消费的提前执行的工具调用"""
+        for tool_call_id, task in self._early_tool_call_tasks.items():
+            if not task.done():
+                logger.warning(f"取消提前执行的工具调用: {tool_call_id}")
+                task.cancel()
+        self._early_tool_call_tasks.clear()
+        self._assistant_message_recorded = None
+
+    def _get_tools_list(self) -> List[Dict[str, Any]]:
+        """
+        获取 LLM 需要的工具参数列表
+
+        工具参数只在工具集合变化时重新生成，其余时间复用同一个列表对象，
+        保证每次请求序列化出的 tools 完全一致，便于服务端命中 prompt 缓存。
+        工具定义优先取自工具清单，尚未被调用过的工具不会被导入。
+
+        Returns:
+            List[Dict[str, Any]]: 工具参数列表
+        """
+        cache_key = tuple((self.tools or {}).keys())
+        if cache_key == self._tools_list_cache_key:
+            return self._tools_list_cache
+
+        # 生成LLM需要的工具定义
+        tools_list = []
+        for tool_name in cache_key:
+            try:
+                tools_list.append(tool_factory.get_tool_param(tool_name))
+            except ValueError as e:
+                logger.warning(f"无法获取工具定义: {tool_name}, {e}")
+
+        # 通过一次 JSON 往返固定内容，避免与 schema 共享的字典被后续修改
+        self._tools_list_cache = json.loads(json.dumps(tools_list, ensure_ascii=False))
+        self._tools_list_cache_key = cache_key
+        logger.debug(f"已生成工具参数列表缓存，共 {len(self._tools_list_cache)} 个工具")
+        return self._tools_list_cache
 
     async def _call_llm(self, messages: List[Dict[str, Any]]) -> ChatCompletion:
         """调用 LLM"""
 
-        # 将工具实例转换为LLM需要的格式
-        tools_list = []
-        if self.tools:
-            for tool_name in self.tools.keys():
-                tool_instance: BaseTool = tool_factory.get_tool_instance(tool_name)
-                # 确保工具实例有效
-                if tool_instance:
-                    tool_param = tool_instance.to_param()
-                    tools_list.append(tool_param)
-                else:
-                    logger.warning(f"无法获取工具实例: {tool_name}")
+        tools_list = self._get_tools_list()
 
         # 保存工具列表到与聊天记录同名的.tools.json文件
         if self.chat_history and tools_list:
@@ -1092,15 +1240,27 @@ class Agent(BaseAgent):
         start_time = time.time()
         # logger.debug(f"发送给 LLM 的 messages: {messages}")
 
+        # 流式模式下边接收边推送增量内容
+        on_chunk, flush_stream_deltas = None, None
+        if self.stream_mode:
+            # 上一轮未被消费的提前执行任务（例如最终响应没有产生工具调用）不再有效
+            self._cancel_early_tool_calls()
+            on_chunk, flush_stream_deltas = self._create_stream_chunk_handler(tool_context)
+
         # 使用 LLMFactory.call_with_tool_support 方法统一处理工具调用
         llm_response: ChatCompletion = await LLMFactory.call_with_tool_support(
             self.llm_id,
             messages, # 传递字典列表
             tools=tools_list if tools_list else None,
             stop=self.agent_context.stop_sequences if hasattr(self.agent_context, 'stop_sequences') else None,
-            agent_context=self.agent_context
+            agent_context=self.agent_context,
+            stream=self.stream_mode,
+            on_chunk=on_chunk
         )
 
+        if flush_stream_deltas:
+            await flush_stream_deltas()
+
         llm_response_message = llm_response.choices[0].message
         request_time = time.time() - start_time
         # ▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲ 调用 LLM 结束 ▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲▲ #
@@ -1124,7 +1284,7 @@ class Agent(BaseAgent):
                                 # 从 arguments 里去掉 explanation (虽然这里修改的是响应对象，可能不影响历史记录)
                                 # del arguments["explanation"]
                                 # tool_call.function.arguments = json.dumps(arguments, ensure_ascii=False)
-                                logger.debug(f"使用 tool_call explanation 作为 LLM content: {llm_response_message.content}")
+                                logger.opt(lazy=True).debug("使用 tool_call explanation 作为 LLM content: {}", lambda: truncate_payload(llm_response_message.content))
                                 break # 找到第一个就用
                       except (json.JSONDecodeError, AttributeError, TypeError):
                            continue # 忽略解析错误或无效结构
@@ -1138,8 +1298,7 @@ class Agent(BaseAgent):
                  # 使用漂亮的 JSON 格式打印有问题的消息
                  try:
                      message_dict = llm_response_message.model_dump() # pydantic v2
-                     formatted_json = json.dumps(message_dict, ensure_ascii=False, indent=2)
-                     logger.warning(f"详细信息:\n{formatted_json}")
+                     logger.warning(f"详细信息: {truncate_payload(message_dict)}")
                  except Exception as e:
                      logger.warning(f"尝试打印 LLM 响应消息失败: {e!s}")
                  llm_response_message.content = "Continue" # 强制设为 Continue
@@ -1162,6 +1321,9 @@ class Agent(BaseAgent):
 
     async def _execute_tool_calls(self, tool_calls: List[ToolCall], llm_response_message: ChatCompletionMessage) -> List[ToolResult]:
         """执行 Tools 调用，支持并行执行"""
+        if self._early_tool_call_tasks:
+            return await self._execute_tool_calls_with_early_results(tool_calls, llm_response_message)
+
         if not self.enable_parallel_tool_calls or len(tool_calls) <= 1:
             # 非并行模式或只有一个工具调用时，使用原来的逻辑
             logger.debug("使用顺序执行模式处理工具调用")
@@ -1171,8 +1333,45 @@ class Agent(BaseAgent):
             logger.info(f"使用并行执行模式处理 {len(tool_calls)} 个工具调用")
             return await self._execute_tool_calls_parallel(tool_calls, llm_response_message)
 
-    async def _execute_tool_calls_sequential(self, tool_calls: List[ToolCall], llm_response_message: ChatCompletionMessage) -> List[ToolResult]:
-        """使用顺序模式执行 Tools 调用（原始逻辑）"""
+    async def _execute_tool_calls_with_early_results(self, tool_calls: List[ToolCall], llm_response_message: ChatCompletionMessage) -> List[ToolResult]:
+        """合并流式响应期间提前执行的工具调用结果，并执行剩余的工具调用"""
+        early_tasks = {}
+        remaining_tool_calls = []
+        for tool_call in tool_calls:
+            task = self._early_tool_call_tasks.pop(tool_call.id, None)
+            if task:
+                early_tasks[tool_call.id] = task
+            else:
+                remaining_tool_calls.append(tool_call)
+        # 不在最终工具调用列表中的提前执行任务（如被多工具调用裁剪）直接取消
+        self._cancel_early_tool_calls()
+
+        results_by_id: Dict[str, ToolResult] = {}
+        for task in early_tasks.values():
+            for result in await task:
+                results_by_id[result.tool_call_id] = result
+
+        if remaining_tool_calls:
+            if not self.enable_parallel_tool_calls or len(remaining_tool_calls) <= 1:
+                remaining_results = await self._execute_tool_calls_sequential(remaining_tool_calls, llm_response_message)
+            else:
+                remaining_results = await self._execute_tool_calls_parallel(remaining_tool_calls, llm_response_message)
+            for result in remaining_results:
+                if result:
+                    results_by_id[result.tool_call_id] = result
+
+        return [results_by_id[tool_call.id] for tool_call in tool_calls if tool_call.id in results_by_id]
+
+    async def _execute_tool_calls_sequential(self, tool_calls: List[ToolCall], llm_response_message: ChatCompletionMessage,
+                                             assistant_message_recorded: Optional[asyncio.Event] = None) -> List[ToolResult]:
+        """
+        使用顺序模式执行 Tools 调用（原始逻辑）
+
+        Args:
+            tool_calls: 工具调用列表
+            llm_response_message: LLM响应消息
+            assistant_message_recorded: 提前执行时传入，工具执行完成后等待本轮助手消息写入聊天历史，再触发 after_tool_call 事件
+        """
         results = []
         for tool_call in tool_calls:
             result = None
@@ -1186,14 +1385,14 @@ class Agent(BaseAgent):
                     tool_arguments_dict = json.loads(tool_arguments_str)
                     if not isinstance(tool_arguments_dict, dict):
                         logger.warning(f"工具 '{tool_name}' 的参数解析后不是字典，将传递空字典。")
-                        logger.warning(f"原始参数数据：{tool_arguments_str}")
-                        logger.warning(f"解析后结果：{tool_arguments_dict}")
+                        logger.warning(f"原始参数数据：{truncate_payload(tool_arguments_str)}")
+                        logger.warning(f"解析后结果：{truncate_payload(tool_arguments_dict)}")
                         tool_arguments_for_exec = {}
                     else:
                         tool_arguments_for_exec = tool_arguments_dict
                 except json.JSONDecodeError as e:
                     logger.warning(f"工具 '{tool_name}' 的参数无法解析为 JSON，将传递空字典。")
-                    logger.warning(f"原始参数数据：{tool_arguments_str}")
+                    logger.warning(f"原始参数数据：{truncate_payload(tool_arguments_str)}")
                     logger.warning(f"完整报错信息：{e}")
                     tool_arguments_for_exec = {}
 
@@ -1211,7 +1410,7 @@ class Agent(BaseAgent):
                     from app.core.entity.event.event_context import EventContext
                     tool_context.register_extension("event_context", EventContext())
 
-                    logger.info(f"开始执行工具: {tool_name}, 参数: {tool_arguments_for_exec}")
+                    logger.info(f"开始执行工具: {tool_name}, 参数: {truncate_payload(tool_arguments_for_exec)}")
 
                     # --- 触发 before_tool_call 事件 ---
                     tool_instance = tool_factory.get_tool_instance(tool_name)
@@ -1241,6 +1440,10 @@ class Agent(BaseAgent):
                     if not result.tool_call_id:
                          result.tool_call_id = tool_call.id
 
+                    # 提前执行的工具调用：助手消息记录之前不产出结果
+                    if assistant_message_recorded is not None:
+                        await assistant_message_recorded.wait()
+
                     # --- 触发 after_tool_call 事件 ---
                     await self.agent_context.dispatch_event(
                         EventType.AFTER_TOOL_CALL,
@@ -1318,14 +1521,14 @@ class Agent(BaseAgent):
                     tool_arguments_dict = json.loads(tool_arguments_str)
                     if not isinstance(tool_arguments_dict, dict):
                         logger.warning(f"并行工具调用：'{tool_name}' 的参数解析后不是字典，将传递空字典")
-                        logger.warning(f"原始参数数据：{tool_arguments_str}")
-                        logger.warning(f"解析后结果：{tool_arguments_dict}")
+                        logger.warning(f"原始参数数据：{truncate_payload(tool_arguments_str)}")
+                        logger.warning(f"解析后结果：{truncate_payload(tool_arguments_dict)}")
                         tool_arguments_for_exec = {}
                     else:
                         tool_arguments_for_exec = tool_arguments_dict
                 except json.JSONDecodeError as e:
                     logger.warning(f"并行工具调用：'{tool_name}' 的参数无法解析为 JSON，将传递空字典")
-                    logger.warning(f"原始参数数据：{tool_arguments_str}")
+                    logger.warning(f"原始参数数据：{truncate_payload(tool_arguments_str)}")
                     logger.warning(f"完整报错信息：{e}")
                     tool_arguments_for_exec = {}
 
@@ -1421,7 +1624,7 @@ class Agent(BaseAgent):
                 )
 
                 # 执行工具调用
-                logger.info(f"并行执行工具: {tool_name}, 参数: {arguments}")
+                logger.info(f"并行执行工具: {tool_name}, 参数: {truncate_payload(arguments)}")
                 result = await tool_executor.execute_tool_call(
                     tool_context=tool_context,
                     arguments=arguments
@@ -1,6 +1,6 @@
 from typing import Any, Callable, Dict
 
-from agentlang.event.event import Event, EventType
+from agentlang.event.event import Event, EventType, ListenerMode
 from agentlang.logger import get_logger
 from app.core.context.agent_context import AgentContext
 
@@ -14,7 +14,12 @@ class BaseListenerService:
     """
 
     @staticmethod
-    def register_event_listener(agent_context: AgentContext, event_type: EventType, listener: Callable[[Event[Any]], None]) -> None:
+    def register_event_listener(
+        agent_context: AgentContext,
+        event_type: EventType,
+        listener: Callable[[Event[Any]], None],
+        mode: ListenerMode = ListenerMode.INLINE
+    ) -> None:
         """
         为代理上下文注册事件监听器
         
@@ -22,6 +27,7 @@ class BaseListenerService:
             agent_context: 代理上下文对象
             event_type: 事件类型
             listener: 事件监听器函数，接收一个事件参数
+            mode: 监听器执行模式，只产生副作用、不修改事件上下文的监听器可以使用 CONCURRENT 或 BACKGROUND
         """
         # 检查agent_context是否为None
         if agent_context is None:
@@ -29,20 +35,25 @@ class BaseListenerService:
             return
 
         # 向代理上下文直接注册监听器
-        agent_context.add_event_listener(event_type, listener)
+        agent_context.add_event_listener(event_type, listener, mode=mode)
 
-        logger.info(f"已注册事件监听器: {event_type}")
+        logger.info(f"已注册事件监听器: {event_type}, 模式: {mode.value}")
 
     @staticmethod
-    def register_listeners(agent_context: AgentContext, event_listeners: Dict[EventType, Callable[[Event[Any]], None]]) -> None:
+    def register_listeners(
+        agent_context: AgentContext,
+        event_listeners: Dict[EventType, Callable[[Event[Any]], None]],
+        mode: ListenerMode = ListenerMode.INLINE
+    ) -> None:
         """
         批量注册多个事件监听器
         
         Args:
             agent_context: 代理上下文对象
             event_listeners: 事件类型到监听器函数的映射字典
+            mode: 监听器执行模式，对映射中的所有监听器生效
         """
         for event_type, listener in event_listeners.items():
-            BaseListenerService.register_event_listener(agent_context, event_type, listener)
+            BaseListenerService.register_event_listener(agent_context, event_type, listener, mode)
 
         logger.info(f"已批量注册 {len(event_listeners)} 个事件监听器")
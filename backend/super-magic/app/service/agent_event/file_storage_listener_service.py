@@ -14,7 +14,7 @@ from typing import List, Optional, Union
 
 from agentlang.context.tool_context import ToolContext
 from agentlang.event.data import AfterMainAgentRunEventData
-from agentlang.event.event import Event, EventType
+from agentlang.event.event import Event, EventType, ListenerMode
 from agentlang.logger import get_logger
 from app.core.context.agent_context import AgentContext
 from app.core.entity.attachment import Attachment, AttachmentTag
@@ -43,16 +43,18 @@ class FileStorageListenerService:
         Args:
             agent_context: 代理上下文对象
         """
-        # 创建事件类型到处理函数的映射
-        event_listeners = {
+        # 上传生成的附件会在 AFTER_TOOL_CALL 消息中使用，需要在 dispatch 返回前完成，
+        # 因此与同一事件的其他监听器并发执行，而不是放到后台
+        BaseListenerService.register_listeners(agent_context, {
             EventType.FILE_CREATED: FileStorageListenerService._handle_file_event,
-            EventType.FILE_UPDATED: FileStorageListenerService._handle_file_event,
+            EventType.FILE_UPDATED: FileStorageListenerService._handle_file_event
+        }, mode=ListenerMode.CONCURRENT)
+
+        # 删除处理和项目归档上传不影响后续流程，放到后台按顺序执行，关闭资源前会等待其完成
+        BaseListenerService.register_listeners(agent_context, {
             EventType.FILE_DELETED: FileStorageListenerService._handle_file_deleted,
             EventType.AFTER_MAIN_AGENT_RUN: FileStorageListenerService._handle_after_main_agent_run
-        }
-
-        # 使用基类方法批量注册监听器
-        BaseListenerService.register_listeners(agent_context, event_listeners)
+        }, mode=ListenerMode.BACKGROUND)
 
         logger.info("已为代理上下文注册文件事件和主代理完成事件监听器")
 
@@ -1,4 +1,4 @@
-from agentlang.event.event import Event, EventType
+from agentlang.event.event import Event, EventType, ListenerMode
 from agentlang.logger import get_logger
 from app.core.context.agent_context import AgentContext
 from app.core.entity.event.file_event import FileEventData
@@ -26,8 +26,8 @@ class RagListenerService:
             EventType.FILE_DELETED: RagListenerService._handle_file_deleted
         }
 
-        # 使用基类方法批量注册监听器
-        BaseListenerService.register_listeners(agent_context, event_listeners)
+        # 索引更新不影响工具调用结果，放到后台按文件事件顺序执行
+        BaseListenerService.register_listeners(agent_context, event_listeners, mode=ListenerMode.BACKGROUND)
 
         logger.info("已为RAG系统注册所有文件相关事件监听器")
 
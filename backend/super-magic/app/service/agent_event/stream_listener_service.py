@@ -12,6 +12,7 @@ from agentlang.event.data import (
     BeforeLlmRequestEventData,
     BeforeToolCallEventData,
     ErrorEventData,
+    LlmStreamDeltaEventData,
 )
 from agentlang.event.event import Event, EventType
 from agentlang.logger import get_logger
@@ -25,8 +26,6 @@ from app.core.entity.event.event_context import EventContext
 from app.core.entity.event.file_event import FileEventData
 from app.core.entity.factory.task_message_factory import TaskMessageFactory
 from app.core.entity.message.server_message import ServerMessage, TaskStatus, TaskStep
-from app.core.stream.http_subscription_stream import HTTPSubscriptionStream
-from app.core.stream.stdout_stream import StdoutStream
 from app.service.agent_event.base_listener_service import BaseListenerService
 
 logger = get_logger(__name__)
@@ -53,6 +52,7 @@ class StreamListenerService:
             EventType.AFTER_CLIENT_CHAT: StreamListenerService._handle_after_client_chat,
             EventType.BEFORE_LLM_REQUEST: StreamListenerService._handle_before_llm_request,
             EventType.AFTER_LLM_REQUEST: StreamListenerService._handle_after_llm_response,
+            EventType.LLM_STREAM_DELTA: StreamListenerService._handle_llm_stream_delta,
             EventType.BEFORE_TOOL_CALL: StreamListenerService._handle_before_tool_call,
             EventType.AFTER_TOOL_CALL: StreamListenerService._handle_after_tool_call,
             EventType.AGENT_SUSPENDED: StreamListenerService._handle_agent_suspended,
@@ -139,6 +139,22 @@ class StreamListenerService:
         await StreamListenerService._send_task_message(event.data.tool_context, task_message, event)
         logger.info(f"结束请求LLM: {event.data.model_name}, 耗时: {event.data.request_time:.2f}秒")
 
+    @staticmethod
+    async def _handle_llm_stream_delta(event: Event[LlmStreamDeltaEventData]) -> None:
+        """
+        处理LLM流式输出增量事件
+
+        Args:
+            event: LLM流式输出增量事件对象，包含LlmStreamDeltaEventData数据
+        """
+        if not event.data.content_delta:
+            return
+
+        # 使用工厂创建任务消息
+        task_message = TaskMessageFactory.create_llm_stream_delta_message(event)
+
+        await StreamListenerService._send_task_message(event.data.tool_context, task_message, event)
+
     @staticmethod
     async def _handle_before_tool_call(event: Event[BeforeToolCallEventData]) -> None:
         """
@@ -297,7 +313,7 @@ class StreamListenerService:
     @staticmethod
     async def _send_task_message(tool_context: ToolContext, task_message: ServerMessage, event: Event) -> None:
         """
-        通过WebSocket向客户端发送任务消息
+        把任务消息放入各通信流的发送队列，由发送器异步写入客户端
 
         Args:
             tool_context: 工具上下文，包含agent_context和event_context
@@ -338,27 +354,20 @@ class StreamListenerService:
 
             message_json = task_message.model_dump_json()
 
-            # 发送到所有流
+            # 放入各流自己的发送队列后立即返回，由各流的后台任务按顺序写入，慢速流不会阻塞其他流和代理主循环
             # 创建字典的副本进行迭代，避免在迭代过程中修改字典引发错误
             for stream_id, stream in list(agent_context.streams.items()):
-                try:
-                    if stream.should_ignore_event(event.event_type):
-                        logger.info(f"跳过往流中写入消息，stream type: {type(stream)}, 事件类型: {event.event_type}")
-                        continue
-
-                    logger.info(f"开始往流中写入消息, stream type: {type(stream)}")
-                    await stream.write(message_json)
-                    logger.info(f"成功往流中写入消息, stream type: {type(stream)}")
-                except Exception as e:
-                    logger.error(f"堆栈信息: {traceback.format_exc()}")
-                    logger.error(f"失败往流中写入消息: {e!s}, 删除流, stream type: {type(stream)}")
-                    # 如果stdoutstream或者httpstream，则不删除
-                    if isinstance(stream, StdoutStream) or isinstance(stream, HTTPSubscriptionStream):
-                        logger.info(f"不删除流, stream type: {type(stream)}")
-                    else:
-                        logger.info(f"删除流, stream type: {type(stream)}")
-                        tool_context.get_extension_typed("agent_context", AgentContext).remove_stream(stream)
-            logger.debug(f"成功发送任务消息: {payload.message_id}")
+                if stream.should_ignore_event(event.event_type):
+                    logger.info(f"跳过往流中写入消息，stream type: {type(stream)}, 事件类型: {event.event_type}")
+                    continue
+
+                sender = agent_context.get_stream_sender(stream)
+                if not sender:
+                    logger.warning(f"未找到流的发送器，跳过, stream type: {type(stream)}")
+                    continue
+                sender.put(event.event_type, message_json, task_message)
+                logger.debug(f"已放入流的发送队列, stream type: {type(stream)}, 积压: {sender.metrics.queue_size}")
+            logger.debug(f"任务消息已入队: {payload.message_id}")
         except Exception as e:
             # 打印堆栈信息
             logger.error(f"堆栈信息: {traceback.format_exc()}")
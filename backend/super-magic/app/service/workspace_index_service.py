@@ -0,0 +1,552 @@
+"""
+工作区文件索引服务
+
+在进程内维护工作区的文件索引（路径、大小、修改时间、缓存的行数/token 数），
+通过 watchdog 监听文件变化保持索引新鲜，供 file_search、list_dir 等工具直接查询，避免每次调用都遍历磁盘。
+依赖目录、版本库目录（node_modules、.git 等）只记录目录本身，不扫描、不监听其中的内容。
+"""
+import bisect
+import fnmatch
+import os
+import re
+import stat
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from watchdog.events import FileSystemEvent, FileSystemEventHandler
+from watchdog.observers import Observer
+from watchdog.observers.api import ObservedWatch
+
+from agentlang.logger import get_logger
+from agentlang.utils.file import count_file_lines, count_file_tokens
+
+logger = get_logger(__name__)
+
+# 未能启动文件监听时，索引的最长有效时间（秒），超过后查询时重新扫描
+UNWATCHED_INDEX_TTL = 5.0
+# 模糊匹配使用的 n-gram 长度
+TRIGRAM_SIZE = 3
+# 路径子序列模糊匹配最多收集的候选数，达到后停止扫描
+SUBSEQUENCE_MAX_CANDIDATES = 200
+# 不扫描、不监听其内容的目录名
+IGNORED_DIR_NAMES = frozenset({
+    ".git", ".svn", ".hg", "node_modules", "__pycache__", ".venv", "venv",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".tox", ".idea", ".vscode",
+})
+# 按忽略规则拆分监听时最多注册的监听数，超过后退回到对根目录的单个递归监听
+MAX_WATCHES = 64
+
+
+@dataclass
+class IndexEntry:
+    """索引条目"""
+    rel_path: str
+    name: str
+    is_dir: bool
+    size: int
+    mtime: float
+    mtime_ns: int
+    # 以下为按需计算并缓存的统计信息，文件变化时条目会被替换，缓存随之失效
+    line_count: Optional[int] = None
+    line_count_ready: bool = False
+    token_count: Optional[int] = None
+    token_count_ready: bool = False
+
+    @property
+    def name_lower(self) -> str:
+        return self.name.lower()
+
+
+def _trigrams(text: str) -> Set[str]:
+    """生成字符串的 trigram 集合"""
+    return {text[i:i + TRIGRAM_SIZE] for i in range(len(text) - TRIGRAM_SIZE + 1)}
+
+
+def is_ignored_path(rel_path: str) -> bool:
+    """判断相对路径是否位于忽略目录之内（忽略目录本身不算）"""
+    parts = rel_path.split(os.sep)
+    return any(part in IGNORED_DIR_NAMES for part in parts[:-1])
+
+
+class WorkspaceIndex:
+    """
+    单个目录的文件索引
+
+    - entries: 相对路径 -> 索引条目（包含文件和目录）
+    - children: 目录相对路径 -> 子项名称集合（根目录为 ""），忽略目录没有该项
+    - 文件名 trigram 倒排索引，用于子串查询的候选过滤
+    - 所有相对路径拼接成的字符串，用于正则实现的模糊子序列匹配
+    """
+
+    def __init__(self, root: Path):
+        self.root = os.path.abspath(root)
+        self._lock = threading.RLock()
+        self._entries: Dict[str, IndexEntry] = {}
+        self._children: Dict[str, Set[str]] = {}
+        self._trigram_index: Dict[str, Set[str]] = {}
+        self._built = False
+        self._built_at = 0.0
+        # 索引中的忽略目录（相对路径），用于规划监听
+        self._ignored_dirs: Set[str] = set()
+        self._observer: Optional[Observer] = None
+        self._event_handler: Optional[FileSystemEventHandler] = None
+        # 监听的目录（相对路径）-> watchdog 监听；_shallow_watch_dirs 中的目录只监听自身，其余递归监听
+        self._watches: Dict[str, ObservedWatch] = {}
+        self._shallow_watch_dirs: Set[str] = set()
+        self._watching = False
+        self._watch_failed = False
+        # 模糊匹配使用的拼接字符串，索引变化后延迟重建
+        self._joined_paths: Optional[str] = None
+        self._joined_paths_list: List[str] = []
+        self._joined_offsets: List[int] = []
+
+    # ---------- 索引构建与维护 ----------
+
+    def ensure_ready(self) -> None:
+        """确保索引可用：首次使用时构建并启动监听，未监听时按 TTL 重新扫描"""
+        with self._lock:
+            if self._built and (self._watching or time.time() - self._built_at < UNWATCHED_INDEX_TTL):
+                return
+            self._rebuild()
+            if not self._watching and not self._watch_failed:
+                self._start_watching()
+
+    def _rebuild(self) -> None:
+        """完整扫描根目录，重建索引"""
+        start_time = time.time()
+        self._entries.clear()
+        self._children.clear()
+        self._trigram_index.clear()
+        self._ignored_dirs.clear()
+        self._children[""] = set()
+        self._scan_directory("")
+        self._built = True
+        self._built_at = time.time()
+        self._joined_paths = None
+        logger.info(f"工作区索引已构建: {self.root}，共 {len(self._entries)} 项，耗时 {(time.time() - start_time) * 1000:.1f}ms")
+
+    def _scan_directory(self, rel_dir: str) -> None:
+        """递归扫描目录并加入索引"""
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            abs_dir = os.path.join(self.root, current) if current else self.root
+            try:
+                with os.scandir(abs_dir) as it:
+                    for dir_entry in it:
+                        rel_path = os.path.join(current, dir_entry.name) if current else dir_entry.name
+                        try:
+                            is_dir = dir_entry.is_dir(follow_symlinks=False)
+                            stat_result = dir_entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        self._add_entry(rel_path, dir_entry.name, is_dir, stat_result)
+                        if is_dir and dir_entry.name not in IGNORED_DIR_NAMES:
+                            stack.append(rel_path)
+            except OSError as e:
+                logger.debug(f"扫描目录失败: {abs_dir}, 错误: {e}")
+
+    def _add_entry(self, rel_path: str, name: str, is_dir: bool, stat_result: os.stat_result) -> None:
+        """加入或替换索引条目"""
+        if rel_path in self._entries:
+            self._remove_entry(rel_path)
+
+        self._entries[rel_path] = IndexEntry(
+            rel_path=rel_path,
+            name=name,
+            is_dir=is_dir,
+            size=stat_result.st_size,
+            mtime=stat_result.st_mtime,
+            mtime_ns=stat_result.st_mtime_ns,
+        )
+        parent = os.path.dirname(rel_path)
+        self._children.setdefault(parent, set()).add(name)
+        if is_dir:
+            if name in IGNORED_DIR_NAMES:
+                self._ignored_dirs.add(rel_path)
+            else:
+                self._children.setdefault(rel_path, set())
+        else:
+            for trigram in _trigrams(name.lower()):
+                self._trigram_index.setdefault(trigram, set()).add(rel_path)
+        self._joined_paths = None
+
+    def _remove_entry(self, rel_path: str) -> None:
+        """从索引中移除条目，目录会连同子项一起移除"""
+        entry = self._entries.pop(rel_path, None)
+        if entry is None:
+            return
+
+        parent_children = self._children.get(os.path.dirname(rel_path))
+        if parent_children is not None:
+            parent_children.discard(entry.name)
+
+        if entry.is_dir:
+            self._ignored_dirs.discard(rel_path)
+            self._unwatch_directory(rel_path)
+            for child_name in list(self._children.pop(rel_path, set())):
+                self._remove_entry(os.path.join(rel_path, child_name))
+        else:
+            for trigram in _trigrams(entry.name_lower):
+                paths = self._trigram_index.get(trigram)
+                if paths is not None:
+                    paths.discard(rel_path)
+                    if not paths:
+                        del self._trigram_index[trigram]
+        self._joined_paths = None
+
+    def _to_rel_path(self, abs_path) -> Optional[str]:
+        """将绝对路径转换为索引使用的相对路径，不在根目录下时返回 None"""
+        if isinstance(abs_path, bytes):
+            abs_path = os.fsdecode(abs_path)
+        rel_path = os.path.relpath(os.path.abspath(abs_path), self.root)
+        if rel_path == "." or rel_path.startswith(".."):
+            return None
+        return rel_path
+
+    def refresh_path(self, abs_path) -> None:
+        """根据磁盘上的最新状态刷新单个路径（文件系统事件回调使用）"""
+        rel_path = self._to_rel_path(abs_path)
+        if rel_path is None or is_ignored_path(rel_path):
+            return
+
+        with self._lock:
+            if not self._built:
+                return
+            try:
+                stat_result = os.lstat(os.path.join(self.root, rel_path))
+            except OSError:
+                self._remove_entry(rel_path)
+                return
+
+            is_dir = stat.S_ISDIR(stat_result.st_mode)
+            existing = self._entries.get(rel_path)
+            if existing and not existing.is_dir and not is_dir \
+                    and existing.mtime_ns == stat_result.st_mtime_ns and existing.size == stat_result.st_size:
+                return
+
+            # 确保父目录已在索引中
+            parent = os.path.dirname(rel_path)
+            if parent and parent not in self._entries:
+                self.refresh_path(os.path.join(self.root, parent))
+                # 扫描父目录时已经加入了当前路径
+                if rel_path in self._entries:
+                    return
+
+            if existing and existing.is_dir and is_dir:
+                # 目录元数据变化，只更新自身
+                existing.mtime = stat_result.st_mtime
+                existing.mtime_ns = stat_result.st_mtime_ns
+                return
+
+            self._add_entry(rel_path, os.path.basename(rel_path), is_dir, stat_result)
+            if is_dir and rel_path not in self._ignored_dirs:
+                # 新目录（或移动进来的目录）需要扫描其中的内容
+                self._scan_directory(rel_path)
+                self._watch_new_directory(rel_path)
+
+    def remove_path(self, abs_path) -> None:
+        """移除单个路径（文件系统事件回调使用）"""
+        rel_path = self._to_rel_path(abs_path)
+        if rel_path is None or is_ignored_path(rel_path):
+            return
+        with self._lock:
+            self._remove_entry(rel_path)
+
+    def _plan_watches(self) -> Tuple[Set[str], Set[str]]:
+        """
+        按忽略规则规划监听：忽略目录的各级祖先目录只监听自身，其余不含忽略目录的子树整体递归监听，
+        这样忽略目录中的内容不会被注册监听。
+
+        Returns:
+            Tuple[Set[str], Set[str]]: (只监听自身的目录, 递归监听的目录)
+        """
+        if not self._ignored_dirs:
+            return set(), {""}
+
+        shallow_dirs = {""}
+        for ignored_dir in self._ignored_dirs:
+            parent = os.path.dirname(ignored_dir)
+            while parent not in shallow_dirs:
+                shallow_dirs.add(parent)
+                parent = os.path.dirname(parent)
+
+        recursive_dirs = set()
+        for shallow_dir in shallow_dirs:
+            for child_name in self._children.get(shallow_dir, ()):
+                child_path = os.path.join(shallow_dir, child_name) if shallow_dir else child_name
+                entry = self._entries.get(child_path)
+                if entry and entry.is_dir and child_path not in shallow_dirs and child_path not in self._ignored_dirs:
+                    recursive_dirs.add(child_path)
+        return shallow_dirs, recursive_dirs
+
+    def _schedule_watch(self, rel_dir: str, recursive: bool) -> None:
+        """注册单个目录的监听"""
+        abs_dir = os.path.join(self.root, rel_dir) if rel_dir else self.root
+        self._watches[rel_dir] = self._observer.schedule(self._event_handler, abs_dir, recursive=recursive)
+        if not recursive:
+            self._shallow_watch_dirs.add(rel_dir)
+
+    def _unwatch_directory(self, rel_dir: str) -> None:
+        """目录被删除或移走时注销其监听"""
+        watch = self._watches.pop(rel_dir, None)
+        self._shallow_watch_dirs.discard(rel_dir)
+        if watch is None or self._observer is None:
+            return
+        try:
+            self._observer.unschedule(watch)
+        except Exception as e:
+            logger.debug(f"注销目录监听失败: {rel_dir}, 错误: {e}")
+
+    def _watch_new_directory(self, rel_dir: str) -> None:
+        """只监听自身的目录中新出现子目录时，为其注册递归监听"""
+        if not self._watching or os.path.dirname(rel_dir) not in self._shallow_watch_dirs or rel_dir in self._watches:
+            return
+        try:
+            self._schedule_watch(rel_dir, recursive=True)
+        except Exception as e:
+            logger.warning(f"监听新目录失败: {rel_dir}, 错误: {e}")
+
+    def _start_watching(self) -> None:
+        """启动 watchdog 监听，失败时退回到按 TTL 重新扫描"""
+        try:
+            self._observer = Observer()
+            self._observer.daemon = True
+            self._event_handler = _WorkspaceIndexEventHandler(self)
+            shallow_dirs, recursive_dirs = self._plan_watches()
+            if len(shallow_dirs) + len(recursive_dirs) > MAX_WATCHES:
+                # 忽略目录分布过散时，监听整个根目录，忽略目录中的事件由回调过滤
+                logger.info(f"工作区索引需要的监听数过多，改为监听整个根目录: {self.root}")
+                shallow_dirs, recursive_dirs = set(), {""}
+            for rel_dir in shallow_dirs:
+                self._schedule_watch(rel_dir, recursive=False)
+            for rel_dir in recursive_dirs:
+                self._schedule_watch(rel_dir, recursive=True)
+            self._observer.start()
+            self._watching = True
+            logger.info(f"工作区索引已开始监听目录变化: {self.root}，监听数: {len(self._watches)}")
+        except Exception as e:
+            logger.warning(f"工作区索引无法监听目录变化，将定期重新扫描: {self.root}, 错误: {e}")
+            self._stop_observer(self._detach_observer())
+            self._watch_failed = True
+
+    def _detach_observer(self) -> Optional[Observer]:
+        """清空监听记录，返回需要停止的 watchdog observer"""
+        observer = self._observer
+        self._observer = None
+        self._event_handler = None
+        self._watches.clear()
+        self._shallow_watch_dirs.clear()
+        self._watching = False
+        return observer
+
+    def _stop_observer(self, observer: Optional[Observer]) -> None:
+        """停止 watchdog observer"""
+        if observer is None:
+            return
+        try:
+            observer.stop()
+        except Exception as e:
+            logger.debug(f"停止目录监听失败: {self.root}, 错误: {e}")
+
+    def stop(self) -> None:
+        """停止监听"""
+        with self._lock:
+            observer = self._detach_observer()
+            self._built = False
+        # 在索引锁之外停止，避免与正在持有 observer 锁、等待索引锁的事件回调互相等待
+        self._stop_observer(observer)
+
+    # ---------- 查询 ----------
+
+    def get_entry(self, path: Path) -> Optional[IndexEntry]:
+        """获取路径对应的索引条目"""
+        rel_path = self._to_rel_path(str(path))
+        if rel_path is None:
+            return None
+        self.ensure_ready()
+        with self._lock:
+            return self._entries.get(rel_path)
+
+    def list_directory(self, path: Path) -> Optional[List[IndexEntry]]:
+        """列出目录下的子项，目录不在索引中（包括忽略目录及其内容）时返回 None"""
+        rel_path = "" if os.path.abspath(path) == self.root else self._to_rel_path(str(path))
+        if rel_path is None:
+            return None
+        self.ensure_ready()
+        with self._lock:
+            child_names = self._children.get(rel_path)
+            if child_names is None:
+                return None
+            return [
+                self._entries[os.path.join(rel_path, name) if rel_path else name]
+                for name in child_names
+                if (os.path.join(rel_path, name) if rel_path else name) in self._entries
+            ]
+
+    def _get_fresh_entry(self, path: Path, stat_result: Optional[os.stat_result]) -> Optional[IndexEntry]:
+        """获取与调用方 stat 结果一致的索引条目，文件变化事件尚未处理时返回 None"""
+        entry = self.get_entry(path)
+        if entry is None or entry.is_dir:
+            return None
+        if stat_result and (entry.mtime_ns != stat_result.st_mtime_ns or entry.size != stat_result.st_size):
+            return None
+        return entry
+
+    def get_line_count(self, path: Path, stat_result: Optional[os.stat_result] = None) -> Optional[int]:
+        """获取文件行数，结果缓存到索引条目中"""
+        entry = self._get_fresh_entry(path, stat_result)
+        if entry is None:
+            return count_file_lines(path, stat_result)
+        if not entry.line_count_ready:
+            entry.line_count = count_file_lines(path, stat_result)
+            entry.line_count_ready = True
+        return entry.line_count
+
+    def get_token_count(self, path: Path, stat_result: Optional[os.stat_result] = None) -> Optional[int]:
+        """获取文件 token 数，结果缓存到索引条目中"""
+        entry = self._get_fresh_entry(path, stat_result)
+        if entry is None:
+            return count_file_tokens(path)
+        if not entry.token_count_ready:
+            entry.token_count = count_file_tokens(path)
+            entry.token_count_ready = True
+        return entry.token_count
+
+    def search_files(self, query: str, limit: int = 10) -> List[IndexEntry]:
+        """
+        按文件名模糊搜索文件
+
+        1. 文件名包含查询串（支持 glob 通配符），完全匹配优先，其次文件名较短者优先
+        2. 结果不足时，补充相对路径按子序列匹配的结果，匹配跨度越小越优先（最多收集 SUBSEQUENCE_MAX_CANDIDATES 个候选）
+        """
+        self.ensure_ready()
+        query_lower = query.lower()
+        with self._lock:
+            matches = self._match_file_names(query_lower)
+            matches.sort(key=lambda e: (e.name_lower != query_lower, len(e.name), e.rel_path))
+            results = matches[:limit]
+
+            if len(results) < limit and query_lower.strip():
+                seen = {entry.rel_path for entry in results}
+                for entry in self._match_subsequence(query_lower):
+                    if entry.rel_path not in seen:
+                        results.append(entry)
+                        seen.add(entry.rel_path)
+                        if len(results) >= limit:
+                            break
+            return results
+
+    def _match_file_names(self, query_lower: str) -> List[IndexEntry]:
+        """文件名子串匹配，含通配符时退回 fnmatch"""
+        if any(ch in query_lower for ch in "*?["):
+            pattern = f"*{query_lower}*"
+            return [e for e in self._entries.values() if not e.is_dir and fnmatch.fnmatch(e.name_lower, pattern)]
+
+        if len(query_lower) < TRIGRAM_SIZE:
+            return [e for e in self._entries.values() if not e.is_dir and query_lower in e.name_lower]
+
+        # 取各 trigram 对应的候选集合求交集，从最小的集合开始
+        candidate_sets = []
+        for trigram in _trigrams(query_lower):
+            paths = self._trigram_index.get(trigram)
+            if not paths:
+                return []
+            candidate_sets.append(paths)
+        candidate_sets.sort(key=len)
+        candidates = set(candidate_sets[0])
+        for paths in candidate_sets[1:]:
+            candidates &= paths
+            if not candidates:
+                return []
+
+        return [
+            self._entries[rel_path] for rel_path in candidates
+            if query_lower in self._entries[rel_path].name_lower
+        ]
+
+    def _match_subsequence(self, query_lower: str) -> List[IndexEntry]:
+        """相对路径子序列匹配（如 "appmain" 匹配 "app/magic/main.py"）"""
+        if self._joined_paths is None:
+            self._joined_paths_list = sorted(rel for rel, e in self._entries.items() if not e.is_dir)
+            self._joined_offsets = []
+            offset = 0
+            for rel_path in self._joined_paths_list:
+                self._joined_offsets.append(offset)
+                offset += len(rel_path) + 1
+            self._joined_paths = "\n".join(self._joined_paths_list).lower()
+
+        chars = [ch for ch in query_lower if not ch.isspace()]
+        if not chars:
+            return []
+        # 字符之间允许任意非换行字符，保证匹配不跨越路径；
+        # 间隔字符类排除下一个待匹配字符，避免正则回溯
+        pattern = re.compile(re.escape(chars[0]) + "".join(
+            f"[^\\n{re.escape(ch)}]*{re.escape(ch)}" for ch in chars[1:]
+        ))
+
+        scored: List[Tuple[int, int, str]] = []
+        matched_lines = set()
+        for match in pattern.finditer(self._joined_paths):
+            line_index = bisect.bisect_right(self._joined_offsets, match.start()) - 1
+            if line_index in matched_lines:
+                continue
+            matched_lines.add(line_index)
+            rel_path = self._joined_paths_list[line_index]
+            scored.append((match.end() - match.start(), len(rel_path), rel_path))
+            if len(scored) >= SUBSEQUENCE_MAX_CANDIDATES:
+                break
+
+        scored.sort()
+        return [self._entries[rel_path] for _, _, rel_path in scored if rel_path in self._entries]
+
+
+class _WorkspaceIndexEventHandler(FileSystemEventHandler):
+    """将 watchdog 文件系统事件同步到工作区索引"""
+
+    def __init__(self, index: WorkspaceIndex):
+        super().__init__()
+        self.index = index
+
+    def on_created(self, event: FileSystemEvent) -> None:
+        self.index.refresh_path(event.src_path)
+
+    def on_modified(self, event: FileSystemEvent) -> None:
+        self.index.refresh_path(event.src_path)
+
+    def on_deleted(self, event: FileSystemEvent) -> None:
+        self.index.remove_path(event.src_path)
+
+    def on_moved(self, event: FileSystemEvent) -> None:
+        self.index.remove_path(event.src_path)
+        self.index.refresh_path(event.dest_path)
+
+
+class WorkspaceIndexService:
+    """
+    工作区索引服务，按根目录维护共享的 WorkspaceIndex 实例
+    """
+    _indexes: Dict[str, WorkspaceIndex] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_index(cls, root: Path) -> WorkspaceIndex:
+        """获取指定根目录的索引实例（不存在时创建）"""
+        key = os.path.abspath(root)
+        with cls._lock:
+            index = cls._indexes.get(key)
+            if index is None:
+                index = WorkspaceIndex(Path(key))
+                cls._indexes[key] = index
+            return index
+
+    @classmethod
+    def stop_all(cls) -> None:
+        """停止所有索引的监听"""
+        with cls._lock:
+            for index in cls._indexes.values():
+                index.stop()
+            cls._indexes.clear()
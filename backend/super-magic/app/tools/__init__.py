@@ -2,37 +2,85 @@
 
 包含各种可供智能体使用的工具。
 """
-# 导出工具类
-from app.tools.abstract_file_tool import AbstractFileTool
-from app.tools.append_to_file import AppendToFile
-from app.tools.ask_user import AskUser
-from app.tools.call_agent import CallAgent
-from app.tools.convert_pdf import ConvertPdf
+import importlib
+from typing import TYPE_CHECKING
+
 from app.tools.core import BaseTool, BaseToolParams, tool, tool_factory
-from app.tools.deep_write import DeepWrite
-from app.tools.delete_file import DeleteFile
-from app.tools.download_from_url import DownloadFromUrl
-from app.tools.file_search import FileSearch
-from app.tools.finish_task import FinishTask
-from app.tools.generate_image import GenerateImage
-from app.tools.get_js_cdn_address import GetJsCdnAddress
-from app.tools.grep_search import GrepSearch
-from app.tools.image_search import ImageSearch
-from app.tools.list_dir import ListDir
-from app.tools.markitdown_plugins import excel_plugin, pdf_plugin
-from app.tools.python_execute import PythonExecute
 
-# 导出工具类
-from app.tools.read_file import ReadFile
-from app.tools.read_files import ReadFiles
-from app.tools.replace_in_file import ReplaceInFile
-from app.tools.shell_exec import ShellExec
-from app.tools.thinking import Thinking
-from app.tools.use_browser import UseBrowser
-from app.tools.visual_understanding import VisualUnderstanding
-from app.tools.web_search import WebSearch
-from app.tools.write_to_file import WriteToFile
-from app.tools.yfinance_tool import YFinance
+if TYPE_CHECKING:
+    from app.tools.abstract_file_tool import AbstractFileTool
+    from app.tools.append_to_file import AppendToFile
+    from app.tools.ask_user import AskUser
+    from app.tools.call_agent import CallAgent
+    from app.tools.convert_pdf import ConvertPdf
+    from app.tools.deep_write import DeepWrite
+    from app.tools.delete_file import DeleteFile
+    from app.tools.download_from_url import DownloadFromUrl
+    from app.tools.file_search import FileSearch
+    from app.tools.finish_task import FinishTask
+    from app.tools.generate_image import GenerateImage
+    from app.tools.get_js_cdn_address import GetJsCdnAddress
+    from app.tools.grep_search import GrepSearch
+    from app.tools.image_search import ImageSearch
+    from app.tools.list_dir import ListDir
+    from app.tools.markitdown_plugins import excel_plugin, pdf_plugin
+    from app.tools.python_execute import PythonExecute
+    from app.tools.read_file import ReadFile
+    from app.tools.read_files import ReadFiles
+    from app.tools.replace_in_file import ReplaceInFile
+    from app.tools.shell_exec import ShellExec
+    from app.tools.thinking import Thinking
+    from app.tools.use_browser import UseBrowser
+    from app.tools.visual_understanding import VisualUnderstanding
+    from app.tools.web_search import WebSearch
+    from app.tools.write_to_file import WriteToFile
+    from app.tools.yfinance_tool import YFinance
+
+# 工具类按需导出：导入 app.tools 时不再加载全部工具模块（及 markitdown、浏览器、yfinance 等依赖）
+# 名称 -> (模块, 属性名)，属性名为 None 时导出模块本身
+_LAZY_EXPORTS = {
+    "AbstractFileTool": ("app.tools.abstract_file_tool", "AbstractFileTool"),
+    "AppendToFile": ("app.tools.append_to_file", "AppendToFile"),
+    "AskUser": ("app.tools.ask_user", "AskUser"),
+    "CallAgent": ("app.tools.call_agent", "CallAgent"),
+    "ConvertPdf": ("app.tools.convert_pdf", "ConvertPdf"),
+    "DeepWrite": ("app.tools.deep_write", "DeepWrite"),
+    "DeleteFile": ("app.tools.delete_file", "DeleteFile"),
+    "DownloadFromUrl": ("app.tools.download_from_url", "DownloadFromUrl"),
+    "FileSearch": ("app.tools.file_search", "FileSearch"),
+    "FinishTask": ("app.tools.finish_task", "FinishTask"),
+    "GenerateImage": ("app.tools.generate_image", "GenerateImage"),
+    "GetJsCdnAddress": ("app.tools.get_js_cdn_address", "GetJsCdnAddress"),
+    "GrepSearch": ("app.tools.grep_search", "GrepSearch"),
+    "ImageSearch": ("app.tools.image_search", "ImageSearch"),
+    "ListDir": ("app.tools.list_dir", "ListDir"),
+    "excel_plugin": ("app.tools.markitdown_plugins.excel_plugin", None),
+    "pdf_plugin": ("app.tools.markitdown_plugins.pdf_plugin", None),
+    "PythonExecute": ("app.tools.python_execute", "PythonExecute"),
+    "ReadFile": ("app.tools.read_file", "ReadFile"),
+    "ReadFiles": ("app.tools.read_files", "ReadFiles"),
+    "ReplaceInFile": ("app.tools.replace_in_file", "ReplaceInFile"),
+    "ShellExec": ("app.tools.shell_exec", "ShellExec"),
+    "Thinking": ("app.tools.thinking", "Thinking"),
+    "UseBrowser": ("app.tools.use_browser", "UseBrowser"),
+    "VisualUnderstanding": ("app.tools.visual_understanding", "VisualUnderstanding"),
+    "WebSearch": ("app.tools.web_search", "WebSearch"),
+    "WriteToFile": ("app.tools.write_to_file", "WriteToFile"),
+    "YFinance": ("app.tools.yfinance_tool", "YFinance"),
+}
+
+
+def __getattr__(name: str):
+    """首次访问时导入工具类"""
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    module_name, attr_name = _LAZY_EXPORTS[name]
+    module = importlib.import_module(module_name)
+    value = getattr(module, attr_name) if attr_name else module
+    globals()[name] = value
+    return value
+
 
 __all__ = [
     # 核心组件
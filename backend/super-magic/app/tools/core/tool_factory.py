@@ -1,6 +1,7 @@
 """工具工厂模块
 
-负责工具的自动发现、注册和创建
+负责工具的自动发现、注册和创建。
+启用按需导入时，工厂优先根据工具清单注册工具并提供 LLM 工具定义，工具模块在首次获取实例时才导入。
 """
 
 import importlib
@@ -10,12 +11,14 @@ import os
 import pkgutil
 import time
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Type, TypeVar
+from typing import Any, Dict, List, Optional, Type, TypeVar
 
+from agentlang.config.config import config
 from agentlang.context.tool_context import ToolContext
 from agentlang.logger import get_logger
 from agentlang.tools.tool_result import ToolResult
 from app.tools.core import BaseTool
+from app.tools.core.tool_manifest import compute_tools_fingerprint, load_tool_manifest, save_tool_manifest
 
 logger = get_logger(__name__)
 
@@ -26,8 +29,8 @@ T = TypeVar('T', bound=BaseTool)
 @dataclass
 class ToolInfo:
     """工具信息类，存储工具的元数据和类型信息"""
-    # 工具类
-    tool_class: Type[BaseTool]
+    # 工具类（从清单注册且尚未导入时为None）
+    tool_class: Optional[Type[BaseTool]]
     # 工具名称
     name: str
     # 工具描述
@@ -36,10 +39,20 @@ class ToolInfo:
     params_class: Optional[Type] = None
     # 错误信息（如果注册过程中发生错误）
     error: Optional[str] = None
+    # 工具类所在模块（从清单注册时使用）
+    module: Optional[str] = None
+    # 工具类名（从清单注册时使用）
+    class_name: Optional[str] = None
+    # LLM 工具定义，即工具实例 to_param() 的结果（从清单注册时使用）
+    tool_param: Optional[Dict[str, Any]] = None
+    # 工具类是否重写了 is_available，为 False 时无需导入即可判定可用（从清单注册时使用）
+    has_availability_check: bool = True
+    # 工具类是否重写了 get_prompt_hint，为 False 时提示为空（从清单注册时使用）
+    has_prompt_hint: bool = True
 
     def __post_init__(self):
         """验证创建的工具信息对象"""
-        if not self.tool_class:
+        if not self.tool_class and not (self.module and self.class_name):
             raise ValueError("工具类不能为空")
         if not self.name:
             raise ValueError("工具名称不能为空")
@@ -48,6 +61,10 @@ class ToolInfo:
         """检查工具信息是否有效"""
         return self.error is None
 
+    def is_loaded(self) -> bool:
+        """检查工具类是否已导入"""
+        return self.tool_class is not None
+
 
 class ToolFactory:
     """工具工厂
@@ -68,6 +85,7 @@ class ToolFactory:
 
         self._tools: Dict[str, ToolInfo] = {}  # 工具信息字典：name -> ToolInfo对象
         self._tool_instances: Dict[str, BaseTool] = {}  # 工具实例缓存：name -> instance
+        self._full_scan_done = False  # 是否已经完整扫描过工具包，按需导入失败时最多退回完整扫描一次
         self._initialized = True
 
     def register_tool(self, tool_class: Type[BaseTool]) -> None:
@@ -114,18 +132,21 @@ class ToolFactory:
                 error=str(e)
             )
 
+    def _get_tool_package_names(self) -> List[str]:
+        """获取需要扫描的工具包名列表 (app.tools 及 agentlang.tools 入口点声明的包)"""
+        package_names = ['app.tools']
+        for entry_point in importlib.metadata.entry_points(group='agentlang.tools'):
+            package_names.append(entry_point.value)
+            logger.info(f"发现工具包: {entry_point.value}")
+        return package_names
+
     def auto_discover_tools(self) -> None:
         """自动发现并注册工具
 
         扫描app.tools包下的所有模块，查找并注册所有通过@tool装饰的工具类
         """
-        # 获取工具包路径
-        package_name = 'app.tools'
-        tools_entry_points = list(importlib.metadata.entry_points(group='agentlang.tools'))
-        package_names = [package_name]
-        for entry_point in tools_entry_points:
-            package_names.append(entry_point.value)
-            logger.info(f"发现工具包: {entry_point.value}")
+        self._full_scan_done = True
+        package_names = self._get_tool_package_names()
         try:
             # 定义一个递归扫描函数
             def scan_package(pkg_name: str, pkg_path: str) -> None:
@@ -190,9 +211,121 @@ class ToolFactory:
             logger.error(f"扫描工具时发生错误: {e!s}", exc_info=True)
 
     def initialize(self) -> None:
-        """初始化工厂，扫描和注册所有工具"""
+        """初始化工厂，扫描和注册所有工具
+
+        启用按需导入 (tools.lazy_discovery) 时，优先从工具清单注册；
+        清单不存在或已过期时完整扫描一次并重新生成清单。
+        """
+        if not config.get("tools.lazy_discovery", True):
+            self.auto_discover_tools()
+            logger.info(f"工具工厂初始化完成，共发现 {len(self._tools)} 个工具")
+            return
+
+        fingerprint = compute_tools_fingerprint(self._get_tool_package_names())
+        if self._register_from_manifest(fingerprint):
+            logger.info(f"工具工厂已从清单注册 {len(self._tools)} 个工具，工具模块将在首次使用时导入")
+            return
+
         self.auto_discover_tools()
         logger.info(f"工具工厂初始化完成，共发现 {len(self._tools)} 个工具")
+        self._save_manifest(fingerprint)
+
+    def _register_from_manifest(self, fingerprint: str) -> bool:
+        """根据工具清单注册工具，不导入工具模块
+
+        Args:
+            fingerprint: 当前工具源码指纹
+
+        Returns:
+            bool: 是否注册成功
+        """
+        manifest_tools = load_tool_manifest(fingerprint)
+        if not manifest_tools:
+            return False
+
+        try:
+            tools = {
+                tool_name: ToolInfo(
+                    tool_class=None,
+                    name=tool_name,
+                    description=entry.get("description") or "",
+                    module=entry["module"],
+                    class_name=entry["class_name"],
+                    tool_param=entry.get("tool_param"),
+                    has_availability_check=bool(entry.get("has_availability_check", True)),
+                    has_prompt_hint=bool(entry.get("has_prompt_hint", True))
+                )
+                for tool_name, entry in manifest_tools.items()
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"工具清单内容无效，将重新扫描工具: {e!s}")
+            return False
+
+        for tool_name, tool_info in tools.items():
+            # 已经导入注册过的工具保持不变
+            self._tools.setdefault(tool_name, tool_info)
+        return True
+
+    def _save_manifest(self, fingerprint: str) -> None:
+        """根据已注册的工具生成工具清单
+
+        Args:
+            fingerprint: 扫描时的工具源码指纹
+        """
+        manifest_tools = {}
+        for tool_name, tool_info in self._tools.items():
+            if not tool_info.is_valid() or not tool_info.is_loaded():
+                continue
+
+            tool_class = tool_info.tool_class
+            tool_param = None
+            try:
+                tool_param = self.get_tool_instance(tool_name).to_param()
+            except Exception as e:
+                logger.warning(f"生成工具 {tool_name} 的 LLM 工具定义失败: {e!s}")
+
+            manifest_tools[tool_name] = {
+                "module": tool_class.__module__,
+                "class_name": tool_class.__name__,
+                "description": tool_info.description,
+                "tool_param": tool_param,
+                "has_availability_check": tool_class.is_available is not BaseTool.is_available,
+                "has_prompt_hint": tool_class.get_prompt_hint is not BaseTool.get_prompt_hint,
+            }
+
+        if manifest_tools:
+            save_tool_manifest(manifest_tools, fingerprint)
+
+    def _load_tool_class(self, tool_info: ToolInfo) -> Optional[ToolInfo]:
+        """导入从清单注册的工具模块，并用实际的工具类重新注册
+
+        Args:
+            tool_info: 尚未导入的工具信息
+
+        Returns:
+            Optional[ToolInfo]: 导入后的工具信息
+        """
+        logger.info(f"按需导入工具模块: {tool_info.module}")
+        try:
+            module = importlib.import_module(tool_info.module)
+            tool_class = getattr(module, tool_info.class_name)
+        except Exception as e:
+            error = f"按需导入工具 {tool_info.name} 失败: {e!s}"
+            if not self._full_scan_done:
+                # 清单与源码不一致时退回完整扫描，每个进程最多一次
+                logger.error(f"{error}，将完整扫描工具")
+                self.auto_discover_tools()
+            else:
+                logger.error(error)
+            loaded_info = self._tools.get(tool_info.name)
+            if loaded_info and loaded_info.is_loaded():
+                return loaded_info
+            # 记录失败原因，之后获取该工具时直接报错，不再重复导入或扫描
+            tool_info.error = error
+            return None
+
+        self.register_tool(tool_class)
+        return self._tools.get(tool_info.name)
 
     def get_tool(self, tool_name: str) -> Optional[ToolInfo]:
         """获取工具信息
@@ -226,6 +359,14 @@ class ToolFactory:
         if not tool_info:
             raise ValueError(f"工具 {tool_name} 不存在")
 
+        # 从清单注册的工具在首次使用时导入，之前导入失败过的直接报错
+        if not tool_info.is_loaded():
+            if tool_info.error:
+                raise ValueError(f"工具 {tool_name} 不可用: {tool_info.error}")
+            tool_info = self._load_tool_class(tool_info)
+            if not tool_info or not tool_info.is_loaded():
+                raise ValueError(f"工具 {tool_name} 不存在")
+
         # 创建工具实例
         try:
             # 获取类属性
@@ -243,6 +384,56 @@ class ToolFactory:
             logger.error(f"创建工具 {tool_name} 实例时出错: {e}")
             raise ValueError(f"无法创建工具 {tool_name} 的实例: {e}")
 
+    def get_tool_param(self, tool_name: str) -> Dict[str, Any]:
+        """获取工具的 LLM 工具定义
+
+        已创建实例的工具使用实例生成；从清单注册且尚未导入的工具直接使用清单中的定义，不导入工具模块。
+
+        Args:
+            tool_name: 工具名称
+
+        Returns:
+            Dict[str, Any]: 函数调用格式的工具描述
+        """
+        if tool_name not in self._tool_instances:
+            tool_info = self.get_tool(tool_name)
+            if tool_info and not tool_info.is_loaded() and tool_info.tool_param:
+                return tool_info.tool_param
+        return self.get_tool_instance(tool_name).to_param()
+
+    def is_tool_available(self, tool_name: str) -> bool:
+        """检查工具是否可用，工具类没有自定义可用性检查时不导入工具模块
+
+        Args:
+            tool_name: 工具名称
+
+        Returns:
+            bool: 工具是否可用
+
+        Raises:
+            ValueError: 工具不存在或无法导入
+        """
+        tool_info = self.get_tool(tool_name)
+        if not tool_info:
+            raise ValueError(f"工具 {tool_name} 不存在")
+        if not tool_info.is_loaded() and not tool_info.error and not tool_info.has_availability_check:
+            return True
+        return self.get_tool_instance(tool_name).is_available()
+
+    def get_tool_prompt_hint(self, tool_name: str) -> str:
+        """获取工具附加到主 Prompt 的提示信息，工具类没有自定义提示时不导入工具模块
+
+        Args:
+            tool_name: 工具名称
+
+        Returns:
+            str: 提示信息，没有时为空字符串
+        """
+        tool_info = self.get_tool(tool_name)
+        if tool_info and not tool_info.is_loaded() and not tool_info.error and not tool_info.has_prompt_hint:
+            return ""
+        return self.get_tool_instance(tool_name).get_prompt_hint()
+
     def get_all_tools(self) -> Dict[str, ToolInfo]:
         """获取所有工具信息
 
@@ -0,0 +1,127 @@
+"""工具清单模块
+
+负责生成、校验和读取工具清单 (工具名称 -> 模块、类名、描述、LLM 工具定义)。
+ToolFactory 借助清单在不导入工具模块的情况下完成注册并生成 LLM 工具定义，工具模块在首次调用时才导入。
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from agentlang.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 清单格式版本，格式变化时递增以使旧清单失效
+TOOL_MANIFEST_VERSION = 2
+
+# 清单文件默认位置：与本模块同目录
+DEFAULT_TOOL_MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tool_manifest.json")
+
+
+def get_package_path(package_name: str) -> Optional[str]:
+    """获取包所在目录，不执行包内模块
+
+    Args:
+        package_name: 包名
+
+    Returns:
+        Optional[str]: 包目录，找不到时返回 None
+    """
+    try:
+        spec = importlib.util.find_spec(package_name)
+    except (ImportError, ValueError) as e:
+        logger.warning(f"查找工具包 {package_name} 失败: {e!s}")
+        return None
+    if not spec or not spec.submodule_search_locations:
+        return None
+    return list(spec.submodule_search_locations)[0]
+
+
+def compute_tools_fingerprint(package_names: List[str]) -> str:
+    """计算工具包源码指纹
+
+    对所有工具包下的 .py 文件内容计算哈希，任意工具源码变化都会使指纹变化。
+
+    Args:
+        package_names: 工具包名列表
+
+    Returns:
+        str: 指纹
+    """
+    digest = hashlib.sha256()
+    for package_name in package_names:
+        digest.update(package_name.encode("utf-8"))
+        package_path = get_package_path(package_name)
+        if not package_path:
+            continue
+        for root, dirs, files in os.walk(package_path):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            for file_name in sorted(files):
+                if not file_name.endswith(".py"):
+                    continue
+                file_path = os.path.join(root, file_name)
+                digest.update(os.path.relpath(file_path, package_path).encode("utf-8"))
+                try:
+                    with open(file_path, "rb") as f:
+                        digest.update(f.read())
+                except OSError as e:
+                    logger.warning(f"读取工具源码 {file_path} 失败: {e!s}")
+    return digest.hexdigest()
+
+
+def load_tool_manifest(fingerprint: str, manifest_path: str = DEFAULT_TOOL_MANIFEST_PATH) -> Optional[Dict[str, Dict[str, Any]]]:
+    """读取工具清单
+
+    Args:
+        fingerprint: 当前工具源码指纹
+        manifest_path: 清单文件路径
+
+    Returns:
+        Optional[Dict[str, Dict[str, Any]]]: 工具名称 -> 清单条目，清单不存在或已过期时返回 None
+    """
+    if not os.path.exists(manifest_path):
+        return None
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"读取工具清单 {manifest_path} 失败: {e!s}")
+        return None
+
+    if manifest.get("version") != TOOL_MANIFEST_VERSION or manifest.get("fingerprint") != fingerprint:
+        logger.info("工具清单已过期，将重新扫描工具")
+        return None
+
+    tools = manifest.get("tools")
+    if not isinstance(tools, dict) or not tools:
+        return None
+    return tools
+
+
+def save_tool_manifest(tools: Dict[str, Dict[str, Any]], fingerprint: str,
+                       manifest_path: str = DEFAULT_TOOL_MANIFEST_PATH) -> None:
+    """保存工具清单
+
+    Args:
+        tools: 工具名称 -> 清单条目 (module, class_name, description, tool_param,
+            has_availability_check, has_prompt_hint)
+        fingerprint: 生成清单时的工具源码指纹
+        manifest_path: 清单文件路径
+    """
+    manifest = {
+        "version": TOOL_MANIFEST_VERSION,
+        "fingerprint": fingerprint,
+        "tools": tools,
+    }
+    temp_path = f"{manifest_path}.tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, manifest_path)
+        logger.info(f"工具清单已保存到: {manifest_path}，共 {len(tools)} 个工具")
+    except OSError as e:
+        logger.warning(f"保存工具清单到 {manifest_path} 失败: {e!s}")
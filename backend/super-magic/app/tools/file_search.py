@@ -1,6 +1,6 @@
-import fnmatch
+import asyncio
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict
 
 from pydantic import Field
 
@@ -8,6 +8,7 @@ from agentlang.context.tool_context import ToolContext
 from agentlang.logger import get_logger
 from agentlang.tools.tool_result import ToolResult
 from agentlang.utils.schema import FileInfo
+from app.service.workspace_index_service import WorkspaceIndexService
 from app.tools.core import BaseToolParams, tool
 from app.tools.workspace_guard_tool import WorkspaceGuardTool
 
@@ -39,8 +40,8 @@ class FileSearch(WorkspaceGuardTool[FileSearchParams]):
         Returns:
             ToolResult: 包含搜索结果
         """
-        # 调用_run方法获取结果
-        result = self._run(params.query)
+        # 调用_run方法获取结果（首次查询需要建立索引，放到线程中执行）
+        result = await asyncio.to_thread(self._run, params.query)
 
         # 返回ToolResult
         return ToolResult(content=result)
@@ -48,32 +49,26 @@ class FileSearch(WorkspaceGuardTool[FileSearchParams]):
     def _run(self, query: str) -> str:
         """运行工具并返回搜索结果"""
         try:
-            # 获取所有文件路径
-            all_files = self._get_all_files(self.base_dir)
-
-            # 使用模糊匹配过滤文件
-            matches = self._fuzzy_match(all_files, query)
-
-            # 限制结果数量
-            matches = matches[:10]
+            # 从共享的工作区文件索引中查询，限制结果数量
+            index = WorkspaceIndexService.get_index(self.base_dir)
+            matches = index.search_files(query, limit=10)
 
             if not matches:
                 return "未找到匹配的文件"
 
             # 格式化输出
             output = ["找到以下匹配的文件：\n"]
-            for file_path in matches:
-                stat = file_path.stat()
-                rel_path = str(file_path.relative_to(self.base_dir))
+            for entry in matches:
+                file_path = Path(index.root) / entry.rel_path
 
                 # 创建 FileInfo 对象
                 file_info = FileInfo(
-                    name=file_path.name,
-                    path=rel_path,
+                    name=entry.name,
+                    path=entry.rel_path,
                     is_dir=False,
-                    size=stat.st_size,
-                    last_modified=stat.st_mtime,
-                    line_count=self._count_lines(file_path)
+                    size=entry.size,
+                    last_modified=entry.mtime,
+                    line_count=index.get_line_count(file_path)
                     if file_path.suffix in [".py", ".js", ".ts", ".jsx", ".tsx", ".vue", ".md", ".txt"]
                     else None,
                 )
@@ -89,39 +84,6 @@ class FileSearch(WorkspaceGuardTool[FileSearchParams]):
             logger.error(f"执行文件搜索时出错: {e}", exc_info=True)
             return f"执行文件搜索时出错: {e!s}"
 
-    def _get_all_files(self, directory: Path) -> List[Path]:
-        """递归获取目录下的所有文件"""
-        files = []
-        try:
-            for item in directory.rglob("*"):
-                if item.is_file():
-                    files.append(item)
-        except Exception as e:
-            logger.warning(f"获取文件列表时出错: {e}")
-        return files
-
-    def _fuzzy_match(self, files: List[Path], pattern: str) -> List[Path]:
-        """使用模糊匹配过滤文件"""
-        # 将模式转换为通配符模式
-        wildcard_pattern = f"*{pattern}*"
-
-        # 过滤匹配的文件
-        matches = []
-        for file in files:
-            if fnmatch.fnmatch(file.name.lower(), wildcard_pattern.lower()):
-                matches.append(file)
-
-        # 按相关性排序（完全匹配优先，然后是文件名长度）
-        matches.sort(
-            key=lambda x: (
-                x.name.lower() != pattern.lower(),  # 完全匹配优先
-                len(x.name),  # 较短的文件名优先
-                str(x),  # 按路径字母顺序
-            )
-        )
-
-        return matches
-
     def _format_size(self, size: int) -> str:
         """格式化文件大小"""
         for unit in ["B", "KB", "MB", "GB"]:
@@ -130,14 +92,6 @@ class FileSearch(WorkspaceGuardTool[FileSearchParams]):
             size /= 1024
         return f"{size:.1f}TB"
 
-    def _count_lines(self, file_path: Path) -> int:
-        """计算文件行数"""
-        try:
-            with file_path.open("r", encoding="utf-8") as f:
-                return sum(1 for _ in f)
-        except:
-            return None
-
     async def get_after_tool_call_friendly_action_and_remark(self, tool_name: str, tool_context: ToolContext, result: ToolResult, execution_time: float, arguments: Dict[str, Any] = None) -> Dict:
         """
         获取工具调用后的友好动作和备注
@@ -1,4 +1,6 @@
-import subprocess
+import asyncio
+import json
+from contextlib import suppress
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -7,12 +9,20 @@ from pydantic import Field
 from agentlang.context.tool_context import ToolContext
 from agentlang.logger import get_logger
 from agentlang.tools.tool_result import ToolResult
+from agentlang.utils.file import count_file_lines
 from agentlang.utils.schema import FileInfo
 from app.tools.core import BaseToolParams, tool
 from app.tools.workspace_guard_tool import WorkspaceGuardTool
 
 logger = get_logger(__name__)
 
+# 匹配项数量上限
+MAX_MATCHES = 50
+# ripgrep 单行 JSON 输出的读取上限，超长行（如压缩后的 js）也需要能完整读取
+RG_OUTPUT_LINE_LIMIT = 16 * 1024 * 1024
+# 终止 ripgrep 后等待其退出的最长时间（秒）
+RG_EXIT_WAIT_TIMEOUT = 5
+
 
 class GrepSearchParams(BaseToolParams):
     """搜索参数"""
@@ -53,7 +63,7 @@ class GrepSearch(WorkspaceGuardTool[GrepSearchParams]):
             ToolResult: 包含搜索结果或错误信息
         """
         # 调用内部方法获取结果
-        result = self._run(
+        result = await self._run(
             query=params.query,
             case_sensitive=params.case_sensitive,
             include_pattern=params.include_pattern,
@@ -63,86 +73,156 @@ class GrepSearch(WorkspaceGuardTool[GrepSearchParams]):
         # 返回ToolResult
         return ToolResult(content=result)
 
-    def _run(self, query: str, case_sensitive: Optional[bool] = None,
-             include_pattern: Optional[str] = None,
-             exclude_pattern: Optional[str] = None) -> str:
-        """运行工具并返回搜索结果"""
-        try:
-            # 构建 ripgrep 命令
-            cmd = ["rg", "--line-number", "--max-count", "50", "--json"]
+    async def _run(self, query: str, case_sensitive: Optional[bool] = None,
+                   include_pattern: Optional[str] = None,
+                   exclude_pattern: Optional[str] = None) -> str:
+        """运行工具并返回搜索结果
+
+        以异步子进程运行 ripgrep 并逐行解析 JSON 输出，达到匹配上限后立即终止进程，
+        任务被取消时同样会终止 ripgrep 进程。
+        """
+        # 构建 ripgrep 命令
+        cmd = ["rg", "--line-number", "--max-count", str(MAX_MATCHES), "--json"]
 
-            # 添加大小写敏感选项
-            if case_sensitive is not None:
-                if not case_sensitive:
-                    cmd.append("--ignore-case")
+        # 添加大小写敏感选项
+        if case_sensitive is not None:
+            if not case_sensitive:
+                cmd.append("--ignore-case")
 
-            # 添加包含模式
-            if include_pattern:
-                cmd.extend(["--glob", include_pattern])
+        # 添加包含模式
+        if include_pattern:
+            cmd.extend(["--glob", include_pattern])
 
-            # 添加排除模式
-            if exclude_pattern:
-                cmd.extend(["--glob", f"!{exclude_pattern}"])
+        # 添加排除模式
+        if exclude_pattern:
+            cmd.extend(["--glob", f"!{exclude_pattern}"])
 
-            # 添加搜索模式和目录
-            cmd.extend([query, str(self.base_dir)])
+        # 添加搜索模式和目录，使用 -e 避免以 - 开头的模式被当作选项
+        cmd.extend(["-e", query, str(self.base_dir)])
 
+        process = None
+        stderr_task = None
+        try:
             # 执行命令
-            process = subprocess.run(cmd, capture_output=True, text=True, cwd=str(self.base_dir))
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=str(self.base_dir),
+                limit=RG_OUTPUT_LINE_LIMIT,
+            )
+            # 并发读取 stderr，避免 stderr 缓冲区写满阻塞 ripgrep
+            stderr_task = asyncio.create_task(process.stderr.read())
+
+            matches, truncated = await self._collect_matches(process.stdout)
+
+            if truncated:
+                # 已达到匹配上限，无需等待 ripgrep 搜索完剩余文件
+                self._terminate_process(process)
+            returncode = await process.wait()
+            stderr = (await stderr_task).decode("utf-8", errors="replace").strip()
+            stderr_task = None
 
             # 处理结果
-            if process.returncode == 0 or process.returncode == 1:  # 1 表示没有匹配
-                output = process.stdout.strip()
-                if not output:
-                    return "未找到匹配项"
-
-                # 解析 JSON 输出并按文件分组
-                matches = self._parse_ripgrep_output(output)
-                if not matches:
-                    return "未找到匹配项"
-
-                # 格式化输出
-                return self._format_matches(matches)
-            else:
-                error_msg = process.stderr.strip()
-                logger.error(f"ripgrep 搜索失败: {error_msg}")
-                return f"搜索执行失败: {error_msg}"
+            if not truncated and returncode not in (0, 1):  # 1 表示没有匹配
+                logger.error(f"ripgrep 搜索失败: {stderr}")
+                return f"搜索执行失败: {stderr}"
+
+            if not matches:
+                return "未找到匹配项"
+
+            # 格式化输出（涉及 stat 和行数统计，放到线程中执行）
+            result = await asyncio.to_thread(self._format_matches, matches)
+            if truncated:
+                result += f"\n\n（已达到 {MAX_MATCHES} 个匹配项上限，结果已截断，请缩小搜索范围）"
+            return result
 
         except FileNotFoundError:
             return "错误：未找到 ripgrep (rg) 命令。请确保已安装 ripgrep。"
+        except asyncio.CancelledError:
+            logger.info("grep_search 已取消，终止 ripgrep 进程")
+            raise
         except Exception as e:
             logger.error(f"执行搜索时出错: {e}", exc_info=True)
             return f"执行搜索时出错: {e!s}"
+        finally:
+            if process is not None and process.returncode is None:
+                await self._terminate_and_wait(process)
+            if stderr_task is not None:
+                # 提前返回或出错时 stderr 未被读取，取消读取任务并等待其结束
+                stderr_task.cancel()
+                with suppress(asyncio.CancelledError, Exception):
+                    await stderr_task
+
+    async def _collect_matches(self, stdout: asyncio.StreamReader) -> Tuple[Dict[Path, List[Tuple[int, str]]], bool]:
+        """逐行读取 ripgrep 的 JSON 输出，按文件分组
 
-    def _parse_ripgrep_output(self, output: str) -> Dict[Path, List[Tuple[int, str]]]:
-        """解析 ripgrep 的 JSON 输出"""
-        import json
-
-        matches = {}
-        for line in output.splitlines():
+        Returns:
+            Tuple: (匹配结果, 是否因达到匹配上限而截断)
+        """
+        matches: Dict[Path, List[Tuple[int, str]]] = {}
+        match_count = 0
+        while True:
             try:
-                data = json.loads(line)
-                if data.get("type") == "match":
-                    path = Path(data["data"]["path"]["text"])
-                    line_number = data["data"]["line_number"]
-                    content = data["data"]["lines"]["text"].strip()
-
-                    if path not in matches:
-                        matches[path] = []
-                    matches[path].append((line_number, content))
-            except json.JSONDecodeError:
+                line = await stdout.readline()
+            except ValueError:
+                # 单行输出超过 RG_OUTPUT_LINE_LIMIT 时 StreamReader 会丢弃已缓冲的部分并抛出异常，跳过该行，
+                # 该行剩余的部分会作为无法解析的行在下一次读取时被忽略
+                logger.warning(f"ripgrep 输出行超过 {RG_OUTPUT_LINE_LIMIT} 字节，已跳过")
                 continue
-            except KeyError:
+            if not line:
+                return matches, False
+
+            match = self._parse_ripgrep_line(line)
+            if not match:
                 continue
 
-        return matches
+            path, line_number, content = match
+            matches.setdefault(path, []).append((line_number, content))
+            match_count += 1
+            if match_count >= MAX_MATCHES:
+                return matches, True
+
+    def _parse_ripgrep_line(self, line: bytes) -> Optional[Tuple[Path, int, str]]:
+        """解析 ripgrep 的一行 JSON 输出，只返回 match 类型的记录"""
+        try:
+            data = json.loads(line)
+            if data.get("type") != "match":
+                return None
+            path = Path(data["data"]["path"]["text"])
+            line_number = data["data"]["line_number"]
+            content = data["data"]["lines"]["text"].strip()
+            return path, line_number, content
+        except (json.JSONDecodeError, KeyError, TypeError):
+            # 非 UTF-8 路径或内容会以 bytes 字段返回，直接跳过
+            return None
+
+    @staticmethod
+    def _terminate_process(process: asyncio.subprocess.Process) -> None:
+        """终止 ripgrep 进程"""
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+    async def _terminate_and_wait(self, process: asyncio.subprocess.Process) -> None:
+        """终止 ripgrep 进程并等待其退出，避免留下僵尸进程"""
+        self._terminate_process(process)
+        try:
+            await asyncio.wait_for(asyncio.shield(process.wait()), timeout=RG_EXIT_WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"等待 ripgrep 进程 {process.pid} 退出超时")
 
     def _format_matches(self, matches: Dict[Path, List[Tuple[int, str]]]) -> str:
         """格式化匹配结果"""
         output = []
         for file_path, lines in matches.items():
             # 获取文件信息
-            stat = file_path.stat()
+            try:
+                stat = file_path.stat()
+            except OSError:
+                # 文件在搜索后被删除
+                continue
             rel_path = str(file_path.relative_to(self.base_dir))
 
             # 创建 FileInfo 对象
@@ -152,7 +232,7 @@ class GrepSearch(WorkspaceGuardTool[GrepSearchParams]):
                 is_dir=False,
                 size=stat.st_size,
                 last_modified=stat.st_mtime,
-                line_count=self._count_lines(file_path)
+                line_count=count_file_lines(file_path, stat)
                 if file_path.suffix in [".py", ".js", ".ts", ".jsx", ".tsx", ".vue", ".md", ".txt"]
                 else None,
             )
@@ -179,14 +259,6 @@ class GrepSearch(WorkspaceGuardTool[GrepSearchParams]):
             size /= 1024
         return f"{size:.1f}TB"
 
-    def _count_lines(self, file_path: Path) -> Optional[int]:
-        """计算文件行数"""
-        try:
-            with file_path.open("r", encoding="utf-8") as f:
-                return sum(1 for _ in f)
-        except:
-            return None
-
     async def get_after_tool_call_friendly_action_and_remark(self, tool_name: str, tool_context: ToolContext, result: ToolResult, execution_time: float, arguments: Dict[str, Any] = None) -> Dict:
         """
         获取工具调用后的友好动作和备注
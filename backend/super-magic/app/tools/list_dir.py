@@ -1,19 +1,32 @@
+import asyncio
+import os
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
 from pydantic import Field
 
 from agentlang.context.tool_context import ToolContext
 from agentlang.logger import get_logger
 from agentlang.tools.tool_result import ToolResult
-from agentlang.utils.file import count_file_lines, count_file_tokens, format_file_size, is_text_file
+from agentlang.utils.file import format_file_size, is_text_file
 from agentlang.utils.schema import DirectoryInfo, FileInfo
+from app.service.workspace_index_service import WorkspaceIndex, WorkspaceIndexService
 from app.tools.core import BaseToolParams, tool
 from app.tools.workspace_guard_tool import WorkspaceGuardTool
 
 logger = get_logger(__name__)
 
 
+class _DirItem(NamedTuple):
+    """目录中的一项，来自工作区索引或磁盘"""
+    path: Path
+    is_dir: bool
+    size: int
+    mtime: float
+    # 来自磁盘时的 stat 结果，来自索引时为 None（行数/token 数直接使用索引条目缓存）
+    stat_result: Optional[os.stat_result] = None
+
+
 class ListDirParams(BaseToolParams):
     """列出目录参数"""
     relative_workspace_path: str = Field(
@@ -61,8 +74,9 @@ class ListDir(WorkspaceGuardTool[ListDirParams]):
              logger.warning(f"Requested level {level} is less than 1, setting to 1.")
              level = 1
 
-        # 调用内部方法获取结果
-        result = self._run(
+        # 调用内部方法获取结果（遍历目录和统计行数属于阻塞操作，放到线程中执行）
+        result = await asyncio.to_thread(
+            self._run,
             relative_workspace_path=params.relative_workspace_path,
             level=level,
             filter_binary=params.filter_binary,
@@ -148,10 +162,11 @@ class ListDir(WorkspaceGuardTool[ListDirParams]):
         if current_level > max_level:
             return total_items, filtered_items
 
+        index = WorkspaceIndexService.get_index(base_dir or self.base_dir)
         try:
             items = sorted(
-                list(current_path.iterdir()),
-                key=lambda x: (not x.is_dir(), x.name.lower())
+                self._list_children(index, current_path),
+                key=lambda x: (not x.is_dir, x.path.name.lower())
             )
         except PermissionError:
             # 使用新的扁平错误格式
@@ -166,7 +181,7 @@ class ListDir(WorkspaceGuardTool[ListDirParams]):
 
         # 如果过滤二进制文件，则先筛选
         if filter_binary:
-            filtered_file_items = [item for item in items if item.is_dir() or self._is_text_file(item)]
+            filtered_file_items = [item for item in items if item.is_dir or self._is_text_file(item.path)]
             filtered_items += len(items) - len(filtered_file_items)
             items = filtered_file_items
 
@@ -180,24 +195,24 @@ class ListDir(WorkspaceGuardTool[ListDirParams]):
             total_items += 1
             # 移除 is_last, connector, new_prefix 的计算和使用
 
-            relative_item_path = str(item.relative_to(base_dir))
+            relative_item_path = str(item.path.relative_to(base_dir))
 
-            if item.is_dir():
+            if item.is_dir:
                 # 统计下一层目录的文件数量
                 try:
-                    sub_items = list(item.iterdir())
+                    sub_items = self._list_children(index, item.path)
                     if filter_binary:
-                        sub_items = [sub_item for sub_item in sub_items if sub_item.is_dir() or self._is_text_file(sub_item)]
+                        sub_items = [sub_item for sub_item in sub_items if sub_item.is_dir or self._is_text_file(sub_item.path)]
                     item_count = f"{len(sub_items)} items"
                 except (PermissionError, Exception):
                     item_count = "? items"  # 如果无法访问子目录，则显示为未知
 
                 info = DirectoryInfo(
-                    name=item.name,
+                    name=item.path.name,
                     path=relative_item_path, # 使用计算好的相对路径
                     is_dir=True,
                     item_count=item_count,
-                    last_modified=item.stat().st_mtime,
+                    last_modified=item.mtime,
                 )
                 # 修改输出格式为：path/: d item_count timestamp
                 output_lines.append(f"{info.path}/: d {info.item_count:>10} {info.format_time()}\n") # 使用 >10 简单右对齐
@@ -206,32 +221,29 @@ class ListDir(WorkspaceGuardTool[ListDirParams]):
                 if current_level < max_level:
                     # 递归处理子目录，层级+1，不再传递 prefix
                     total_items, filtered_items = self._list_directory_recursive(
-                        item, current_level + 1, output_lines, # 移除 new_prefix
+                        item.path, current_level + 1, output_lines, # 移除 new_prefix
                         (total_items, filtered_items),
                         max_level, filter_binary, calculate_tokens, base_dir
                     )
             else: # 处理文件
                 try:
-                    stat_result = item.stat()
-                    file_size = stat_result.st_size
-
                     # 对于文本文件计算行数和token数量
                     line_count = None
                     token_count = None
 
-                    if self._is_text_file(item):
-                        line_count = self._count_lines(item)
+                    if self._is_text_file(item.path):
+                        line_count = self._count_lines(item.path, item.stat_result)
                         # 仅在需要计算token时计算
                         if calculate_tokens:
-                            token_count = self._count_tokens(item)
+                            token_count = self._count_tokens(item.path, item.stat_result)
 
                     info = FileInfo(
-                        name=item.name,
+                        name=item.path.name,
                         path=relative_item_path, # 使用计算好的相对路径
                         is_dir=False,
-                        size=file_size,
+                        size=item.size,
                         line_count=line_count,
-                        last_modified=stat_result.st_mtime,
+                        last_modified=item.mtime,
                     )
 
                     size_str = self._format_size(info.size)
@@ -252,13 +264,36 @@ class ListDir(WorkspaceGuardTool[ListDirParams]):
 
         return total_items, filtered_items
 
-    def _count_lines(self, file_path: Path) -> Optional[int]:
-        """计算文件行数"""
-        return count_file_lines(file_path)
-
-    def _count_tokens(self, file_path: Path) -> Optional[int]:
-        """计算文件token数量"""
-        return count_file_tokens(file_path)
+    def _list_children(self, index: WorkspaceIndex, dir_path: Path) -> List[_DirItem]:
+        """列出目录的直接子项，优先使用工作区索引，目录不在索引中（如 node_modules 等忽略目录）时读取磁盘"""
+        entries = index.list_directory(dir_path)
+        if entries is not None:
+            return [
+                _DirItem(path=dir_path / entry.name, is_dir=entry.is_dir, size=entry.size, mtime=entry.mtime)
+                for entry in entries
+            ]
+
+        items = []
+        with os.scandir(dir_path) as it:
+            for dir_entry in it:
+                is_dir = dir_entry.is_dir()
+                stat_result = dir_entry.stat()
+                items.append(_DirItem(
+                    path=dir_path / dir_entry.name,
+                    is_dir=is_dir,
+                    size=stat_result.st_size,
+                    mtime=stat_result.st_mtime,
+                    stat_result=None if is_dir else stat_result,
+                ))
+        return items
+
+    def _count_lines(self, file_path: Path, stat_result: Optional[os.stat_result] = None) -> Optional[int]:
+        """计算文件行数，结果由工作区文件索引缓存"""
+        return WorkspaceIndexService.get_index(self.base_dir).get_line_count(file_path, stat_result)
+
+    def _count_tokens(self, file_path: Path, stat_result: Optional[os.stat_result] = None) -> Optional[int]:
+        """计算文件token数量，结果由工作区文件索引缓存"""
+        return WorkspaceIndexService.get_index(self.base_dir).get_token_count(file_path, stat_result)
 
     def _format_size(self, size: int) -> str:
         """格式化文件大小"""
@@ -1,24 +1,25 @@
+import asyncio
+import hashlib
+import json
 import os
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
 
 import aiofiles
 import aiofiles.os  # Keep this for os.path.exists etc.
-from markitdown import MarkItDown, StreamInfo
 from pydantic import Field
 
 from agentlang.context.tool_context import ToolContext
 from agentlang.logger import get_logger
 from agentlang.tools.tool_result import ToolResult
-from agentlang.utils.token_estimator import num_tokens_from_string
+from agentlang.utils.token_estimator import truncate_text_to_token_budget
 from app.core.entity.message.server_message import DisplayType, FileContent, ToolDetail
+from app.paths import PathManager
 from app.tools.abstract_file_tool import AbstractFileTool
 from app.tools.core import BaseToolParams, tool
-from app.tools.markitdown_plugins.csv_plugin import CSVConverter
-
-# Keep Excel and CSV converters if needed for other types
-from app.tools.markitdown_plugins.excel_plugin import ExcelConverter
 from app.tools.workspace_guard_tool import WorkspaceGuardTool
+from app.utils.document_converter import CONVERTER_VERSION, DocumentConverter
+from app.utils.line_offset_index import LineOffsetIndexCache
 
 # Import the new local PDF converter utility
 from app.utils.pdf_converter_utils import convert_pdf_locally
@@ -27,6 +28,13 @@ logger = get_logger(__name__)
 
 # 设置最大Token限制
 MAX_TOTAL_TOKENS = 30000
+# 文本读取的字符数上限（按单个 token 最多对应的字符数估算），超过后不再继续读取内容，保证内存占用有界
+MAX_READ_CHARS = MAX_TOTAL_TOKENS * 8
+# 流式读取文本时每次读取的字符数
+TEXT_READ_CHUNK_CHARS = 64 * 1024
+
+# PDF Markdown 缓存记录目录名（位于缓存目录下），记录生成缓存时源 PDF 的大小、修改时间和转换器版本
+PDF_CACHE_RECORD_DIR_NAME = "pdf_markdown_records"
 
 
 class ReadFileParams(BaseToolParams):
@@ -65,11 +73,6 @@ class ReadFile(AbstractFileTool[ReadFileParams], WorkspaceGuardTool[ReadFilePara
     EXCEL_MAX_ROWS = 1000
     EXCEL_MAX_PREVIEW_ROWS = 50
 
-    md = MarkItDown()
-    # Remove PDFConverter registration here, it's handled in the util
-    md.register_converter(ExcelConverter())
-    md.register_converter(CSVConverter())
-
     async def execute(self, tool_context: ToolContext, params: ReadFileParams) -> ToolResult:
         """
         执行文件读取操作
@@ -108,14 +111,14 @@ class ReadFile(AbstractFileTool[ReadFileParams], WorkspaceGuardTool[ReadFilePara
             if file_path.suffix.lower() == '.pdf':
                 cache_md_path = file_path.with_suffix('.md')
                 try:
-                    cache_exists = await aiofiles.os.path.exists(cache_md_path)
+                    cache_fresh = await self._is_pdf_cache_fresh(file_path, cache_md_path)
 
-                    if cache_exists:
+                    if cache_fresh:
                         logger.info(f"使用缓存文件: {cache_md_path} 读取 PDF 内容: {file_path}")
                         read_path = cache_md_path # 设置读取路径为缓存文件
                         cache_just_created = False
                     else:
-                        logger.info(f"缓存文件 {cache_md_path} 不存在，尝试本地转换: {file_path}")
+                        logger.info(f"缓存文件 {cache_md_path} 不存在或已过期，尝试本地转换: {file_path}")
                         # 调用工具函数获取 Markdown 文本
                         markdown_content = await convert_pdf_locally(file_path)
 
@@ -129,6 +132,7 @@ class ReadFile(AbstractFileTool[ReadFileParams], WorkspaceGuardTool[ReadFilePara
                             async with aiofiles.open(cache_md_path, "w", encoding="utf-8") as cache_f:
                                 await cache_f.write(markdown_content)
                             logger.info(f"已成功创建 PDF 缓存文件: {cache_md_path}")
+                            self._save_pdf_cache_record(file_path, cache_md_path)
                             cache_just_created = True # 标记缓存刚刚创建
                             read_path = cache_md_path # 设置读取路径为新创建的缓存
                         except Exception as write_e:
@@ -159,6 +163,7 @@ class ReadFile(AbstractFileTool[ReadFileParams], WorkspaceGuardTool[ReadFilePara
             markitdown_extensions = {".ipynb", ".csv", ".xlsx", ".xls", ".docx"} # 添加或移除需要的格式
 
             content: str = ""
+            total_chars: Optional[int] = None  # 整文件读取时由读取过程统计，可能大于实际读取的内容
             is_binary = await self._is_binary_file(read_path)
 
             # 判断是否使用 MarkItDown
@@ -170,16 +175,16 @@ class ReadFile(AbstractFileTool[ReadFileParams], WorkspaceGuardTool[ReadFilePara
             if use_markitdown:
                  logger.info(f"文件 {read_path} (原始: {original_file_name}) 使用 markitdown 进行读取")
                  try:
-                     # MarkItDown 需要二进制读取
-                     async with aiofiles.open(read_path, "rb") as f:
-                         # 传递原始的 offset 和 limit 给 MarkItDown (除了 PDF 缓存创建阶段)
-                         # 注意：这里传递的是用户原始请求的 offset 和 limit
-                         result = self.md.convert(f, stream_info=StreamInfo(extension=read_extension), offset=params.offset, limit=params.limit)
-                         if not result or not result.markdown:
-                             logger.warning(f"MarkItDown 转换返回空内容: {read_path}")
-                             content = "[文件转换结果为空]"
-                         else:
-                             content = result.markdown
+                     # 在进程池中转换，避免大文件阻塞事件循环
+                     # 注意：这里传递的是用户原始请求的 offset 和 limit
+                     markdown = await DocumentConverter.convert(
+                         read_path, read_extension, offset=params.offset, limit=params.limit
+                     )
+                     if not markdown:
+                         logger.warning(f"MarkItDown 转换返回空内容: {read_path}")
+                         content = "[文件转换结果为空]"
+                     else:
+                         content = markdown
                  except Exception as e:
                      logger.exception(f"使用 MarkItDown 读取文件失败 ({read_path}): {e!s}")
                      return ToolResult(error=f"文件转换失败: {e!s}")
@@ -187,42 +192,25 @@ class ReadFile(AbstractFileTool[ReadFileParams], WorkspaceGuardTool[ReadFilePara
                  # 使用文本读取逻辑 (包括读取 .md 缓存)
                  logger.info(f"文件 {read_path} (原始: {original_file_name}) 使用文本读取逻辑")
                  if params.limit is None or params.limit <= 0:
-                     content = await self._read_text_file(read_path)
+                     content, total_chars = await self._read_text_file(read_path)
                  else:
                      content = await self._read_text_file_with_range(
                          read_path, params.offset, params.limit
                      )
             # --- 内容读取逻辑结束 ---
 
+            if total_chars is None:
+                total_chars = len(content)
+            # 整文件读取时内容可能只读取了前 MAX_READ_CHARS 个字符
+            content_truncated = len(content) < total_chars
 
-            # 计算token数量并处理截断
-            content_tokens = num_tokens_from_string(content)
-            total_chars = len(content)
-            content_truncated = False
-
-            if content_tokens > MAX_TOTAL_TOKENS:
-                logger.info(f"文件 {read_path.name} (原始: {original_file_name}) 内容token数 ({content_tokens}) 超出限制 ({MAX_TOTAL_TOKENS})，进行截断")
-                content_truncated = True
-
-                # 使用二分查找确定最佳截断点
-                left, right = 0, len(content)
-                best_content = ""
-                best_tokens = 0
-
-                while left <= right:
-                    mid = (left + right) // 2
-                    truncated = content[:mid]
-                    tokens = num_tokens_from_string(truncated)
-
-                    if tokens <= MAX_TOTAL_TOKENS:
-                        best_content = truncated
-                        best_tokens = tokens
-                        left = mid + 1
-                    else:
-                        right = mid - 1
+            # 按 token 预算截断，达到预算后即停止编码
+            content, content_tokens, exceeded = truncate_text_to_token_budget(content, MAX_TOTAL_TOKENS)
+            if exceeded:
+                logger.info(f"文件 {read_path.name} (原始: {original_file_name}) 内容token数超出限制 ({MAX_TOTAL_TOKENS})，已截断")
+            content_truncated = content_truncated or exceeded
 
-                content = best_content
-                content_tokens = best_tokens
+            if content_truncated:
                 truncation_note = f"\n\n[内容已截断：原始token数超过{MAX_TOTAL_TOKENS}的限制]"
                 content += truncation_note
 
@@ -262,6 +250,52 @@ class ReadFile(AbstractFileTool[ReadFileParams], WorkspaceGuardTool[ReadFilePara
             logger.exception(f"读取文件失败 (原始请求: {params.file_path}): {e!s}")
             return ToolResult(error=f"读取文件失败: {e!s}")
 
+    def _get_pdf_cache_record_path(self, file_path: Path) -> Path:
+        """获取 PDF Markdown 缓存记录文件路径"""
+        path_hash = hashlib.sha256(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+        return PathManager.get_cache_dir() / PDF_CACHE_RECORD_DIR_NAME / f"{path_hash}.json"
+
+    @staticmethod
+    def _get_pdf_source_signature(file_path: Path) -> list:
+        """获取源 PDF 的签名 (大小, 修改时间, 转换器版本)"""
+        stat_result = os.stat(file_path)
+        return [stat_result.st_size, stat_result.st_mtime_ns, CONVERTER_VERSION]
+
+    async def _is_pdf_cache_fresh(self, file_path: Path, cache_md_path: Path) -> bool:
+        """判断 PDF 的 Markdown 缓存文件是否可用
+
+        有缓存记录时，要求源 PDF 的大小、修改时间和转换器版本与记录一致；
+        没有记录时（旧版本生成或用户自行创建的 .md），要求 .md 不早于 PDF。
+        """
+        if not await aiofiles.os.path.exists(cache_md_path):
+            return False
+        record_path = self._get_pdf_cache_record_path(file_path)
+        try:
+            async with aiofiles.open(record_path, "r", encoding="utf-8") as f:
+                record = json.loads(await f.read())
+            return record.get("source") == self._get_pdf_source_signature(file_path)
+        except FileNotFoundError:
+            pdf_stat = await aiofiles.os.stat(file_path)
+            md_stat = await aiofiles.os.stat(cache_md_path)
+            return md_stat.st_mtime_ns >= pdf_stat.st_mtime_ns
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取 PDF 缓存记录失败 ({record_path}): {e!s}")
+            return False
+
+    def _save_pdf_cache_record(self, file_path: Path, cache_md_path: Path) -> None:
+        """记录生成 Markdown 缓存时源 PDF 的签名"""
+        record_path = self._get_pdf_cache_record_path(file_path)
+        try:
+            record_path.parent.mkdir(parents=True, exist_ok=True)
+            record = {
+                "pdf_path": os.path.abspath(file_path),
+                "markdown_path": os.path.abspath(cache_md_path),
+                "source": self._get_pdf_source_signature(file_path),
+            }
+            record_path.write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"写入 PDF 缓存记录失败 ({record_path}): {e!s}")
+
     async def _is_binary_file(self, file_path: Path) -> bool:
         """检查文件是否为二进制文件"""
         try:
@@ -299,14 +333,38 @@ class ReadFile(AbstractFileTool[ReadFileParams], WorkspaceGuardTool[ReadFilePara
             return False # Default to not binary if unsure
             # 如果不确定，默认为非二进制
 
-    async def _read_text_file(self, file_path: Path) -> str:
-        """读取整个文本文件内容"""
-        async with aiofiles.open(file_path, "r", encoding="utf-8", errors="replace") as f:
-            return await f.read()
+    async def _read_text_file(self, file_path: Path) -> Tuple[str, int]:
+        """读取整个文本文件内容
+
+        最多保留 MAX_READ_CHARS 个字符，超出部分只统计字符数，内存占用与文件大小无关。
+
+        Returns:
+            Tuple[str, int]: (读取到的内容, 文件总字符数)
+        """
+        return await asyncio.to_thread(self._read_text_file_sync, file_path)
+
+    def _read_text_file_sync(self, file_path: Path) -> Tuple[str, int]:
+        """同步读取文本文件内容，见 _read_text_file"""
+        parts: List[str] = []
+        kept_chars = 0
+        total_chars = 0
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            while True:
+                chunk = f.read(TEXT_READ_CHUNK_CHARS)
+                if not chunk:
+                    break
+                total_chars += len(chunk)
+                if kept_chars < MAX_READ_CHARS:
+                    chunk = chunk[:MAX_READ_CHARS - kept_chars]
+                    parts.append(chunk)
+                    kept_chars += len(chunk)
+        return "".join(parts), total_chars
 
     async def _read_text_file_with_range(self, file_path: Path, offset: int, limit: int) -> str:
         """读取指定范围的文本文件内容
 
+        大文件借助行偏移索引直接定位到起始行附近，不再从文件开头逐行扫描。
+
         Args:
             file_path: 文件路径
             offset: 起始行号（从0开始）
@@ -315,23 +373,7 @@ class ReadFile(AbstractFileTool[ReadFileParams], WorkspaceGuardTool[ReadFilePara
         Returns:
             包含行号信息和指定范围内容的字符串，如果范围无效则返回提示信息
         """
-        # 统计文件总行数并读取指定范围内容
-        all_lines = []
-        target_lines = []
-
-        async with aiofiles.open(file_path, "r", encoding="utf-8", errors="replace") as f:
-            line_idx = 0
-            async for line in f:
-                all_lines.append(line)
-                # 根据行索引应用 offset 和 limit
-                if limit > 0: # 如果 limit 是正数，从 offset 开始读取 limit 行
-                    if offset <= line_idx < offset + limit:
-                        target_lines.append(line)
-                elif offset <= line_idx: # 如果 limit 不是正数（<=0 或 None），从 offset 读取到文件末尾
-                    target_lines.append(line)
-                line_idx += 1
-
-        total_lines = len(all_lines)
+        target_lines, total_lines = await asyncio.to_thread(self._read_lines_sync, file_path, offset, limit)
         start_line = offset + 1  # 转为1-indexed便于用户理解
 
         # 构建结果头部信息
@@ -368,6 +410,82 @@ class ReadFile(AbstractFileTool[ReadFileParams], WorkspaceGuardTool[ReadFilePara
 
         return header + content
 
+    def _read_lines_sync(self, file_path: Path, offset: int, limit: int) -> Tuple[List[str], int]:
+        """同步读取指定范围的行
+
+        读取的内容累计超过 MAX_READ_CHARS 后停止，后续行视为未读取。
+
+        Returns:
+            Tuple[List[str], int]: (读取到的行, 文件总行数)
+        """
+        offset = max(offset, 0)
+        stat_result = os.stat(file_path)
+        index = LineOffsetIndexCache.get(file_path, stat_result)
+
+        target_lines: List[str] = []
+        read_chars = 0
+        line_idx = 0
+        with open(file_path, "rb") as f:
+            if index is not None:
+                if offset >= index.total_lines:
+                    return [], index.total_lines
+                # 定位到不晚于起始行的最近检查点，再跳过剩余的行
+                line_idx, byte_offset = index.locate(offset)
+                f.seek(byte_offset)
+                while line_idx < offset and self._skip_line(f):
+                    line_idx += 1
+
+            while limit <= 0 or line_idx < offset + limit:
+                if read_chars >= MAX_READ_CHARS:
+                    break
+                raw_line = self._read_line(f, (MAX_READ_CHARS - read_chars) * 4)
+                if not raw_line:
+                    break
+                if line_idx >= offset:
+                    line = raw_line.decode("utf-8", errors="replace")
+                    if line.endswith("\r\n"):
+                        line = line[:-2] + "\n"
+                    line = line[:MAX_READ_CHARS - read_chars]
+                    target_lines.append(line)
+                    read_chars += len(line)
+                line_idx += 1
+
+            if index is not None:
+                return target_lines, index.total_lines
+
+            # 小文件没有索引，继续扫描剩余内容统计总行数
+            last_byte = b"\n"
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                line_idx += chunk.count(b"\n")
+                last_byte = chunk[-1:]
+            if last_byte != b"\n":
+                line_idx += 1
+        return target_lines, line_idx
+
+    @staticmethod
+    def _read_line(f: BinaryIO, max_bytes: int) -> bytes:
+        """读取一行，最多保留 max_bytes 字节，超出部分直接跳过"""
+        line = f.readline(max(max_bytes, 1))
+        if line and not line.endswith(b"\n") and len(line) >= max_bytes:
+            # 行过长，跳过该行剩余部分，保证后续行号正确
+            ReadFile._skip_line(f)
+        return line
+
+    @staticmethod
+    def _skip_line(f: BinaryIO) -> bool:
+        """跳过当前行剩余部分，分块读取避免超长行占用大量内存，返回是否读到了内容"""
+        read_any = False
+        while True:
+            chunk = f.readline(1024 * 1024)
+            if not chunk:
+                return read_any
+            read_any = True
+            if chunk.endswith(b"\n"):
+                return True
+
     async def get_tool_detail(self, tool_context: ToolContext, result: ToolResult, arguments: Dict[str, Any] = None) -> Optional[ToolDetail]:
         """
         根据工具执行结果获取对应的ToolDetail
@@ -79,6 +79,7 @@ from magic_use.magic_browser import (
     PageStateSuccess,
     ScreenshotSuccess,
 )
+from magic_use.request_policy import RequestPolicy
 
 logger = get_logger(__name__)
 
@@ -289,6 +290,16 @@ class UseBrowser(WorkspaceGuardTool[UseBrowserParams], AbstractFileTool):
             browser_config.user_agent = config.get("browser.user_agent")
         if config.get("browser.browser_type") is not None:
             browser_config.browser_type = config.get("browser.browser_type")
+        if config.get("browser.request_policy") == "text_extraction":
+            browser_config.request_policy = RequestPolicy.create_for_text_extraction()
+        if config.get("browser.context_pool_max_size") is not None:
+            browser_config.context_pool_max_size = int(config.get("browser.context_pool_max_size"))
+        if config.get("browser.context_pool_min_size") is not None:
+            browser_config.context_pool_min_size = int(config.get("browser.context_pool_min_size"))
+        if config.get("browser.context_pool_idle_ttl") is not None:
+            browser_config.context_pool_idle_ttl = float(config.get("browser.context_pool_idle_ttl"))
+        if config.get("browser.context_pool_reset_between_tasks") is not None:
+            browser_config.context_pool_reset_between_tasks = config.get("browser.context_pool_reset_between_tasks")
 
         # 创建新的浏览器实例
         # logger.debug(f"通过以下配置创建浏览器实例: {browser_config}")
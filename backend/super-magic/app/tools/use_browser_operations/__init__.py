@@ -4,6 +4,7 @@
 """
 
 from app.tools.use_browser_operations.base import BaseOperationParams, OperationGroup, operation
+from app.tools.use_browser_operations.batch import BatchOperations
 from app.tools.use_browser_operations.content import ContentOperations
 from app.tools.use_browser_operations.interaction import InteractionOperations
 from app.tools.use_browser_operations.navigation import NavigationOperations
@@ -11,6 +12,7 @@ from app.tools.use_browser_operations.operations_registry import operations_regi
 
 __all__ = [
     'BaseOperationParams',
+    'BatchOperations',
     'ContentOperations',
     'InteractionOperations',
     'NavigationOperations',
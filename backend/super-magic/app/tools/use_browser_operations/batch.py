@@ -0,0 +1,236 @@
+"""浏览器批量操作组
+
+包含并行打开多个网页并提取内容等批量操作
+"""
+
+import asyncio
+import os
+import time
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from agentlang.logger import get_logger
+from agentlang.tools.tool_result import ToolResult
+from agentlang.utils.file import generate_safe_filename_with_timestamp
+from app.tools.use_browser_operations.base import BaseOperationParams, OperationGroup, operation
+from app.tools.use_browser_operations.content import (
+    MARKDOWN_RECORDS_DIR_NAME,
+    _add_markdown_metadata,
+    get_or_create_markdown_records_dir,
+)
+from app.tools.use_browser_operations.navigation import check_invalid_url
+from magic_use.magic_browser import GotoSuccess, MagicBrowser, MagicBrowserError, MarkdownSuccess
+
+# 日志记录器
+logger = get_logger(__name__)
+
+# 单次批量操作最多处理的 URL 数量
+MAX_BATCH_URLS = 20
+# 结果中每个页面的内容预览长度（字符）
+PREVIEW_CHARS = 300
+
+
+class BatchReadAsMarkdownParams(BaseOperationParams):
+    """批量读取网页为Markdown的参数"""
+    urls: List[str] = Field(..., description=f"要读取的网页 URL 列表，最多 {MAX_BATCH_URLS} 个", min_length=1, max_length=MAX_BATCH_URLS)
+    scope: Literal["viewport", "all"] = Field("all", description="内容范围: viewport (首屏) 或 all (整个页面)")
+    concurrency: int = Field(4, description="同时打开的页面数", ge=1, le=8)
+    timeout: float = Field(45, description="单个页面打开并读取的超时时间（秒）", ge=5, le=120)
+
+
+class PageExtractionResult(BaseModel):
+    """单个页面的提取结果"""
+    index: int
+    url: str
+    success: bool
+    title: Optional[str] = None
+    final_url: Optional[str] = None
+    relative_path: Optional[str] = None
+    char_count: int = 0
+    preview: Optional[str] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+
+class BatchOperations(OperationGroup):
+    """批量操作组
+
+    包含并行打开多个网页并提取内容等批量操作
+    """
+    group_name = "batch"
+    group_description = "多页面批量操作"
+
+    async def _open_page(self, browser: MagicBrowser, context_id: str) -> str:
+        """在指定上下文中创建页面；等待期间被取消时，页面创建完成后随即关闭，避免泄漏"""
+        page_task = asyncio.ensure_future(browser.new_page(context_id=context_id))
+        try:
+            return await asyncio.shield(page_task)
+        except asyncio.CancelledError:
+            def _close_created_page(task: asyncio.Future) -> None:
+                if not task.cancelled() and task.exception() is None:
+                    asyncio.ensure_future(browser.close_page(task.result()))
+
+            page_task.add_done_callback(_close_created_page)
+            raise
+
+    async def _extract_page(
+        self, browser: MagicBrowser, page_id: str, index: int, url: str, scope: str
+    ) -> PageExtractionResult:
+        """在指定页面中打开 URL 并提取 Markdown"""
+        try:
+            goto_result = await browser.goto(page_id=page_id, url=url)
+            if isinstance(goto_result, MagicBrowserError):
+                return PageExtractionResult(index=index, url=url, success=False, error=goto_result.error)
+
+            markdown_result = await browser.read_as_markdown(page_id=page_id, scope=scope)
+            if isinstance(markdown_result, MagicBrowserError):
+                return PageExtractionResult(index=index, url=url, success=False, error=markdown_result.error)
+            if not isinstance(markdown_result, MarkdownSuccess):
+                return PageExtractionResult(index=index, url=url, success=False, error="读取页面返回了意外的结果类型")
+
+            title = markdown_result.title or (goto_result.title if isinstance(goto_result, GotoSuccess) else url)
+            relative_path = self._save_markdown(markdown_result, scope)
+            markdown_text = markdown_result.markdown or ""
+            return PageExtractionResult(
+                index=index,
+                url=url,
+                success=True,
+                title=title,
+                final_url=markdown_result.url,
+                relative_path=relative_path,
+                char_count=len(markdown_text),
+                preview=markdown_text[:PREVIEW_CHARS].strip(),
+            )
+        except Exception as e:
+            logger.error(f"批量读取页面失败: {url}, 错误: {e!s}", exc_info=True)
+            return PageExtractionResult(index=index, url=url, success=False, error=f"读取页面时发生意外错误: {e!s}")
+
+    def _save_markdown(self, result: MarkdownSuccess, scope: str) -> Optional[str]:
+        """将提取的 Markdown 保存到 webview_reports 目录，返回相对路径，失败时返回 None"""
+        records_dir = get_or_create_markdown_records_dir()
+        filename = f"{generate_safe_filename_with_timestamp(result.title)}_{scope}.md"
+        content = _add_markdown_metadata(content=result.markdown, title=result.title, url=result.url, scope=scope)
+        try:
+            with open(records_dir / filename, "w", encoding="utf-8") as f:
+                f.write(content)
+            return os.path.join(MARKDOWN_RECORDS_DIR_NAME, filename)
+        except Exception as e:
+            logger.error(f"保存 Markdown 文件失败: {records_dir / filename}, 错误: {e}", exc_info=True)
+            return None
+
+    async def _extract_with_limit(
+        self,
+        browser: MagicBrowser,
+        context_id: str,
+        semaphore: asyncio.Semaphore,
+        index: int,
+        url: str,
+        scope: str,
+        timeout: float,
+    ) -> PageExtractionResult:
+        """在并发限制和超时控制下提取单个页面，页面在超时控制之外创建，结束后总是关闭"""
+        async with semaphore:
+            start_time = time.monotonic()
+            try:
+                page_id = await self._open_page(browser, context_id)
+            except Exception as e:
+                logger.error(f"批量读取创建页面失败: {url}, 错误: {e!s}")
+                result = PageExtractionResult(index=index, url=url, success=False, error=f"创建页面失败: {e!s}")
+                result.elapsed = time.monotonic() - start_time
+                return result
+
+            try:
+                result = await asyncio.wait_for(self._extract_page(browser, page_id, index, url, scope), timeout=timeout)
+            except asyncio.TimeoutError:
+                result = PageExtractionResult(index=index, url=url, success=False, error=f"超时（超过 {timeout:.0f} 秒）")
+            finally:
+                await browser.close_page(page_id)
+            result.elapsed = time.monotonic() - start_time
+            return result
+
+    @operation(
+        example={
+            "operation": "batch_read_as_markdown",
+            "operation_params": {
+                "urls": ["https://{actual_domain}/article/1", "https://{actual_domain}/article/2"],
+                "scope": "all"
+            }
+        }
+    )
+    async def batch_read_as_markdown(self, browser: MagicBrowser, params: BatchReadAsMarkdownParams) -> ToolResult:
+        """并行打开多个网页并读取为 Markdown。
+
+        适合需要阅读多个搜索结果或多篇文章的场景：每个 URL 在独立的新页面中打开并读取，读取后自动关闭页面，
+        总耗时接近最慢的单个页面而不是所有页面之和。每个页面的完整内容保存到工作目录的 webview_reports 目录下，
+        结果按完成顺序列出标题、保存路径和内容预览，需要详细内容时再读取对应文件。
+        不会改变当前活动页面，需要与页面交互（点击、输入等）时请使用 goto。
+        """
+        targets: List[tuple[int, str]] = []
+        invalid_results: List[PageExtractionResult] = []
+        for index, url in enumerate(params.urls, start=1):
+            is_invalid, error_message = check_invalid_url(url)
+            if is_invalid:
+                invalid_results.append(PageExtractionResult(index=index, url=url, success=False, error=error_message))
+            else:
+                targets.append((index, url))
+
+        # 所有页面共用同一个上下文，在并发开始前确定，避免各任务分别创建上下文
+        await browser.initialize()
+        context_id = await browser.get_active_context_id() or await browser.new_context()
+
+        # 批量页面不抢占当前活动页面
+        active_page_id = await browser.get_active_page_id()
+        semaphore = asyncio.Semaphore(params.concurrency)
+        start_time = time.monotonic()
+        tasks = [
+            asyncio.create_task(
+                self._extract_with_limit(browser, context_id, semaphore, index, url, params.scope, params.timeout)
+            )
+            for index, url in targets
+        ]
+
+        # 按完成顺序收集结果
+        results: List[PageExtractionResult] = []
+        try:
+            for future in asyncio.as_completed(tasks):
+                result = await future
+                results.append(result)
+                status = "成功" if result.success else f"失败: {result.error}"
+                logger.info(f"batch_read_as_markdown: [{len(results)}/{len(tasks)}] {result.url} {status} ({result.elapsed:.1f}s)")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            if active_page_id:
+                await browser.set_active_page(active_page_id)
+
+        results.extend(invalid_results)
+        return ToolResult(content=self._format_results(results, params.scope, time.monotonic() - start_time))
+
+    def _format_results(self, results: List[PageExtractionResult], scope: str, elapsed: float) -> str:
+        """格式化批量读取结果"""
+        success_count = sum(1 for r in results if r.success)
+        lines = [
+            "**操作: batch_read_as_markdown**",
+            f"状态: 完成 (成功 {success_count} / 失败 {len(results) - success_count})",
+            f"范围: {scope}",
+            f"总耗时: {elapsed:.1f} 秒",
+        ]
+        for result in results:
+            lines.append("")
+            if result.success:
+                lines.append(f"### {result.index}. {result.title}")
+                lines.append(f"URL: `{result.final_url or result.url}`")
+                if result.relative_path:
+                    lines.append(f"保存路径: `{result.relative_path}`")
+                lines.append(f"字符数: {result.char_count}，耗时: {result.elapsed:.1f} 秒")
+                if result.preview:
+                    lines.append(f"内容预览:\n{result.preview}")
+            else:
+                lines.append(f"### {result.index}. 读取失败")
+                lines.append(f"URL: `{result.url}`")
+                lines.append(f"错误: {result.error}")
+        lines.append("")
+        lines.append("**提示**: 完整内容已保存至上述文件，如需详细内容请读取对应文件。")
+        return "\n".join(lines)
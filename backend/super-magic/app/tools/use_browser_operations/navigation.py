@@ -30,6 +30,46 @@ class ScrollToParams(BaseOperationParams):
     screen_number: int = Field(..., description="目标屏幕编号 (从1开始)", ge=1)
 
 
+def check_invalid_url(url: str) -> Tuple[bool, str]:
+    """检测无效URL
+
+    检查URL是否为明显无效的域名，如示例域名
+
+    Args:
+        url: 需要检查的URL
+
+    Returns:
+        Tuple[bool, str]: (是否无效, 错误信息)
+    """
+    # 解析URL获取域名
+    try:
+        parsed_url = urlparse(url)
+        domain = parsed_url.netloc.lower()
+
+        # 定义无效域名列表
+        invalid_domains = [
+            'example.com', 'example.org', 'example.net',
+            'test.com', 'test.org', 'test.net',
+            'domain.com', 'domain.org', 'domain.net',
+            'localhost', '127.0.0.1',
+            'website.com', 'mywebsite.com', 'yourwebsite.com',
+            '{actual_domain}'
+        ]
+
+        # 检查是否为无效域名
+        if domain in invalid_domains or domain.startswith('example.') or domain.startswith('test.'):
+            return True, f"检测到无效域名: {domain}。这是一个示例域名，请使用真实的网址。"
+
+        # 检查是否是未替换的占位符
+        if '{actual_domain}' in domain:
+            return True, f"检测到占位符域名: {domain}。请将{'{actual_domain}'}替换为真实的网址。"
+
+        return False, ""
+    except Exception as e:
+        logger.error(f"URL检测失败: {e!s}")
+        return False, ""
+
+
 class NavigationOperations(OperationGroup):
     """导航操作组
 
@@ -69,33 +109,7 @@ class NavigationOperations(OperationGroup):
         Returns:
             Tuple[bool, str]: (是否无效, 错误信息)
         """
-        # 解析URL获取域名
-        try:
-            parsed_url = urlparse(url)
-            domain = parsed_url.netloc.lower()
-
-            # 定义无效域名列表
-            invalid_domains = [
-                'example.com', 'example.org', 'example.net',
-                'test.com', 'test.org', 'test.net',
-                'domain.com', 'domain.org', 'domain.net',
-                'localhost', '127.0.0.1',
-                'website.com', 'mywebsite.com', 'yourwebsite.com',
-                '{actual_domain}'
-            ]
-
-            # 检查是否为无效域名
-            if domain in invalid_domains or domain.startswith('example.') or domain.startswith('test.'):
-                return True, f"检测到无效域名: {domain}。这是一个示例域名，请使用真实的网址。"
-
-            # 检查是否是未替换的占位符
-            if '{actual_domain}' in domain:
-                return True, f"检测到占位符域名: {domain}。请将{'{actual_domain}'}替换为真实的网址。"
-
-            return False, ""
-        except Exception as e:
-            logger.error(f"URL检测失败: {e!s}")
-            return False, ""
+        return check_invalid_url(url)
 
     @operation(
         example={
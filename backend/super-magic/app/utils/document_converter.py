@@ -0,0 +1,278 @@
+"""
+文档转换模块
+
+在独立的工作进程中使用 MarkItDown 将 PDF、Excel、Word、CSV、Notebook 等文件转换为 Markdown，
+避免大文件转换阻塞事件循环。转换支持超时与取消，结果按 (路径, 大小, 修改时间, 转换器版本) 缓存。
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+from agentlang.config.config import config
+from agentlang.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 转换器版本，转换插件逻辑变化时递增，使旧的缓存结果失效
+CONVERTER_VERSION = 1
+
+# 内存缓存中保存的转换结果总字符数上限
+CACHE_MAX_CHARS = 64 * 1024 * 1024
+
+# 子进程中复用的 MarkItDown 实例
+_worker_markitdown = None
+
+
+def _get_worker_markitdown():
+    """获取子进程内的 MarkItDown 实例，首次使用时创建并注册自定义转换器"""
+    global _worker_markitdown
+    if _worker_markitdown is None:
+        from markitdown import MarkItDown
+
+        from app.tools.markitdown_plugins.csv_plugin import CSVConverter
+        from app.tools.markitdown_plugins.excel_plugin import ExcelConverter
+        from app.tools.markitdown_plugins.pdf_plugin import PDFConverter
+
+        md = MarkItDown()
+        md.register_converter(ExcelConverter())
+        md.register_converter(CSVConverter())
+        md.register_converter(PDFConverter())
+        _worker_markitdown = md
+    return _worker_markitdown
+
+
+def _convert_in_worker(file_path: str, extension: str, offset: int, limit: int) -> str:
+    """在子进程中执行转换，返回 Markdown 文本（转换结果为空时返回空字符串）"""
+    from markitdown import StreamInfo
+
+    stream_info = StreamInfo(extension=extension)
+    if extension == ".pdf":
+        stream_info = StreamInfo(extension=extension, mimetype="application/pdf")
+
+    with open(file_path, "rb") as f:
+        result = _get_worker_markitdown().convert(f, stream_info=stream_info, offset=offset, limit=limit)
+    if not result or not result.markdown:
+        return ""
+    return result.markdown
+
+
+def _worker_main(conn: Connection) -> None:
+    """工作进程主循环：逐个接收转换请求并返回 ("ok", markdown) 或 ("error", 异常)"""
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            response = ("ok", _convert_in_worker(*request))
+        except Exception as e:
+            response = ("error", e)
+        try:
+            conn.send(response)
+        except (EOFError, OSError):
+            return
+        except Exception as e:
+            # 异常对象无法序列化时只返回其描述
+            conn.send(("error", RuntimeError(f"{type(response[1]).__name__}: {response[1]}")))
+
+
+def _get_mp_context():
+    """工作进程的启动方式：优先 forkserver，不可用时使用 spawn，不从已启动线程和事件循环的主进程直接 fork"""
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+class ConversionWorkerError(RuntimeError):
+    """转换工作进程异常退出"""
+
+
+class _ConversionWorker:
+    """单个转换工作进程，同一时间只执行一个转换，超时或取消时只终止它自己"""
+
+    def __init__(self, mp_context):
+        self._conn, child_conn = mp_context.Pipe()
+        self.process = mp_context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def run(self, *request: Any) -> str:
+        """发送转换请求并阻塞等待结果（在线程中调用）"""
+        try:
+            self._conn.send(request)
+            status, payload = self._conn.recv()
+        except (EOFError, OSError) as e:
+            raise ConversionWorkerError(f"文档转换进程异常退出: {e!r}") from e
+        if status == "ok":
+            return payload
+        raise payload
+
+    def kill(self) -> None:
+        """终止工作进程"""
+        try:
+            self.process.kill()
+            self.process.join(timeout=1)
+        except Exception as e:
+            logger.debug(f"终止文档转换进程失败: {e}")
+        try:
+            self._conn.close()
+        except OSError:
+            pass
+
+
+ConversionKey = Tuple[str, int, int, int, str, int, int]
+
+
+def get_conversion_key(file_path: Path, extension: str, offset: int = 0, limit: int = -1) -> ConversionKey:
+    """
+    获取文件的转换缓存键
+
+    Args:
+        file_path: 源文件路径
+        extension: 按此扩展名选择转换器
+        offset: 转换起始位置（行/页）
+        limit: 转换数量，-1 表示全部
+
+    Returns:
+        ConversionKey: (绝对路径, 大小, 修改时间, 转换器版本, 扩展名, offset, limit)
+    """
+    stat_result = os.stat(file_path)
+    return (
+        os.path.abspath(file_path), stat_result.st_size, stat_result.st_mtime_ns, CONVERTER_VERSION,
+        extension, offset, limit,
+    )
+
+
+class DocumentConverter:
+    """
+    文档转换器，在共享的工作进程中执行 MarkItDown 转换
+
+    - 同时进行的转换数（即工作进程数）由 read_file.conversion_workers 控制，空闲的工作进程会被复用
+    - 单次转换超时由 read_file.conversion_timeout 控制，超时或调用方取消时只终止执行该转换的工作进程
+    - 转换结果缓存在内存中（LRU），源文件变化后缓存键随之变化
+    """
+    _mp_context = None
+    _idle_workers: List[_ConversionWorker] = []
+    _workers_lock = threading.Lock()
+    _slots: Optional[asyncio.Semaphore] = None
+    _slots_loop: Optional[asyncio.AbstractEventLoop] = None
+    _cache: "OrderedDict[ConversionKey, str]" = OrderedDict()
+    _cache_chars = 0
+    _cache_lock = threading.Lock()
+
+    @classmethod
+    def _get_slots(cls) -> asyncio.Semaphore:
+        """获取限制并发转换数的信号量，绑定到当前事件循环"""
+        loop = asyncio.get_running_loop()
+        if cls._slots is None or cls._slots_loop is not loop:
+            max_workers = max(1, int(config.get("read_file.conversion_workers", 2)))
+            cls._slots = asyncio.Semaphore(max_workers)
+            cls._slots_loop = loop
+        return cls._slots
+
+    @classmethod
+    def _acquire_worker(cls) -> _ConversionWorker:
+        """取出一个空闲的工作进程，没有时新建"""
+        with cls._workers_lock:
+            while cls._idle_workers:
+                worker = cls._idle_workers.pop()
+                if worker.is_alive():
+                    return worker
+                worker.kill()
+            if cls._mp_context is None:
+                cls._mp_context = _get_mp_context()
+        logger.info(f"创建文档转换进程 (start method: {cls._mp_context.get_start_method()})")
+        return _ConversionWorker(cls._mp_context)
+
+    @classmethod
+    def _release_worker(cls, worker: _ConversionWorker) -> None:
+        """归还空闲的工作进程"""
+        with cls._workers_lock:
+            cls._idle_workers.append(worker)
+
+    @classmethod
+    def get_cached(cls, key: ConversionKey) -> Optional[str]:
+        """读取缓存的转换结果"""
+        with cls._cache_lock:
+            markdown = cls._cache.get(key)
+            if markdown is not None:
+                cls._cache.move_to_end(key)
+            return markdown
+
+    @classmethod
+    def _put_cache(cls, key: ConversionKey, markdown: str) -> None:
+        """写入转换结果缓存，超出上限时淘汰最久未使用的结果"""
+        max_entries = int(config.get("read_file.conversion_cache_size", 32))
+        if max_entries <= 0 or len(markdown) > CACHE_MAX_CHARS:
+            return
+        with cls._cache_lock:
+            old = cls._cache.pop(key, None)
+            if old is not None:
+                cls._cache_chars -= len(old)
+            cls._cache[key] = markdown
+            cls._cache_chars += len(markdown)
+            while cls._cache and (len(cls._cache) > max_entries or cls._cache_chars > CACHE_MAX_CHARS):
+                _, evicted = cls._cache.popitem(last=False)
+                cls._cache_chars -= len(evicted)
+
+    @classmethod
+    async def convert(cls, file_path: Path, extension: str, offset: int = 0, limit: int = -1) -> str:
+        """
+        将文件转换为 Markdown
+
+        Args:
+            file_path: 源文件路径
+            extension: 按此扩展名选择转换器（如 .pdf、.xlsx）
+            offset: 转换起始位置（行/页）
+            limit: 转换数量，-1 表示全部
+
+        Returns:
+            str: Markdown 文本，转换结果为空时返回空字符串
+
+        Raises:
+            TimeoutError: 转换超时
+            asyncio.CancelledError: 调用方取消
+            Exception: 转换失败
+        """
+        key = get_conversion_key(file_path, extension, offset, limit)
+        markdown = cls.get_cached(key)
+        if markdown is not None:
+            logger.info(f"使用文档转换缓存: {file_path}")
+            return markdown
+
+        timeout = float(config.get("read_file.conversion_timeout", 120))
+        async with cls._get_slots():
+            worker = await asyncio.to_thread(cls._acquire_worker)
+            try:
+                markdown = await asyncio.wait_for(
+                    asyncio.to_thread(worker.run, str(file_path), extension, offset, limit), timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"文档转换超时 ({timeout}s)，终止转换进程: {file_path}")
+                worker.kill()
+                raise TimeoutError(f"文档转换超时（超过 {timeout:.0f} 秒）")
+            except asyncio.CancelledError:
+                logger.info(f"文档转换已取消，终止转换进程: {file_path}")
+                worker.kill()
+                raise
+            except ConversionWorkerError:
+                logger.error(f"文档转换进程异常退出: {file_path}")
+                worker.kill()
+                raise
+            except BaseException:
+                # 转换本身失败（如文件格式错误），工作进程仍可复用
+                cls._release_worker(worker)
+                raise
+            cls._release_worker(worker)
+
+        # 转换期间文件被修改时不缓存，避免缓存键与内容不一致
+        if get_conversion_key(file_path, extension, offset, limit) == key:
+            cls._put_cache(key, markdown)
+        return markdown
@@ -0,0 +1,198 @@
+"""
+文本文件行偏移索引模块
+
+为大文本文件建立稀疏的行号 -> 字节偏移索引，按行范围读取时可以直接定位到目标行附近，
+无需从文件开头逐行扫描。索引按 (路径, 大小, 修改时间) 校验，持久化到缓存目录，进程重启后仍可复用。
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from agentlang.logger import get_logger
+from app.paths import PathManager
+
+logger = get_logger(__name__)
+
+# 索引格式版本，格式变化时递增以使旧索引失效
+LINE_INDEX_VERSION = 1
+# 每隔多少行记录一个字节偏移
+LINE_INDEX_STRIDE = 1000
+# 小于该大小的文件直接顺序扫描，不建立索引
+LINE_INDEX_MIN_FILE_SIZE = 1024 * 1024
+# 建立索引时每次读取的字节数
+LINE_INDEX_READ_CHUNK_SIZE = 1024 * 1024
+# 持久化目录名（位于缓存目录下）
+LINE_INDEX_DIR_NAME = "line_index"
+# 内存中保留的索引数量
+LINE_INDEX_MEMORY_CACHE_SIZE = 64
+
+
+@dataclass
+class LineOffsetIndex:
+    """稀疏行偏移索引：offsets[i] 为第 i * stride 行（从0开始）的起始字节偏移"""
+    path: str
+    size: int
+    mtime_ns: int
+    total_lines: int
+    stride: int = LINE_INDEX_STRIDE
+    offsets: List[int] = field(default_factory=list)
+
+    def locate(self, line: int) -> Tuple[int, int]:
+        """
+        获取不晚于目标行的最近检查点
+
+        Args:
+            line: 目标行号（从0开始）
+
+        Returns:
+            Tuple[int, int]: (检查点行号, 检查点字节偏移)
+        """
+        checkpoint = min(max(line, 0) // self.stride, len(self.offsets) - 1)
+        return checkpoint * self.stride, self.offsets[checkpoint]
+
+    def matches(self, stat_result: os.stat_result) -> bool:
+        """判断索引是否与文件当前状态一致"""
+        return self.size == stat_result.st_size and self.mtime_ns == stat_result.st_mtime_ns
+
+
+def build_line_offset_index(file_path: Path, stat_result: os.stat_result) -> LineOffsetIndex:
+    """按块扫描文件建立行偏移索引，内存占用与文件大小无关"""
+    stride = LINE_INDEX_STRIDE
+    offsets = [0]
+    line_count = 0
+    position = 0
+    last_byte = b""
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(LINE_INDEX_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            start = 0
+            while True:
+                newline = chunk.find(b"\n", start)
+                if newline < 0:
+                    break
+                line_count += 1
+                if line_count % stride == 0:
+                    offsets.append(position + newline + 1)
+                start = newline + 1
+            position += len(chunk)
+            last_byte = chunk[-1:]
+
+    # 最后一行没有换行符时也算一行
+    total_lines = line_count + (1 if position and last_byte != b"\n" else 0)
+    # 文件以换行结尾且行数恰为 stride 整数倍时，最后一个检查点指向文件末尾，不对应任何行
+    if len(offsets) > 1 and offsets[-1] >= position:
+        offsets.pop()
+    return LineOffsetIndex(
+        path=os.path.abspath(file_path),
+        size=stat_result.st_size,
+        mtime_ns=stat_result.st_mtime_ns,
+        total_lines=total_lines,
+        stride=stride,
+        offsets=offsets,
+    )
+
+
+class LineOffsetIndexCache:
+    """行偏移索引缓存：内存 LRU + 缓存目录下的持久化文件"""
+    _indexes: "OrderedDict[str, LineOffsetIndex]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @classmethod
+    def _get_index_file(cls, abs_path: str) -> Path:
+        """获取索引的持久化文件路径"""
+        path_hash = hashlib.sha256(abs_path.encode("utf-8")).hexdigest()
+        return PathManager.get_cache_dir() / LINE_INDEX_DIR_NAME / f"{path_hash}.json"
+
+    @classmethod
+    def _load(cls, abs_path: str, stat_result: os.stat_result) -> Optional[LineOffsetIndex]:
+        """从持久化文件加载索引，文件不存在或已过期时返回 None"""
+        index_file = cls._get_index_file(abs_path)
+        try:
+            with open(index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.debug(f"读取行偏移索引失败: {index_file}, 错误: {e}")
+            return None
+
+        if data.get("version") != LINE_INDEX_VERSION or data.get("path") != abs_path:
+            return None
+        try:
+            index = LineOffsetIndex(
+                path=abs_path,
+                size=data["size"],
+                mtime_ns=data["mtime_ns"],
+                total_lines=data["total_lines"],
+                stride=data["stride"],
+                offsets=data["offsets"],
+            )
+        except (KeyError, TypeError):
+            return None
+        return index if index.matches(stat_result) and index.offsets else None
+
+    @classmethod
+    def _save(cls, index: LineOffsetIndex) -> None:
+        """持久化索引，写入临时文件后原子替换"""
+        index_file = cls._get_index_file(index.path)
+        temp_file = index_file.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            index_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": LINE_INDEX_VERSION,
+                    "path": index.path,
+                    "size": index.size,
+                    "mtime_ns": index.mtime_ns,
+                    "total_lines": index.total_lines,
+                    "stride": index.stride,
+                    "offsets": index.offsets,
+                }, f)
+            os.replace(temp_file, index_file)
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"保存行偏移索引失败: {index_file}, 错误: {e}")
+
+    @classmethod
+    def get(cls, file_path: Path, stat_result: Optional[os.stat_result] = None) -> Optional[LineOffsetIndex]:
+        """
+        获取文件的行偏移索引，必要时建立并持久化
+
+        Args:
+            file_path: 文件路径
+            stat_result: 调用方已获取的 stat 结果，可选
+
+        Returns:
+            Optional[LineOffsetIndex]: 行偏移索引，文件小于 LINE_INDEX_MIN_FILE_SIZE 时返回 None
+        """
+        stat_result = stat_result or os.stat(file_path)
+        if stat_result.st_size < LINE_INDEX_MIN_FILE_SIZE:
+            return None
+
+        abs_path = os.path.abspath(file_path)
+        with cls._lock:
+            index = cls._indexes.get(abs_path)
+            if index is not None and index.matches(stat_result):
+                cls._indexes.move_to_end(abs_path)
+                return index
+
+        index = cls._load(abs_path, stat_result)
+        if index is None:
+            index = build_line_offset_index(file_path, stat_result)
+            # 建立索引期间文件被修改时不持久化
+            if index.matches(os.stat(file_path)):
+                cls._save(index)
+            logger.info(f"已建立行偏移索引: {abs_path}，共 {index.total_lines} 行")
+
+        with cls._lock:
+            cls._indexes[abs_path] = index
+            cls._indexes.move_to_end(abs_path)
+            while len(cls._indexes) > LINE_INDEX_MEMORY_CACHE_SIZE:
+                cls._indexes.popitem(last=False)
+        return index
@@ -1,21 +1,13 @@
-import io  # 导入 io 模块
 from pathlib import Path
 
-import aiofiles
-from markitdown import MarkItDown, StreamInfo
-
 from agentlang.logger import get_logger
-from app.tools.markitdown_plugins.pdf_plugin import PDFConverter
+from app.utils.document_converter import DocumentConverter
 
 logger = get_logger(__name__)
 
-# Initialize MarkItDown instance here to reuse it
-md = MarkItDown()
-md.register_converter(PDFConverter()) # Register only PDF for this util
-
 async def convert_pdf_locally(pdf_path: Path) -> str | None:
     """
-    使用 MarkItDown 将本地 PDF 文件转换为 Markdown 文本。
+    使用 MarkItDown 将本地 PDF 文件转换为 Markdown 文本，转换在独立进程中执行。
 
     不再负责文件写入。
 
@@ -28,28 +20,15 @@ async def convert_pdf_locally(pdf_path: Path) -> str | None:
     logger.info(f"开始本地 PDF 到文本转换: {pdf_path}")
 
     try:
-        # 1. 异步读取整个 PDF 文件内容到内存
-        async with aiofiles.open(pdf_path, "rb") as f:
-            pdf_content_bytes = await f.read()
-
-        # 2. 将内存中的 bytes 包装成 BytesIO 对象
-        pdf_stream = io.BytesIO(pdf_content_bytes)
-
-        # 3. 将 BytesIO 对象传递给 MarkItDown 进行转换
-        # MarkItDown/Magika 需要同步的 BinaryIO
-        result = md.convert(
-            pdf_stream,
-            stream_info=StreamInfo(extension='.pdf', mimetype='application/pdf'),
-            offset=0,
-            limit=-1
-        )
-
-        if not result or not result.markdown:
+        # 在进程池中执行转换，避免阻塞事件循环；源文件未变化时直接命中缓存
+        markdown = await DocumentConverter.convert(pdf_path, ".pdf")
+
+        if not markdown:
             logger.error(f"本地 PDF 转换失败（MarkItDown 未返回内容）: {pdf_path}")
             return None
 
         logger.info(f"本地 PDF 到文本转换成功: {pdf_path}")
-        return result.markdown # 直接返回文本内容
+        return markdown # 直接返回文本内容
 
     except FileNotFoundError:
         logger.error(f"本地 PDF 到文本转换失败：源文件未找到 {pdf_path}")
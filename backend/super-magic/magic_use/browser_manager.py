@@ -8,15 +8,32 @@
 import asyncio
 import logging
 import os
-from typing import Dict, Optional
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set
 
-from playwright.async_api import Browser, BrowserContext, async_playwright
+from playwright.async_api import Browser, BrowserContext, Page, async_playwright
 
+from magic_use.js_loader import JSLoader
 from magic_use.magic_browser_config import MagicBrowserConfig
+from magic_use.request_policy import RequestInterceptor, StaticAssetCache
 
 # 设置日志
 logger = logging.getLogger(__name__)
 
+# 上下文池维护任务的检查间隔（秒）
+POOL_MAINTENANCE_INTERVAL = 5.0
+
+
+@dataclass
+class PooledContext:
+    """上下文池中的空闲上下文"""
+    context_id: str
+    context: BrowserContext
+    config: MagicBrowserConfig
+    page: Optional[Page]  # 预先创建的空白页面
+    idle_since: float
+
 
 class BrowserManager:
     """浏览器管理器，负责全局浏览器实例和上下文的生命周期管理"""
@@ -44,6 +61,26 @@ class BrowserManager:
         self._lock = asyncio.Lock()  # 用于保护并发初始化
         self._storage_save_tasks = {}  # 存储状态定期保存任务
         self._client_refs = 0  # 客户端引用计数
+        self._js_preinjected_contexts: Set[str] = set()  # 已注册 JS 打包脚本的上下文ID
+        self._request_interceptors: Dict[str, RequestInterceptor] = {}  # 上下文ID到请求拦截器的映射
+        self._asset_cache = StaticAssetCache()  # 静态资源缓存，本浏览器的所有上下文共享
+        self._context_configs: Dict[str, MagicBrowserConfig] = {}  # 上下文ID到创建时所用配置的映射
+
+        # 预热上下文池
+        self._idle_contexts: List[PooledContext] = []  # 空闲的预热上下文
+        self._pool_lock = asyncio.Lock()  # 保护上下文池的并发访问
+        self._pool_task: Optional[asyncio.Task] = None  # 上下文池维护任务
+        self._pool_wakeup = asyncio.Event()  # 唤醒维护任务立即补充上下文池
+        self._warm_pages: Dict[str, Page] = {}  # 上下文ID到预创建页面的映射，供首次 new_page 使用
+        self._acquired_at: Dict[str, float] = {}  # 上下文ID到取用时间的映射，用于统计首次导航耗时
+        self._last_client_release = 0.0  # 最后一个客户端注销的时间
+        self._pool_metrics: Dict[str, float] = {
+            "hits": 0,
+            "misses": 0,
+            "first_navigation_count": 0,
+            "first_navigation_total": 0.0,
+            "first_navigation_max": 0.0,
+        }
 
         BrowserManager._initialized = True
 
@@ -56,7 +93,8 @@ class BrowserManager:
     async def unregister_client(self) -> None:
         """注销浏览器客户端，减少引用计数
 
-        当引用计数归零时，自动关闭浏览器实例
+        当引用计数归零时，自动关闭浏览器实例；启用上下文池时浏览器和空闲上下文
+        保留到空闲超时后由维护任务关闭，供下一个任务直接复用
         """
         async with self._lock:
             if self._client_refs > 0:
@@ -64,9 +102,17 @@ class BrowserManager:
 
             logger.debug(f"注销浏览器客户端，当前引用数: {self._client_refs}")
 
+            if self._client_refs > 0 or not self._initialized:
+                return
+
+            if self._is_pool_enabled() and self.config.context_pool_idle_ttl > 0:
+                self._last_client_release = time.monotonic()
+                self._ensure_pool_task()
+                logger.debug(f"无活跃客户端，浏览器将在空闲 {self.config.context_pool_idle_ttl} 秒后关闭")
+                return
+
             # 如果没有活跃客户端，则自动关闭浏览器
-            if self._client_refs == 0 and self._initialized:
-                await self.close()
+            await self.close()
 
     async def initialize(self, config: MagicBrowserConfig = None) -> None:
         """初始化浏览器实例
@@ -202,8 +248,28 @@ class BrowserManager:
         except Exception as e:
             logger.error(f"注入反指纹JS脚本失败: {e}")
 
+        # 注册 JS 模块打包脚本，页面每次导航时自动执行，后续操作无需探测和注入模块
+        if context_config.preinject_js_modules:
+            try:
+                await context.add_init_script(JSLoader.get_bundle_script())
+                self._js_preinjected_contexts.add(context_id)
+                logger.debug(f"已为上下文 {context_id} 注册 JS 模块打包脚本: {JSLoader.get_bundle_modules()}")
+            except Exception as e:
+                logger.error(f"注册 JS 模块打包脚本失败，将回退为按需注入: {e}")
+
+        # 按请求拦截策略拦截不需要的资源
+        if context_config.request_policy:
+            try:
+                interceptor = RequestInterceptor(context_config.request_policy, self._asset_cache)
+                await context.route("**/*", interceptor.handle)
+                self._request_interceptors[context_id] = interceptor
+                logger.debug(f"已为上下文 {context_id} 启用请求拦截策略")
+            except Exception as e:
+                logger.error(f"启用请求拦截策略失败: {e}")
+
         # 注册上下文
         self._contexts[context_id] = context
+        self._context_configs[context_id] = context_config
 
         # 设置定期保存存储状态的任务
         if context_config.storage_state_file:
@@ -213,11 +279,266 @@ class BrowserManager:
         logger.info(f"已创建浏览器上下文: {context_id}")
         return context_id, context
 
+    def _is_pool_enabled(self) -> bool:
+        """判断是否启用了预热上下文池"""
+        return self._initialized and self.config.context_pool_max_size > 0
+
+    def _ensure_pool_task(self) -> None:
+        """启动上下文池维护任务（如未运行）"""
+        if self._pool_task is None or self._pool_task.done():
+            self._pool_task = asyncio.create_task(self._pool_maintenance_loop())
+
+    async def acquire_context(self, config: Optional[MagicBrowserConfig] = None) -> tuple[str, BrowserContext]:
+        """为任务获取浏览器上下文，优先从预热上下文池中取用
+
+        启用上下文池时，配置相同的空闲上下文直接取出（命中），否则新建上下文（未命中），
+        取用后唤醒维护任务在后台补充上下文池。未启用时等同于 get_context。
+
+        Args:
+            config: 浏览器配置，如果为None则使用管理器的默认配置
+
+        Returns:
+            tuple: (上下文ID, 上下文对象)
+        """
+        if not self._initialized:
+            await self.initialize(config)
+
+        if not self._is_pool_enabled():
+            return await self.get_context(config)
+
+        context_config = config or self.config
+        pooled: Optional[PooledContext] = None
+        async with self._pool_lock:
+            for index, item in enumerate(self._idle_contexts):
+                if item.config == context_config and item.context_id in self._contexts:
+                    pooled = self._idle_contexts.pop(index)
+                    break
+
+        if pooled:
+            self._pool_metrics["hits"] += 1
+            context_id, context = pooled.context_id, pooled.context
+            if pooled.page and not pooled.page.is_closed():
+                self._warm_pages[context_id] = pooled.page
+            logger.info(f"从上下文池取用上下文: {context_id}，{self._format_pool_metrics()}")
+        else:
+            self._pool_metrics["misses"] += 1
+            context_id, context = await self.get_context(context_config)
+            logger.info(f"上下文池未命中，已新建上下文: {context_id}，{self._format_pool_metrics()}")
+
+        self._acquired_at[context_id] = time.monotonic()
+        self._ensure_pool_task()
+        self._pool_wakeup.set()
+        return context_id, context
+
+    def take_warm_page(self, context_id: str) -> Optional[Page]:
+        """取出上下文中预先创建的页面，不存在或已关闭时返回 None
+
+        Args:
+            context_id: 上下文ID
+
+        Returns:
+            Optional[Page]: 预创建的页面
+        """
+        page = self._warm_pages.pop(context_id, None)
+        if page and not page.is_closed():
+            return page
+        return None
+
+    async def release_context(self, context_id: str) -> None:
+        """任务结束时归还上下文
+
+        未启用上下文池时不做处理，上下文随浏览器一起关闭（保持原有行为）。
+        启用时按 context_pool_reset_between_tasks 处理：
+        - True：保存存储状态后关闭上下文，由维护任务以最新存储状态重新预热，任务之间互不影响
+        - False：关闭上下文中的页面后放回上下文池，保留 cookie 和缓存，复用成本最低
+
+        Args:
+            context_id: 上下文ID
+        """
+        self._acquired_at.pop(context_id, None)
+        warm_page = self._warm_pages.pop(context_id, None)
+        if not self._is_pool_enabled():
+            return
+
+        context = self._contexts.get(context_id)
+        if not context:
+            return
+
+        if self.config.context_pool_reset_between_tasks:
+            await self.close_context(context_id)
+            self._pool_wakeup.set()
+            return
+
+        try:
+            for page in list(context.pages):
+                if page is not warm_page:
+                    await page.close()
+            if warm_page is None or warm_page.is_closed():
+                warm_page = await context.new_page()
+        except Exception as e:
+            logger.warning(f"重置上下文 {context_id} 失败，直接关闭: {e}")
+            await self.close_context(context_id)
+            return
+
+        async with self._pool_lock:
+            if len(self._idle_contexts) < self.config.context_pool_max_size:
+                self._idle_contexts.append(PooledContext(
+                    context_id=context_id,
+                    context=context,
+                    config=self._context_configs.get(context_id, self.config),
+                    page=warm_page,
+                    idle_since=time.monotonic(),
+                ))
+                logger.debug(f"上下文 {context_id} 已放回上下文池，空闲数: {len(self._idle_contexts)}")
+                return
+        await self.close_context(context_id)
+
+    def record_navigation(self, context_id: Optional[str]) -> None:
+        """记录导航完成，上下文取用后的首次导航计入首次导航耗时指标
+
+        Args:
+            context_id: 发生导航的上下文ID
+        """
+        acquired_at = self._acquired_at.pop(context_id, None) if context_id else None
+        if acquired_at is None:
+            return
+        elapsed = time.monotonic() - acquired_at
+        self._pool_metrics["first_navigation_count"] += 1
+        self._pool_metrics["first_navigation_total"] += elapsed
+        self._pool_metrics["first_navigation_max"] = max(self._pool_metrics["first_navigation_max"], elapsed)
+        logger.info(f"上下文 {context_id} 首次导航耗时 {elapsed:.3f} 秒，{self._format_pool_metrics()}")
+
+    def get_pool_metrics(self) -> Dict[str, Any]:
+        """获取上下文池指标
+
+        Returns:
+            Dict[str, Any]: 命中数、未命中数、命中率、空闲上下文数和首次导航耗时统计（秒）
+        """
+        hits = int(self._pool_metrics["hits"])
+        misses = int(self._pool_metrics["misses"])
+        navigation_count = int(self._pool_metrics["first_navigation_count"])
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "idle_contexts": len(self._idle_contexts),
+            "first_navigation_count": navigation_count,
+            "first_navigation_avg": (
+                self._pool_metrics["first_navigation_total"] / navigation_count if navigation_count else 0.0
+            ),
+            "first_navigation_max": self._pool_metrics["first_navigation_max"],
+        }
+
+    def _format_pool_metrics(self) -> str:
+        """格式化上下文池指标，用于日志输出"""
+        metrics = self.get_pool_metrics()
+        return (
+            f"上下文池 命中/未命中: {metrics['hits']}/{metrics['misses']}，空闲: {metrics['idle_contexts']}，"
+            f"首次导航平均耗时: {metrics['first_navigation_avg']:.3f} 秒"
+        )
+
+    async def _create_pooled_context(self) -> None:
+        """新建一个带空白页面的上下文并放入上下文池"""
+        context_id, context = await self.get_context(self.config)
+        page = None
+        try:
+            page = await context.new_page()
+        except Exception as e:
+            logger.warning(f"上下文 {context_id} 预创建页面失败: {e}")
+        async with self._pool_lock:
+            self._idle_contexts.append(PooledContext(
+                context_id=context_id,
+                context=context,
+                config=self.config,
+                page=page,
+                idle_since=time.monotonic(),
+            ))
+        logger.debug(f"已预热上下文: {context_id}，空闲数: {len(self._idle_contexts)}")
+
+    async def _maintain_pool(self) -> bool:
+        """执行一次上下文池维护：淘汰超时的空闲上下文、补充到最小数量、空闲超时后关闭浏览器
+
+        Returns:
+            bool: 浏览器仍在运行时返回 True，已关闭时返回 False
+        """
+        now = time.monotonic()
+        ttl = self.config.context_pool_idle_ttl
+        min_size = min(self.config.context_pool_min_size, self.config.context_pool_max_size)
+
+        # 没有活跃客户端且空闲超时，关闭浏览器
+        if self._client_refs == 0 and ttl > 0 and now - self._last_client_release >= ttl:
+            async with self._lock:
+                if self._client_refs == 0 and self._initialized:
+                    logger.info(f"浏览器空闲超过 {ttl} 秒，关闭浏览器")
+                    await self.close()
+            return self._initialized
+
+        # 淘汰超过空闲时间的上下文，但保留最小数量
+        expired: List[PooledContext] = []
+        async with self._pool_lock:
+            if ttl > 0:
+                for item in list(self._idle_contexts):
+                    if len(self._idle_contexts) <= min_size:
+                        break
+                    if now - item.idle_since >= ttl:
+                        self._idle_contexts.remove(item)
+                        expired.append(item)
+            missing = min_size - len(self._idle_contexts)
+        for item in expired:
+            await self.close_context(item.context_id)
+
+        for _ in range(max(missing, 0)):
+            try:
+                await self._create_pooled_context()
+            except Exception as e:
+                logger.error(f"预热浏览器上下文失败: {e}")
+                break
+        return True
+
+    async def _pool_maintenance_loop(self) -> None:
+        """上下文池维护任务，被唤醒或定期执行维护，浏览器关闭后退出"""
+        try:
+            while self._initialized:
+                if not await self._maintain_pool():
+                    break
+                try:
+                    await asyncio.wait_for(self._pool_wakeup.wait(), timeout=POOL_MAINTENANCE_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._pool_wakeup.clear()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"上下文池维护任务失败: {e}")
+
     def _generate_context_id(self) -> str:
         """生成唯一的上下文ID"""
         self._context_counter += 1
         return f"ctx_{self._context_counter}"
 
+    def get_request_stats(self, context_id: str) -> Optional[Dict[str, int]]:
+        """获取上下文的请求拦截统计
+
+        Args:
+            context_id: 上下文ID
+
+        Returns:
+            Optional[Dict[str, int]]: 放行、拦截、超限和静态资源缓存命中数，未启用拦截时返回 None
+        """
+        interceptor = self._request_interceptors.get(context_id)
+        return dict(interceptor.stats) if interceptor else None
+
+    def is_js_preinjected(self, context_id: Optional[str]) -> bool:
+        """判断上下文是否已注册 JS 模块打包脚本
+
+        Args:
+            context_id: 上下文ID
+
+        Returns:
+            bool: 是否已注册
+        """
+        return context_id in self._js_preinjected_contexts
+
     async def get_context_by_id(self, context_id: str) -> Optional[BrowserContext]:
         """根据ID获取浏览器上下文
 
@@ -302,6 +623,11 @@ class BrowserManager:
 
             # 从字典中移除上下文ID
             self._contexts.pop(context_id, None)
+            self._js_preinjected_contexts.discard(context_id)
+            self._context_configs.pop(context_id, None)
+            interceptor = self._request_interceptors.pop(context_id, None)
+            if interceptor:
+                logger.info(f"上下文 {context_id} 请求拦截统计: {interceptor.stats}")
 
             # 关闭上下文
             try:
@@ -321,6 +647,16 @@ class BrowserManager:
             return
 
         try:
+            # 停止上下文池维护任务（维护任务自身触发关闭时不取消自己）
+            pool_task = self._pool_task
+            self._pool_task = None
+            if pool_task and pool_task is not asyncio.current_task() and not pool_task.done():
+                pool_task.cancel()
+            self._idle_contexts.clear()
+            self._warm_pages.clear()
+            self._acquired_at.clear()
+            self._asset_cache.clear()
+
             # 关闭所有上下文
             context_ids = list(self._contexts.keys())
             for context_id in context_ids:
@@ -3,6 +3,9 @@ JavaScript 加载管理模块
 
 负责 JavaScript 代码的加载、依赖解析和执行，
 为浏览器页面提供 JS 功能支持。
+
+所有模块会按依赖顺序打包为一个脚本，由 BrowserManager 通过 context.add_init_script 注册，
+页面每次导航时自动执行，浏览器操作无需再逐个探测和注入模块。
 """
 
 import glob
@@ -17,25 +20,36 @@ from playwright.async_api import Page
 # 设置日志
 logger = logging.getLogger(__name__)
 
+# JS文件目录路径
+JS_DIR = Path(__file__).parent / "js"
+
 
 class JSLoader:
     """JavaScript加载器，负责加载和管理JS代码"""
 
-    def __init__(self, page: Page):
+    # 打包后的预注入脚本及其包含的模块（按依赖顺序），进程内只构建一次
+    _bundle_script: Optional[str] = None
+    _bundle_modules: List[str] = []
+
+    def __init__(self, page: Page, preinjected: bool = False):
         """初始化JS加载器
 
         Args:
             page: Playwright页面对象
+            preinjected: 页面所属上下文是否已通过 init script 预注入了打包脚本
         """
         self.page = page
         self._js_code = {}    # 存储各模块代码
-        self._js_dir = Path(__file__).parent / "js"  # JS文件目录路径
+        self._js_dir = JS_DIR  # JS文件目录路径
         self._loading_modules = set()  # 正在加载中的模块，用于检测循环依赖
+        # 已预注入的模块无需探测和注入
+        self._preinjected_modules: Set[str] = set(self.get_bundle_modules()) if preinjected else set()
 
         # 确保JS目录存在
         os.makedirs(self._js_dir, exist_ok=True)
 
-    async def _parse_dependencies(self, js_code: str) -> List[str]:
+    @staticmethod
+    def _parse_dependency_names(js_code: str) -> List[str]:
         """从JS代码中解析依赖声明
 
         查找类似 // @depends: module1, module2 的注释
@@ -61,6 +75,79 @@ class JSLoader:
 
         return dependencies
 
+    async def _parse_dependencies(self, js_code: str) -> List[str]:
+        """从JS代码中解析依赖声明，见 _parse_dependency_names"""
+        return self._parse_dependency_names(js_code)
+
+    @classmethod
+    def _build_bundle(cls) -> None:
+        """读取 js 目录下的所有模块，按依赖顺序打包为单个脚本"""
+        sources: Dict[str, str] = {}
+        for js_file in sorted(glob.glob(str(JS_DIR / "*.js"))):
+            sources[Path(js_file).stem] = Path(js_file).read_text(encoding="utf-8")
+
+        ordered: List[str] = []
+        visiting: Set[str] = set()
+
+        def visit(module_name: str) -> None:
+            if module_name in ordered:
+                return
+            if module_name in visiting:
+                raise ValueError(f"检测到循环依赖: {module_name}")
+            if module_name not in sources:
+                raise FileNotFoundError(f"JavaScript模块文件不存在: {JS_DIR / f'{module_name}.js'}")
+            visiting.add(module_name)
+            for dep in cls._parse_dependency_names(sources[module_name]):
+                visit(dep)
+            visiting.remove(module_name)
+            ordered.append(module_name)
+
+        for module_name in sources:
+            visit(module_name)
+
+        module_scripts = []
+        for module_name in ordered:
+            module_scripts.append(f"""
+    // ===== {module_name}.js =====
+    try {{
+        (function() {{
+            {sources[module_name]}
+        }})();
+        window.MagicUse['{module_name}'] = true;
+    }} catch (error) {{
+        console.error('执行模块 {module_name} 代码出错:', error);
+    }}""")
+
+        # 只在顶层页面执行，与按需注入时的行为保持一致
+        cls._bundle_script = f"""
+(function() {{
+    if (window.top !== window) {{
+        return;
+    }}
+    window.SuperMagic = window.SuperMagic || {{
+        'version': '0.0.1',
+    }};
+    window.MagicUse = window.MagicUse || {{}};
+{"".join(module_scripts)}
+}})();
+"""
+        cls._bundle_modules = ordered
+        logger.info(f"JavaScript模块已打包: {ordered}，共 {len(cls._bundle_script)} 字符")
+
+    @classmethod
+    def get_bundle_script(cls) -> str:
+        """获取打包后的预注入脚本（用于 context.add_init_script）"""
+        if cls._bundle_script is None:
+            cls._build_bundle()
+        return cls._bundle_script
+
+    @classmethod
+    def get_bundle_modules(cls) -> List[str]:
+        """获取预注入脚本中包含的模块"""
+        if cls._bundle_script is None:
+            cls._build_bundle()
+        return cls._bundle_modules
+
     async def load_module(self, module_name: str, force_reload: bool = False) -> bool:
         """加载JavaScript模块，默认情况下仅在模块不存在时加载
         支持自动加载依赖模块
@@ -73,6 +160,10 @@ class JSLoader:
             bool: 模块是否成功加载
         """
         try:
+            # 预注入的模块已在页面导航时执行，无需探测
+            if not force_reload and module_name in self._preinjected_modules:
+                return True
+
             # 检测循环依赖
             if module_name in self._loading_modules:
                 logger.error(f"检测到循环依赖: {module_name}")
@@ -6,14 +6,16 @@
 """
 
 import asyncio
+import dataclasses
 import glob
 import logging
 import os
 import re
 import tempfile
 import uuid
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union, Literal
+from typing import Any, Dict, List, Optional, Tuple, Union, Literal
 
 from pydantic import BaseModel, Field
 from playwright.async_api import Page, Error as PlaywrightError
@@ -22,6 +24,7 @@ from agentlang.utils.file import safe_delete
 from magic_use.browser_manager import BrowserManager
 from magic_use.magic_browser_config import MagicBrowserConfig
 from magic_use.page_registry import PageRegistry, PageState
+from magic_use.request_policy import RequestPolicy
 
 # 设置日志
 logger = logging.getLogger(__name__)
@@ -105,6 +108,56 @@ MagicBrowserResult = Union[
 
 # --- End DTO Definitions ---
 
+# 内容提取结果缓存的最大条目数（每个 MagicBrowser 实例）
+EXTRACTION_CACHE_SIZE = 32
+
+# 页面内 DOM 版本探测脚本：首次执行时安装 MutationObserver，DOM 变化或表单输入时递增版本号。
+# token 在每次文档加载时随机生成，用于区分同一 URL 的不同文档实例；
+# 忽略 MagicTouch 写入的 magic-touch-id 属性和 MagicMarker 的标记层，避免提取和标记操作本身使版本失效。
+DOM_VERSION_SCRIPT = """
+() => {
+    if (!window.__magicDomState) {
+        const state = { token: Math.random().toString(36).slice(2) + Date.now().toString(36), version: 0 };
+        const isMarkerNode = (node) => !!node && (
+            node.id === 'magic-marker-host' ||
+            (node.nodeType === 1 && typeof node.closest === 'function' && node.closest('#magic-marker-host') !== null)
+        );
+        const onMutations = (records) => {
+            for (const record of records) {
+                if (record.type === 'attributes' && record.attributeName === 'magic-touch-id') continue;
+                if (isMarkerNode(record.target)) continue;
+                if (record.type === 'childList') {
+                    const nodes = [...record.addedNodes, ...record.removedNodes];
+                    if (nodes.length > 0 && nodes.every(isMarkerNode)) continue;
+                }
+                state.version++;
+                return;
+            }
+        };
+        try {
+            new MutationObserver(onMutations).observe(document, {
+                subtree: true, childList: true, attributes: true, characterData: true
+            });
+        } catch (e) {
+            state.token = null;
+        }
+        const onInput = () => { state.version++; };
+        document.addEventListener('input', onInput, true);
+        document.addEventListener('change', onInput, true);
+        window.__magicDomState = state;
+    }
+    const state = window.__magicDomState;
+    return {
+        token: state.token,
+        version: state.version,
+        scroll_x: Math.round(window.scrollX),
+        scroll_y: Math.round(window.scrollY),
+        width: window.innerWidth,
+        height: window.innerHeight
+    };
+}
+"""
+
 
 class MagicBrowser:
     """浏览器控制类
@@ -127,8 +180,11 @@ class MagicBrowser:
         self._active_context_id: Optional[str] = None
         self._active_page_id: Optional[str] = None
         self._managed_page_ids: set[str] = set()
+        self._acquired_context_ids: set[str] = set()  # 从 BrowserManager 取用的上下文，关闭时归还
         self._initialized: bool = False
         self._temp_files: List[Path] = [] # 用于管理临时截图文件
+        # 内容提取结果缓存，键为 (操作, 页面ID, URL, 文档token, DOM版本, 范围, 视口位置)
+        self._extraction_cache: "OrderedDict[Tuple, Any]" = OrderedDict()
 
         # --- 临时截图目录 ---
         self._TEMP_SCREENSHOT_DIR: Optional[Path] = None
@@ -158,9 +214,10 @@ class MagicBrowser:
             # 注册为浏览器客户端
             await self._browser_manager.register_client()
 
-            # 创建默认上下文
-            context_id, _ = await self._browser_manager.get_context(self.config)
+            # 获取默认上下文（启用上下文池时优先取用预热的上下文）
+            context_id, _ = await self._browser_manager.acquire_context(self.config)
             self._active_context_id = context_id
+            self._acquired_context_ids.add(context_id)
 
             self._initialized = True
             logger.info("MagicBrowser 初始化完成")
@@ -173,12 +230,20 @@ class MagicBrowser:
         if not self._initialized:
             await self.initialize()
 
-    async def new_context(self) -> str:
-        """创建新的浏览器上下文并设为活动"""
+    async def new_context(self, request_policy: Optional[RequestPolicy] = None) -> str:
+        """创建新的浏览器上下文并设为活动
+
+        Args:
+            request_policy: 该上下文使用的请求拦截策略，为 None 时沿用实例配置
+        """
         await self._ensure_initialized()
         try:
-            context_id, _ = await self._browser_manager.get_context(self.config)
+            context_config = self.config
+            if request_policy is not None:
+                context_config = dataclasses.replace(self.config, request_policy=request_policy)
+            context_id, _ = await self._browser_manager.acquire_context(context_config)
             self._active_context_id = context_id
+            self._acquired_context_ids.add(context_id)
             logger.info(f"创建新上下文并设为活动: {context_id}")
             return context_id
         except Exception as e:
@@ -198,7 +263,8 @@ class MagicBrowser:
             if not context:
                 raise ValueError(f"上下文不存在: {use_context_id}")
 
-            page = await context.new_page()
+            # 优先使用上下文池预先创建的页面
+            page = self._browser_manager.take_warm_page(use_context_id) or await context.new_page()
             page_id = await self._page_registry.register_page(page, use_context_id)
             self._managed_page_ids.add(page_id)
             self._active_page_id = page_id
@@ -212,6 +278,20 @@ class MagicBrowser:
             logger.error(f"创建页面失败: {e}", exc_info=True)
             raise # 页面创建失败视为严重错误
 
+    async def close_page(self, page_id: str) -> None:
+        """关闭并注销指定页面，关闭的是活动页面时清除活动页面ID"""
+        page = await self._page_registry.get_page_by_id(page_id)
+        try:
+            if page:
+                await page.close()
+        except Exception as e:
+            logger.warning(f"关闭页面 {page_id} 时出现错误: {e}")
+        finally:
+            await self._page_registry.unregister_page(page_id)
+            self._managed_page_ids.discard(page_id)
+            if self._active_page_id == page_id:
+                self._active_page_id = None
+
     async def ensure_js_module_loaded(self, page_id: str, module_names: Union[str, List[str]]) -> Dict[str, bool]:
         """确保指定页面加载了JS模块
 
@@ -224,6 +304,57 @@ class MagicBrowser:
         """
         return await self._page_registry.ensure_js_module_loaded(page_id, module_names)
 
+    async def _evaluate_module_script(self, page: Page, page_id: str, module_name: str, script: str) -> Any:
+        """执行依赖 JS 模块的脚本
+
+        模块通常已由上下文的预注入脚本加载；脚本返回 module_missing 时（如预注入脚本执行失败），
+        强制注入模块后重试一次。
+        """
+        result = await page.evaluate(script)
+        if isinstance(result, dict) and result.get("module_missing"):
+            logger.warning(f"页面 {page_id} 中 JS 模块 '{module_name}' 不存在，强制重新注入")
+            load_result = await self._page_registry.ensure_js_module_loaded(page_id, [module_name], force_reload=True)
+            if not load_result.get(module_name):
+                return {"error": f"加载JS模块 '{module_name}' 失败"}
+            result = await page.evaluate(script)
+        return result
+
+    async def _get_extraction_cache_key(self, page: Page, page_id: str, operation: str, scope: str) -> Optional[Tuple]:
+        """获取内容提取结果的缓存键，页面不支持 DOM 版本探测时返回 None
+
+        视口范围的结果与滚动位置和视口尺寸相关，一并计入缓存键，滚动回已读取过的位置时可直接复用。
+        """
+        try:
+            state = await page.evaluate(DOM_VERSION_SCRIPT)
+        except Exception as e:
+            logger.debug(f"探测页面 {page_id} DOM 版本失败，跳过缓存: {e}")
+            return None
+        if not isinstance(state, dict) or not state.get("token"):
+            return None
+
+        viewport = None
+        if scope == "viewport":
+            viewport = (state.get("scroll_x"), state.get("scroll_y"), state.get("width"), state.get("height"))
+        return (operation, page_id, page.url, state["token"], state.get("version"), scope, viewport)
+
+    def _get_cached_extraction(self, key: Optional[Tuple]) -> Optional[Any]:
+        """读取缓存的内容提取结果"""
+        if key is None:
+            return None
+        result = self._extraction_cache.get(key)
+        if result is not None:
+            self._extraction_cache.move_to_end(key)
+        return result
+
+    def _put_cached_extraction(self, key: Optional[Tuple], result: Any) -> None:
+        """写入内容提取结果缓存，超出上限时淘汰最久未使用的结果"""
+        if key is None:
+            return
+        self._extraction_cache[key] = result
+        self._extraction_cache.move_to_end(key)
+        while len(self._extraction_cache) > EXTRACTION_CACHE_SIZE:
+            self._extraction_cache.popitem(last=False)
+
     async def get_active_context_id(self) -> Optional[str]:
         """获取当前活动上下文ID"""
         return self._active_context_id
@@ -246,6 +377,16 @@ class MagicBrowser:
                 self._active_page_id = None
         return self._active_page_id
 
+    async def set_active_page(self, page_id: str) -> bool:
+        """将指定页面设为活动页面，页面不存在或已关闭时返回 False"""
+        if not await self._page_registry.get_page_by_id(page_id):
+            return False
+        self._active_page_id = page_id
+        context_id = await self._page_registry.get_context_id_for_page(page_id)
+        if context_id:
+            self._active_context_id = context_id
+        return True
+
     async def get_page_by_id(self, page_id: str) -> Optional[Page]:
         """根据ID获取有效页面 (不存在或已关闭则返回None)"""
         return await self._page_registry.get_page_by_id(page_id)
@@ -298,6 +439,7 @@ class MagicBrowser:
             logger.info(f"{operation_name}: 页面 {actual_page_id} 导航至 {url}")
             await page.goto(url, wait_until=wait_until, timeout=60000) # 增加超时
             await self._wait_for_stable_network(page)
+            self._browser_manager.record_navigation(context_id)
 
             final_url = page.url
             title = "获取标题失败"
@@ -601,8 +743,18 @@ class MagicBrowser:
             if scope not in ["viewport", "all"]:
                 return MagicBrowserError(error=f"无效的范围: {scope}，支持 'viewport' 或 'all'", operation=operation_name, details=details)
 
+            # 页面内容未变化时直接返回缓存结果；缓存键在提取前获取，提取期间发生的变化会使下次读取重新提取
+            cache_key = await self._get_extraction_cache_key(page, page_id, operation_name, scope)
+            cached = self._get_cached_extraction(cache_key)
+            if cached is not None:
+                logger.info(f"{operation_name}: 页面 {page_id} 内容未变化，使用缓存结果。")
+                return cached
+
             script = f"""
             async () => {{
+                if (typeof window.MagicLens === 'undefined') {{
+                    return {{ module_missing: true }};
+                }}
                 try {{
                     return await window.MagicLens.readAsMarkdown('{scope}');
                 }} catch (e) {{
@@ -610,7 +762,7 @@ class MagicBrowser:
                 }}
             }}
             """
-            result = await page.evaluate(script)
+            result = await self._evaluate_module_script(page, page_id, "lens", script)
 
             if isinstance(result, dict) and "error" in result:
                 js_error = f"JS执行获取Markdown失败 ({scope}): {result['error']}"
@@ -621,7 +773,9 @@ class MagicBrowser:
             title = await page.title() or "无标题" # 同样需要处理 title 获取错误
 
             logger.info(f"{operation_name}: 页面 {page_id} 读取成功。")
-            return MarkdownSuccess(markdown=result, url=url, title=title, scope=scope)
+            markdown_result = MarkdownSuccess(markdown=result, url=url, title=title, scope=scope)
+            self._put_cached_extraction(cache_key, markdown_result)
+            return markdown_result
 
         except PlaywrightError as e:
             error_msg = f"读取Markdown失败 (Playwright Error): {e}"
@@ -653,8 +807,17 @@ class MagicBrowser:
                 return MagicBrowserError(error="加载JS模块 'touch' 失败", operation=operation_name, details=details)
 
             scope_value = "viewport" if scope == "viewport" else "all"
+            cache_key = await self._get_extraction_cache_key(page, page_id, operation_name, scope_value)
+            cached = self._get_cached_extraction(cache_key)
+            if cached is not None:
+                logger.info(f"{operation_name}: 页面 {page_id} 内容未变化，使用缓存结果。")
+                return cached
+
             script = f"""
             async () => {{
+                if (typeof window.MagicTouch === 'undefined') {{
+                    return {{ module_missing: true }};
+                }}
                 try {{
                     return await window.MagicTouch.getInteractiveElements('{scope_value}');
                 }} catch (e) {{
@@ -662,7 +825,7 @@ class MagicBrowser:
                 }}
             }}
             """
-            result = await page.evaluate(script)
+            result = await self._evaluate_module_script(page, page_id, "touch", script)
 
             if isinstance(result, dict) and "error" in result:
                 js_error = f"JS执行获取交互元素失败: {result['error']}"
@@ -674,7 +837,9 @@ class MagicBrowser:
             total_count = sum(len(v) for v in elements_by_category.values() if isinstance(v, list))
 
             logger.info(f"{operation_name}: 页面 {page_id} 获取到 {total_count} 个元素。")
-            return InteractiveElementsSuccess(elements_by_category=elements_by_category, total_count=total_count)
+            elements_result = InteractiveElementsSuccess(elements_by_category=elements_by_category, total_count=total_count)
+            self._put_cached_extraction(cache_key, elements_result)
+            return elements_result
 
         except PlaywrightError as e:
             error_msg = f"获取交互元素失败 (Playwright Error): {e}"
@@ -799,6 +964,11 @@ class MagicBrowser:
             self._active_page_id = None
             logger.info("所有管理的页面已请求关闭并注销。")
 
+            # 归还取用的上下文（启用上下文池时重置或放回池中）
+            for context_id in list(self._acquired_context_ids):
+                await self._browser_manager.release_context(context_id)
+            self._acquired_context_ids.clear()
+
             # 注销浏览器客户端引用
             await self._browser_manager.unregister_client()
             self._active_context_id = None
@@ -818,7 +988,9 @@ class MagicBrowser:
             self._active_page_id = None
             self._active_context_id = None
             self._managed_page_ids.clear()
+            self._acquired_context_ids.clear()
             self._temp_files.clear() # 再次清空以防万一
+            self._extraction_cache.clear()
 
     async def _wait_for_stable_network(self, page: Page, wait_time: float = 0.5, max_wait_time: float = 5.0):
         """等待网络活动稳定 (内部辅助方法)"""
@@ -874,9 +1046,19 @@ class MagicBrowser:
             pending_requests.remove(request)
             last_activity = asyncio.get_event_loop().time()
 
+        # 请求失败（包括被请求拦截策略中止）时不再等待
+        async def on_request_failed(request):
+            if request not in pending_requests:
+                return
+
+            nonlocal last_activity
+            pending_requests.discard(request)
+            last_activity = asyncio.get_event_loop().time()
+
         # 设置请求和响应监听器
         page.on("request", on_request)
         page.on("response", on_response)
+        page.on("requestfailed", on_request_failed)
 
         try:
             # 等待网络稳定
@@ -898,6 +1080,7 @@ class MagicBrowser:
             try:
                 page.remove_listener("request", on_request)
                 page.remove_listener("response", on_response)
+                page.remove_listener("requestfailed", on_request_failed)
             except Exception as remove_e:
                 # 在页面关闭等情况下移除监听器可能失败，忽略错误
                 logger.debug(f"移除网络监听器时出错 (可能页面已关闭): {remove_e}")
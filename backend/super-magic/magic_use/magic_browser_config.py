@@ -13,6 +13,7 @@ from typing import Any, Dict, List, Optional
 
 from app.paths import PathManager
 from agentlang.config.config import config
+from magic_use.request_policy import RequestPolicy
 
 # 设置日志
 logger = logging.getLogger(__name__)
@@ -126,6 +127,24 @@ class MagicBrowserConfig:
     # 浏览器权限列表
     permissions: Optional[List[str]] = None
 
+    # 请求拦截策略（按资源类型/域名拦截、限制响应大小、缓存静态资源），None 表示不拦截
+    request_policy: Optional[RequestPolicy] = None
+
+    # 是否在创建上下文时预注入 JS 模块打包脚本（关闭后在操作时按需探测和注入）
+    preinject_js_modules: bool = True
+
+    # 预热上下文池最多保留的空闲上下文数，0 表示不启用上下文池
+    context_pool_max_size: int = 0
+
+    # 预热上下文池保持的最少空闲上下文数
+    context_pool_min_size: int = 0
+
+    # 空闲上下文的保留时间（秒），无客户端时浏览器也在空闲该时间后关闭
+    context_pool_idle_ttl: float = 300
+
+    # 任务结束归还上下文时是否重置（关闭后按最新存储状态重新预热），否则仅关闭页面后复用
+    context_pool_reset_between_tasks: bool = True
+
     def __post_init__(self):
         """初始化后处理"""
         # 设置默认下载路径
@@ -391,3 +410,10 @@ class MagicBrowserConfig:
             storage_state_file=str(PathManager.get_browser_storage_state_file()),
             permissions=["geolocation", "notifications"]
         )
+
+    @classmethod
+    def create_for_text_extraction(cls) -> 'MagicBrowserConfig':
+        """创建针对纯文本提取优化的配置：在爬取配置基础上拦截图片、媒体、字体和追踪请求"""
+        browser_config = cls.create_for_scraping()
+        browser_config.request_policy = RequestPolicy.create_for_text_extraction()
+        return browser_config
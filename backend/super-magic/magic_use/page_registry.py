@@ -13,6 +13,7 @@ from typing import Dict, List, Optional, Union
 from pydantic import BaseModel, Field
 from playwright.async_api import Page
 
+from magic_use.browser_manager import BrowserManager
 from magic_use.js_loader import JSLoader
 from magic_use.userscript_manager import UserscriptManager
 
@@ -113,8 +114,9 @@ class PageRegistry:
             page_id = self._generate_page_id()
             self._pages[page_id] = page
 
-            # 创建并关联JS加载器
-            self._js_loaders[page_id] = JSLoader(page)
+            # 创建并关联JS加载器，上下文已预注入打包脚本时跳过模块探测
+            preinjected = BrowserManager().is_js_preinjected(context_id)
+            self._js_loaders[page_id] = JSLoader(page, preinjected=preinjected)
 
             # 记录页面所属的上下文，如果有
             if context_id:
@@ -289,12 +291,14 @@ class PageRegistry:
              return None
         return self._page_contexts.get(page_id)
 
-    async def ensure_js_module_loaded(self, page_id: str, module_names: Union[str, List[str]]) -> Dict[str, bool]:
+    async def ensure_js_module_loaded(self, page_id: str, module_names: Union[str, List[str]],
+                                      force_reload: bool = False) -> Dict[str, bool]:
         """确保指定页面加载了JS模块
 
         Args:
             page_id: 页面ID
             module_names: 模块名称或名称列表
+            force_reload: 是否跳过探测强制注入，用于预注入脚本未生效时的补救
 
         Returns:
             Dict[str, bool]: 加载结果，键为模块名，值为是否成功
@@ -322,7 +326,7 @@ class PageRegistry:
                      logger.warning(f"页面 {page_id} 在尝试加载模块 '{module_name}' 前已关闭。")
                      results[module_name] = False
                      continue
-                success = await js_loader.load_module(module_name)
+                success = await js_loader.load_module(module_name, force_reload=force_reload)
                 results[module_name] = success
             except Exception as e:
                 # 同样处理 Playwright 导航/关闭错误
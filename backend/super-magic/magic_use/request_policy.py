@@ -0,0 +1,294 @@
+"""
+请求拦截策略模块
+
+按资源类型和域名的允许/拒绝列表拦截浏览器请求，限制子资源的响应大小，
+并在内存中缓存脚本、样式等静态资源，减少纯文本抓取场景下的带宽和等待时间。
+策略按浏览器上下文生效，由 MagicBrowserConfig.request_policy 指定。
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from playwright.async_api import APIResponse, Request, Route
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 常见的统计、广告和追踪域名
+DEFAULT_TRACKER_DOMAINS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "doubleclick.net",
+    "adservice.google.com",
+    "connect.facebook.net",
+    "analytics.twitter.com",
+    "hm.baidu.com",
+    "cnzz.com",
+    "umeng.com",
+    "growingio.com",
+    "sensorsdata.cn",
+    "hotjar.com",
+    "mixpanel.com",
+    "segment.io",
+    "clarity.ms",
+    "scorecardresearch.com",
+    "quantserve.com",
+]
+
+# 静态资源缓存的总字节数上限
+STATIC_ASSET_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# 缓存响应时丢弃的头部（响应体已解压，长度由 fulfill 重新计算）
+STRIPPED_CACHE_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "set-cookie"}
+
+# Vary 中出现这些头部时响应因用户而异，不能按 URL 共享缓存
+PRIVATE_VARY_HEADERS = {"*", "cookie", "authorization"}
+
+
+def _match_domain(host: str, domains: List[str]) -> bool:
+    """判断主机名是否等于列表中的某个域名或为其子域名"""
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+@dataclass
+class RequestPolicy:
+    """请求拦截策略"""
+
+    # 拦截的资源类型（Playwright resource_type，如 image、media、font）
+    blocked_resource_types: List[str] = field(default_factory=list)
+
+    # 拦截的域名（包含子域名）
+    blocked_domains: List[str] = field(default_factory=list)
+
+    # 允许的域名（包含子域名），非空时其他域名的子资源请求均被拦截，主页面导航不受限制
+    allowed_domains: List[str] = field(default_factory=list)
+
+    # 由拦截器代为获取的响应的最大字节数，超出时中止请求，None 表示不限制
+    max_response_size: Optional[int] = None
+
+    # 设置 max_response_size 时，除缓存的资源类型外还需代为获取以检查大小的资源类型，主页面导航不受限制
+    size_limited_resource_types: List[str] = field(default_factory=lambda: ["document", "xhr", "fetch"])
+
+    # 是否在内存中缓存静态资源，同一浏览器的上下文之间复用
+    cache_static_assets: bool = False
+
+    # 经由缓存代为获取的资源类型，其他资源直接放行，不经过拦截器缓冲
+    cached_resource_types: List[str] = field(default_factory=lambda: ["script", "stylesheet"])
+
+    def get_block_reason(self, url: str, resource_type: str) -> Optional[str]:
+        """
+        判断请求是否应被拦截
+
+        Args:
+            url: 请求地址
+            resource_type: 资源类型
+
+        Returns:
+            Optional[str]: 拦截原因，不拦截时返回 None
+        """
+        if resource_type in self.blocked_resource_types:
+            return f"resource_type:{resource_type}"
+
+        host = (urlsplit(url).hostname or "").lower()
+        if not host:
+            return None
+        if self.blocked_domains and _match_domain(host, self.blocked_domains):
+            return f"blocked_domain:{host}"
+        if self.allowed_domains and not _match_domain(host, self.allowed_domains):
+            return f"not_allowed_domain:{host}"
+        return None
+
+    @classmethod
+    def create_for_text_extraction(cls) -> 'RequestPolicy':
+        """创建面向文本提取的策略：拦截图片、媒体、字体和追踪脚本，缓存脚本和样式"""
+        return cls(
+            blocked_resource_types=["image", "media", "font", "imageset", "texttrack", "beacon", "ping", "manifest"],
+            blocked_domains=DEFAULT_TRACKER_DOMAINS.copy(),
+            max_response_size=5 * 1024 * 1024,
+            cache_static_assets=True,
+        )
+
+
+class StaticAssetCache:
+    """静态资源内存缓存（LRU），按 URL 缓存成功的 GET 响应，由浏览器管理器持有，供其所有上下文共享"""
+
+    def __init__(self, max_bytes: int = STATIC_ASSET_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._assets: "OrderedDict[str, Tuple[int, Dict[str, str], bytes]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        """读取缓存的资源 (状态码, 响应头, 响应体)"""
+        with self._lock:
+            asset = self._assets.get(url)
+            if asset is not None:
+                self._assets.move_to_end(url)
+            return asset
+
+    def put(self, url: str, status: int, headers: Dict[str, str], body: bytes) -> None:
+        """写入缓存，超出总大小时淘汰最久未使用的资源"""
+        if len(body) > self.max_bytes // 16:
+            return
+        with self._lock:
+            old = self._assets.pop(url, None)
+            if old is not None:
+                self._total_bytes -= len(old[2])
+            self._assets[url] = (status, headers, body)
+            self._total_bytes += len(body)
+            while self._assets and self._total_bytes > self.max_bytes:
+                _, (_, _, evicted) = self._assets.popitem(last=False)
+                self._total_bytes -= len(evicted)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._assets.clear()
+            self._total_bytes = 0
+
+
+class RequestInterceptor:
+    """按 RequestPolicy 处理单个上下文中的请求，并统计拦截情况"""
+
+    def __init__(self, policy: RequestPolicy, asset_cache: Optional[StaticAssetCache] = None):
+        """
+        Args:
+            policy: 请求拦截策略
+            asset_cache: 静态资源缓存，为 None 时不缓存，脚本、样式等请求直接放行
+        """
+        self.policy = policy
+        self.asset_cache = asset_cache if policy.cache_static_assets else None
+        self.stats: Dict[str, int] = {
+            "allowed": 0,
+            "blocked": 0,
+            "oversized": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+        }
+
+    @staticmethod
+    def _is_main_frame_navigation(request: Request) -> bool:
+        """判断是否为主框架的页面导航，此类请求始终放行"""
+        try:
+            return request.is_navigation_request() and request.frame.parent_frame is None
+        except Exception:
+            # Service Worker 等请求没有所属框架
+            return False
+
+    async def handle(self, route: Route, request: Request) -> None:
+        """路由处理函数，供 BrowserContext.route 使用"""
+        try:
+            if not self._is_main_frame_navigation(request):
+                reason = self.policy.get_block_reason(request.url, request.resource_type)
+                if reason:
+                    self.stats["blocked"] += 1
+                    logger.debug(f"拦截请求 ({reason}): {request.url}")
+                    await route.abort("blockedbyclient")
+                    return
+
+                if self._is_cacheable(request):
+                    await self._fetch_static_asset(route, request)
+                    return
+
+                if self._is_size_limited(request):
+                    await self._fetch_with_size_limit(route, request)
+                    return
+
+            self.stats["allowed"] += 1
+            await route.continue_()
+        except Exception as e:
+            # 页面关闭等情况下路由可能已失效，尝试放行后忽略错误
+            logger.debug(f"处理请求拦截时出错: {request.url}, {e}")
+            try:
+                await route.continue_()
+            except Exception:
+                pass
+
+    def _is_cacheable(self, request: Request) -> bool:
+        """判断请求能否由静态资源缓存处理，只有这类请求才由拦截器代为获取"""
+        return (
+            self.asset_cache is not None
+            and request.method == "GET"
+            and request.resource_type in self.policy.cached_resource_types
+            and request.url.startswith(("http://", "https://"))
+        )
+
+    async def _fetch_static_asset(self, route: Route, request: Request) -> None:
+        """通过缓存或代为请求获取静态资源，并检查响应大小"""
+        url = request.url
+        cached = self.asset_cache.get(url)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            status, headers, body = cached
+            await route.fulfill(status=status, headers=headers, body=body)
+            return
+        self.stats["cache_misses"] += 1
+
+        fetched = await self._fetch_within_limit(route, request)
+        if fetched is None:
+            return
+        response, body = fetched
+
+        if response.status == 200 and self._is_shareable(request, response.headers):
+            cached_headers = {k: v for k, v in response.headers.items() if k.lower() not in STRIPPED_CACHE_HEADERS}
+            self.asset_cache.put(url, response.status, cached_headers, body)
+        self.stats["allowed"] += 1
+        await route.fulfill(response=response, body=body)
+
+    def _is_size_limited(self, request: Request) -> bool:
+        """判断请求是否需要代为获取以检查响应大小"""
+        return (
+            bool(self.policy.max_response_size)
+            and request.resource_type in self.policy.size_limited_resource_types
+            and request.url.startswith(("http://", "https://"))
+        )
+
+    async def _fetch_with_size_limit(self, route: Route, request: Request) -> None:
+        """代为请求文档、XHR 等不缓存的资源，只检查响应大小"""
+        fetched = await self._fetch_within_limit(route, request)
+        if fetched is None:
+            return
+        response, body = fetched
+        self.stats["allowed"] += 1
+        await route.fulfill(response=response, body=body)
+
+    async def _fetch_within_limit(self, route: Route, request: Request) -> Optional[Tuple[APIResponse, bytes]]:
+        """
+        代为请求资源并检查响应大小
+
+        Returns:
+            Optional[Tuple[APIResponse, bytes]]: 响应和响应体，超出大小限制时中止请求并返回 None
+        """
+        response = await route.fetch()
+        body = await response.body()
+        if self.policy.max_response_size and len(body) > self.policy.max_response_size:
+            self.stats["oversized"] += 1
+            logger.debug(f"响应超出大小限制 ({len(body)} 字节)，中止请求: {request.url}")
+            await route.abort("blockedbyclient")
+            return None
+        return response, body
+
+    @staticmethod
+    def _is_shareable(request: Request, headers: Dict[str, str]) -> bool:
+        """
+        判断响应能否按 URL 在上下文之间共享缓存
+
+        带凭据的请求、设置 Cookie 的响应、Cache-Control 为 private/no-store 的响应，
+        以及 Vary 依赖 Cookie 或 Authorization 的响应都因用户而异，不能共享
+        """
+        if "authorization" in {k.lower() for k in request.headers}:
+            return False
+        headers = {k.lower(): v for k, v in headers.items()}
+        if "set-cookie" in headers:
+            return False
+        cache_control = {d.strip().split("=", 1)[0] for d in headers.get("cache-control", "").lower().split(",")}
+        if cache_control & {"no-store", "private"}:
+            return False
+        vary = {v.strip() for v in headers.get("vary", "").lower().split(",")}
+        return not vary & PRIVATE_VARY_HEADERS
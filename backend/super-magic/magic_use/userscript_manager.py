@@ -3,8 +3,11 @@ import asyncio
 import fnmatch # 引入 fnmatch 用于 URL 模式匹配
 import logging
 import re # 引入 re 模块
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Optional, Dict, Any # 引入 Dict, Any
+from typing import List, Optional, Dict, Any, Pattern, Set, Tuple # 引入 Dict, Any
+from urllib.parse import urlsplit
 
 import aiofiles # 用于异步文件读取
 from magic_use.userscript import Userscript
@@ -14,6 +17,91 @@ logger = logging.getLogger(__name__)
 # Define the path to the magic_monkey directory relative to this file
 MAGIC_MONKEY_DIR = Path(__file__).resolve().parent / "magic_monkey"
 
+# URL 匹配结果缓存的最大条目数
+MATCH_CACHE_SIZE = 256
+# 检查脚本目录变化的最小间隔（秒）
+RELOAD_CHECK_INTERVAL = 5.0
+
+# 从 @match 模式中提取主机部分，例如 "*://*.example.com/path/*" -> "*.example.com"
+_PATTERN_HOST_RE = re.compile(r"^[^/]*://([^/]*)/")
+_WILDCARD_CHARS = set("*?[")
+
+
+class UserscriptMatcher:
+    """
+    预编译的油猴脚本匹配器。
+
+    加载脚本时将所有 @match/@exclude 模式编译为正则（语义与 fnmatch 相同），
+    并按模式中的主机名建立索引，匹配时只检查与 URL 主机相关的候选脚本：
+    - 精确主机（如 "36kr.com"）按主机名索引
+    - 子域名通配（如 "*.baidu.com"）按后缀域名索引
+    - 主机部分包含其他通配符或无法解析的模式归入通用列表，总是参与匹配
+    """
+
+    def __init__(self, scripts: List[Userscript]):
+        self._scripts = scripts
+        self._match_regexes: List[List[Pattern]] = []
+        self._exclude_regexes: List[List[Pattern]] = []
+        self._exact_hosts: Dict[str, Set[int]] = {}
+        self._suffix_hosts: Dict[str, Set[int]] = {}
+        self._generic: Set[int] = set()
+
+        for index, script in enumerate(scripts):
+            self._match_regexes.append([re.compile(fnmatch.translate(p)) for p in script.match_patterns])
+            self._exclude_regexes.append([re.compile(fnmatch.translate(p)) for p in script.exclude_patterns])
+            for pattern in script.match_patterns:
+                self._index_pattern(index, pattern)
+
+    def _index_pattern(self, index: int, pattern: str) -> None:
+        """按 @match 模式的主机部分为脚本建立索引"""
+        match = _PATTERN_HOST_RE.match(pattern)
+        host = match.group(1).lower() if match else ""
+        if host and not host.startswith("["):
+            host = host.split(":", 1)[0] # 去掉端口
+        if host and not _WILDCARD_CHARS & set(host):
+            self._exact_hosts.setdefault(host, set()).add(index)
+        elif host.startswith("*.") and not _WILDCARD_CHARS & set(host[2:]):
+            self._suffix_hosts.setdefault(host[2:], set()).add(index)
+        else:
+            self._generic.add(index)
+
+    def _get_candidates(self, url: str) -> List[int]:
+        """获取与 URL 主机相关的候选脚本索引（按加载顺序）"""
+        try:
+            host = (urlsplit(url).hostname or "").lower()
+        except ValueError:
+            host = ""
+        candidates = set(self._generic)
+        candidates.update(self._exact_hosts.get(host, ()))
+        parts = host.split(".")
+        for i in range(len(parts)):
+            candidates.update(self._suffix_hosts.get(".".join(parts[i:]), ()))
+        return sorted(candidates)
+
+    def match(self, url: str, run_at: str) -> List[Userscript]:
+        """
+        查找匹配 URL 和注入时机的脚本。
+
+        Args:
+            url: 页面 URL。
+            run_at: 脚本注入时机。
+
+        Returns:
+            匹配的 Userscript 对象列表（按加载顺序）。
+        """
+        matching_scripts: List[Userscript] = []
+        for index in self._get_candidates(url):
+            script = self._scripts[index]
+            if script.run_at != run_at:
+                continue
+            if not any(regex.match(url) for regex in self._match_regexes[index]):
+                continue
+            if any(regex.match(url) for regex in self._exclude_regexes[index]):
+                continue
+            matching_scripts.append(script)
+            logger.debug(f"URL '{url}' 匹配脚本 '{script.name}' (run_at={run_at})")
+        return matching_scripts
+
 class UserscriptManager:
     """
     管理油猴脚本 (Userscripts) 的加载、解析、缓存和匹配。
@@ -41,6 +129,11 @@ class UserscriptManager:
         else:
             self._userscript_dir = userscript_dir
         self._scripts: List[Userscript] = [] # 缓存解析后的脚本
+        self._matcher = UserscriptMatcher([]) # 预编译的匹配器
+        self._match_cache: "OrderedDict[Tuple[str, str], Tuple[Userscript, ...]]" = OrderedDict() # URL 匹配结果缓存
+        self._file_states: Dict[Path, Tuple[int, int]] = {} # 已加载脚本文件的 (修改时间, 大小)
+        self._last_reload_check = 0.0 # 上次检查脚本目录变化的时间
+        self._reload_task: Optional[asyncio.Task] = None # 后台检查目录变化并重新加载的任务
         self._load_lock = asyncio.Lock() # 用于保护加载过程的异步锁
         self._initialized = False # 添加初始化标记
 
@@ -146,9 +239,52 @@ class UserscriptManager:
             logger.error(f"解析脚本文件时发生意外错误: {file_path}, Error: {e}")
             return None
 
+    def _scan_script_files(self) -> Dict[Path, Tuple[int, int]]:
+        """扫描脚本目录，返回所有 .js 文件的 (修改时间, 大小)"""
+        file_states: Dict[Path, Tuple[int, int]] = {}
+        for file_path in self._userscript_dir.rglob("*.js"):
+            try:
+                if file_path.is_file():
+                    stat_result = file_path.stat()
+                    file_states[file_path] = (stat_result.st_mtime_ns, stat_result.st_size)
+            except OSError:
+                continue
+        return file_states
+
+    async def _load_scripts_locked(self):
+        """解析所有脚本并重建匹配器，调用方需持有 _load_lock。新匹配器构建完成后才替换旧的，加载期间匹配不中断"""
+        logger.info(f"开始从 {self._userscript_dir} 加载油猴脚本...")
+        loaded_scripts: List[Userscript] = []
+
+        # 使用 pathlib 的 rglob 查找所有 .js 文件，目录遍历和 stat 放到线程中执行，避免阻塞事件循环
+        try:
+             file_states = await asyncio.to_thread(self._scan_script_files)
+        except Exception as e:
+             logger.error(f"扫描油猴脚本目录失败: {self._userscript_dir}, Error: {e}")
+             file_states = {} # 出错则不加载
+
+        # 为每个文件创建一个解析任务
+        tasks = [asyncio.create_task(self._parse_script_file(file_path)) for file_path in sorted(file_states)]
+
+        if tasks:
+             results = await asyncio.gather(*tasks)
+             for script in results:
+                 if script:
+                     loaded_scripts.append(script)
+             logger.info(f"成功加载 {len(loaded_scripts)} 个油猴脚本。")
+        else:
+             logger.info("在指定目录中未找到油猴脚本文件。")
+
+        self._scripts = loaded_scripts # 更新缓存
+        self._matcher = UserscriptMatcher(loaded_scripts)
+        self._match_cache.clear()
+        self._file_states = file_states
+        self._last_reload_check = time.monotonic()
+        self._initialized = True # 标记初始化完成
+
     async def load_scripts(self):
         """
-        异步扫描脚本目录，解析所有 .js 文件并缓存结果。
+        异步扫描脚本目录，解析所有 .js 文件，编译匹配器并缓存结果。
 
         使用锁确保同一时间只有一个加载操作在进行。
         """
@@ -163,42 +299,45 @@ class UserscriptManager:
             if self._initialized:
                 logger.debug("Userscripts 已经加载过，跳过。")
                 return
-
-            logger.info(f"开始从 {self._userscript_dir} 加载油猴脚本...")
-            loaded_scripts: List[Userscript] = []
-            tasks = []
-
-            # 使用 pathlib 的 rglob 查找所有 .js 文件
-            try:
-                 script_files = [f for f in self._userscript_dir.rglob("*.js") if f.is_file()]
-            except Exception as e:
-                 logger.error(f"扫描油猴脚本目录失败: {self._userscript_dir}, Error: {e}")
-                 script_files = [] # 出错则不加载
-
-            for file_path in script_files:
-                 # 为每个文件创建一个解析任务
-                 tasks.append(asyncio.create_task(self._parse_script_file(file_path)))
-
-            if tasks:
-                 results = await asyncio.gather(*tasks)
-                 for script in results:
-                     if script:
-                         loaded_scripts.append(script)
-                 logger.info(f"成功加载 {len(loaded_scripts)} 个油猴脚本。")
-            else:
-                 logger.info("在指定目录中未找到油猴脚本文件。")
-
-
-            self._scripts = loaded_scripts # 更新缓存
-            self._initialized = True # 标记初始化完成
+            await self._load_scripts_locked()
 
     async def reload_scripts(self):
          """强制重新加载所有脚本"""
+         if self._userscript_dir is None:
+             return
          async with self._load_lock: # 获取锁
-             self._initialized = False # 重置初始化标记
-             self._scripts.clear() # 清空缓存
              logger.info("强制重新加载油猴脚本...")
-         await self.load_scripts() # 重新加载
+             await self._load_scripts_locked() # 重新加载
+
+    def _check_for_changes(self):
+        """按间隔在后台检查脚本目录是否有文件增删改（本次匹配仍使用当前匹配器）"""
+        if self._userscript_dir is None:
+            return
+        now = time.monotonic()
+        if now - self._last_reload_check < RELOAD_CHECK_INTERVAL:
+            return
+        self._last_reload_check = now
+        if self._reload_task is not None and not self._reload_task.done():
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._reload_task = loop.create_task(self._reload_if_changed())
+
+    async def _reload_if_changed(self):
+        """在线程中扫描脚本目录，与已加载的文件状态不同时重新加载"""
+        try:
+            file_states = await asyncio.to_thread(self._scan_script_files)
+        except Exception as e:
+            logger.debug(f"检查油猴脚本目录变化失败: {e}")
+            return
+        if file_states == self._file_states:
+            return
+
+        logger.info("检测到油猴脚本文件变化，后台重新加载。")
+        await self.reload_scripts()
 
     def get_matching_scripts(self, url: str, run_at: str = "document-end") -> List[Userscript]:
         """
@@ -220,42 +359,18 @@ class UserscriptManager:
         if not url: # 如果 URL 为空或 None，不进行匹配
             return []
 
-        matching_scripts: List[Userscript] = []
-        for script in self._scripts:
-            # 1. 检查注入时机是否匹配
-            if script.run_at != run_at:
-                continue
+        self._check_for_changes()
 
-            # 2. 检查 URL 是否匹配 @match 规则
-            is_matched = False
-            if not script.match_patterns: # 如果没有 @match 规则，默认不匹配任何页面
-                logger.debug(f"脚本 '{script.name}' 没有 @match 规则，跳过 URL: {url}")
-                continue
-            for pattern in script.match_patterns:
-                # 使用 fnmatch 进行简单的通配符匹配
-                # 注意：这可能无法完全覆盖 Tampermonkey 的所有复杂匹配规则
-                # 但能处理常见的 * 通配符
-                if fnmatch.fnmatch(url, pattern):
-                    is_matched = True
-                    break # 匹配到任何一个 @match 即可
-
-            if not is_matched:
-                continue # 如果没有匹配任何 @match 规则，则跳过此脚本
-
-            # 3. 检查 URL 是否匹配 @exclude 规则
-            is_excluded = False
-            for pattern in script.exclude_patterns:
-                if fnmatch.fnmatch(url, pattern):
-                    is_excluded = True
-                    break # 匹配到任何一个 @exclude 即可排除
-
-            if is_excluded:
-                continue # 如果匹配了排除规则，则跳过此脚本
-
-            # 4. 如果通过所有检查，则添加到结果列表
-            matching_scripts.append(script)
-            logger.debug(f"URL '{url}' 匹配脚本 '{script.name}' (run_at={run_at})")
+        cache_key = (url, run_at)
+        cached = self._match_cache.get(cache_key)
+        if cached is not None:
+            self._match_cache.move_to_end(cache_key)
+            return list(cached)
 
+        matching_scripts = self._matcher.match(url, run_at)
+        self._match_cache[cache_key] = tuple(matching_scripts)
+        while len(self._match_cache) > MATCH_CACHE_SIZE:
+            self._match_cache.popitem(last=False)
         return matching_scripts
 
 # 可以选择在这里创建单例实例，如果不需要异步获取的话
@@ -0,0 +1,37 @@
+"""
+ChatHistory 追加日志重放测试
+"""
+from agentlang.chat_history.chat_history import ChatHistory
+from agentlang.chat_history.chat_history_models import CompressionConfig, UserMessage
+
+
+def _create_history(tmp_path) -> ChatHistory:
+    return ChatHistory(
+        "test_agent", "agent-1", str(tmp_path),
+        compression_config=CompressionConfig(enable_compression=False),
+        storage_mode="journal",
+    )
+
+
+async def test_journal_replays_messages_after_snapshot(tmp_path):
+    history = _create_history(tmp_path)
+    await history.append_user_message("first")
+    history.compact()
+    await history.append_user_message("second")
+    await history.append_user_message("third")
+
+    reloaded = _create_history(tmp_path)
+    assert [message.content for message in reloaded.messages] == ["first", "second", "third"]
+
+
+async def test_stale_journal_is_skipped_when_crash_follows_snapshot_replace(tmp_path, monkeypatch):
+    history = _create_history(tmp_path)
+    for content in ["one", "two", "three", "four"]:
+        await history.append_user_message(content)
+
+    # 模拟压缩后写入了更短的快照，但在清空追加日志前进程退出
+    monkeypatch.setattr(history, "_reset_journal", lambda: None)
+    history.replace([UserMessage(content="summary")])
+
+    reloaded = _create_history(tmp_path)
+    assert [message.content for message in reloaded.messages] == ["summary"]
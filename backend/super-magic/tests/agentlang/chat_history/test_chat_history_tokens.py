@@ -0,0 +1,68 @@
+"""
+ChatHistory token 总数增量维护测试
+"""
+from agentlang.chat_history.chat_history import ChatHistory
+from agentlang.chat_history.chat_history_models import CompressionConfig, UserMessage
+from agentlang.llms.token_usage.models import TokenUsage
+
+
+def _create_history(tmp_path, storage_mode: str = "snapshot") -> ChatHistory:
+    return ChatHistory(
+        "test_agent", "agent-1", str(tmp_path),
+        compression_config=CompressionConfig(enable_compression=False),
+        storage_mode=storage_mode,
+    )
+
+
+def _full_recount(history: ChatHistory) -> int:
+    return sum(history._count_message_tokens(message)[0] for message in history.messages)
+
+
+async def test_running_total_matches_full_recount_after_mixed_mutations(tmp_path):
+    history = _create_history(tmp_path)
+
+    await history.append_system_message("You are a helpful assistant.")
+    await history.append_user_message("List the files in the workspace.")
+    await history.append_assistant_message(
+        "Let me check.",
+        tool_calls_data=[{"id": "call_1", "type": "function",
+                          "function": {"name": "list_dir", "arguments": "{\"path\": \".\"}"}}],
+    )
+    await history.append_tool_message("a.txt\nb.txt", tool_call_id="call_1")
+    await history.append_assistant_message(
+        "There are two files.",
+        token_usage=TokenUsage(input_tokens=120, output_tokens=30, total_tokens=150),
+    )
+    assert history.tokens_count == _full_recount(history)
+
+    history.insert_message_before_last(UserMessage(content="Also show hidden files."))
+    assert history.tokens_count == _full_recount(history)
+
+    history.remove_last_message()
+    history.remove_last_message()
+    assert history.tokens_count == _full_recount(history)
+
+    history.replace_last_user_message("Show every file, including hidden ones, with sizes.")
+    assert history.tokens_count == _full_recount(history)
+
+    kept = history.messages[:2]
+    history.replace(kept + [UserMessage(content="Start over with a summary.")])
+    assert history.tokens_count == _full_recount(history)
+
+    history.load()
+    assert history.tokens_count == _full_recount(history)
+
+    history.replace([])
+    assert history.tokens_count == 0
+
+
+async def test_invalidate_picks_up_direct_message_edits(tmp_path):
+    history = _create_history(tmp_path, storage_mode="journal")
+    await history.append_user_message("short")
+    before = history.tokens_count
+
+    history.messages[0].content = "a much longer message " * 20
+    assert history.tokens_count == before
+
+    assert history.invalidate_tokens_count() == _full_recount(history)
+    assert history.tokens_count > before
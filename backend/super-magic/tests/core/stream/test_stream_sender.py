@@ -0,0 +1,65 @@
+"""
+StreamSender 关闭行为测试
+"""
+import asyncio
+from typing import List, Optional
+
+from agentlang.event.event import EventType
+from app.core.stream.base import Stream
+from app.core.stream.stream_sender import StreamSender
+
+
+class SlowStream(Stream):
+    """每次写入前等待一段时间的测试流"""
+
+    def __init__(self, delay: float = 0.01):
+        super().__init__()
+        self.delay = delay
+        self.written: List[str] = []
+
+    def read(self, size: Optional[int] = None) -> str:
+        return ""
+
+    async def write(self, data: str, data_type: str = "json") -> int:
+        await asyncio.sleep(self.delay)
+        self.written.append(data)
+        return len(data)
+
+
+async def test_aclose_delivers_message_enqueued_right_before_close():
+    stream = SlowStream()
+    sender = StreamSender(stream)
+    for i in range(5):
+        sender.put(EventType.AFTER_LLM_REQUEST, f"message-{i}")
+    sender.put(EventType.AFTER_MAIN_AGENT_RUN, "task-finished")
+
+    await sender.aclose(timeout=5)
+
+    assert stream.written[-1] == "task-finished"
+    assert len(stream.written) == 6
+    assert sender.metrics.queue_size == 0
+
+
+async def test_aclose_drops_remaining_messages_after_timeout():
+    stream = SlowStream(delay=1)
+    sender = StreamSender(stream)
+    sender.put(EventType.AFTER_LLM_REQUEST, "first")
+    sender.put(EventType.AFTER_MAIN_AGENT_RUN, "second")
+
+    await sender.aclose(timeout=0.05)
+
+    assert stream.written == []
+    sender.put(EventType.AFTER_MAIN_AGENT_RUN, "after-close")
+    assert sender.metrics.enqueued == 2
+
+
+async def test_close_wakes_pending_flush():
+    stream = SlowStream(delay=1)
+    sender = StreamSender(stream)
+    sender.put(EventType.AFTER_LLM_REQUEST, "message")
+
+    flush_task = asyncio.create_task(sender.flush(timeout=5))
+    await asyncio.sleep(0)
+    sender.close()
+
+    await asyncio.wait_for(flush_task, timeout=1)